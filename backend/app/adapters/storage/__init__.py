@@ -1,3 +1,26 @@
-from .manager import get_storage_backend, LocalStorageBackend, StoredObject
+from .manager import (
+    get_storage_backend,
+    get_local_storage_backend,
+    LocalStorageBackend,
+    LocatedObject,
+    StoredObject,
+    StreamWriter,
+    StorageLimitExceeded,
+)
+from .pack import PackStore
+from .s3 import S3StorageBackend, S3StorageError
+from .usage import StorageUsageLedger
 
-__all__ = ["get_storage_backend", "LocalStorageBackend", "StoredObject"]
+__all__ = [
+    "get_storage_backend",
+    "get_local_storage_backend",
+    "LocalStorageBackend",
+    "LocatedObject",
+    "StoredObject",
+    "StreamWriter",
+    "StorageLimitExceeded",
+    "PackStore",
+    "S3StorageBackend",
+    "S3StorageError",
+    "StorageUsageLedger",
+]
@@ -7,21 +7,30 @@
 设计说明：
 - 异步API接口，通过 asyncio.to_thread 实现阻塞SDK的异步调用
 - 调用者建议使用基于内容寻址的key（基于sha256）
+- 可选打包存储：不超过阈值的小对象写入段文件（见 pack.py），读取时透明回退
 """
 
 from __future__ import annotations
 
 import asyncio
+import hashlib
+import itertools
 import os
+import tempfile
 from dataclasses import dataclass
-from typing import Optional, Literal
+from typing import AsyncIterable, AsyncIterator, Callable, Iterator, Optional, Literal, Union
 
 from app.core.config import settings
 from app.core.logging import logger
+from app.adapters.storage.pack import PackStore
+from app.adapters.storage.usage import StorageUsageLedger
 
 
 StorageBackendType = Literal["local"]
 
+# 流式写入的暂存目录（位于存储根目录下，保证重命名为原子操作）
+STAGING_DIR = ".staging"
+
 
 @dataclass(frozen=True)
 class StoredObject:
@@ -32,10 +41,136 @@ class StoredObject:
     url: Optional[str] = None
 
 
+@dataclass(frozen=True)
+class LocatedObject:
+    """对象在本地磁盘上的位置：独立文件（offset=0）或段文件中的一个区间"""
+    key: str
+    path: str
+    offset: int
+    length: int
+    mtime: float
+    packed: bool = False
+
+
+def _existing_size(path: str) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+class StorageLimitExceeded(Exception):
+    """流式写入超过配置的最大字节数"""
+
+    def __init__(self, limit: int, size: int):
+        super().__init__(f"Object exceeds size limit: {size} > {limit} bytes")
+        self.limit = limit
+        self.size = size
+
+
+class StreamWriter:
+    """流式写入句柄：分块写入暂存文件并增量计算 sha256，最后原子重命名到目标 key。
+
+    暂存文件位于存储根目录下的 `.staging/`，与目标路径同一文件系统，保证 rename 原子性。
+    内存占用只与单个分块大小有关，与对象总大小无关。
+    """
+
+    def __init__(self, backend: "LocalStorageBackend", *, max_bytes: Optional[int] = None):
+        self._backend = backend
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        staging_dir = os.path.join(backend.root_dir, STAGING_DIR)
+        os.makedirs(staging_dir, exist_ok=True)
+        fd, self._tmp_path = tempfile.mkstemp(dir=staging_dir, suffix=".part")
+        self._file = os.fdopen(fd, "wb")
+        self._hasher = hashlib.sha256()
+        self._closed = False
+        self.size = 0
+
+    @property
+    def sha256(self) -> str:
+        return self._hasher.hexdigest()
+
+    async def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self.max_bytes is not None and self.size + len(chunk) > self.max_bytes:
+            raise StorageLimitExceeded(self.max_bytes, self.size + len(chunk))
+        self._hasher.update(chunk)
+        await asyncio.to_thread(self._file.write, chunk)
+        self.size += len(chunk)
+
+    async def reset(self) -> None:
+        """丢弃已写入内容（如上游不支持 Range 续传时从头开始）"""
+
+        def truncate() -> None:
+            self._file.seek(0)
+            self._file.truncate()
+
+        await asyncio.to_thread(truncate)
+        self._hasher = hashlib.sha256()
+        self.size = 0
+
+    async def commit(self, *, key: str, content_type: str) -> StoredObject:
+        path = self._backend._full_path(key)
+
+        def finalize() -> None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            previous_size = _existing_size(path)
+            os.replace(self._tmp_path, path)
+            self._backend.usage.apply(
+                key,
+                bytes_delta=self.size - (previous_size or 0),
+                files_delta=0 if previous_size is not None else 1,
+            )
+
+        await asyncio.to_thread(finalize)
+        self._closed = True
+        return StoredObject(
+            key=key,
+            size=self.size,
+            sha256=self.sha256,
+            content_type=content_type,
+            url=self._backend.get_url(key=key),
+        )
+
+    async def abort(self) -> None:
+        """清理暂存文件；commit 之后调用为空操作"""
+        if self._closed:
+            return
+        self._closed = True
+
+        def cleanup() -> None:
+            self._file.close()
+            try:
+                os.remove(self._tmp_path)
+            except FileNotFoundError:
+                pass
+
+        await asyncio.to_thread(cleanup)
+
+
 class LocalStorageBackend:
-    def __init__(self, root_dir: str, public_base_url: Optional[str] = None):
+    def __init__(
+        self,
+        root_dir: str,
+        public_base_url: Optional[str] = None,
+        *,
+        pack_threshold_bytes: int = 0,
+        pack_segment_max_bytes: int = 256 * 1024 * 1024,
+    ):
         self.root_dir = os.path.abspath(root_dir)
         self.public_base_url = public_base_url.strip().rstrip("/") if public_base_url else None
+        self.usage = StorageUsageLedger(self.root_dir)
+        # 打包存储：阈值 <= 0 时关闭
+        self.pack_threshold_bytes = max(0, int(pack_threshold_bytes or 0))
+        self.packs: Optional[PackStore] = (
+            PackStore(self.root_dir, segment_max_bytes=pack_segment_max_bytes)
+            if self.pack_threshold_bytes > 0
+            else None
+        )
 
     def _full_path(self, key: str) -> str:
         """将key转换为分片路径（支持sha256:前缀）"""
@@ -49,22 +184,59 @@ class LocalStorageBackend:
         
         return os.path.join(self.root_dir, safe_key)
 
+    def locate(self, key: str) -> Optional[LocatedObject]:
+        """定位对象（同步调用）：优先独立文件，其次打包段"""
+        path = self._full_path(key)
+        try:
+            st = os.stat(path)
+        except OSError:
+            st = None
+        if st is not None:
+            return LocatedObject(key=key, path=path, offset=0, length=st.st_size, mtime=st.st_mtime)
+        if self.packs is not None:
+            packed = self.packs.locate(key.lstrip("/"))
+            if packed is not None:
+                return LocatedObject(
+                    key=key,
+                    path=packed.segment_path,
+                    offset=packed.offset,
+                    length=packed.length,
+                    mtime=packed.created_at,
+                    packed=True,
+                )
+        return None
+
     async def exists(self, *, key: str) -> bool:
         path = self._full_path(key)
-        return os.path.exists(path)
+        if os.path.exists(path):
+            return True
+        if self.packs is None:
+            return False
+        return await asyncio.to_thread(self.packs.locate, key.lstrip("/")) is not None
         
     def get_local_path(self, *, key: str) -> Optional[str]:
+        """返回对象的本地文件路径（同步调用）；打包对象解出为独立副本"""
         path = self._full_path(key)
         if os.path.exists(path):
             return path
-        return None
+        if self.packs is None:
+            return None
+        return self.packs.extract(key.lstrip("/"))
 
     async def get_bytes(self, key: str) -> bytes:
         path = self._full_path(key)
 
         def read_file() -> bytes:
-            with open(path, "rb") as f:
-                return f.read()
+            try:
+                with open(path, "rb") as f:
+                    return f.read()
+            except FileNotFoundError:
+                if self.packs is None:
+                    raise
+                data = self.packs.read(key.lstrip("/"))
+                if data is None:
+                    raise
+                return data
 
         try:
             return await asyncio.to_thread(read_file)
@@ -83,10 +255,18 @@ class LocalStorageBackend:
         path = self._full_path(key)
 
         def remove_file() -> bool:
-            if os.path.exists(path):
+            removed = False
+            size = _existing_size(path)
+            if size is not None:
                 os.remove(path)
-                return True
-            return False
+                self.usage.apply(key, bytes_delta=-size, files_delta=-1)
+                removed = True
+            if self.packs is not None:
+                packed_size = self.packs.delete(key.lstrip("/"))
+                if packed_size is not None:
+                    self.usage.apply(key, bytes_delta=-packed_size, files_delta=-1)
+                    removed = True
+            return removed
 
         try:
             return await asyncio.to_thread(remove_file)
@@ -95,6 +275,10 @@ class LocalStorageBackend:
             return False
 
     async def put_bytes(self, *, key: str, data: bytes, content_type: str) -> StoredObject:
+        if self.packs is not None and len(data) <= self.pack_threshold_bytes:
+            await asyncio.to_thread(self._put_packed, key, data, content_type)
+            return StoredObject(key=key, size=len(data), content_type=content_type, url=self.get_url(key=key))
+
         path = self._full_path(key)
         os.makedirs(os.path.dirname(path), exist_ok=True)
 
@@ -105,33 +289,189 @@ class LocalStorageBackend:
                 f.write(data)
                 f.flush()
                 os.fsync(f.fileno())
+            previous_size = _existing_size(path)
             os.replace(tmp_path, path)
+            self.usage.apply(
+                key,
+                bytes_delta=len(data) - (previous_size or 0),
+                files_delta=0 if previous_size is not None else 1,
+            )
 
         await asyncio.to_thread(write_atomic)
         return StoredObject(key=key, size=len(data), content_type=content_type, url=self.get_url(key=key))
 
+    def _put_packed(self, key: str, data: bytes, content_type: str) -> None:
+        if "/blobs/" in f"/{self.relative_key(key)}":
+            packed = self.packs.locate(key.lstrip("/"))
+            if packed is not None and packed.length == len(data) and self.packs.touch(key.lstrip("/")):
+                # 内容寻址对象已打包且大小一致：不重复追加，只刷新写入时间，使其重新受 GC 宽限期保护
+                return
+        previous_size = self.packs.put(key.lstrip("/"), data, content_type)
+        self.usage.apply(
+            key,
+            bytes_delta=len(data) - (previous_size or 0),
+            files_delta=0 if previous_size is not None else 1,
+        )
+        # 同 key 的独立文件（打包启用前写入）不再需要
+        path = self._full_path(key)
+        loose_size = _existing_size(path)
+        if loose_size is not None:
+            os.remove(path)
+            self.usage.apply(key, bytes_delta=-loose_size, files_delta=-1)
+
+    def relative_key(self, key: str) -> str:
+        """规范化 key 为相对存储根目录的路径（兼容 sha256: 前缀的历史 key）"""
+        return os.path.relpath(self._full_path(key), self.root_dir).replace(os.sep, "/")
+
+    def _iter_blob_objects(self) -> Iterator[tuple[str, int, float]]:
+        root = self.root_dir
+        for dirpath, dirnames, filenames in os.walk(root):
+            if dirpath == root:
+                dirnames[:] = [d for d in dirnames if not d.startswith(".")]
+            rel_dir = os.path.relpath(dirpath, root).replace(os.sep, "/")
+            if "/blobs/" not in f"/{rel_dir}/":
+                continue
+            for name in filenames:
+                try:
+                    stat = os.stat(os.path.join(dirpath, name))
+                except OSError:
+                    continue
+                yield f"{rel_dir}/{name}", stat.st_size, stat.st_mtime
+
+        if self.packs is not None:
+            for key, length, created_at in self.packs.iter_objects():
+                if "/blobs/" in f"/{key}":
+                    yield key, length, created_at
+
+    async def iter_blob_batches(self, batch_size: int = 1000) -> AsyncIterator[list[tuple[str, int, float]]]:
+        """分批遍历内容寻址对象（独立文件 + 打包对象），产出 [(key, 大小, 修改时间)]"""
+        objects = self._iter_blob_objects()
+
+        def next_batch() -> list[tuple[str, int, float]]:
+            return list(itertools.islice(objects, batch_size))
+
+        while True:
+            batch = await asyncio.to_thread(next_batch)
+            if not batch:
+                return
+            yield batch
+
+    async def reconcile_usage(self) -> dict:
+        """全量校准用量台账，打包对象按索引计入"""
+
+        def reconcile() -> dict:
+            packed = self.packs.iter_objects() if self.packs is not None else ()
+            return self.usage.reconcile(extra_objects=((key, length) for key, length, _ in packed))
+
+        return await asyncio.to_thread(reconcile)
+
+    async def compact_packs(self, *, garbage_ratio: float) -> Optional[dict]:
+        """压缩打包段，未启用打包时返回 None"""
+        if self.packs is None:
+            return None
+        return await asyncio.to_thread(self.packs.compact, garbage_ratio=garbage_ratio)
+
+    def open_stream(self, *, max_bytes: Optional[int] = None) -> StreamWriter:
+        """打开一个流式写入句柄，调用方负责 commit 或 abort。"""
+        return StreamWriter(self, max_bytes=max_bytes)
+
+    async def put_stream(
+        self,
+        *,
+        chunks: AsyncIterable[bytes],
+        key: Union[str, Callable[[str], str]],
+        content_type: str,
+        max_bytes: Optional[int] = None,
+    ) -> StoredObject:
+        """流式写入对象。
+
+        Args:
+            chunks: 异步字节块迭代器
+            key: 目标 key；传入可调用对象时以写入完成后的 sha256 生成内容寻址 key
+            content_type: MIME 类型
+            max_bytes: 最大允许字节数，超出时抛出 StorageLimitExceeded 并清理暂存文件
+        """
+        writer = self.open_stream(max_bytes=max_bytes)
+        try:
+            async for chunk in chunks:
+                await writer.write(chunk)
+            final_key = key(writer.sha256) if callable(key) else key
+            return await writer.commit(key=final_key, content_type=content_type)
+        finally:
+            await writer.abort()
 
-_backend_singleton: LocalStorageBackend | None = None
 
+_backend_singleton = None
+_local_backend_singleton: LocalStorageBackend | None = None
 
-def get_storage_backend() -> LocalStorageBackend:
+
+def get_local_storage_backend() -> LocalStorageBackend:
+    """获取本地文件系统存储后端（单例）。
+
+    存储后端为 s3 时，图片代理缓存等本地专用数据仍使用该后端。
+    """
+
+    global _local_backend_singleton
+    if _local_backend_singleton is not None:
+        return _local_backend_singleton
+
+    public_base_url = None
+    if getattr(settings, "storage_backend", "local") == "local":
+        public_base_url = (getattr(settings, "storage_public_base_url", None) or "").strip() or None
+
+    root = getattr(settings, "storage_local_root", "data/storage")
+    pack_threshold = int(getattr(settings, "storage_pack_threshold_bytes", 0) or 0)
+    _local_backend_singleton = LocalStorageBackend(
+        root_dir=root,
+        public_base_url=public_base_url,
+        pack_threshold_bytes=pack_threshold,
+        pack_segment_max_bytes=int(getattr(settings, "storage_pack_segment_max_bytes", 256 * 1024 * 1024)),
+    )
+    logger.info("本地存储: root_dir={}, pack_threshold={}", os.path.abspath(root), pack_threshold)
+    return _local_backend_singleton
+
+
+def get_storage_backend():
     """获取基于配置的单例存储后端。
 
     配置项:
-    - storage_backend: local (仅支持本地文件系统)
-    - storage_local_root
+    - storage_backend: local | s3
+    - storage_local_root（s3 模式下用于元数据缓存与用量台账）
     - storage_public_base_url (optional)
+    - storage_pack_threshold_bytes / storage_pack_segment_max_bytes (optional, local)
+    - storage_s3_* (s3)
     """
 
     global _backend_singleton
     if _backend_singleton is not None:
         return _backend_singleton
 
-    backend = getattr(settings, "storage_backend", "local")
-    public_base_url_raw = getattr(settings, "storage_public_base_url", None)
-    public_base_url = (public_base_url_raw or "").strip() or None
+    if getattr(settings, "storage_backend", "local") != "s3":
+        _backend_singleton = get_local_storage_backend()
+        return _backend_singleton
 
-    root = getattr(settings, "storage_local_root", "data/storage")
-    _backend_singleton = LocalStorageBackend(root_dir=root, public_base_url=public_base_url)
-    logger.info("存储后端: local (root_dir={})", os.path.abspath(root))
+    from app.adapters.storage.s3 import S3StorageBackend
+
+    access_key = settings.storage_s3_access_key
+    secret_key = settings.storage_s3_secret_key
+    _backend_singleton = S3StorageBackend(
+        endpoint_url=settings.storage_s3_endpoint_url or "",
+        bucket=settings.storage_s3_bucket or "",
+        access_key=access_key.get_secret_value() if access_key else "",
+        secret_key=secret_key.get_secret_value() if secret_key else "",
+        metadata_dir=os.path.join(getattr(settings, "storage_local_root", "data/storage"), ".s3"),
+        region=settings.storage_s3_region,
+        prefix=settings.storage_s3_prefix,
+        addressing_style=settings.storage_s3_addressing_style,
+        public_base_url=(settings.storage_public_base_url or "").strip() or None,
+        part_size=settings.storage_s3_part_size_bytes,
+        upload_concurrency=settings.storage_s3_upload_concurrency,
+        presign_expires_seconds=settings.storage_s3_presign_expires_seconds,
+    )
+    logger.info(
+        "存储后端: s3 (endpoint={}, bucket={}, prefix={})",
+        settings.storage_s3_endpoint_url,
+        settings.storage_s3_bucket,
+        settings.storage_s3_prefix,
+    )
     return _backend_singleton
@@ -0,0 +1,402 @@
+"""小对象打包存储
+
+目标：
+- 缩略图、头像、代理缓存等小对象不再各占一个文件，追加写入大段文件（segment），避免 inode 耗尽、备份与遍历缓慢
+- 索引记录 key -> (segment, offset, length)，读取为一次定位 + pread，可直接按区间零拷贝发送
+- 删除/覆盖只在索引中登记垃圾字节，由后台压缩（compaction）回收
+
+设计说明：
+- 段文件与索引位于存储根目录下的 `.packs/`；索引为 SQLite（WAL），段文件只追加
+- 追加写入在进程内线程锁 + 跨进程文件锁（fcntl，可用时）下进行；读取走每线程独立的只读连接，
+  不经过写锁，压缩期间定位/读取照常进行（WAL 下只看到已提交的位置）
+- 需要文件路径的调用方（推送渠道上传本地文件）由 extract 把对象解出到 `.packs/extracted/`，
+  文件名含段与偏移，对象被覆盖或搬移后自然换名；过期副本随压缩清理
+- 压缩时把存活对象复制到当前活跃段，旧段标记为 retired，延迟一段时间后再删除文件，
+  保证正在读取旧段的请求不受影响
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional
+
+from app.core.logging import logger
+
+try:  # pragma: no cover - Windows 无 fcntl，退化为进程内锁
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore[assignment]
+
+PACK_DIR = ".packs"
+_EXTRACT_DIR = "extracted"
+
+_SEGMENT_ACTIVE = 0
+_SEGMENT_SEALED = 1
+_SEGMENT_RETIRED = 2
+
+
+def pread(fd: int, length: int, offset: int) -> bytes:
+    """按偏移读取（无 os.pread 的平台退化为 lseek + read）"""
+    if hasattr(os, "pread"):
+        return os.pread(fd, length, offset)
+    os.lseek(fd, offset, os.SEEK_SET)  # pragma: no cover
+    return os.read(fd, length)  # pragma: no cover
+
+
+@dataclass(frozen=True)
+class PackedObject:
+    key: str
+    segment_path: str
+    offset: int
+    length: int
+    content_type: str
+    created_at: float
+
+
+class PackStore:
+    """追加写段文件 + SQLite 索引的小对象存储。"""
+
+    _RETIRED_SEGMENT_TTL_SECONDS = 3600.0
+
+    def __init__(self, root_dir: str, *, segment_max_bytes: int):
+        self.pack_dir = os.path.join(root_dir, PACK_DIR)
+        self.segment_max_bytes = max(1, int(segment_max_bytes))
+        self._lock = threading.RLock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._readers = threading.local()
+        self._reader_conns: list[sqlite3.Connection] = []
+        self._reader_lock = threading.Lock()
+        self._reader_generation = 0
+
+    # --- internals ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(self.pack_dir, exist_ok=True)
+        conn = sqlite3.connect(
+            os.path.join(self.pack_dir, "index.db"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=10,
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS objects (
+                key TEXT PRIMARY KEY,
+                segment INTEGER NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_objects_segment ON objects(segment)")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS segments (
+                id INTEGER PRIMARY KEY,
+                size INTEGER NOT NULL DEFAULT 0,
+                live_bytes INTEGER NOT NULL DEFAULT 0,
+                state INTEGER NOT NULL DEFAULT 0,
+                retired_at REAL
+            )
+            """
+        )
+        self._conn = conn
+        return conn
+
+    def _read_conn(self) -> sqlite3.Connection:
+        """当前线程的只读连接（不持有写锁，首次使用时借写连接建表）"""
+        cached = getattr(self._readers, "conn", None)
+        if cached is not None and cached[0] == self._reader_generation:
+            return cached[1]
+        if self._conn is None:
+            with self._lock:
+                self._connect()
+        conn = sqlite3.connect(
+            os.path.join(self.pack_dir, "index.db"),
+            check_same_thread=False,
+            isolation_level=None,
+            timeout=10,
+        )
+        conn.execute("PRAGMA query_only=ON")
+        with self._reader_lock:
+            self._reader_conns.append(conn)
+            generation = self._reader_generation
+        self._readers.conn = (generation, conn)
+        return conn
+
+    def _segment_path(self, segment_id: int) -> str:
+        return os.path.join(self.pack_dir, f"seg-{segment_id:06d}.pack")
+
+    @contextlib.contextmanager
+    def _write_lock(self):
+        """进程内 + 跨进程互斥，保证同一时刻只有一个写者追加段文件。"""
+        with self._lock:
+            os.makedirs(self.pack_dir, exist_ok=True)
+            if fcntl is None:
+                yield
+                return
+            with open(os.path.join(self.pack_dir, "write.lock"), "a+b") as lock_file:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+    def _active_segment(self, conn: sqlite3.Connection, incoming: int) -> int:
+        row = conn.execute(
+            "SELECT id, size FROM segments WHERE state = ? ORDER BY id DESC LIMIT 1",
+            (_SEGMENT_ACTIVE,),
+        ).fetchone()
+        if row is not None:
+            segment_id, size = row
+            if size == 0 or size + incoming <= self.segment_max_bytes:
+                return int(segment_id)
+            conn.execute("UPDATE segments SET state = ? WHERE id = ?", (_SEGMENT_SEALED, segment_id))
+        cursor = conn.execute("INSERT INTO segments (size, live_bytes, state) VALUES (0, 0, ?)", (_SEGMENT_ACTIVE,))
+        return int(cursor.lastrowid)
+
+    def _append_locked(self, conn: sqlite3.Connection, data: bytes) -> tuple[int, int]:
+        """追加到活跃段末尾，返回 (segment, offset)。调用方需持有写锁。"""
+        segment_id = self._active_segment(conn, len(data))
+        with open(self._segment_path(segment_id), "ab") as f:
+            offset = f.tell()
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        return segment_id, offset
+
+    def _release_locked(self, conn: sqlite3.Connection, key: str) -> Optional[int]:
+        row = conn.execute("SELECT segment, length FROM objects WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        segment_id, length = row
+        conn.execute("DELETE FROM objects WHERE key = ?", (key,))
+        conn.execute("UPDATE segments SET live_bytes = MAX(0, live_bytes - ?) WHERE id = ?", (length, segment_id))
+        return int(length)
+
+    # --- public API (同步调用，应在工作线程中执行) ---
+
+    def put(self, key: str, data: bytes, content_type: str) -> Optional[int]:
+        """写入对象，返回被覆盖对象的长度（新 key 返回 None）"""
+        with self._write_lock():
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                segment_id, offset = self._append_locked(conn, data)
+                previous = self._release_locked(conn, key)
+                conn.execute(
+                    "INSERT INTO objects (key, segment, offset, length, content_type, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, segment_id, offset, len(data), content_type, time.time()),
+                )
+                conn.execute(
+                    "UPDATE segments SET size = ?, live_bytes = live_bytes + ? WHERE id = ?",
+                    (offset + len(data), len(data), segment_id),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return previous
+
+    def touch(self, key: str) -> bool:
+        """把对象的写入时间刷新为当前时间（去重命中时使用），对象不存在返回 False"""
+        with self._write_lock():
+            cursor = self._connect().execute("UPDATE objects SET created_at = ? WHERE key = ?", (time.time(), key))
+        return cursor.rowcount > 0
+
+    def locate(self, key: str) -> Optional[PackedObject]:
+        row = self._read_conn().execute(
+            "SELECT segment, offset, length, content_type, created_at FROM objects WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        segment_id, offset, length, content_type, created_at = row
+        return PackedObject(
+            key=key,
+            segment_path=self._segment_path(int(segment_id)),
+            offset=int(offset),
+            length=int(length),
+            content_type=content_type,
+            created_at=float(created_at),
+        )
+
+    def read(self, key: str) -> Optional[bytes]:
+        obj = self.locate(key)
+        if obj is None:
+            return None
+        fd = os.open(obj.segment_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            return pread(fd, obj.length, obj.offset)
+        finally:
+            os.close(fd)
+
+    def extract(self, key: str) -> Optional[str]:
+        """把对象解出为独立文件并返回路径（同一位置的对象复用已解出的副本）"""
+        obj = self.locate(key)
+        if obj is None:
+            return None
+        segment = os.path.splitext(os.path.basename(obj.segment_path))[0]
+        path = os.path.join(self.pack_dir, _EXTRACT_DIR, f"{segment}-{obj.offset}-{os.path.basename(key)}")
+        with contextlib.suppress(OSError):
+            if os.path.getsize(path) == obj.length:
+                return path
+        fd = os.open(obj.segment_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            data = pread(fd, obj.length, obj.offset)
+        finally:
+            os.close(fd)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return path
+
+    def delete(self, key: str) -> Optional[int]:
+        """删除对象，返回释放的长度（不存在返回 None）"""
+        with self._write_lock():
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                released = self._release_locked(conn, key)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return released
+
+    def iter_objects(self, batch_size: int = 1000) -> Iterator[tuple[str, int, float]]:
+        """按 key 顺序分批产出 (key, length, created_at)"""
+        last_key = ""
+        while True:
+            rows = self._read_conn().execute(
+                "SELECT key, length, created_at FROM objects WHERE key > ? ORDER BY key LIMIT ?",
+                (last_key, batch_size),
+            ).fetchall()
+            if not rows:
+                return
+            for key, length, created_at in rows:
+                yield key, int(length), float(created_at)
+            last_key = rows[-1][0]
+
+    def stats(self) -> dict:
+        conn = self._read_conn()
+        row = conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0), COALESCE(SUM(live_bytes), 0) "
+            "FROM segments WHERE state != ?",
+            (_SEGMENT_RETIRED,),
+        ).fetchone()
+        objects = conn.execute("SELECT COUNT(*) FROM objects").fetchone()[0]
+        segments, size, live = row
+        return {
+            "segments": int(segments),
+            "objects": int(objects),
+            "segment_bytes": int(size),
+            "live_bytes": int(live),
+            "garbage_bytes": int(size) - int(live),
+        }
+
+    def compact(self, *, garbage_ratio: float = 0.5) -> dict:
+        """压缩垃圾占比不低于 garbage_ratio 的已封存段，并清理到期的 retired 段"""
+        compacted = 0
+        moved_bytes = 0
+        with self._write_lock():
+            conn = self._connect()
+            candidates = conn.execute(
+                "SELECT id, size, live_bytes FROM segments WHERE state = ? AND size > 0",
+                (_SEGMENT_SEALED,),
+            ).fetchall()
+            for segment_id, size, live_bytes in candidates:
+                if (size - live_bytes) / size < garbage_ratio:
+                    continue
+                moved_bytes += self._compact_segment_locked(conn, int(segment_id))
+                compacted += 1
+            purged = self._purge_retired_locked(conn)
+        self._purge_extracted()
+
+        if compacted or purged:
+            logger.info("打包存储压缩完成: compacted={}, moved_bytes={}, purged={}", compacted, moved_bytes, purged)
+        return {"compacted_segments": compacted, "moved_bytes": moved_bytes, "purged_segments": purged}
+
+    def _compact_segment_locked(self, conn: sqlite3.Connection, segment_id: int) -> int:
+        source_path = self._segment_path(segment_id)
+        rows = conn.execute(
+            "SELECT key, offset, length FROM objects WHERE segment = ? ORDER BY offset",
+            (segment_id,),
+        ).fetchall()
+        moved = 0
+        fd = os.open(source_path, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+        try:
+            for key, offset, length in rows:
+                data = pread(fd, int(length), int(offset))
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    target_id, target_offset = self._append_locked(conn, data)
+                    conn.execute(
+                        "UPDATE objects SET segment = ?, offset = ? WHERE key = ?",
+                        (target_id, target_offset, key),
+                    )
+                    conn.execute(
+                        "UPDATE segments SET size = ?, live_bytes = live_bytes + ? WHERE id = ?",
+                        (target_offset + len(data), len(data), target_id),
+                    )
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+                moved += len(data)
+        finally:
+            os.close(fd)
+        conn.execute(
+            "UPDATE segments SET state = ?, live_bytes = 0, retired_at = ? WHERE id = ?",
+            (_SEGMENT_RETIRED, time.time(), segment_id),
+        )
+        return moved
+
+    def _purge_retired_locked(self, conn: sqlite3.Connection) -> int:
+        cutoff = time.time() - self._RETIRED_SEGMENT_TTL_SECONDS
+        rows = conn.execute(
+            "SELECT id FROM segments WHERE state = ? AND retired_at < ?",
+            (_SEGMENT_RETIRED, cutoff),
+        ).fetchall()
+        for (segment_id,) in rows:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(self._segment_path(int(segment_id)))
+            conn.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+        return len(rows)
+
+    def _purge_extracted(self) -> None:
+        """删除超过保留时长的解出副本（推送渠道读取文件早已结束）"""
+        cutoff = time.time() - self._RETIRED_SEGMENT_TTL_SECONDS
+        try:
+            entries = list(os.scandir(os.path.join(self.pack_dir, _EXTRACT_DIR)))
+        except FileNotFoundError:
+            return
+        for entry in entries:
+            with contextlib.suppress(OSError):
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        with self._reader_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
+            self._reader_generation += 1
@@ -0,0 +1,670 @@
+"""S3 兼容存储后端
+
+目标：
+- 媒体字节存放在 S3 / MinIO 等对象存储中，API 节点不再是媒体流量的瓶颈
+- 流式写入使用分片上传（multipart），分片大小与并发可配置，内存占用为 分片大小 x (并发 + 1)
+- `proxy_media` 通过 302/307 跳转到公开地址或预签名地址，由对象存储直接服务字节
+- `exists` 检查走本地元数据缓存：内容寻址对象不可变，命中后无需再发 HEAD
+
+设计说明：
+- 直接基于 httpx 实现 AWS Signature V4，不引入额外 SDK
+- 流式写入时最终 key（内容寻址）在写完后才确定：不足一个分片时直接单次 PUT，
+  否则先分片上传到 `.staging/` 临时对象，完成后服务端复制到最终 key 并删除临时对象
+- 用量台账与元数据缓存保存在本地 `metadata_dir`（默认存储根目录下的 `.s3/`）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import hmac
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from typing import AsyncIterable, AsyncIterator, Callable, Optional, Union
+from urllib.parse import quote, urlsplit
+
+import httpx
+
+from app.core.logging import logger
+from app.adapters.storage.manager import StorageLimitExceeded, StoredObject, STAGING_DIR
+from app.adapters.storage.usage import StorageUsageLedger
+
+_UNSIGNED_PAYLOAD = "UNSIGNED-PAYLOAD"
+_MIN_PART_SIZE = 5 * 1024 * 1024
+_MAX_SINGLE_COPY_BYTES = 5 * 1024 * 1024 * 1024
+_COPY_PART_SIZE = 512 * 1024 * 1024
+_NEGATIVE_CACHE_TTL_SECONDS = 60.0
+
+
+class S3StorageError(Exception):
+    """S3 请求失败"""
+
+    def __init__(self, status_code: int, code: str, message: str = ""):
+        super().__init__(f"S3 error {status_code} {code}: {message}".strip())
+        self.status_code = status_code
+        self.code = code
+
+
+def _uri_encode(value: str, *, safe: str = "-_.~") -> str:
+    return quote(value, safe=safe)
+
+
+def _hmac_sha256(key: bytes, msg: str) -> bytes:
+    return hmac.new(key, msg.encode("utf-8"), hashlib.sha256).digest()
+
+
+def _signing_key(secret_key: str, date: str, region: str, service: str = "s3") -> bytes:
+    k_date = _hmac_sha256(("AWS4" + secret_key).encode("utf-8"), date)
+    k_region = _hmac_sha256(k_date, region)
+    k_service = _hmac_sha256(k_region, service)
+    return _hmac_sha256(k_service, "aws4_request")
+
+
+def _canonical_query(params: dict[str, str]) -> str:
+    return "&".join(
+        f"{_uri_encode(k)}={_uri_encode(v)}" for k, v in sorted((str(k), str(v)) for k, v in params.items())
+    )
+
+
+def _xml_text(element: ET.Element, tag: str) -> Optional[str]:
+    found = element.find(f"{{*}}{tag}")
+    return found.text if found is not None else None
+
+
+class _ObjectMetaCache:
+    """对象元数据缓存（SQLite）：存在的对象长期缓存，不存在的结果短期缓存。"""
+
+    def __init__(self, path: str):
+        self._path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(os.path.dirname(self._path), exist_ok=True)
+        conn = sqlite3.connect(self._path, check_same_thread=False, isolation_level=None, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS objects (
+                key TEXT PRIMARY KEY,
+                present INTEGER NOT NULL,
+                size INTEGER,
+                checked_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn = conn
+        return conn
+
+    def get(self, key: str) -> Optional[tuple[bool, Optional[int]]]:
+        """返回 (是否存在, 大小)；无有效缓存时返回 None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT present, size, checked_at FROM objects WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        present, size, checked_at = row
+        if not present and time.time() - float(checked_at) > _NEGATIVE_CACHE_TTL_SECONDS:
+            return None
+        return bool(present), (int(size) if size is not None else None)
+
+    def set(self, key: str, *, present: bool, size: Optional[int] = None) -> None:
+        with self._lock:
+            self._connect().execute(
+                "INSERT OR REPLACE INTO objects (key, present, size, checked_at) VALUES (?, ?, ?, ?)",
+                (key, 1 if present else 0, size, time.time()),
+            )
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class S3StreamWriter:
+    """S3 流式写入句柄，接口与本地 StreamWriter 一致（write / reset / commit / abort）。"""
+
+    def __init__(self, backend: "S3StorageBackend", *, max_bytes: Optional[int] = None):
+        self._backend = backend
+        self.max_bytes = max_bytes if max_bytes and max_bytes > 0 else None
+        self._buffer = bytearray()
+        self._hasher = hashlib.sha256()
+        self._staging_key: Optional[str] = None
+        self._upload_id: Optional[str] = None
+        self._parts: list[asyncio.Task] = []
+        self._slots = asyncio.Semaphore(backend.upload_concurrency)
+        self._closed = False
+        self.size = 0
+
+    @property
+    def sha256(self) -> str:
+        return self._hasher.hexdigest()
+
+    async def write(self, chunk: bytes) -> None:
+        if not chunk:
+            return
+        if self.max_bytes is not None and self.size + len(chunk) > self.max_bytes:
+            raise StorageLimitExceeded(self.max_bytes, self.size + len(chunk))
+        self._hasher.update(chunk)
+        self._buffer.extend(chunk)
+        self.size += len(chunk)
+        part_size = self._backend.part_size
+        while len(self._buffer) >= part_size:
+            part = bytes(self._buffer[:part_size])
+            del self._buffer[:part_size]
+            await self._submit_part(part)
+
+    async def _submit_part(self, data: bytes) -> None:
+        if self._upload_id is None:
+            self._staging_key = f"{STAGING_DIR}/{uuid.uuid4().hex}"
+            self._upload_id = await self._backend._create_multipart(self._staging_key, "application/octet-stream")
+        # 在途分片达到并发上限时阻塞写入方，限制内存占用
+        await self._slots.acquire()
+        part_number = len(self._parts) + 1
+        task = asyncio.create_task(self._upload_part(part_number, data))
+        self._parts.append(task)
+
+    async def _upload_part(self, part_number: int, data: bytes) -> tuple[int, str]:
+        try:
+            etag = await self._backend._upload_part(self._staging_key, self._upload_id, part_number, data)
+            return part_number, etag
+        finally:
+            self._slots.release()
+
+    async def _discard_upload(self) -> None:
+        for task in self._parts:
+            task.cancel()
+        await asyncio.gather(*self._parts, return_exceptions=True)
+        if self._upload_id is not None:
+            try:
+                await self._backend._abort_multipart(self._staging_key, self._upload_id)
+            except Exception as e:
+                logger.warning("Abort multipart upload failed: {}, {}", self._staging_key, e)
+        self._parts = []
+        self._upload_id = None
+        self._staging_key = None
+
+    async def reset(self) -> None:
+        """丢弃已写入内容（如上游不支持 Range 续传时从头开始）"""
+        await self._discard_upload()
+        self._buffer = bytearray()
+        self._hasher = hashlib.sha256()
+        self.size = 0
+
+    async def commit(self, *, key: str, content_type: str) -> StoredObject:
+        backend = self._backend
+        if self._upload_id is None:
+            # 不足一个分片：直接单次上传到最终 key
+            stored = await backend.put_bytes(key=key, data=bytes(self._buffer), content_type=content_type)
+            self._closed = True
+            return StoredObject(
+                key=stored.key,
+                size=stored.size,
+                sha256=self.sha256,
+                content_type=content_type,
+                url=stored.url,
+            )
+
+        if self._buffer:
+            await self._submit_part(bytes(self._buffer))
+            self._buffer = bytearray()
+        parts = await asyncio.gather(*self._parts)
+        await backend._complete_multipart(self._staging_key, self._upload_id, sorted(parts))
+        self._upload_id = None
+        try:
+            await backend._copy_object(self._staging_key, key, size=self.size, content_type=content_type)
+        finally:
+            await backend._delete_raw(self._staging_key)
+        await backend._record_put(key, self.size)
+        self._closed = True
+        return StoredObject(
+            key=key,
+            size=self.size,
+            sha256=self.sha256,
+            content_type=content_type,
+            url=backend.get_url(key=key),
+        )
+
+    async def abort(self) -> None:
+        """放弃未完成的分片上传；commit 之后调用为空操作"""
+        if self._closed:
+            return
+        self._closed = True
+        await self._discard_upload()
+        self._buffer = bytearray()
+
+
+class S3StorageBackend:
+    """S3 兼容对象存储后端（AWS S3 / MinIO / R2 等）。"""
+
+    def __init__(
+        self,
+        *,
+        endpoint_url: str,
+        bucket: str,
+        access_key: str,
+        secret_key: str,
+        metadata_dir: str,
+        region: str = "us-east-1",
+        prefix: str = "",
+        addressing_style: str = "path",
+        public_base_url: Optional[str] = None,
+        part_size: int = 16 * 1024 * 1024,
+        upload_concurrency: int = 4,
+        presign_expires_seconds: int = 3600,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.endpoint_url = endpoint_url.rstrip("/")
+        self.bucket = bucket
+        self.region = region
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.addressing_style = addressing_style
+        self.public_base_url = public_base_url.strip().rstrip("/") if public_base_url else None
+        self.part_size = max(_MIN_PART_SIZE, int(part_size))
+        self.upload_concurrency = max(1, int(upload_concurrency))
+        self.presign_expires_seconds = max(60, int(presign_expires_seconds))
+        self._access_key = access_key
+        self._secret_key = secret_key
+        self._transport = transport
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # 本地元数据：用量台账 + exists 缓存（root_dir 同时作为 GC 等本地临时文件目录）
+        self.root_dir = os.path.abspath(metadata_dir)
+        self.usage = StorageUsageLedger(self.root_dir)
+        self._meta = _ObjectMetaCache(os.path.join(self.root_dir, "objects.db"))
+        self.packs = None
+
+    # --- addressing & signing ---
+
+    def relative_key(self, key: str) -> str:
+        """规范化 key（与本地后端一致：sha256: 前缀按两级目录分片）"""
+        safe_key = key.lstrip("/")
+        if safe_key.startswith("sha256:"):
+            hash_val = safe_key.split(":", 1)[1]
+            return f"{hash_val[:2]}/{hash_val[2:4]}/{hash_val}"
+        return safe_key
+
+    def _object_key(self, key: str) -> str:
+        return f"{self.prefix}{self.relative_key(key)}"
+
+    def _base_url_and_path(self, object_key: str) -> tuple[str, str]:
+        parts = urlsplit(self.endpoint_url)
+        encoded_key = _uri_encode(object_key, safe="-_.~/")
+        if self.addressing_style == "virtual":
+            return f"{parts.scheme}://{self.bucket}.{parts.netloc}", f"/{encoded_key}"
+        base_path = parts.path.rstrip("/")
+        return f"{parts.scheme}://{parts.netloc}", f"{base_path}/{self.bucket}/{encoded_key}"
+
+    def _sign_headers(
+        self,
+        method: str,
+        host: str,
+        path: str,
+        params: dict[str, str],
+        headers: dict[str, str],
+        *,
+        now: Optional[datetime] = None,
+    ) -> dict[str, str]:
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        signed = {k.lower(): str(v) for k, v in headers.items()}
+        signed["host"] = host
+        signed["x-amz-date"] = amz_date
+        signed.setdefault("x-amz-content-sha256", _UNSIGNED_PAYLOAD)
+
+        names = sorted(signed)
+        canonical_headers = "".join(f"{name}:{' '.join(signed[name].strip().split())}\n" for name in names)
+        signed_headers = ";".join(names)
+        canonical_request = "\n".join(
+            [method, path, _canonical_query(params), canonical_headers, signed_headers, signed["x-amz-content-sha256"]]
+        )
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        string_to_sign = "\n".join(
+            ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()]
+        )
+        signature = hmac.new(
+            _signing_key(self._secret_key, date, self.region), string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        signed["authorization"] = (
+            f"AWS4-HMAC-SHA256 Credential={self._access_key}/{scope}, "
+            f"SignedHeaders={signed_headers}, Signature={signature}"
+        )
+        signed.pop("host")
+        return signed
+
+    def presigned_url(self, key: str, *, expires_seconds: Optional[int] = None, now: Optional[datetime] = None) -> str:
+        """生成 GET 预签名地址"""
+        now = now or datetime.now(timezone.utc)
+        amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        date = amz_date[:8]
+        scope = f"{date}/{self.region}/s3/aws4_request"
+        base_url, path = self._base_url_and_path(self._object_key(key))
+        host = urlsplit(base_url).netloc
+        params = {
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self._access_key}/{scope}",
+            "X-Amz-Date": amz_date,
+            "X-Amz-Expires": str(expires_seconds or self.presign_expires_seconds),
+            "X-Amz-SignedHeaders": "host",
+        }
+        canonical_request = "\n".join(
+            ["GET", path, _canonical_query(params), f"host:{host}\n", "host", _UNSIGNED_PAYLOAD]
+        )
+        string_to_sign = "\n".join(
+            ["AWS4-HMAC-SHA256", amz_date, scope, hashlib.sha256(canonical_request.encode("utf-8")).hexdigest()]
+        )
+        signature = hmac.new(
+            _signing_key(self._secret_key, date, self.region), string_to_sign.encode("utf-8"), hashlib.sha256
+        ).hexdigest()
+        return f"{base_url}{path}?{_canonical_query(params)}&X-Amz-Signature={signature}"
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=self._transport,
+                timeout=httpx.Timeout(120.0, connect=10.0),
+            )
+        return self._client
+
+    async def _request(
+        self,
+        method: str,
+        object_key: Optional[str],
+        *,
+        params: Optional[dict[str, str]] = None,
+        headers: Optional[dict[str, str]] = None,
+        content: Optional[bytes] = None,
+        ok: tuple[int, ...] = (200,),
+    ) -> httpx.Response:
+        params = params or {}
+        if object_key is None:
+            base_url, path = self._base_url_and_path("")
+            path = path.rstrip("/") or "/"
+        else:
+            base_url, path = self._base_url_and_path(object_key)
+        host = urlsplit(base_url).netloc
+        signed = self._sign_headers(method, host, path, params, headers or {})
+        query = _canonical_query(params)
+        url = f"{base_url}{path}" + (f"?{query}" if query else "")
+        resp = await self._get_client().request(method, url, headers=signed, content=content)
+        if resp.status_code not in ok:
+            code, message = "HTTP", resp.text[:200]
+            try:
+                root = ET.fromstring(resp.content)
+                code = _xml_text(root, "Code") or code
+                message = _xml_text(root, "Message") or message
+            except ET.ParseError:
+                pass
+            raise S3StorageError(resp.status_code, code, message)
+        return resp
+
+    @staticmethod
+    def _raise_embedded_error(resp: httpx.Response) -> None:
+        """Complete/Copy 可能以 200 返回错误体"""
+        if b"<Error>" not in resp.content[:512]:
+            return
+        root = ET.fromstring(resp.content)
+        raise S3StorageError(resp.status_code, _xml_text(root, "Code") or "Error", _xml_text(root, "Message") or "")
+
+    # --- multipart primitives ---
+
+    async def _create_multipart(self, object_key: str, content_type: str) -> str:
+        resp = await self._request(
+            "POST", self.prefix + object_key, params={"uploads": ""}, headers={"content-type": content_type}
+        )
+        upload_id = _xml_text(ET.fromstring(resp.content), "UploadId")
+        if not upload_id:
+            raise S3StorageError(resp.status_code, "InvalidResponse", "missing UploadId")
+        return upload_id
+
+    async def _upload_part(self, object_key: str, upload_id: str, part_number: int, data: bytes) -> str:
+        resp = await self._request(
+            "PUT",
+            self.prefix + object_key,
+            params={"partNumber": str(part_number), "uploadId": upload_id},
+            content=data,
+        )
+        return resp.headers.get("etag", "")
+
+    async def _complete_multipart(self, object_key: str, upload_id: str, parts: list[tuple[int, str]]) -> None:
+        body = "<CompleteMultipartUpload>" + "".join(
+            f"<Part><PartNumber>{n}</PartNumber><ETag>{etag}</ETag></Part>" for n, etag in parts
+        ) + "</CompleteMultipartUpload>"
+        resp = await self._request(
+            "POST",
+            self.prefix + object_key,
+            params={"uploadId": upload_id},
+            headers={"content-type": "application/xml"},
+            content=body.encode("utf-8"),
+        )
+        self._raise_embedded_error(resp)
+
+    async def _abort_multipart(self, object_key: str, upload_id: str) -> None:
+        await self._request("DELETE", self.prefix + object_key, params={"uploadId": upload_id}, ok=(200, 204, 404))
+
+    async def _copy_object(self, staging_key: str, key: str, *, size: int, content_type: str) -> None:
+        """服务端复制临时对象到最终 key（超过单次复制上限时使用分片复制）"""
+        source = "/" + _uri_encode(f"{self.bucket}/{self.prefix}{staging_key}", safe="-_.~/")
+        target = self._object_key(key)
+        if size <= _MAX_SINGLE_COPY_BYTES:
+            resp = await self._request(
+                "PUT",
+                target,
+                headers={
+                    "x-amz-copy-source": source,
+                    "x-amz-metadata-directive": "REPLACE",
+                    "content-type": content_type,
+                },
+            )
+            self._raise_embedded_error(resp)
+            return
+
+        upload_id = await self._create_multipart(target[len(self.prefix):], content_type)
+        try:
+            parts = []
+            for index, start in enumerate(range(0, size, _COPY_PART_SIZE), start=1):
+                end = min(start + _COPY_PART_SIZE, size) - 1
+                resp = await self._request(
+                    "PUT",
+                    target,
+                    params={"partNumber": str(index), "uploadId": upload_id},
+                    headers={"x-amz-copy-source": source, "x-amz-copy-source-range": f"bytes={start}-{end}"},
+                )
+                self._raise_embedded_error(resp)
+                parts.append((index, _xml_text(ET.fromstring(resp.content), "ETag") or ""))
+            await self._complete_multipart(target[len(self.prefix):], upload_id, parts)
+        except Exception:
+            await self._abort_multipart(target[len(self.prefix):], upload_id)
+            raise
+
+    async def _delete_raw(self, object_key: str) -> None:
+        try:
+            await self._request("DELETE", self.prefix + object_key, ok=(200, 204, 404))
+        except Exception as e:
+            logger.warning("Delete staging object failed: {}, {}", object_key, e)
+
+    # --- metadata ---
+
+    async def _stat(self, key: str) -> Optional[int]:
+        """返回对象大小（不存在返回 None），优先使用本地元数据缓存"""
+        object_key = self._object_key(key)
+        cached = await asyncio.to_thread(self._meta.get, object_key)
+        if cached is not None:
+            present, size = cached
+            if not present:
+                return None
+            if size is not None:
+                return size
+
+        resp = await self._request("HEAD", object_key, ok=(200, 404))
+        if resp.status_code == 404:
+            await asyncio.to_thread(self._meta.set, object_key, present=False)
+            return None
+        size = int(resp.headers.get("content-length", "0"))
+        await asyncio.to_thread(self._meta.set, object_key, present=True, size=size)
+        return size
+
+    async def _record_put(self, key: str, size: int, previous_size: Optional[int] = None) -> None:
+        await asyncio.to_thread(self._meta.set, self._object_key(key), present=True, size=size)
+        await asyncio.to_thread(
+            self.usage.apply,
+            key,
+            bytes_delta=size - (previous_size or 0),
+            files_delta=0 if previous_size is not None else 1,
+        )
+
+    # --- public API（与 LocalStorageBackend 对齐）---
+
+    async def exists(self, *, key: str) -> bool:
+        return await self._stat(key) is not None
+
+    def locate(self, key: str) -> None:
+        """对象不在本地磁盘上"""
+        return None
+
+    def get_local_path(self, *, key: str) -> Optional[str]:
+        return None
+
+    def get_url(self, *, key: str) -> Optional[str]:
+        if not self.public_base_url:
+            return None
+        return f"{self.public_base_url}/{self.relative_key(key)}"
+
+    def get_download_url(self, key: str) -> str:
+        """供浏览器直接下载的地址：公开地址优先，否则预签名"""
+        return self.get_url(key=key) or self.presigned_url(key)
+
+    async def get_bytes(self, key: str) -> bytes:
+        try:
+            resp = await self._request("GET", self._object_key(key))
+        except S3StorageError as e:
+            logger.error(f"Read object failed: {key}, {e}")
+            if e.status_code == 404:
+                raise FileNotFoundError(key) from e
+            raise
+        return resp.content
+
+    async def put_bytes(self, *, key: str, data: bytes, content_type: str) -> StoredObject:
+        previous_size = await self._stat(key)
+        if previous_size == len(data) and "/blobs/" in f"/{self.relative_key(key)}":
+            # 内容寻址对象已存在且大小一致：不重复上传，服务端自我复制刷新 LastModified，
+            # 使其重新受 GC 宽限期保护（GC 以 LastModified 作为对象年龄）
+            try:
+                await self._copy_object(self.relative_key(key), key, size=len(data), content_type=content_type)
+                return StoredObject(key=key, size=len(data), content_type=content_type, url=self.get_url(key=key))
+            except S3StorageError as e:
+                if e.status_code != 404:
+                    raise
+                # 元数据缓存过期，对象已在外部被删除：重新上传（台账仍按原对象计数，不重复累加）
+
+        await self._request(
+            "PUT",
+            self._object_key(key),
+            headers={
+                "content-type": content_type,
+                "x-amz-content-sha256": hashlib.sha256(data).hexdigest(),
+            },
+            content=data,
+        )
+        await self._record_put(key, len(data), previous_size)
+        return StoredObject(key=key, size=len(data), content_type=content_type, url=self.get_url(key=key))
+
+    async def delete(self, *, key: str) -> bool:
+        """删除存储对象，返回是否成功删除"""
+        try:
+            size = await self._stat(key)
+            if size is None:
+                return False
+            await self._request("DELETE", self._object_key(key), ok=(200, 204))
+        except Exception as e:
+            logger.error(f"Delete object failed: {key}, {e}")
+            return False
+        await asyncio.to_thread(self._meta.set, self._object_key(key), present=False)
+        await asyncio.to_thread(self.usage.apply, key, bytes_delta=-size, files_delta=-1)
+        return True
+
+    def open_stream(self, *, max_bytes: Optional[int] = None) -> S3StreamWriter:
+        """打开一个流式写入句柄，调用方负责 commit 或 abort。"""
+        return S3StreamWriter(self, max_bytes=max_bytes)
+
+    async def put_stream(
+        self,
+        *,
+        chunks: AsyncIterable[bytes],
+        key: Union[str, Callable[[str], str]],
+        content_type: str,
+        max_bytes: Optional[int] = None,
+    ) -> StoredObject:
+        writer = self.open_stream(max_bytes=max_bytes)
+        try:
+            async for chunk in chunks:
+                await writer.write(chunk)
+            final_key = key(writer.sha256) if callable(key) else key
+            return await writer.commit(key=final_key, content_type=content_type)
+        finally:
+            await writer.abort()
+
+    async def _iter_listing(self) -> AsyncIterator[list[tuple[str, int, float]]]:
+        """分页列出前缀下的所有对象，产出 [(相对 key, 大小, 修改时间)]"""
+        token: Optional[str] = None
+        while True:
+            params = {"list-type": "2", "max-keys": "1000"}
+            if self.prefix:
+                params["prefix"] = self.prefix
+            if token:
+                params["continuation-token"] = token
+            root = ET.fromstring((await self._request("GET", None, params=params)).content)
+            batch = []
+            for item in root.findall("{*}Contents"):
+                object_key = _xml_text(item, "Key") or ""
+                modified = _xml_text(item, "LastModified")
+                mtime = datetime.fromisoformat(modified.replace("Z", "+00:00")).timestamp() if modified else 0.0
+                batch.append((object_key[len(self.prefix):], int(_xml_text(item, "Size") or 0), mtime))
+            if batch:
+                yield batch
+            if (_xml_text(root, "IsTruncated") or "").lower() != "true":
+                return
+            token = _xml_text(root, "NextContinuationToken")
+
+    async def iter_blob_batches(self, batch_size: int = 1000) -> AsyncIterator[list[tuple[str, int, float]]]:
+        """分批遍历内容寻址对象，产出 [(key, 大小, 修改时间)]"""
+        async for page in self._iter_listing():
+            blobs = [item for item in page if "/blobs/" in f"/{item[0]}"]
+            for start in range(0, len(blobs), batch_size):
+                yield blobs[start:start + batch_size]
+
+    async def reconcile_usage(self) -> dict:
+        """按对象列表全量校准用量台账"""
+        from app.adapters.storage.usage import NAMESPACES, classify_key, is_internal_key
+
+        baseline = await asyncio.to_thread(self.usage.applied)
+        totals = {ns: {"bytes": 0, "files": 0} for ns in NAMESPACES}
+        async for page in self._iter_listing():
+            for key, size, _ in page:
+                if is_internal_key(key):
+                    continue
+                bucket = totals[classify_key(key)]
+                bucket["bytes"] += size
+                bucket["files"] += 1
+        return await asyncio.to_thread(self.usage.overwrite, totals, since=baseline)
+
+    async def compact_packs(self, *, garbage_ratio: float) -> None:
+        """对象存储不使用打包段"""
+        return None
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._meta.close()
@@ -0,0 +1,209 @@
+"""存储用量台账
+
+目标：
+- 在写入/删除时增量维护各命名空间（blobs / thumbs / proxy_cache / other）的字节数与文件数
+- 仪表盘直接读取台账，O(1) 获得用量，不再遍历整个存储目录
+- 由后台任务周期性全量校准，修正进程崩溃或外部改动带来的漂移
+- 校准的遍历不持锁：每个命名空间另记一份只增不减的增量累计（applied_*），覆盖时把遍历期间
+  新增的增量补回，遍历期间的写入/删除不会丢失；遍历已经看到的对象若同时被记账则会多计一次，
+  偏差以遍历期间的写入量为上限，由下一次校准修正
+
+设计说明：
+- 台账为存储根目录下的独立 SQLite 文件 `.usage.db`，增量使用原子 UPDATE，多进程写入安全
+- 台账失败不影响对象读写，仅记录日志
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+from app.core.logging import logger
+
+USAGE_DB_FILENAME = ".usage.db"
+NAMESPACES = ("blobs", "thumbs", "proxy_cache", "other")
+
+# 代理缓存的索引库（含 WAL 旁路文件），与缓存文件同目录但不是存储对象
+_PROXY_CACHE_INDEX_FILES = frozenset(
+    f"proxy_cache/index.db{suffix}" for suffix in ("", "-wal", "-shm", "-journal")
+)
+
+
+def is_internal_key(key: str) -> bool:
+    """是否为存储内部文件（不计入用量）
+
+    增量记账与全量校准共用同一判定：根目录下以 "." 开头的条目（.staging / .packs / .usage.db / .s3 等）、
+    代理缓存索引库、原子写入的暂存文件（*.tmp）。
+    """
+    safe_key = key.lstrip("/")
+    return safe_key.startswith(".") or safe_key.endswith(".tmp") or safe_key in _PROXY_CACHE_INDEX_FILES
+
+
+def classify_key(key: str) -> str:
+    """根据存储 key 判定所属命名空间"""
+    safe_key = key.lstrip("/")
+    if safe_key.startswith("proxy_cache/"):
+        return "proxy_cache"
+    if safe_key.endswith(".thumb.webp"):
+        return "thumbs"
+    if "blobs/" in safe_key or safe_key.startswith("sha256:"):
+        return "blobs"
+    return "other"
+
+
+class StorageUsageLedger:
+    """按命名空间记录存储用量的持久化计数器。"""
+
+    def __init__(self, root_dir: str):
+        self.root_dir = root_dir
+        self._db_path = os.path.join(root_dir, USAGE_DB_FILENAME)
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(self.root_dir, exist_ok=True)
+        conn = sqlite3.connect(self._db_path, check_same_thread=False, isolation_level=None, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS usage (
+                namespace TEXT PRIMARY KEY,
+                bytes INTEGER NOT NULL DEFAULT 0,
+                files INTEGER NOT NULL DEFAULT 0,
+                applied_bytes INTEGER NOT NULL DEFAULT 0,
+                applied_files INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(usage)")}
+        for column in ("applied_bytes", "applied_files"):
+            if column not in columns:
+                conn.execute(f"ALTER TABLE usage ADD COLUMN {column} INTEGER NOT NULL DEFAULT 0")
+        conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        conn.executemany("INSERT OR IGNORE INTO usage (namespace) VALUES (?)", [(ns,) for ns in NAMESPACES])
+        self._conn = conn
+        return conn
+
+    def apply(self, key: str, *, bytes_delta: int, files_delta: int) -> None:
+        """对 key 所属命名空间记一笔增量（同步调用，应在工作线程中执行）"""
+        if (not bytes_delta and not files_delta) or is_internal_key(key):
+            return
+        namespace = classify_key(key)
+        try:
+            with self._lock:
+                self._connect().execute(
+                    "UPDATE usage SET bytes = MAX(0, bytes + ?), files = MAX(0, files + ?), "
+                    "applied_bytes = applied_bytes + ?, applied_files = applied_files + ? WHERE namespace = ?",
+                    (int(bytes_delta), int(files_delta), int(bytes_delta), int(files_delta), namespace),
+                )
+        except Exception as e:
+            logger.warning("Storage usage ledger update failed: key={}, {}", key, e)
+
+    def snapshot(self) -> dict:
+        """读取当前用量：{"namespaces": {...}, "total_bytes": int, "total_files": int, "reconciled_at": float|None}"""
+        with self._lock:
+            conn = self._connect()
+            rows = conn.execute("SELECT namespace, bytes, files FROM usage").fetchall()
+            meta = conn.execute("SELECT value FROM meta WHERE key = 'reconciled_at'").fetchone()
+
+        namespaces = {ns: {"bytes": int(b), "files": int(f)} for ns, b, f in rows}
+        return {
+            "namespaces": namespaces,
+            "total_bytes": sum(v["bytes"] for v in namespaces.values()),
+            "total_files": sum(v["files"] for v in namespaces.values()),
+            "reconciled_at": float(meta[0]) if meta and meta[0] else None,
+        }
+
+    def total_bytes(self) -> int:
+        return int(self.snapshot()["total_bytes"])
+
+    def applied(self) -> dict:
+        """各命名空间的增量累计 {namespace: (bytes, files)}，全量统计开始前读取，供 overwrite 补回期间的增量"""
+        with self._lock:
+            rows = self._connect().execute("SELECT namespace, applied_bytes, applied_files FROM usage").fetchall()
+        return {ns: (int(b), int(f)) for ns, b, f in rows}
+
+    def reconcile(self, extra_objects: Iterable[tuple[str, int]] = ()) -> dict:
+        """全量遍历存储目录并覆盖台账（同步调用，耗时与文件数成正比）
+
+        Args:
+            extra_objects: 不以独立文件存放的对象 (key, size)，如打包存储中的小对象
+        Returns:
+            写入台账的用量（已补回遍历期间的增量）
+        """
+        baseline = self.applied()
+        totals = {ns: {"bytes": 0, "files": 0} for ns in NAMESPACES}
+        for key, size in extra_objects:
+            if is_internal_key(key):
+                continue
+            bucket = totals[classify_key(key)]
+            bucket["bytes"] += int(size)
+            bucket["files"] += 1
+        if os.path.exists(self.root_dir):
+            for dirpath, dirnames, filenames in os.walk(self.root_dir):
+                if dirpath == self.root_dir:
+                    dirnames[:] = [d for d in dirnames if not is_internal_key(d)]
+                rel_dir = os.path.relpath(dirpath, self.root_dir)
+                for name in filenames:
+                    rel_key = name if rel_dir == "." else f"{rel_dir}/{name}".replace(os.sep, "/")
+                    if is_internal_key(rel_key):
+                        continue
+                    try:
+                        size = os.path.getsize(os.path.join(dirpath, name))
+                    except OSError:
+                        continue
+                    bucket = totals[classify_key(rel_key)]
+                    bucket["bytes"] += size
+                    bucket["files"] += 1
+
+        return self.overwrite(totals, since=baseline)
+
+    def overwrite(self, totals: dict, *, since: Optional[dict] = None) -> dict:
+        """以全量统计结果 {namespace: {"bytes", "files"}} 覆盖台账并记录校准时间
+
+        since 为统计开始前的 applied() 结果：其后记下的增量（统计可能没有看到）补回到结果中。
+        返回实际写入的用量。
+        """
+        result = {}
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                applied = {
+                    ns: (int(b), int(f))
+                    for ns, b, f in conn.execute("SELECT namespace, applied_bytes, applied_files FROM usage")
+                }
+                for ns in NAMESPACES:
+                    value = totals.get(ns) or {"bytes": 0, "files": 0}
+                    bytes_, files = int(value["bytes"]), int(value["files"])
+                    if since is not None:
+                        start_bytes, start_files = since.get(ns, applied.get(ns, (0, 0)))
+                        now_bytes, now_files = applied.get(ns, (0, 0))
+                        bytes_ = max(0, bytes_ + now_bytes - start_bytes)
+                        files = max(0, files + now_files - start_files)
+                    result[ns] = {"bytes": bytes_, "files": files}
+                    conn.execute(
+                        "UPDATE usage SET bytes = ?, files = ? WHERE namespace = ?",
+                        (bytes_, files, ns),
+                    )
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('reconciled_at', ?)",
+                    (str(time.time()),),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
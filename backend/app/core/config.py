@@ -88,6 +88,35 @@ class Settings(BaseSettings):
     embedding_api_key: Optional[SecretStr] = None
     embedding_model: str = "gemini-embedding-2-preview"
     embedding_output_dimensionality: int = 1536
+    # 语义检索近似索引（IVF-Flat）：向量数达到阈值时后台构建，0 表示始终精确检索
+    embedding_ann_min_rows: int = 50000
+    embedding_ann_nprobe: int = 16  # 每次检索探查的倒排列表数，越大召回越高、越慢
+    embedding_index_dir: str = "data/vector_index"  # 向量矩阵与索引快照目录
+    # 内存向量矩阵量化：int8 约为 float32 内存的 1/4，候选由库中 float32 向量精排
+    embedding_quantization: Literal["none", "int8"] = "none"
+    embedding_rerank_factor: int = 2  # 量化时精排的候选数为 limit 的倍数
+    # 语义索引批处理（解析后入队与全库重建共用）
+    embedding_batch_size: int = 32  # 每批内容数（远程接口单次最多 100 条）
+    embedding_batch_concurrency: int = 2  # 同时执行的批次数
+    embedding_batch_linger_seconds: float = 1.0  # 未攒满一批时的最长等待
+    # 检索缓存：查询向量 LRU 与召回结果短时缓存（条数为 0 表示关闭）
+    search_query_cache_size: int = 1024
+    search_ranked_cache_size: int = 256
+    search_ranked_cache_ttl_seconds: float = 30.0
+    # 相似内容（预计算近邻）
+    related_content_k: int = 20  # 每条内容保存的近邻数
+    related_content_batch_size: int = 64  # 每批一起计算的内容数
+    related_content_refresh_interval_seconds: int = 3600
+    related_content_max_age_hours: int = 168  # 超过该时长的近邻列表定期重算
+    # 仪表盘计数（触发器增量维护）按源表对账的间隔
+    dashboard_counters_reconcile_interval_seconds: int = 900
+    # 只读接口响应缓存（按数据版本失效，条数为 0 表示关闭）
+    response_cache_size: int = 128
+    response_cache_max_body_bytes: int = 1024 * 1024
+    # 内容大字段压缩副表（content_blobs）：zstd 级别、训练字典大小、迁移每批行数
+    content_blob_zstd_level: int = 9
+    content_blob_dict_size: int = 64 * 1024
+    content_blob_migrate_chunk_size: int = 500
 
     # 存储后端配置
     storage_backend: Literal["local", "s3"] = "local"
@@ -95,6 +124,26 @@ class Settings(BaseSettings):
 
     # LocalFS
     storage_local_root: str = "data/storage"
+    storage_usage_reconcile_interval_seconds: int = 24 * 3600  # 用量台账全量校准间隔（同时作为媒体 GC 周期）
+    storage_gc_enabled: bool = True  # 后台周期清理无人引用的归档媒体
+    storage_gc_dry_run: bool = True  # 仅输出报告，不删除；引用只按 contents 表标记，核对报告后再显式设为 False
+    storage_gc_grace_seconds: int = 7 * 24 * 3600  # 早于该时长的孤儿文件才会被清理
+    # 小对象打包存储（缩略图/头像/代理缓存等），0 表示关闭
+    storage_pack_threshold_bytes: int = 0
+    storage_pack_segment_max_bytes: int = 256 * 1024 * 1024
+    storage_pack_compact_garbage_ratio: float = 0.5  # 段内垃圾占比达到该值时压缩
+
+    # S3 兼容对象存储（storage_backend=s3）
+    storage_s3_endpoint_url: Optional[str] = None  # 如 https://s3.amazonaws.com、http://minio:9000
+    storage_s3_region: str = "us-east-1"
+    storage_s3_bucket: Optional[str] = None
+    storage_s3_access_key: Optional[SecretStr] = None
+    storage_s3_secret_key: Optional[SecretStr] = None
+    storage_s3_prefix: str = ""  # 对象 key 前缀
+    storage_s3_addressing_style: Literal["path", "virtual"] = "path"  # MinIO 通常为 path
+    storage_s3_part_size_bytes: int = 16 * 1024 * 1024  # 分片上传分片大小（不小于 5MiB）
+    storage_s3_upload_concurrency: int = 4  # 单次流式写入的并发分片数
+    storage_s3_presign_expires_seconds: int = 3600  # 媒体跳转预签名地址有效期
 
     # 分发队列系统
     queue_worker_count: int = 3  # 队列Worker并发数
@@ -107,10 +156,26 @@ class Settings(BaseSettings):
     # 摘要生成
     enable_auto_summary: bool = False
 
+    # 近似重复检测（解析时计算 SimHash，命中则跳过媒体归档、向量与分发）
+    enable_near_duplicate_detection: bool = True
+    near_duplicate_max_distance: int = 3  # 汉明距离上限（不超过分段数 - 1，保证分段召回无漏）
+    near_duplicate_min_features: int = 32  # 特征数低于该值的短文本不参与判重
+
     # 媒体处理
     enable_archive_media_processing: bool = True
     archive_image_webp_quality: int = 80
     archive_image_max_count: Optional[int] = None
+    archive_video_max_bytes: Optional[int] = 2 * 1024 * 1024 * 1024  # 单个视频上限，超出跳过
+    media_ffmpeg_concurrency: int = 2  # 同时运行的 ffmpeg 转码进程数上限
+    # 媒体处理防护（解压炸弹 / 内存上限），0 表示不限制
+    media_max_download_bytes: int = 50 * 1024 * 1024  # 单张图片下载上限（流式检查）
+    media_max_image_pixels: int = 50_000_000  # 单帧像素上限
+    media_max_image_frames: int = 1000  # 动画帧数上限
+    media_max_total_pixels: int = 400_000_000  # 帧数 x 单帧像素上限
+    media_memory_budget_bytes: int = 1024 * 1024 * 1024  # 并发解码的估算内存预算
+
+    # 图片代理缓存（/proxy/image），超出预算后按 LRU 淘汰，0 表示不限制
+    proxy_image_cache_max_bytes: int = 2 * 1024 * 1024 * 1024
 
 
 settings = Settings()
@@ -128,4 +193,8 @@ def validate_settings() -> None:
         if settings.cors_allowed_origins == "*":
             raise RuntimeError("CORS_ALLOWED_ORIGINS must not be '*' in production")
 
+    if settings.storage_backend == "s3":
+        if not settings.storage_s3_endpoint_url or not settings.storage_s3_bucket:
+            raise RuntimeError("STORAGE_S3_ENDPOINT_URL and STORAGE_S3_BUCKET are required when STORAGE_BACKEND=s3")
+
     return None
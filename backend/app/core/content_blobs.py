@@ -0,0 +1,415 @@
+"""
+内容大字段压缩副表（content_blobs）
+
+- 正文 body 与 JSON 字段 rich_payload / archive_metadata 不在 contents 里，每条内容一行存入 content_blobs，
+  每个字段一个 zstd 帧（编解码见 app.utils.blob_codec）；contents 行变小，列表与筛选扫描的页数随之减少
+- 压缩字典由已有内容训练，存于 content_blob_dicts（只增不改）；新行使用最新字典，已有行沿用自己的 dict_id，
+  换新字典后可用 recompress 重写
+- Content.body 等仍按普通属性读写：读时解压并缓存，新行在 flush 前选定字典后压缩（before_flush 钩子）；
+  Content.blob 默认随内容 selectin 加载，列表接口走列投影、批量查询用 raiseload 跳过
+- SQL 内解压用 vs_blob_text(data, dict_data)，在每个 SQLite 连接建立时注册；全文索引触发器与
+  LIKE 退回检索依赖它，不经过本应用直接改写 content_blobs 的工具需先注册同名函数
+
+旧库迁移（contents 上仍有这三列）：
+  1. 旧版本照常服务时分批复制，不改旧列；期间旧列被改写的行由触发器作废副本，稍后重新复制：
+       python -m app.core.content_blobs migrate
+  2. 新版本启动时 init_db 收尾：补齐剩余的行并分批清空旧列（每批一个短事务）
+  3. 可选，删除旧列并回收空间（会重写 contents 整表）：
+       python -m app.core.content_blobs finalize --drop-columns --vacuum
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Callable, Optional
+
+import zstandard
+from sqlalchemy import JSON, Text, event, func, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models.base import Base
+from app.utils.blob_codec import (
+    BLOB_FIELDS,
+    JSON_FIELDS,
+    compress_text,
+    decompress_text,
+    encode_field,
+    serialize_field,
+    train_dictionary,
+)
+
+BLOB_TEXT_FUNCTION = "vs_blob_text"
+LEGACY_GUARD_TRIGGER = "contents_blobs_legacy_au"
+# 少于该数量的样本训练出的字典收益不稳定，先不压字典
+MIN_TRAIN_SAMPLES = 200
+MAX_TRAIN_ROWS = 2000
+
+
+def _blob_text(data, dict_data):
+    return decompress_text(data, dict_data) if data is not None else None
+
+
+@event.listens_for(Engine, "connect")
+def _register_blob_text_function(dbapi_conn, connection_record) -> None:
+    create_function = getattr(dbapi_conn, "create_function", None)
+    if create_function is not None:
+        create_function(BLOB_TEXT_FUNCTION, 2, _blob_text, deterministic=True)
+
+
+@event.listens_for(Session, "before_flush")
+def _compress_new_blobs(session: Session, flush_context, instances) -> None:
+    """新建的副表行统一使用当前最新字典压缩"""
+    from app.models.content import BLOB_PENDING_ATTR, ContentBlob, ContentBlobDict
+
+    pending = [obj for obj in session.new if isinstance(obj, ContentBlob) and obj.__dict__.get(BLOB_PENDING_ATTR)]
+    if not pending:
+        return
+    dictionary = session.scalars(select(ContentBlobDict).order_by(ContentBlobDict.id.desc()).limit(1)).first()
+    dict_data = dictionary.data if dictionary is not None else None
+    for blob in pending:
+        blob.dictionary = dictionary
+        for name in blob.__dict__.pop(BLOB_PENDING_ATTR):
+            setattr(blob, name, encode_field(name, blob.read(name), dict_data))
+
+
+def blob_value(name: str, parse_json: bool = False):
+    """SQL 中解压后的字段文本（parse_json 时 JSON 字段按 JSON 解析），与外层查询的 content_blobs 关联"""
+    from app.models import ContentBlob, ContentBlobDict
+
+    dict_data = select(ContentBlobDict.data).where(ContentBlobDict.id == ContentBlob.dict_id).scalar_subquery()
+    return func.vs_blob_text(getattr(ContentBlob, name), dict_data, type_=JSON if parse_json and name in JSON_FIELDS else Text)
+
+
+def blob_content_ids(*conditions):
+    """任一条件成立的内容 id 子查询（条件用 blob_value 构造；逐行解压，只用于退回路径与后台任务）"""
+    from app.models import ContentBlob
+
+    return select(ContentBlob.content_id).where(or_(*conditions))
+
+
+def _decoded(alias: str, name: str, dict_alias: str = "d") -> str:
+    return f"{BLOB_TEXT_FUNCTION}({alias}.{name}, {dict_alias}.data)"
+
+
+def _ddl() -> list[str]:
+    # 外键级联之外再用触发器兜底：未开启 foreign_keys 的连接批量删除内容时不留孤儿行
+    return [
+        "CREATE TRIGGER IF NOT EXISTS contents_blobs_ad AFTER DELETE ON contents BEGIN "
+        "DELETE FROM content_blobs WHERE content_id = old.id; END",
+    ]
+
+
+def _active_dictionary(conn: Connection) -> tuple[Optional[int], Optional[bytes]]:
+    row = conn.execute(text("SELECT id, data FROM content_blob_dicts ORDER BY id DESC LIMIT 1")).first()
+    return (row[0], row[1]) if row is not None else (None, None)
+
+
+def legacy_columns(conn: Connection) -> list[str]:
+    """contents 上尚未删除的旧大字段列"""
+    if conn.dialect.name != "sqlite":
+        return []
+    names = {row[1] for row in conn.execute(text("PRAGMA table_info(contents)")).all()}
+    return [name for name in BLOB_FIELDS if name in names]
+
+
+def _legacy_pending(columns: list[str], alias: str = "c") -> str:
+    return "(" + " OR ".join(f"{alias}.{name} IS NOT NULL" for name in columns) + ")"
+
+
+def _legacy_text(name: str, raw: Any) -> Optional[str]:
+    """旧列原值转为待压缩文本；JSON 列先解析再统一序列化（JSON null 视为空）"""
+    if raw is None:
+        return None
+    if name in JSON_FIELDS and isinstance(raw, str):
+        try:
+            raw = json.loads(raw)
+        except ValueError:
+            pass
+    return serialize_field(name, raw)
+
+
+def _training_samples(conn: Connection, columns: list[str]) -> list[bytes]:
+    if columns:
+        rows = conn.execute(
+            text(
+                f"SELECT {', '.join(f'c.{name}' for name in columns)} FROM contents c "
+                f"WHERE {_legacy_pending(columns)} ORDER BY random() LIMIT :limit"
+            ),
+            {"limit": MAX_TRAIN_ROWS},
+        ).all()
+        values = [[_legacy_text(name, raw) for name, raw in zip(columns, row)] for row in rows]
+    else:
+        rows = conn.execute(
+            text(
+                f"SELECT {', '.join(_decoded('b', name) for name in BLOB_FIELDS)} FROM content_blobs b "
+                f"LEFT JOIN content_blob_dicts d ON d.id = b.dict_id ORDER BY random() LIMIT :limit"
+            ),
+            {"limit": MAX_TRAIN_ROWS},
+        ).all()
+        values = [list(row) for row in rows]
+    return [value.encode("utf-8") for row in values for value in row if value]
+
+
+def train_blob_dictionary(conn: Connection, columns: Optional[list[str]] = None) -> Optional[int]:
+    """按旧列（迁移期间）或现有副表行采样训练新字典，返回字典 id；样本不足时返回 None"""
+    samples = _training_samples(conn, legacy_columns(conn) if columns is None else columns)
+    if len(samples) < MIN_TRAIN_SAMPLES:
+        logger.info("大字段样本不足，暂不训练压缩字典: samples={}", len(samples))
+        return None
+    try:
+        data = train_dictionary(samples)
+    except zstandard.ZstdError as e:
+        logger.warning(f"压缩字典训练失败，继续使用无字典压缩: {e}")
+        return None
+    result = conn.execute(
+        text("INSERT INTO content_blob_dicts(data, sample_count, created_at) VALUES (:data, :count, CURRENT_TIMESTAMP)"),
+        {"data": data, "count": len(samples)},
+    )
+    logger.info("压缩字典已训练: id={}, samples={}, bytes={}", result.lastrowid, len(samples), len(data))
+    return int(result.lastrowid)
+
+
+def copy_legacy_chunk(conn: Connection, after_id: int, chunk_size: int, clear: bool) -> Optional[tuple[int, int]]:
+    """把 id > after_id 的一批旧列数据写入副表，返回 (本批最大 id, 新写入行数)；没有待迁移的行时返回 None
+
+    已有副表行的内容以副表为准（已复制过，或新版本已写入）；clear=True 时同批清空旧列。
+    """
+    columns = legacy_columns(conn)
+    if not columns:
+        return None
+    rows = conn.execute(
+        text(
+            f"SELECT c.id, EXISTS (SELECT 1 FROM content_blobs b WHERE b.content_id = c.id), "
+            f"{', '.join(f'c.{name}' for name in columns)} FROM contents c "
+            f"WHERE c.id > :after AND {_legacy_pending(columns)} ORDER BY c.id LIMIT :limit"
+        ),
+        {"after": after_id, "limit": chunk_size},
+    ).all()
+    if not rows:
+        return None
+
+    dict_id, dict_data = _active_dictionary(conn)
+    blobs = []
+    for row in rows:
+        if row[1]:
+            continue
+        values = dict.fromkeys(BLOB_FIELDS)
+        for name, raw in zip(columns, row[2:]):
+            value = _legacy_text(name, raw)
+            values[name] = compress_text(value, dict_data) if value is not None else None
+        blobs.append({"content_id": row[0], "dict_id": dict_id, **values})
+    if blobs:
+        conn.execute(
+            text(
+                f"INSERT INTO content_blobs(content_id, dict_id, {', '.join(BLOB_FIELDS)}) "
+                f"VALUES (:content_id, :dict_id, {', '.join(f':{name}' for name in BLOB_FIELDS)})"
+            ),
+            blobs,
+        )
+    last_id = int(rows[-1][0])
+    if clear:
+        conn.execute(
+            text(f"UPDATE contents SET {', '.join(f'{name} = NULL' for name in columns)} WHERE id > :after AND id <= :last"),
+            {"after": after_id, "last": last_id},
+        )
+    return last_id, len(blobs)
+
+
+def recompress_chunk(conn: Connection, after_id: int, chunk_size: int) -> Optional[tuple[int, int]]:
+    """把 content_id > after_id 且未使用最新字典的一批行按最新字典重写"""
+    dict_id, dict_data = _active_dictionary(conn)
+    rows = conn.execute(
+        text(
+            f"SELECT b.content_id, {', '.join(_decoded('b', name) for name in BLOB_FIELDS)} FROM content_blobs b "
+            f"LEFT JOIN content_blob_dicts d ON d.id = b.dict_id "
+            f"WHERE b.content_id > :after AND b.dict_id IS NOT :dict_id ORDER BY b.content_id LIMIT :limit"
+        ),
+        {"after": after_id, "dict_id": dict_id, "limit": chunk_size},
+    ).all()
+    if not rows:
+        return None
+    conn.execute(
+        text(
+            f"UPDATE content_blobs SET dict_id = :dict_id, "
+            f"{', '.join(f'{name} = :{name}' for name in BLOB_FIELDS)} WHERE content_id = :content_id"
+        ),
+        [
+            {
+                "content_id": row[0],
+                "dict_id": dict_id,
+                **{
+                    name: compress_text(value, dict_data) if value is not None else None
+                    for name, value in zip(BLOB_FIELDS, row[1:])
+                },
+            }
+            for row in rows
+        ],
+    )
+    return int(rows[-1][0]), len(rows)
+
+
+async def run_in_chunks(
+    engine: AsyncEngine,
+    step: Callable[..., Optional[tuple[int, int]]],
+    *args: Any,
+    chunk_size: Optional[int] = None,
+) -> int:
+    """按主键分批执行 step，每批一个短事务（其间其他连接照常读写），返回处理的行数"""
+    size = chunk_size or settings.content_blob_migrate_chunk_size
+    after_id, total = 0, 0
+    while True:
+        async with engine.begin() as conn:
+            result = await conn.run_sync(step, after_id, size, *args)
+        if result is None:
+            return total
+        after_id, count = result
+        total += count
+        await asyncio.sleep(0)
+
+
+def install_legacy_guard(conn: Connection) -> None:
+    """旧版本仍在服务时，旧列被改写的行作废已复制的副本（收尾时重新复制）"""
+    columns = legacy_columns(conn)
+    if columns:
+        conn.execute(
+            text(
+                f"CREATE TRIGGER IF NOT EXISTS {LEGACY_GUARD_TRIGGER} AFTER UPDATE OF {', '.join(columns)} ON contents "
+                f"BEGIN DELETE FROM content_blobs WHERE content_id = new.id; END"
+            )
+        )
+
+
+def drop_legacy_guard(conn: Connection) -> None:
+    conn.execute(text(f"DROP TRIGGER IF EXISTS {LEGACY_GUARD_TRIGGER}"))
+
+
+def _prepare_migration(conn: Connection, guard: bool) -> bool:
+    """返回是否还有旧列数据需要迁移；没有可用字典时先按旧列训练"""
+    if conn.dialect.name != "sqlite":
+        return False
+    columns = legacy_columns(conn)
+    if guard:
+        install_legacy_guard(conn)
+    else:
+        drop_legacy_guard(conn)
+    if not columns:
+        return False
+    pending = conn.execute(text(f"SELECT 1 FROM contents c WHERE {_legacy_pending(columns)} LIMIT 1")).first()
+    if pending is None:
+        return False
+    if _active_dictionary(conn)[0] is None:
+        train_blob_dictionary(conn, columns)
+    return True
+
+
+async def migrate_legacy_blobs(engine: AsyncEngine, *, finalize: bool, chunk_size: Optional[int] = None) -> int:
+    """把旧列分批迁入副表；finalize=False 只复制（旧版本仍在服务），True 时同批清空旧列"""
+    async with engine.begin() as conn:
+        if not await conn.run_sync(_prepare_migration, not finalize):
+            return 0
+    moved = await run_in_chunks(engine, copy_legacy_chunk, finalize, chunk_size=chunk_size)
+    if moved:
+        # 副表写入逐行重建了全文索引，合并碎片化的索引段
+        from app.core.fts import optimize_fts
+
+        async with engine.begin() as conn:
+            await conn.run_sync(optimize_fts)
+    logger.info("内容大字段已迁入 content_blobs: rows={}, finalize={}", moved, finalize)
+    return moved
+
+
+def drop_legacy_columns(conn: Connection) -> list[str]:
+    """删除已清空的旧列（SQLite 会重写整表，需在低峰期执行）"""
+    columns = legacy_columns(conn)
+    drop_legacy_guard(conn)
+    for name in columns:
+        conn.execute(text(f"ALTER TABLE contents DROP COLUMN {name}"))
+    return columns
+
+
+def blob_stats(conn: Connection) -> dict[str, int]:
+    """副表行数、压缩后与解压后的字节数（逐行解压，仅供运维命令使用）"""
+    compressed = " + ".join(f"coalesce(length(b.{name}), 0)" for name in BLOB_FIELDS)
+    raw = " + ".join(f"coalesce(length(CAST({_decoded('b', name)} AS BLOB)), 0)" for name in BLOB_FIELDS)
+    row = conn.execute(
+        text(
+            f"SELECT count(*), coalesce(sum({compressed}), 0), coalesce(sum({raw}), 0) FROM content_blobs b "
+            f"LEFT JOIN content_blob_dicts d ON d.id = b.dict_id"
+        )
+    ).one()
+    dicts = conn.execute(text("SELECT count(*) FROM content_blob_dicts")).scalar_one()
+    return {"rows": int(row[0]), "compressed_bytes": int(row[1]), "raw_bytes": int(row[2]), "dictionaries": int(dicts)}
+
+
+def ensure_content_blobs(conn: Connection) -> None:
+    """安装触发器（幂等）；还没有字典而副表已有足够内容时训练一个"""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in _ddl():
+        conn.execute(text(statement))
+    if _active_dictionary(conn)[0] is not None or legacy_columns(conn):
+        return
+    rows = conn.execute(
+        text("SELECT count(*) FROM (SELECT 1 FROM content_blobs LIMIT :limit)"), {"limit": MIN_TRAIN_SAMPLES}
+    ).scalar_one()
+    if rows >= MIN_TRAIN_SAMPLES:
+        train_blob_dictionary(conn, [])
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection: Connection, **kw) -> None:
+    ensure_content_blobs(connection)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="内容大字段副表维护")
+    parser.add_argument("command", choices=["migrate", "finalize", "train", "recompress", "stats"])
+    parser.add_argument("--chunk-size", type=int, default=None)
+    parser.add_argument("--drop-columns", action="store_true", help="finalize 后删除 contents 上的旧列")
+    parser.add_argument("--vacuum", action="store_true", help="finalize 后 VACUUM 回收空间")
+    args = parser.parse_args()
+
+    async def _main() -> None:
+        from app.core.db_adapter import engine
+        from app.models import ContentBlob, ContentBlobDict
+
+        async with engine.begin() as conn:
+            for model in (ContentBlobDict, ContentBlob):
+                await conn.run_sync(model.__table__.create, checkfirst=True)
+            await conn.run_sync(ensure_content_blobs)
+
+        if args.command in ("migrate", "finalize"):
+            moved = await migrate_legacy_blobs(engine, finalize=args.command == "finalize", chunk_size=args.chunk_size)
+            print(f"migrated {moved} rows into content_blobs")
+            if args.command == "finalize" and args.drop_columns:
+                async with engine.begin() as conn:
+                    dropped = await conn.run_sync(drop_legacy_columns)
+                print(f"dropped legacy columns: {', '.join(dropped) or '-'}")
+            if args.command == "finalize" and args.vacuum:
+                async with engine.connect() as conn:
+                    await conn.execution_options(isolation_level="AUTOCOMMIT")
+                    await conn.execute(text("VACUUM"))
+                print("vacuumed")
+        elif args.command == "train":
+            async with engine.begin() as conn:
+                dict_id = await conn.run_sync(train_blob_dictionary)
+            print(f"trained dictionary: {dict_id if dict_id is not None else '- (not enough samples)'}")
+        elif args.command == "recompress":
+            rows = await run_in_chunks(engine, recompress_chunk, chunk_size=args.chunk_size)
+            print(f"recompressed {rows} rows")
+
+        async with engine.connect() as conn:
+            stats = await conn.run_sync(blob_stats)
+        await engine.dispose()
+        print(
+            f"content_blobs: rows={stats['rows']} dictionaries={stats['dictionaries']} "
+            f"compressed={stats['compressed_bytes']} raw={stats['raw_bytes']}"
+        )
+
+    asyncio.run(_main())
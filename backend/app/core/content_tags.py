@@ -0,0 +1,112 @@
+"""
+内容标签索引（content_tags / tag_counts）
+
+- contents.tags 仍是 JSON 数组（展示与编辑用），content_tags 按 (content_id, tag_norm) 一行一个标签，
+  由 contents 上的触发器同步维护；标签筛选走 (tag_norm, content_id) 索引
+- tag_counts 记录每个规范化标签的使用次数，由 content_tags 上的触发器增减，标签云只读这一张小表
+- 规范化函数 vs_tag_norm（去首尾空白 + 小写，与 normalize_tag 一致）在每个 SQLite 连接建立时注册，
+  触发器依赖它；不经过本应用直接改写 contents 的工具需先注册同名函数
+- 触发器在 create_all 之后自动安装（幂等），索引为空而已有带标签的内容时回填
+
+重建：python -m app.core.content_tags rebuild
+"""
+from __future__ import annotations
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.logging import logger
+from app.models.base import Base
+from app.utils.tags import normalize_tag
+
+TAG_NORM_FUNCTION = "vs_tag_norm"
+
+
+def _tag_norm(value):
+    return normalize_tag(value) if isinstance(value, str) else None
+
+
+@event.listens_for(Engine, "connect")
+def _register_tag_norm_function(dbapi_conn, connection_record) -> None:
+    create_function = getattr(dbapi_conn, "create_function", None)
+    if create_function is not None:
+        create_function(TAG_NORM_FUNCTION, 1, _tag_norm, deterministic=True)
+
+
+def _select_tags(source: str) -> str:
+    """展开 JSON 标签数组为 (content_id, tag_norm, name) 行；同一内容内重复的标签由主键去重"""
+    prefix = f"{source}."
+    return (
+        f"SELECT {prefix}id, {TAG_NORM_FUNCTION}(je.value), trim(je.value) "
+        f"FROM {'contents, ' if source == 'contents' else ''}"
+        f"json_each(CASE WHEN json_valid({prefix}tags) THEN {prefix}tags END) AS je "
+        f"WHERE je.type = 'text' AND {TAG_NORM_FUNCTION}(je.value) <> ''"
+    )
+
+
+def _ddl() -> list[str]:
+    insert = f"INSERT OR IGNORE INTO content_tags(content_id, tag_norm, name) {_select_tags('new')};"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS contents_tags_ai AFTER INSERT ON contents BEGIN {insert} END",
+        "CREATE TRIGGER IF NOT EXISTS contents_tags_ad AFTER DELETE ON contents BEGIN "
+        "DELETE FROM content_tags WHERE content_id = old.id; END",
+        "CREATE TRIGGER IF NOT EXISTS contents_tags_au AFTER UPDATE OF tags ON contents BEGIN "
+        f"DELETE FROM content_tags WHERE content_id = old.id; {insert} END",
+        "CREATE TRIGGER IF NOT EXISTS content_tags_count_ai AFTER INSERT ON content_tags BEGIN "
+        "INSERT INTO tag_counts(tag_norm, name, count) VALUES (new.tag_norm, new.name, 1) "
+        "ON CONFLICT(tag_norm) DO UPDATE SET count = count + 1; END",
+        "CREATE TRIGGER IF NOT EXISTS content_tags_count_ad AFTER DELETE ON content_tags BEGIN "
+        "UPDATE tag_counts SET count = count - 1 WHERE tag_norm = old.tag_norm; "
+        "DELETE FROM tag_counts WHERE tag_norm = old.tag_norm AND count <= 0; END",
+    ]
+
+
+def rebuild_content_tags(conn: Connection) -> int:
+    """清空并按 contents 全量重建标签行与计数，返回写入的标签行数"""
+    conn.execute(text("DELETE FROM content_tags"))
+    conn.execute(text("DELETE FROM tag_counts"))
+    result = conn.execute(
+        text(f"INSERT OR IGNORE INTO content_tags(content_id, tag_norm, name) {_select_tags('contents')}")
+    )
+    return int(result.rowcount or 0)
+
+
+def ensure_content_tags(conn: Connection) -> None:
+    """安装触发器（幂等）；标签表为空而已有带标签的内容时回填"""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in _ddl():
+        conn.execute(text(statement))
+    if conn.execute(text("SELECT 1 FROM content_tags LIMIT 1")).first() is not None:
+        return
+    has_tagged = conn.execute(
+        text("SELECT 1 FROM contents WHERE json_valid(tags) AND json_array_length(tags) > 0 LIMIT 1")
+    ).first()
+    if has_tagged is not None:
+        rows = rebuild_content_tags(conn)
+        logger.info("标签索引已回填: rows={}", rows)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection: Connection, **kw) -> None:
+    ensure_content_tags(connection)
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="内容标签索引维护")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    async def _main() -> None:
+        from app.core.db_adapter import engine
+
+        async with engine.begin() as conn:
+            await conn.run_sync(ensure_content_tags)
+            rows = await conn.run_sync(rebuild_content_tags)
+        await engine.dispose()
+        print(f"rebuilt content_tags: {rows} rows")
+
+    asyncio.run(_main())
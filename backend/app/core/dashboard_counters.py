@@ -0,0 +1,167 @@
+"""
+仪表盘计数器（dashboard_counters）
+
+看板的解析状态、平台分布与分发分桶预先汇总在 dashboard_counters 中，读取只扫描这张小表：
+- parse：订阅库内容（discovery_state 为空或 promoted）按解析状态计数
+- platform：订阅库内容按平台计数
+- distribution：解析成功的订阅库内容的分发队列项，按规则（dim = rule_id）和看板分桶计数
+  （分桶规则与 dashboard_service.classify_distribution_status 一致）
+
+计数由 contents / content_queue_items 上的触发器在状态变化时增量维护，
+解析任务与分发 worker 的每次状态写入都会同步生效；定时对账（reconcile_counters）
+按源表重算并修正漂移。触发器在 create_all 之后自动安装（幂等），计数表为空时回填。
+
+重建：python -m app.core.dashboard_counters rebuild
+"""
+from __future__ import annotations
+
+from sqlalchemy import event, text
+from sqlalchemy.engine import Connection
+
+from app.core.logging import logger
+from app.models.base import Base
+
+METRIC_PARSE = "parse"
+METRIC_PLATFORM = "platform"
+METRIC_DISTRIBUTION = "distribution"
+
+
+def _library(alias: str) -> str:
+    return f"({alias}.discovery_state IS NULL OR {alias}.discovery_state = 'promoted')"
+
+
+def _distributable(alias: str) -> str:
+    return f"({alias}.status = 'parse_success' AND {_library(alias)})"
+
+
+def _bucket(alias: str) -> str:
+    return (
+        f"CASE WHEN {alias}.status = 'success' THEN 'pushed' "
+        f"WHEN {alias}.status IN ('scheduled', 'processing') THEN 'will_push' "
+        f"WHEN {alias}.status = 'failed' AND {alias}.next_attempt_at IS NOT NULL THEN 'will_push' "
+        f"ELSE 'filtered' END"
+    )
+
+
+_UPSERT = "ON CONFLICT(metric, dim, bucket) DO UPDATE SET count = count + excluded.count;"
+
+
+def _bump_content(alias: str, delta: int) -> str:
+    """单条内容对 parse / platform 计数的增减"""
+    return " ".join(
+        f"INSERT INTO dashboard_counters(metric, dim, bucket, count) "
+        f"SELECT '{metric}', '', coalesce({alias}.{column}, ''), {delta} WHERE {_library(alias)} {_UPSERT}"
+        for metric, column in ((METRIC_PARSE, "status"), (METRIC_PLATFORM, "platform"))
+    )
+
+
+def _bump_queue_item(alias: str, delta: int) -> str:
+    """单个队列项对 distribution 计数的增减（所属内容须为解析成功的订阅库内容）"""
+    return (
+        f"INSERT INTO dashboard_counters(metric, dim, bucket, count) "
+        f"SELECT '{METRIC_DISTRIBUTION}', coalesce(CAST({alias}.rule_id AS TEXT), ''), {_bucket(alias)}, {delta} "
+        f"WHERE EXISTS (SELECT 1 FROM contents c WHERE c.id = {alias}.content_id AND {_distributable('c')}) {_UPSERT}"
+    )
+
+
+def _bump_content_queue(alias: str, sign: int, where: str) -> str:
+    """内容进出“可分发”状态时，其全部队列项整体计入或移出 distribution 计数"""
+    return (
+        f"INSERT INTO dashboard_counters(metric, dim, bucket, count) "
+        f"SELECT '{METRIC_DISTRIBUTION}', coalesce(CAST(q.rule_id AS TEXT), ''), {_bucket('q')}, {sign} * count(*) "
+        f"FROM content_queue_items q WHERE q.content_id = {alias}.id AND {where} "
+        f"GROUP BY 2, 3 {_UPSERT}"
+    )
+
+
+def _ddl() -> list[str]:
+    leaves = f"{_distributable('old')} AND NOT {_distributable('new')}"
+    enters = f"{_distributable('new')} AND NOT {_distributable('old')}"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS contents_counters_ai AFTER INSERT ON contents BEGIN "
+        f"{_bump_content('new', 1)} END",
+        # BEFORE DELETE：级联删除队列项时内容行已不存在，先按内容整体移出分发计数
+        f"CREATE TRIGGER IF NOT EXISTS contents_counters_bd BEFORE DELETE ON contents BEGIN "
+        f"{_bump_content('old', -1)} {_bump_content_queue('old', -1, _distributable('old'))} END",
+        f"CREATE TRIGGER IF NOT EXISTS contents_counters_au AFTER UPDATE OF status, discovery_state, platform ON contents BEGIN "
+        f"{_bump_content('old', -1)} {_bump_content('new', 1)} "
+        f"{_bump_content_queue('old', -1, leaves)} {_bump_content_queue('new', 1, enters)} END",
+        f"CREATE TRIGGER IF NOT EXISTS queue_items_counters_ai AFTER INSERT ON content_queue_items BEGIN "
+        f"{_bump_queue_item('new', 1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS queue_items_counters_ad AFTER DELETE ON content_queue_items BEGIN "
+        f"{_bump_queue_item('old', -1)} END",
+        f"CREATE TRIGGER IF NOT EXISTS queue_items_counters_au "
+        f"AFTER UPDATE OF status, next_attempt_at, rule_id, content_id ON content_queue_items BEGIN "
+        f"{_bump_queue_item('old', -1)} {_bump_queue_item('new', 1)} END",
+    ]
+
+
+_SOURCE_COUNTS = f"""
+SELECT '{METRIC_PARSE}', '', coalesce(c.status, ''), count(*) FROM contents c WHERE {_library('c')} GROUP BY 3
+UNION ALL
+SELECT '{METRIC_PLATFORM}', '', coalesce(c.platform, ''), count(*) FROM contents c WHERE {_library('c')} GROUP BY 3
+UNION ALL
+SELECT '{METRIC_DISTRIBUTION}', coalesce(CAST(q.rule_id AS TEXT), ''), {_bucket('q')}, count(*)
+FROM content_queue_items q JOIN contents c ON c.id = q.content_id
+WHERE {_distributable('c')} GROUP BY 2, 3
+"""
+
+
+def _snapshot(conn: Connection) -> dict[tuple[str, str, str], int]:
+    rows = conn.execute(text("SELECT metric, dim, bucket, count FROM dashboard_counters WHERE count <> 0")).all()
+    return {(metric, dim, bucket): int(count) for metric, dim, bucket, count in rows}
+
+
+def rebuild_counters(conn: Connection) -> int:
+    """按源表全量重算计数，返回写入行数"""
+    conn.execute(text("DELETE FROM dashboard_counters"))
+    result = conn.execute(text(f"INSERT INTO dashboard_counters(metric, dim, bucket, count) {_SOURCE_COUNTS}"))
+    return int(result.rowcount or 0)
+
+
+def reconcile_counters(conn: Connection) -> int:
+    """重算计数并返回与重算前不一致的计数项数（漂移）"""
+    before = _snapshot(conn)
+    rebuild_counters(conn)
+    after = _snapshot(conn)
+    drift = sum(1 for key in before.keys() | after.keys() if before.get(key, 0) != after.get(key, 0))
+    if drift:
+        logger.warning("仪表盘计数存在漂移，已按源表修正: entries={}", drift)
+    return drift
+
+
+def ensure_counters(conn: Connection) -> None:
+    """安装触发器（幂等）；计数表为空时回填"""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in _ddl():
+        conn.execute(text(statement))
+    if conn.execute(text("SELECT 1 FROM dashboard_counters LIMIT 1")).first() is None:
+        rows = rebuild_counters(conn)
+        if rows:
+            logger.info("仪表盘计数已回填: rows={}", rows)
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection: Connection, **kw) -> None:
+    ensure_counters(connection)
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="仪表盘计数维护")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    async def _main() -> None:
+        from app.core.db_adapter import engine
+
+        async with engine.begin() as conn:
+            await conn.run_sync(ensure_counters)
+            rows = await conn.run_sync(rebuild_counters)
+        await engine.dispose()
+        print(f"rebuilt dashboard_counters: {rows} rows")
+
+    asyncio.run(_main())
@@ -0,0 +1,64 @@
+"""
+按表的数据版本号（data_versions）
+
+被跟踪的表每次插入、更新、删除都由触发器把对应行的 version 加一，
+读多写少的接口据此判断数据是否变化（见 app.core.response_cache）：
+版本号没变，上次的响应就仍然有效。版本号存在库里，多实例与绕过应用的写入同样生效。
+另存一个建库时随机生成的纪元（EPOCH），随版本号一并返回：库被重建后版本号从头计数，
+纪元不同，旧的缓存键与 ETag 不会误命中。
+触发器在 create_all 之后自动安装（幂等）；非 SQLite 数据库不安装，读取返回 None。
+"""
+from __future__ import annotations
+
+from typing import Iterable, Optional
+
+from sqlalchemy import event, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.base import Base
+
+# content_blobs 单独计数：只改正文/富文本/归档元数据时 contents 行不变，但全文检索结果会变
+TRACKED_TABLES = ("contents", "content_blobs", "content_queue_items")
+EPOCH = "__epoch__"
+
+
+def _bump(table: str) -> str:
+    return (
+        f"INSERT INTO data_versions(name, version) VALUES ('{table}', 1) "
+        f"ON CONFLICT(name) DO UPDATE SET version = version + 1;"
+    )
+
+
+def _ddl() -> list[str]:
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS {table}_version_{suffix} AFTER {op} ON {table} BEGIN {_bump(table)} END"
+        for table in TRACKED_TABLES
+        for suffix, op in (("ai", "INSERT"), ("au", "UPDATE"), ("ad", "DELETE"))
+    ]
+
+
+def ensure_data_versions(conn: Connection) -> None:
+    """安装触发器并写入纪元（幂等）"""
+    if conn.dialect.name != "sqlite":
+        return
+    for statement in _ddl():
+        conn.execute(text(statement))
+    conn.execute(text(f"INSERT OR IGNORE INTO data_versions(name, version) VALUES ('{EPOCH}', abs(random()))"))
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _install_after_create(target, connection: Connection, **kw) -> None:
+    ensure_data_versions(connection)
+
+
+async def read_versions(session: AsyncSession, tables: Iterable[str]) -> Optional[tuple[int, ...]]:
+    """返回 (纪元, *按 tables 顺序的版本号)；未安装触发器的数据库返回 None（调用方不应缓存）"""
+    if session.bind.dialect.name != "sqlite":
+        return None
+    from app.models import DataVersion
+
+    names = (EPOCH, *tables)
+    rows = await session.execute(select(DataVersion.name, DataVersion.version).where(DataVersion.name.in_(names)))
+    versions = dict(rows.all())
+    return tuple(int(versions.get(name) or 0) for name in names)
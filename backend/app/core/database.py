@@ -3,7 +3,9 @@
 """
 from sqlalchemy import text
 
+from app.core.content_blobs import migrate_legacy_blobs
 from app.core.db_adapter import AsyncSessionLocal, engine
+from app.core.fts import ensure_fts
 from app.models import Base
 
 
@@ -11,6 +13,9 @@ async def init_db():
     """初始化数据库基础结构。"""
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(ensure_fts)
+    # 旧库收尾：contents 上遗留的大字段分批迁入 content_blobs（没有旧列时直接返回）
+    await migrate_legacy_blobs(engine, finalize=True)
 
 
 async def db_ping() -> bool:
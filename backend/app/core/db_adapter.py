@@ -6,6 +6,7 @@ import time
 from sqlalchemy import event
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.pool import NullPool
+from app.core import fts  # noqa: F401  注册全文索引切分函数（连接建立时）
 from app.core.config import settings
 from app.core.logging import logger
 
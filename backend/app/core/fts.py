@@ -0,0 +1,236 @@
+"""
+内容全文索引（SQLite FTS5）
+
+- contents_fts 以 rowid = contents.id 存放标题/作者/标签/摘要/正文，由 contents 与 content_blobs
+  上的触发器同步维护（正文在副表中压缩存储，经 vs_blob_text 解压后写入索引，见 app.core.content_blobs）
+- 中日韩文字连续片段在写入前切分为重叠的二元组（"机器学习" -> "机器 器学 学习"），
+  英文等仍由 unicode61 分词；查询按同样规则切分为短语，匹配相邻二元组
+- 切分函数 vs_fts_segment 在每个 SQLite 连接建立时注册，触发器依赖它；
+  不经过本应用直接改写 contents 的工具需先注册同名函数
+- 排序使用 bm25，各列权重见 BM25_WEIGHTS
+- 触发器定义变化时（与 sqlite_master 中的不一致）启动时自动替换
+
+重建：python -m app.core.fts rebuild
+"""
+from __future__ import annotations
+
+import re
+from typing import Optional
+
+from sqlalchemy import bindparam, column, event, select, table, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.content_blobs import BLOB_TEXT_FUNCTION
+from app.core.logging import logger
+
+FTS_TABLE = "contents_fts"
+SEGMENT_FUNCTION = "vs_fts_segment"
+# 列顺序即 bm25 权重顺序
+FTS_COLUMNS = ("title", "author", "tags", "summary", "body")
+BM25_WEIGHTS = (10.0, 4.0, 6.0, 2.0, 1.0)
+_SOURCE_COLUMNS = ("title", "author_name", "tags", "summary", "body")
+# contents 上的源列（body 在 content_blobs）
+_CONTENT_COLUMNS = ("title", "author_name", "tags", "summary")
+
+_CJK_RUN = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af\uf900-\ufaff]+")
+_QUERY_TERM = re.compile(r"\w+")
+
+contents_fts = table(FTS_TABLE, column("rowid"))
+
+
+def _bigrams(run: str) -> str:
+    if len(run) == 1:
+        return run
+    return " ".join(run[i:i + 2] for i in range(len(run) - 1))
+
+
+def segment_text(value: Optional[str]) -> Optional[str]:
+    """写入索引前的切分：中日韩片段展开为二元组，其余原样交给 unicode61"""
+    if value is None:
+        return None
+    return _CJK_RUN.sub(lambda m: f" {_bigrams(m.group())} ", str(value))
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """把用户输入转为 FTS5 MATCH 表达式：每个词一个短语（词间为 AND），末尾按前缀匹配
+
+    只保留字母数字，用户输入中的 FTS5 运算符不会生效；没有可检索的词时返回 None。
+    """
+    phrases = []
+    for term in _QUERY_TERM.findall(query):
+        tokens = _QUERY_TERM.findall(segment_text(term))
+        if tokens:
+            phrases.append('"' + " ".join(tokens) + '"*')
+    return " ".join(phrases) or None
+
+
+def fts_match(match: str):
+    return text(f"{FTS_TABLE} MATCH :fts_query").bindparams(fts_query=match)
+
+
+def fts_rank():
+    """bm25 分数越小越相关，可直接用于升序排序"""
+    return text(f"bm25({FTS_TABLE}, {', '.join(str(w) for w in BM25_WEIGHTS)})")
+
+
+def fts_content_ids(match: str):
+    """命中内容 id 的子查询（不排序），用于列表过滤"""
+    return select(contents_fts.c.rowid).where(fts_match(match))
+
+
+async def fts_ready(session: AsyncSession) -> bool:
+    """索引表是否存在（SQLite 未编译 FTS5 或尚未初始化时调用方退回 LIKE）"""
+    row = (
+        await session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {"name": FTS_TABLE},
+        )
+    ).first()
+    return row is not None
+
+
+@event.listens_for(Engine, "connect")
+def _register_segment_function(dbapi_conn, connection_record) -> None:
+    # 所有 SQLite 连接都注册，保证任何会话写 contents 时触发器可执行
+    create_function = getattr(dbapi_conn, "create_function", None)
+    if create_function is not None:
+        create_function(SEGMENT_FUNCTION, 1, segment_text, deterministic=True)
+
+
+def _source_expr(prefix: str, name: str) -> str:
+    if name == "tags":
+        # tags 以 JSON 数组存储（非 ASCII 被转义），展开为空格分隔的原文
+        return f"(SELECT group_concat(value, ' ') FROM json_each(CASE WHEN json_valid({prefix}tags) THEN {prefix}tags END))"
+    if name == "body":
+        return (
+            f"(SELECT {BLOB_TEXT_FUNCTION}(b.body, d.data) FROM content_blobs b "
+            f"LEFT JOIN content_blob_dicts d ON d.id = b.dict_id WHERE b.content_id = {prefix}id)"
+        )
+    return f"{prefix}{name}"
+
+
+def _segmented_values(prefix: str) -> str:
+    return ", ".join(f"{SEGMENT_FUNCTION}({_source_expr(prefix, name)})" for name in _SOURCE_COLUMNS)
+
+
+def _reindex(content_id: str) -> str:
+    """按内容 id 重写一行索引（副表行写入时内容行已存在）"""
+    return (
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = {content_id}; "
+        f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)}) "
+        f"SELECT c.id, {_segmented_values('c.')} FROM contents c WHERE c.id = {content_id};"
+    )
+
+
+def _triggers() -> list[str]:
+    columns = ", ".join(FTS_COLUMNS)
+    insert = f"INSERT INTO {FTS_TABLE}(rowid, {columns}) VALUES (new.id, {_segmented_values('new.')});"
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS contents_fts_ai AFTER INSERT ON contents BEGIN {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS contents_fts_ad AFTER DELETE ON contents BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; END",
+        f"CREATE TRIGGER IF NOT EXISTS contents_fts_au AFTER UPDATE OF {', '.join(_CONTENT_COLUMNS)} ON contents BEGIN "
+        f"DELETE FROM {FTS_TABLE} WHERE rowid = old.id; {insert} END",
+        f"CREATE TRIGGER IF NOT EXISTS content_blobs_fts_ai AFTER INSERT ON content_blobs BEGIN "
+        f"{_reindex('new.content_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS content_blobs_fts_ad AFTER DELETE ON content_blobs BEGIN "
+        f"{_reindex('old.content_id')} END",
+        f"CREATE TRIGGER IF NOT EXISTS content_blobs_fts_au AFTER UPDATE OF body ON content_blobs BEGIN "
+        f"{_reindex('new.content_id')} END",
+    ]
+
+
+def _ddl() -> list[str]:
+    columns = ", ".join(FTS_COLUMNS)
+    return [
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 2')",
+        *_triggers(),
+    ]
+
+
+def _trigger_name(statement: str) -> str:
+    return statement.split()[5]  # CREATE TRIGGER IF NOT EXISTS <name> ...
+
+
+def _drop_stale_triggers(conn: Connection) -> None:
+    """定义已变化的旧触发器先删除，随后按当前定义重建"""
+    expected = {_trigger_name(statement): statement.replace("IF NOT EXISTS ", "", 1) for statement in _triggers()}
+    rows = conn.execute(
+        text("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name IN :names").bindparams(
+            bindparam("names", expanding=True)
+        ),
+        {"names": list(expected)},
+    ).all()
+    for name, sql in rows:
+        if sql != expected[name]:
+            conn.execute(text(f"DROP TRIGGER {name}"))
+
+
+def rebuild_fts(conn: Connection) -> int:
+    """清空并按 contents 全量重建索引，返回写入行数"""
+    conn.execute(text(f"DELETE FROM {FTS_TABLE}"))
+    result = conn.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}(rowid, {', '.join(FTS_COLUMNS)}) "
+            f"SELECT c.id, {_segmented_values('c.')} FROM contents c"
+        )
+    )
+    optimize_fts(conn)
+    return int(result.rowcount or 0)
+
+
+def optimize_fts(conn: Connection) -> None:
+    """合并索引段（批量重写大量行之后执行）"""
+    exists = conn.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+    ).first()
+    if exists is not None:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+
+
+def _is_empty(conn: Connection, table_name: str) -> bool:
+    return conn.execute(text(f"SELECT 1 FROM {table_name} LIMIT 1")).first() is None
+
+
+def ensure_fts(conn: Connection) -> bool:
+    """建表与触发器（幂等）；索引为空而 contents 有数据时回填"""
+    existing = [row[1] for row in conn.execute(text(f"PRAGMA table_info({FTS_TABLE})")).all()]
+    if existing and tuple(existing) != FTS_COLUMNS:
+        # 旧版本遗留的同名表结构不同，整体重建
+        conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+        for statement in _triggers():
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {_trigger_name(statement)}"))
+        existing = []
+    try:
+        _drop_stale_triggers(conn)
+        for statement in _ddl():
+            conn.execute(text(statement))
+    except OperationalError as e:
+        logger.warning(f"FTS5 不可用，关键词检索退回 LIKE: {e}")
+        return False
+    if _is_empty(conn, FTS_TABLE) and not _is_empty(conn, "contents"):
+        rows = rebuild_fts(conn)
+        logger.info("全文索引已创建并回填: rows={}", rows)
+    return True
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+
+    parser = argparse.ArgumentParser(description="内容全文索引维护")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+
+    async def _main() -> None:
+        from app.core.db_adapter import engine
+
+        async with engine.begin() as conn:
+            await conn.run_sync(ensure_fts)
+            rows = await conn.run_sync(rebuild_fts)
+        await engine.dispose()
+        print(f"rebuilt {FTS_TABLE}: {rows} rows")
+
+    asyncio.run(_main())
@@ -0,0 +1,133 @@
+"""
+按数据版本缓存的只读接口响应（ETag + 304）
+
+- 缓存键 = (路径, 查询参数, 相关表的数据版本号[, 时间片])；版本号由触发器在写入时递增（见 app.core.data_versions），
+  数据不变时键不变，写入后键随之变化，不需要显式失效
+- ETag 由缓存键派生：If-None-Match 命中时只读一次版本号就返回 304，不执行查询也不需要缓存体；
+  否则命中进程内缓存直接返回上次的响应体
+- 未命中时照常执行接口，由 store_cached_response 中间件在序列化后保存响应体
+- 结果还依赖当前时间的接口（今日统计、到期数量等）传 ttl_seconds，按时间片并入缓存键
+
+用法（放在路由装饰器之下，鉴权等依赖照常先执行）：
+
+    @router.get("/tags")
+    @cached_response("contents")
+    async def get_tags_list(...): ...
+"""
+from __future__ import annotations
+
+import functools
+import hashlib
+import inspect
+import time
+from typing import Hashable, Optional
+
+from fastapi import Depends, Request, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.data_versions import read_versions
+from app.core.database import get_db
+from app.media.responses import is_not_modified, not_modified_response
+from app.services.search_cache import LRUCache
+
+_REQUEST_PARAM = "_response_cache_request"
+_DB_PARAM = "_response_cache_db"
+_STATE_KEY = "response_cache_key"
+
+_response_cache: Optional[LRUCache] = None
+
+
+def get_response_cache() -> LRUCache:
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = LRUCache(settings.response_cache_size)
+    return _response_cache
+
+
+def response_etag(key: Hashable) -> str:
+    # 同一键下的响应体可能包含读版本号之后的新写入，语义等价即可，用弱 ETag
+    return f'W/"{hashlib.blake2b(repr(key).encode("utf-8"), digest_size=12).hexdigest()}"'
+
+
+def _cache_headers(key: Hashable) -> dict[str, str]:
+    # 客户端每次都回源校验，未变化时由 304 兜底
+    return {"ETag": response_etag(key), "Cache-Control": "private, no-cache"}
+
+
+async def _cache_key(
+    request: Request,
+    db: AsyncSession,
+    tables: tuple[str, ...],
+    ttl_seconds: Optional[float],
+) -> Optional[tuple]:
+    # 与接口共用同一请求内的会话，先读版本号再执行查询：缓存体至少与键中的版本一样新
+    versions = await read_versions(db, tables)
+    if versions is None:
+        return None
+    params = tuple(sorted(request.query_params.multi_items()))
+    window = int(time.time() // ttl_seconds) if ttl_seconds else None
+    return (request.url.path, params, tables, versions, window)
+
+
+def cached_response(*tables: str, ttl_seconds: Optional[float] = None):
+    """为只读 JSON 接口启用按 tables 数据版本的响应缓存"""
+
+    def decorator(endpoint):
+        signature = inspect.signature(endpoint)
+        request_param = next(
+            (p.name for p in signature.parameters.values() if p.annotation is Request),
+            None,
+        )
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            if request_param:
+                request: Optional[Request] = kwargs.get(request_param)
+            else:
+                request = kwargs.pop(_REQUEST_PARAM, None)
+            db: Optional[AsyncSession] = kwargs.pop(_DB_PARAM, None)
+            cache = get_response_cache()
+            # 直接调用（非经路由）时不走缓存
+            usable = isinstance(request, Request) and isinstance(db, AsyncSession) and cache.maxsize > 0
+            key = await _cache_key(request, db, tables, ttl_seconds) if usable else None
+            if key is None:
+                return await endpoint(*args, **kwargs)
+
+            headers = _cache_headers(key)
+            if is_not_modified(request.headers, etag=headers["ETag"], last_modified=None):
+                return not_modified_response(headers)
+            body = cache.get(key)
+            if body is not None:
+                return Response(content=body, media_type="application/json", headers=headers)
+
+            setattr(request.state, _STATE_KEY, key)
+            return await endpoint(*args, **kwargs)
+
+        # 追加仅供缓存使用的参数；get_db 在同一请求内只解析一次，与接口拿到的是同一个会话
+        extra = [
+            inspect.Parameter(
+                _DB_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=AsyncSession, default=Depends(get_db)
+            )
+        ]
+        if request_param is None:
+            extra.append(inspect.Parameter(_REQUEST_PARAM, inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+        wrapper.__signature__ = signature.replace(parameters=[*signature.parameters.values(), *extra])
+        return wrapper
+
+    return decorator
+
+
+async def store_cached_response(request: Request, call_next):
+    """HTTP 中间件：保存 cached_response 未命中时序列化好的响应体，并补上 ETag"""
+    response = await call_next(request)
+    key = getattr(request.state, _STATE_KEY, None)
+    if key is None or response.status_code != 200:
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    if len(body) <= settings.response_cache_max_body_bytes:
+        get_response_cache().put(key, body)
+    headers = dict(response.headers)
+    headers.update(_cache_headers(key))
+    return Response(content=body, status_code=response.status_code, headers=headers)
@@ -28,6 +28,7 @@ from app.core.config import settings, validate_settings
 from app.core.database import init_db
 from app.core.queue import task_queue
 from app.core.events import event_bus
+from app.core.response_cache import store_cached_response
 from app.tasks import worker, DistributionQueueWorker
 from app.services.distribution import enqueue_content
 
@@ -111,11 +112,15 @@ async def lifespan(app: FastAPI):
 
     # 初始化周期任务实例（即使本进程不是 leader，也保留实例用于手动触发场景）
     from app.tasks import CookieKeepAliveTask
-    from app.tasks import DiscoverySyncTask, DiscoveryCleanupTask, FavoritesSyncTask
+    from app.tasks import DiscoverySyncTask, DiscoveryCleanupTask, FavoritesSyncTask, StorageMaintenanceTask
+    from app.tasks import RelatedContentTask, DashboardCountersTask
     maintenance_worker = CookieKeepAliveTask()
     discovery_sync_task = DiscoverySyncTask()
     discovery_cleanup_task = DiscoveryCleanupTask()
     favorites_sync_task = FavoritesSyncTask()
+    storage_maintenance_task = StorageMaintenanceTask()
+    related_content_task = RelatedContentTask()
+    dashboard_counters_task = DashboardCountersTask()
 
     # 周期任务单实例机制：只有 leader 进程启动后台循环
     from app.services.background_task_leader import background_task_leader
@@ -130,6 +135,15 @@ async def lifespan(app: FastAPI):
 
         favorites_sync_task.start()
         logger.info("收藏同步任务已启动")
+
+        storage_maintenance_task.start()
+        logger.info("存储维护任务已启动")
+
+        related_content_task.start()
+        logger.info("相似内容预计算任务已启动")
+
+        dashboard_counters_task.start()
+        logger.info("仪表盘计数对账任务已启动")
     else:
         logger.warning("当前进程未获得周期任务 leader 锁，跳过自动循环任务启动")
 
@@ -137,6 +151,14 @@ async def lifespan(app: FastAPI):
     app.state.discovery_sync_task = discovery_sync_task
     app.state.favorites_sync_task = favorites_sync_task
     app.state.periodic_tasks_started = periodic_tasks_started
+
+    # 继续上次未完成的全库语义索引重建（仅 leader 进程）
+    from app.services.embedding_queue import get_embedding_queue, get_reindex_job
+    if periodic_tasks_started:
+        try:
+            await get_reindex_job().resume_if_interrupted()
+        except Exception as e:
+            logger.warning(f"恢复语义索引重建失败: {e}")
     
     yield
     
@@ -150,6 +172,12 @@ async def lifespan(app: FastAPI):
         logger.info("发现流同步和清理任务已停止")
         await favorites_sync_task.stop()
         logger.info("收藏同步任务已停止")
+        await storage_maintenance_task.stop()
+        logger.info("存储维护任务已停止")
+        await related_content_task.stop()
+        logger.info("相似内容预计算任务已停止")
+        await dashboard_counters_task.stop()
+        logger.info("仪表盘计数对账任务已停止")
 
         await maintenance_worker.stop()
         logger.info("Cookie 保活任务已停止")
@@ -176,6 +204,14 @@ async def lifespan(app: FastAPI):
 
     # 停止事件总线
     await event_bus.stop()
+
+    # 语义索引：等待已入队的批次写完，重建任务保留断点待下次启动继续
+    await get_reindex_job().stop(pause=False)
+    await get_embedding_queue().drain()
+
+    # 保存向量索引快照，下次启动直接加载
+    from app.services.vector_cache import get_vector_cache
+    await get_vector_cache().persist()
     
     logger.info("应用程序关闭完成")
 
@@ -227,6 +263,9 @@ async def request_id_middleware(request: Request, call_next):
 
     return JSONResponse(status_code=500, content={"detail": "internal error"}, headers={"X-Request-Id": request_id})
 
+# 只读接口响应缓存：保存未命中时的响应体（见 app.core.response_cache）
+app.middleware("http")(store_cached_response)
+
 # CORS中间件
 _cors_origins = [o.strip() for o in settings.cors_allowed_origins.split(",") if o.strip()]
 app.add_middleware(
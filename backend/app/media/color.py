@@ -3,6 +3,8 @@
 
 从图片中提取主色调信息
 """
+import asyncio
+
 import httpx
 from pathlib import Path
 from typing import Optional
@@ -10,6 +12,7 @@ from urllib.parse import urlparse
 
 from app.core.logging import logger
 from app.core.config import settings
+from app.media.guards import MediaLimitExceeded, fetch_bytes_limited, probe_image_header
 
 
 def _get_dominant_color(data: bytes) -> str:
@@ -29,6 +32,7 @@ def _get_dominant_color(data: bytes) -> str:
         from io import BytesIO
         
         img = Image.open(BytesIO(data))
+        img.draft("RGB", (100, 100))  # JPEG 按缩小比例解码，避免解出整张大图
         img = img.convert("RGB")
         img = img.resize((100, 100))  # 缩小以提高性能
         
@@ -89,12 +93,14 @@ async def extract_cover_color(url: str, timeout_seconds: float = 10.0) -> Option
         if local_data:
             return _get_dominant_color(local_data)
         
-        # 远程URL通过HTTP获取
+        # 远程URL通过HTTP获取（流式检查下载上限，解码前检查像素/帧数上限）
         async with httpx.AsyncClient(timeout=timeout_seconds) as client:
-            resp = await client.get(url)
-            resp.raise_for_status()
-            data = resp.content
-            return _get_dominant_color(data)
+            data, _ = await fetch_bytes_limited(client, url)
+        await asyncio.to_thread(probe_image_header, data)
+        return _get_dominant_color(data)
+    except MediaLimitExceeded as e:
+        logger.warning(f"封面超出处理上限，跳过颜色提取 ({url}): {e}")
+        return None
     except Exception as e:
         logger.warning(f"提取封面颜色失败 ({url}): {e}")
         return None
@@ -0,0 +1,190 @@
+"""媒体处理防护（解压炸弹与内存上限）
+
+远程图片的字节数很小并不代表解码后很小：一张 50KB 的 PNG 可以声明 6 万 x 6 万像素，
+一个 GIF 可以包含上万帧。这里提供三层防护：
+
+- 下载上限：流式读取响应体，声明大小或实际读取量超过上限立即中止
+- 解码前检查：只读图片头（不解码像素），按像素数、帧数、总像素数（帧数 x 单帧像素）拒绝
+- 内存记账：按解码后的估算字节数向进程级预算申请额度，额度不足时排队等待；
+  单个任务的估算超过整个预算时直接拒绝，由调用方降级（保存原图或跳过）
+
+这样并发归档时峰值内存约为 预算 + 下载上限 x 并发数，而不是取决于最坏的输入。
+"""
+
+from __future__ import annotations
+
+import asyncio
+import contextlib
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+import httpx
+
+from app.core.config import settings
+
+# Pillow 解码后的每像素字节数按 RGBA 估算
+_BYTES_PER_PIXEL = 4
+
+
+class MediaLimitExceeded(ValueError):
+    """媒体超出处理上限（下载大小、像素、帧数或内存预算）"""
+
+    def __init__(self, reason: str, limit: int, actual: Optional[int] = None):
+        detail = f"{actual} > {limit}" if actual is not None else f"limit {limit}"
+        super().__init__(f"media limit exceeded: {reason} ({detail})")
+        self.reason = reason
+        self.limit = limit
+        self.actual = actual
+
+
+@dataclass(frozen=True)
+class ImageHeader:
+    """图片头信息（未解码像素）"""
+
+    format: Optional[str]
+    width: int
+    height: int
+    frames: int
+
+    @property
+    def is_animated(self) -> bool:
+        return self.frames > 1
+
+    @property
+    def pixels(self) -> int:
+        return self.width * self.height
+
+    def decoded_bytes(self, *, all_frames: bool) -> int:
+        """解码后的估算内存：Pillow 动画转码会同时持有全部帧"""
+        return self.pixels * _BYTES_PER_PIXEL * (self.frames if all_frames else 1)
+
+
+def probe_image_header(data: bytes) -> ImageHeader:
+    """读取图片头并检查像素/帧数上限（同步，调用方负责放到工作线程）
+
+    帧数统计在超过上限后立即停止，不会遍历病态 GIF 的全部帧。
+
+    Raises:
+        MediaLimitExceeded: 像素数、帧数或总像素数超过上限
+    """
+    from PIL import Image
+    from io import BytesIO
+
+    max_pixels = int(settings.media_max_image_pixels)
+    max_frames = int(settings.media_max_image_frames)
+
+    try:
+        im = Image.open(BytesIO(data))
+    except Image.DecompressionBombError as e:
+        # 超过 Pillow 自带上限的两倍时 open 直接拒绝
+        raise MediaLimitExceeded("pixels", max_pixels or Image.MAX_IMAGE_PIXELS) from e
+
+    with im:
+        width, height = im.size
+        if max_pixels > 0 and width * height > max_pixels:
+            raise MediaLimitExceeded("pixels", max_pixels, width * height)
+
+        frames = 1
+        if getattr(im, "is_animated", False):
+            # n_frames 会扫描整个文件；逐帧 seek 可在超限时提前退出
+            try:
+                while True:
+                    im.seek(frames)
+                    frames += 1
+                    if max_frames > 0 and frames > max_frames:
+                        raise MediaLimitExceeded("frames", max_frames, frames)
+            except EOFError:
+                pass
+
+        header = ImageHeader(format=im.format, width=int(width), height=int(height), frames=frames)
+
+    max_total = int(settings.media_max_total_pixels)
+    if max_total > 0 and header.pixels * header.frames > max_total:
+        raise MediaLimitExceeded("total_pixels", max_total, header.pixels * header.frames)
+    return header
+
+
+class MediaMemoryBudget:
+    """进程级媒体解码内存预算（按估算字节记账的异步信号量）"""
+
+    def __init__(self, capacity_bytes: int):
+        self.capacity = max(0, int(capacity_bytes))
+        self._in_use = 0
+        self._condition = asyncio.Condition()
+
+    @property
+    def in_use(self) -> int:
+        return self._in_use
+
+    @contextlib.asynccontextmanager
+    async def reserve(self, nbytes: int) -> AsyncIterator[None]:
+        """申请 nbytes 额度，退出时归还；capacity 为 0 表示不限制
+
+        Raises:
+            MediaLimitExceeded: 单个任务的估算超过整个预算
+        """
+        nbytes = max(0, int(nbytes))
+        if self.capacity <= 0:
+            yield
+            return
+        if nbytes > self.capacity:
+            raise MediaLimitExceeded("memory", self.capacity, nbytes)
+
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_use + nbytes <= self.capacity)
+            self._in_use += nbytes
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._in_use -= nbytes
+                self._condition.notify_all()
+
+
+_memory_budget: Optional[MediaMemoryBudget] = None
+
+
+def get_media_memory_budget() -> MediaMemoryBudget:
+    """延迟创建，确保绑定到运行中的事件循环"""
+    global _memory_budget
+    if _memory_budget is None:
+        _memory_budget = MediaMemoryBudget(settings.media_memory_budget_bytes)
+    return _memory_budget
+
+
+async def read_response_limited(resp: httpx.Response, max_bytes: Optional[int] = None) -> bytes:
+    """流式读取响应体，超过上限立即中止（需配合 client.stream 使用）
+
+    Raises:
+        MediaLimitExceeded: 声明的 Content-Length 或实际读取量超过上限
+    """
+    limit = int(settings.media_max_download_bytes) if max_bytes is None else int(max_bytes)
+    declared = resp.headers.get("content-length")
+    if limit > 0 and declared and declared.isdigit() and int(declared) > limit:
+        raise MediaLimitExceeded("download", limit, int(declared))
+
+    buffer = bytearray()
+    async for chunk in resp.aiter_bytes():
+        buffer.extend(chunk)
+        if limit > 0 and len(buffer) > limit:
+            raise MediaLimitExceeded("download", limit, len(buffer))
+    return bytes(buffer)
+
+
+async def fetch_bytes_limited(
+    client: httpx.AsyncClient,
+    url: str,
+    *,
+    headers: Optional[dict[str, str]] = None,
+    max_bytes: Optional[int] = None,
+) -> tuple[bytes, Optional[str]]:
+    """GET 并按上限读取响应体，返回 (内容, Content-Type)
+
+    Raises:
+        httpx.HTTPStatusError: 非 2xx
+        MediaLimitExceeded: 超出下载上限
+    """
+    async with client.stream("GET", url, headers=headers) as resp:
+        resp.raise_for_status()
+        data = await read_response_limited(resp, max_bytes)
+        return data, resp.headers.get("content-type")
@@ -2,6 +2,7 @@
 
 当前范围：
 - 下载私有存档引用的远程图片，通过存储后端转换为WebP格式存储
+- 流式下载存档视频（支持大小上限与 Range 续传）
 - 就地更新存档中的存储资产引用
 
 未来范围：
@@ -21,7 +22,13 @@ import httpx
 
 from app.core.logging import logger
 from app.core.config import settings
-from app.adapters.storage import LocalStorageBackend
+from app.adapters.storage import LocalStorageBackend, StorageLimitExceeded, StoredObject
+from app.media.guards import (
+    MediaLimitExceeded,
+    fetch_bytes_limited,
+    get_media_memory_budget,
+    probe_image_header,
+)
 
 _URL_PATH_SAFE_CHARS = "/%:@!$&'()*+,;=-._~"
 _URL_QUERY_SAFE_CHARS = "/?:@!$&'()*+,;=-._~%="
@@ -90,91 +97,151 @@ def _content_addressed_key(namespace: str, sha256_hex: str, ext: str) -> str:
     return f"{prefix}blobs/sha256/{sha256_hex[:2]}/{sha256_hex[2:4]}/{sha256_hex}.{ext.lstrip('.')}"
 
 
-def _image_to_webp_ffmpeg(data: bytes, quality: int = 80) -> Optional[tuple[bytes, int, int]]:
+_IMAGE_EXTENSIONS = ("jpeg", "jpg", "png", "gif", "webp")
+
+
+def _image_content_type_and_ext(content_type_header: Optional[str]) -> tuple[str, str]:
+    """从响应 content-type 推断图片 MIME 与扩展名（默认 jpg）"""
+    content_type = (content_type_header or "").split(";")[0].strip() or "image/jpeg"
+    subtype = content_type.split("/")[-1]
+    if not content_type.startswith("image/") or subtype not in _IMAGE_EXTENSIONS:
+        return "image/jpeg", "jpg"
+    return content_type, subtype
+
+
+_FFMPEG_TIMEOUT_SECONDS = 120
+_ffmpeg_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_ffmpeg_semaphore() -> asyncio.Semaphore:
+    """限制并发 ffmpeg 进程数（按配置懒创建）"""
+    global _ffmpeg_semaphore
+    if _ffmpeg_semaphore is None:
+        _ffmpeg_semaphore = asyncio.Semaphore(max(1, int(settings.media_ffmpeg_concurrency)))
+    return _ffmpeg_semaphore
+
+
+def _fix_riff_size(data: bytes) -> bytes:
+    """输出到管道时 ffmpeg 无法回写 RIFF 头中的文件大小，这里补齐"""
+    if len(data) < 12 or data[:4] != b"RIFF" or data[8:12] != b"WEBP":
+        return data
+    riff_size = (len(data) - 8).to_bytes(4, "little")
+    if data[4:8] == riff_size:
+        return data
+    return data[:4] + riff_size + data[8:]
+
+
+def _webp_canvas_size(data: bytes) -> Optional[tuple[int, int]]:
+    """从 WebP 的 VP8X 扩展头读取画布尺寸（无需解码）"""
+    if len(data) < 30 or data[:4] != b"RIFF" or data[12:16] != b"VP8X":
+        return None
+    width = int.from_bytes(data[24:27], "little") + 1
+    height = int.from_bytes(data[27:30], "little") + 1
+    return width, height
+
+
+async def _image_to_webp_ffmpeg(
+    data: bytes,
+    quality: int = 80,
+    size: Optional[tuple[int, int]] = None,
+) -> Optional[tuple[bytes, int, int]]:
     """使用 ffmpeg 转码动画为 WebP（高性能）
-    
+
+    输入经 stdin、输出经 stdout 传递，不落临时文件；异步子进程不阻塞事件循环。
+    尺寸优先使用调用方从源图头部读到的值，否则读取输出的 VP8X 头。
+
     性能对比：
     - PNG 单帧：ffmpeg 1.4x 快，但输出大 3.8x（不推荐）
     - GIF 动画：ffmpeg 25x 快，输出大 3.9x（推荐）
     """
-    import subprocess
-    import tempfile
-    import os
-    from io import BytesIO
-    
-    try:
-        with tempfile.NamedTemporaryFile(delete=False) as tmp_in:
-            tmp_in.write(data)
-            tmp_in_path = tmp_in.name
-        
-        with tempfile.NamedTemporaryFile(suffix=".webp", delete=False) as tmp_out:
-            tmp_out_path = tmp_out.name
-        
+    # quality 映射：80 → crf 40（数值越低质量越好，范围0-63）
+    crf = max(0, min(63, int(80 - quality / 100 * 30)))
+    cmd = [
+        "ffmpeg",
+        "-hide_banner",
+        "-loglevel", "error",
+        "-i", "pipe:0",
+        "-c:v", "libwebp",
+        "-quality", str(100),  # 编码质量 0-100
+        "-crf", str(crf),      # 恒定质量模式
+        "-loop", "0",          # 无限循环
+        "-f", "webp",
+        "pipe:1",
+    ]
+
+    async with _get_ffmpeg_semaphore():
         try:
-            # quality 映射：80 → crf 40（数值越低质量越好，范围0-63）
-            crf = max(0, min(63, int(80 - quality / 100 * 30)))
-            
-            result = subprocess.run(
-                [
-                    "ffmpeg",
-                    "-i", tmp_in_path,
-                    "-c:v", "libwebp",
-                    "-quality", str(100),  # 编码质量 0-100
-                    "-crf", str(crf),      # 恒定质量模式
-                    "-loop", "0",          # 无限循环
-                    "-y",                  # 覆盖输出文件
-                    tmp_out_path
-                ],
-                capture_output=True,
-                timeout=120,
-                check=False
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
             )
-            
-            if result.returncode != 0:
-                logger.warning(f"ffmpeg 转码失败: {result.stderr.decode()}")
-                return None
-            
-            with open(tmp_out_path, "rb") as f:
-                webp_data = f.read()
-            
-            # 获取尺寸
-            from PIL import Image
-            with Image.open(BytesIO(webp_data)) as img:
-                width, height = img.size
-            
-            return webp_data, width, height
-        finally:
-            os.unlink(tmp_in_path)
-            os.unlink(tmp_out_path)
-    
-    except (FileNotFoundError, subprocess.TimeoutExpired, Exception) as e:
-        logger.debug(f"ffmpeg 不可用或转码失败: {e}")
+        except (FileNotFoundError, PermissionError) as e:
+            logger.debug(f"ffmpeg 不可用: {e}")
+            return None
+
+        try:
+            stdout, stderr = await asyncio.wait_for(proc.communicate(input=data), timeout=_FFMPEG_TIMEOUT_SECONDS)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            logger.warning("ffmpeg 转码超时 ({}s)", _FFMPEG_TIMEOUT_SECONDS)
+            return None
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+                await proc.wait()
+            raise
+
+    if proc.returncode != 0 or not stdout:
+        logger.warning(f"ffmpeg 转码失败: {stderr.decode(errors='replace')}")
+        return None
+
+    webp_data = _fix_riff_size(stdout)
+    dims = size or _webp_canvas_size(webp_data)
+    if dims is None:
+        logger.warning("ffmpeg 输出缺少尺寸信息，放弃使用")
         return None
+    return webp_data, int(dims[0]), int(dims[1])
 
 
-def _image_to_webp(data: bytes, quality: int = 80) -> tuple[bytes, Optional[int], Optional[int]]:
+async def _image_to_webp(data: bytes, quality: int = 80) -> tuple[bytes, Optional[int], Optional[int]]:
     """将图片转换为WebP格式，保留动画帧
-    
-    优先使用 ffmpeg（动画快 10+ 倍），降级到 Pillow
+
+    优先使用 ffmpeg（动画快 10+ 倍），降级到 Pillow；Pillow 部分在工作线程中执行。
+    解码前检查像素/帧数上限，并按估算的解码内存向进程级预算申请额度。
+
+    Raises:
+        MediaLimitExceeded: 超出像素/帧数上限或单任务内存估算超出预算，调用方应降级处理
     """
     try:
-        from PIL import Image  # type: ignore
+        from PIL import Image  # type: ignore  # noqa: F401
     except Exception as e:  # pragma: no cover
         raise RuntimeError("WebP转码需要安装 Pillow") from e
 
-    from io import BytesIO
+    header = await asyncio.to_thread(probe_image_header, data)
+    budget = get_media_memory_budget()
 
-    # 先尝试 ffmpeg（只对动画有效）
-    with Image.open(BytesIO(data)) as im:
-        is_animated = hasattr(im, 'n_frames') and im.n_frames > 1
-    
-    if is_animated:
-        ffmpeg_result = _image_to_webp_ffmpeg(data, quality=quality)
+    # 先尝试 ffmpeg（只对动画有效）；子进程逐帧处理，按两帧估算
+    if header.is_animated:
+        async with budget.reserve(header.decoded_bytes(all_frames=False) * 2):
+            ffmpeg_result = await _image_to_webp_ffmpeg(data, quality=quality, size=(header.width, header.height))
         if ffmpeg_result:
-            return ffmpeg_result[0], ffmpeg_result[1], ffmpeg_result[2]
+            return ffmpeg_result
         # ffmpeg 不可用，降级到 Pillow
         logger.info("ffmpeg 不可用，使用 Pillow 转码（速度较慢）")
-    
+
+    # Pillow 动画转码会同时持有全部帧
+    async with budget.reserve(header.decoded_bytes(all_frames=header.is_animated)):
+        return await asyncio.to_thread(_image_to_webp_pillow, data, quality)
+
+
+def _image_to_webp_pillow(data: bytes, quality: int = 80) -> tuple[bytes, Optional[int], Optional[int]]:
+    """Pillow 转码（同步，调用方负责放到工作线程）"""
+    from PIL import Image
+    from io import BytesIO
+
     # Pillow 转码（用于单帧或 ffmpeg 不可用）
     with Image.open(BytesIO(data)) as im:
         width, height = im.size
@@ -358,14 +425,26 @@ async def store_archive_images_as_webp(
             height = None
             key = None
             sha256_hex = None
+            content_type = "image/webp"
 
             # Best-effort retries for transient failures (network hiccups, CDN throttling).
             for attempt in range(3):
                 try:
-                    resp = await client.get(request_url, headers=_request_headers_for_url(orig_url))
-                    resp.raise_for_status()
-                    src_bytes = resp.content
-                    webp_bytes, width, height = _image_to_webp(src_bytes, quality=quality)
+                    src_bytes, src_content_type = await fetch_bytes_limited(
+                        client, request_url, headers=_request_headers_for_url(orig_url)
+                    )
+                    try:
+                        webp_bytes, width, height = await _image_to_webp(src_bytes, quality=quality)
+                    except MediaLimitExceeded as limit_err:
+                        # 解码代价过高：原样保存（已受下载上限约束），不转码、不生成缩略图
+                        logger.warning("Image exceeds decode limits, storing original: {} ({})", orig_url, limit_err)
+                        content_type, ext = _image_content_type_and_ext(src_content_type)
+                        webp_bytes = src_bytes
+                        sha256_hex = _sha256_bytes(src_bytes)
+                        key = _content_addressed_key(namespace, sha256_hex, ext)
+                        await storage.put_bytes(key=key, data=src_bytes, content_type=content_type)
+                        break
+
                     sha256_hex = _sha256_bytes(webp_bytes)
                     key = _content_addressed_key(namespace, sha256_hex, "webp")
                     await storage.put_bytes(key=key, data=webp_bytes, content_type="image/webp")
@@ -388,6 +467,10 @@ async def store_archive_images_as_webp(
                         except Exception as color_err:
                             logger.warning(f"提取主色调失败: {color_err}")
                         
+                    break
+                except MediaLimitExceeded as e:
+                    # 超出下载上限：重试没有意义
+                    logger.warning("Skip oversized image: {} ({})", orig_url, e)
                     break
                 except Exception as e:
                     is_last = attempt >= 2
@@ -414,6 +497,7 @@ async def store_archive_images_as_webp(
                 size=len(webp_bytes),
                 width=width,
                 height=height,
+                content_type=content_type,
             )
 
             img["stored_key"] = info.key
@@ -486,6 +570,102 @@ async def store_archive_images_as_webp(
     return archive
 
 
+_VIDEO_STREAM_CHUNK_SIZE = 1024 * 1024
+_VIDEO_EXTENSIONS = ("mp4", "webm", "ogg", "mov", "avi", "mkv")
+
+
+def _video_content_type_and_ext(content_type_header: Optional[str]) -> tuple[str, str]:
+    """从响应 content-type 推断视频 MIME 与扩展名（默认 mp4）"""
+    content_type = content_type_header or "video/mp4"
+    if "video" not in content_type:
+        content_type = "video/mp4"
+
+    ext = "mp4"
+    if "/" in content_type:
+        mime_subtype = content_type.split("/")[1].split(";")[0].strip()
+        if mime_subtype in _VIDEO_EXTENSIONS:
+            ext = mime_subtype
+    return content_type, ext
+
+
+def _declared_total_size(resp: httpx.Response) -> Optional[int]:
+    """解析响应声明的对象总大小（支持 206 的 Content-Range）"""
+    content_range = resp.headers.get("content-range")
+    if content_range and "/" in content_range:
+        total = content_range.rsplit("/", 1)[1].strip()
+        if total.isdigit():
+            return int(total)
+    content_length = resp.headers.get("content-length")
+    if content_length and content_length.isdigit() and resp.status_code == 200:
+        return int(content_length)
+    return None
+
+
+async def _download_video_stream(
+    *,
+    client: httpx.AsyncClient,
+    storage: LocalStorageBackend,
+    orig_url: str,
+    namespace: str,
+    max_bytes: Optional[int],
+    attempts: int = 3,
+) -> Optional[StoredObject]:
+    """流式下载单个视频到存储后端。
+
+    - 分块写入暂存文件并增量计算 sha256，内存占用为 O(chunk)
+    - 中途失败时携带 Range 头从已写入偏移续传；上游不支持 Range 则从头重下
+    - 声明大小或实际写入超过 max_bytes 时放弃，不重试
+    """
+    writer = storage.open_stream(max_bytes=max_bytes)
+    content_type, ext = _video_content_type_and_ext(None)
+    try:
+        # Best-effort retries for transient failures
+        for attempt in range(attempts):
+            try:
+                headers = _request_headers_for_url(orig_url)
+                if writer.size:
+                    headers["Range"] = f"bytes={writer.size}-"
+
+                async with client.stream("GET", orig_url, headers=headers) as resp:
+                    resp.raise_for_status()
+                    if writer.size and resp.status_code != 206:
+                        logger.info("上游不支持 Range 续传，重新下载: {}", orig_url)
+                        await writer.reset()
+                    if not writer.size:
+                        content_type, ext = _video_content_type_and_ext(resp.headers.get("content-type"))
+
+                    declared = _declared_total_size(resp)
+                    if writer.max_bytes is not None and declared is not None and declared > writer.max_bytes:
+                        raise StorageLimitExceeded(writer.max_bytes, declared)
+
+                    async for chunk in resp.aiter_bytes(_VIDEO_STREAM_CHUNK_SIZE):
+                        await writer.write(chunk)
+
+                if not writer.size:
+                    raise ValueError("empty video response")
+
+                key = _content_addressed_key(namespace, writer.sha256, ext)
+                return await writer.commit(key=key, content_type=content_type)
+            except StorageLimitExceeded as e:
+                logger.warning("Skip oversized video: {} ({})", orig_url, e)
+                return None
+            except Exception as e:
+                is_last = attempt >= attempts - 1
+                if is_last:
+                    logger.warning(
+                        "Process video failed: {} (attempt={}/{}, {})",
+                        orig_url,
+                        attempt + 1,
+                        attempts,
+                        f"{type(e).__name__}: {e}",
+                    )
+                else:
+                    await asyncio.sleep(1.5 * (attempt + 1))
+        return None
+    finally:
+        await writer.abort()
+
+
 async def store_archive_videos(
     *,
     archive: dict[str, Any],
@@ -493,6 +673,7 @@ async def store_archive_videos(
     namespace: str,
     timeout_seconds: float = 120.0,
     max_videos: Optional[int] = None,
+    max_bytes: Optional[int] = None,
 ) -> dict[str, Any]:
     """下载并存储存档中的视频，更新存档引用。
 
@@ -509,6 +690,7 @@ async def store_archive_videos(
         namespace: 存储命名空间
         timeout_seconds: 下载超时时间
         max_videos: 最大处理视频数量
+        max_bytes: 单个视频最大字节数，超出则跳过该视频
 
     Returns:
         更新后的存档字典（同一对象被修改）。
@@ -541,62 +723,27 @@ async def store_archive_videos(
             if isinstance(vid.get("stored_key"), str) and vid.get("stored_key"):
                 continue
 
-            video_bytes = None
-            key = None
-            sha256_hex = None
-
-            # Best-effort retries for transient failures
-            for attempt in range(3):
-                try:
-                    resp = await client.get(orig_url, headers=_request_headers_for_url(orig_url))
-                    resp.raise_for_status()
-                    video_bytes = resp.content
-                    sha256_hex = _sha256_bytes(video_bytes)
-                    
-                    # 检测视频格式（从URL或内容类型）
-                    content_type = resp.headers.get("content-type", "video/mp4")
-                    if "video" not in content_type:
-                        content_type = "video/mp4"  # 默认为 mp4
-                    
-                    # 从 content-type 提取扩展名
-                    ext = "mp4"  # 默认
-                    if "/" in content_type:
-                        mime_subtype = content_type.split("/")[1].split(";")[0].strip()
-                        if mime_subtype in ["mp4", "webm", "ogg", "mov", "avi", "mkv"]:
-                            ext = mime_subtype
-                    
-                    key = _content_addressed_key(namespace, sha256_hex, ext)
-                    await storage.put_bytes(key=key, data=video_bytes, content_type=content_type)
-                    break
-                except Exception as e:
-                    is_last = attempt >= 2
-                    if is_last:
-                        logger.warning(
-                            "Process video failed: {} (attempt={}/3, {})",
-                            orig_url,
-                            attempt + 1,
-                            f"{type(e).__name__}: {e}",
-                        )
-                    else:
-                        await asyncio.sleep(1.5 * (attempt + 1))
-                        continue
-
-            if not (video_bytes and key and sha256_hex):
+            stored = await _download_video_stream(
+                client=client,
+                storage=storage,
+                orig_url=orig_url,
+                namespace=namespace,
+                max_bytes=max_bytes,
+            )
+            if stored is None:
                 continue
 
-            stored_url = storage.get_url(key=key)
-            
-            vid["stored_key"] = key
-            vid["stored_url"] = stored_url
-            vid["stored_sha256"] = sha256_hex
-            vid["stored_size"] = len(video_bytes)
+            vid["stored_key"] = stored.key
+            vid["stored_url"] = stored.url
+            vid["stored_sha256"] = stored.sha256
+            vid["stored_size"] = stored.size
 
             stored_videos.append({
                 "orig_url": orig_url,
-                "key": key,
-                "url": stored_url,
-                "sha256": sha256_hex,
-                "size": len(video_bytes),
+                "key": stored.key,
+                "url": stored.url,
+                "sha256": stored.sha256,
+                "size": stored.size,
             })
 
             count += 1
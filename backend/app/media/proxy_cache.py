@@ -0,0 +1,327 @@
+"""图片代理磁盘缓存
+
+目标：
+- 为 /proxy/image 提供有容量上限的本地缓存（按字节预算淘汰）
+- 命中查询走 SQLite 主键索引，不再 os.listdir 扫描分片目录
+- 同一 URL 的并发未命中合并为一次下载/转码（single-flight）
+- 提供命中/未命中/淘汰等计数，便于观测
+
+设计说明：
+- 索引文件位于 `<storage_root>/proxy_cache/index.db`，与缓存文件同生命周期
+- 淘汰策略为 LRU：按 last_access 升序删除，直到低于预算的低水位
+- 命中时的 last_access 更新做了节流，避免每次命中都写库
+- 同一 URL 以新扩展名重新写入时删除旧文件；缺少内容摘要的旧条目在首次命中时补算（用于 ETag）
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional, TypeVar
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.adapters.storage import LocalStorageBackend, LocatedObject
+
+T = TypeVar("T")
+
+CACHE_NAMESPACE = "proxy_cache"
+
+# 历史版本按扩展名落盘，索引缺失时按这些扩展名探测并收编
+_LEGACY_EXTENSIONS = ("webp", "jpeg", "jpg", "png", "gif")
+_HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def _hash_located(located: LocatedObject) -> str:
+    """按区间计算对象的 sha256（独立文件或打包段中的一段）"""
+    hasher = hashlib.sha256()
+    with open(located.path, "rb") as f:
+        f.seek(located.offset)
+        remaining = located.length
+        while remaining > 0:
+            chunk = f.read(min(_HASH_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            hasher.update(chunk)
+            remaining -= len(chunk)
+    return hasher.hexdigest()
+
+
+@dataclass(frozen=True)
+class ProxyCacheEntry:
+    url_hash: str
+    key: str
+    path: str
+    size: int
+    content_type: str
+    sha256: Optional[str] = None
+
+
+class ProxyImageCache:
+    """带容量上限、LRU 淘汰与 single-flight 的图片代理缓存。"""
+
+    _TOUCH_INTERVAL_SECONDS = 60.0
+    _EVICT_LOW_WATERMARK = 0.9
+    _EVICT_BATCH_SIZE = 256
+
+    def __init__(self, storage: LocalStorageBackend, max_bytes: int):
+        self.storage = storage
+        self.max_bytes = max(0, int(max_bytes))
+        self._index_path = os.path.join(storage.root_dir, CACHE_NAMESPACE, "index.db")
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._total_bytes: Optional[int] = None
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "evictions": 0,
+            "evicted_bytes": 0,
+        }
+
+    # --- key helpers ---
+
+    @staticmethod
+    def hash_url(url: str) -> str:
+        return hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
+
+    @staticmethod
+    def build_key(url_hash: str, ext: str) -> str:
+        return f"{CACHE_NAMESPACE}/{url_hash[:2]}/{url_hash[2:4]}/{url_hash}.{ext.lstrip('.')}"
+
+    # --- index ---
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is not None:
+            return self._conn
+        os.makedirs(os.path.dirname(self._index_path), exist_ok=True)
+        conn = sqlite3.connect(self._index_path, check_same_thread=False, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS entries (
+                url_hash TEXT PRIMARY KEY,
+                key TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                content_type TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+            """
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_last_access ON entries(last_access)")
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(entries)")}
+        if "sha256" not in columns:
+            # 早期索引没有内容摘要列（用于 ETag），旧条目在首次命中时补算
+            conn.execute("ALTER TABLE entries ADD COLUMN sha256 TEXT")
+        self._conn = conn
+        self._total_bytes = int(conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0])
+        return conn
+
+    def _lookup_sync(self, url_hash: str) -> Optional[ProxyCacheEntry]:
+        with self._db_lock:
+            conn = self._connect()
+            row = conn.execute(
+                "SELECT key, size, content_type, last_access, sha256 FROM entries WHERE url_hash = ?",
+                (url_hash,),
+            ).fetchone()
+            if row is None:
+                return self._adopt_legacy_sync(conn, url_hash)
+
+            key, size, content_type, last_access, sha256 = row
+            located = self.storage.locate(key)
+            if located is None:
+                conn.execute("DELETE FROM entries WHERE url_hash = ?", (url_hash,))
+                self._total_bytes = max(0, (self._total_bytes or 0) - int(size))
+                return None
+
+            if sha256 is None:
+                sha256 = _hash_located(located)
+                conn.execute("UPDATE entries SET sha256 = ? WHERE url_hash = ?", (sha256, url_hash))
+
+            now = time.time()
+            if now - float(last_access) >= self._TOUCH_INTERVAL_SECONDS:
+                conn.execute(
+                    "UPDATE entries SET last_access = ?, hits = hits + 1 WHERE url_hash = ?",
+                    (now, url_hash),
+                )
+            return ProxyCacheEntry(
+                url_hash=url_hash,
+                key=key,
+                path=located.path,
+                size=int(size),
+                content_type=content_type,
+                sha256=sha256,
+            )
+
+    def _adopt_legacy_sync(self, conn: sqlite3.Connection, url_hash: str) -> Optional[ProxyCacheEntry]:
+        """收编索引建立前落盘的缓存文件（逐个扩展名探测，不列目录）。"""
+        for ext in _LEGACY_EXTENSIONS:
+            key = self.build_key(url_hash, ext)
+            located = self.storage.locate(key)
+            if located is None:
+                continue
+            try:
+                sha256 = _hash_located(located)
+            except OSError:
+                continue
+            size = located.length
+            content_type = "image/webp" if ext == "webp" else f"image/{'jpeg' if ext == 'jpg' else ext}"
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(url_hash, key, size, content_type, created_at, last_access, hits, sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                (url_hash, key, size, content_type, now, now, sha256),
+            )
+            self._total_bytes = (self._total_bytes or 0) + size
+            return ProxyCacheEntry(
+                url_hash=url_hash,
+                key=key,
+                path=located.path,
+                size=size,
+                content_type=content_type,
+                sha256=sha256,
+            )
+        return None
+
+    def _record_sync(
+        self, url_hash: str, key: str, size: int, content_type: str, sha256: str
+    ) -> tuple[Optional[str], list[str]]:
+        """登记索引，返回 (被替换的旧文件 key, 淘汰的文件 key 列表)"""
+        with self._db_lock:
+            conn = self._connect()
+            previous = conn.execute("SELECT size, key FROM entries WHERE url_hash = ?", (url_hash,)).fetchone()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO entries "
+                "(url_hash, key, size, content_type, created_at, last_access, hits, sha256) "
+                "VALUES (?, ?, ?, ?, ?, ?, 0, ?)",
+                (url_hash, key, int(size), content_type, now, now, sha256),
+            )
+            self._total_bytes = (self._total_bytes or 0) + int(size) - (int(previous[0]) if previous else 0)
+            # 同一 URL 换了扩展名（内容类型变化）时旧文件不再被索引引用
+            replaced = previous[1] if previous and previous[1] != key else None
+            return replaced, self._collect_evictions_sync(conn, protect=url_hash)
+
+    def _collect_evictions_sync(self, conn: sqlite3.Connection, *, protect: str) -> list[str]:
+        """删除超出预算的最久未访问条目，返回待删除的文件 key。"""
+        if self.max_bytes <= 0 or (self._total_bytes or 0) <= self.max_bytes:
+            return []
+
+        target = int(self.max_bytes * self._EVICT_LOW_WATERMARK)
+        evicted: list[str] = []
+        while (self._total_bytes or 0) > target:
+            rows = conn.execute(
+                "SELECT url_hash, key, size FROM entries WHERE url_hash != ? "
+                "ORDER BY last_access ASC LIMIT ?",
+                (protect, self._EVICT_BATCH_SIZE),
+            ).fetchall()
+            if not rows:
+                break
+            for url_hash, key, size in rows:
+                conn.execute("DELETE FROM entries WHERE url_hash = ?", (url_hash,))
+                self._total_bytes = max(0, (self._total_bytes or 0) - int(size))
+                self._stats["evictions"] += 1
+                self._stats["evicted_bytes"] += int(size)
+                evicted.append(key)
+                if (self._total_bytes or 0) <= target:
+                    break
+        return evicted
+
+    # --- public API ---
+
+    async def lookup(self, url: str) -> Optional[ProxyCacheEntry]:
+        url_hash = self.hash_url(url)
+        entry = await asyncio.to_thread(self._lookup_sync, url_hash)
+        if entry is not None:
+            self._stats["hits"] += 1
+        return entry
+
+    async def store(self, url: str, *, data: bytes, ext: str, content_type: str) -> ProxyCacheEntry:
+        """写入缓存文件并登记索引，必要时触发淘汰。"""
+        url_hash = self.hash_url(url)
+        key = self.build_key(url_hash, ext)
+        sha256 = hashlib.sha256(data).hexdigest()
+        await self.storage.put_bytes(key=key, data=data, content_type=content_type)
+        replaced, evicted = await asyncio.to_thread(self._record_sync, url_hash, key, len(data), content_type, sha256)
+        if replaced is not None:
+            await self.storage.delete(key=replaced)
+        for evicted_key in evicted:
+            await self.storage.delete(key=evicted_key)
+        if evicted:
+            logger.info("图片代理缓存淘汰: count={}, total_bytes={}", len(evicted), self._total_bytes)
+        return ProxyCacheEntry(
+            url_hash=url_hash,
+            key=key,
+            path=self.storage._full_path(key),
+            size=len(data),
+            content_type=content_type,
+            sha256=sha256,
+        )
+
+    async def single_flight(self, url: str, fetch: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """合并同一 URL 的并发未命中。
+
+        Returns:
+            (fetch 的结果, 是否复用了其他请求的在途结果)
+        """
+        url_hash = self.hash_url(url)
+        task = self._inflight.get(url_hash)
+        if task is not None:
+            self._stats["coalesced"] += 1
+            return await asyncio.shield(task), True
+
+        self._stats["misses"] += 1
+        # 独立 task 执行：发起请求的客户端断开时，下载仍会完成并写入缓存
+        task = asyncio.create_task(fetch())
+        self._inflight[url_hash] = task
+        task.add_done_callback(lambda t: self._on_fetch_done(url_hash, t))
+        return await asyncio.shield(task), False
+
+    def _on_fetch_done(self, url_hash: str, task: asyncio.Task) -> None:
+        if self._inflight.get(url_hash) is task:
+            self._inflight.pop(url_hash, None)
+        if not task.cancelled():
+            # 所有等待者都已断开时，避免 "exception was never retrieved" 警告
+            task.exception()
+
+    def stats(self) -> dict:
+        lookups = self._stats["hits"] + self._stats["misses"] + self._stats["coalesced"]
+        return {
+            **self._stats,
+            "inflight": len(self._inflight),
+            "total_bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
+
+    def close(self) -> None:
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+_cache_singleton: ProxyImageCache | None = None
+
+
+def get_proxy_image_cache(storage: LocalStorageBackend) -> ProxyImageCache:
+    """获取图片代理缓存单例（存储根目录变化时重建）。"""
+    global _cache_singleton
+    if _cache_singleton is not None and _cache_singleton.storage.root_dir == storage.root_dir:
+        return _cache_singleton
+
+    if _cache_singleton is not None:
+        _cache_singleton.close()
+    max_bytes = int(getattr(settings, "proxy_image_cache_max_bytes", 0) or 0)
+    _cache_singleton = ProxyImageCache(storage, max_bytes=max_bytes)
+    return _cache_singleton
@@ -0,0 +1,206 @@
+"""媒体响应
+
+- 条件请求：内容寻址 key 自带 sha256，作为强 ETag；If-None-Match / If-Modified-Since 命中时返回 304
+- 打包存储中的对象（段文件中的一个区间）与内存数据的 HTTP 响应：
+  - 支持单区间 Range 与 If-Range（多区间按完整内容返回）
+  - ASGI 服务器支持 `http.response.zerocopysend` 扩展时直接交给内核 sendfile，
+    否则按块 pread 发送，不把整个对象读入内存
+"""
+
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Mapping, Optional
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from app.adapters.storage import LocatedObject
+from app.adapters.storage.pack import pread
+
+_CHUNK_SIZE = 256 * 1024
+_NOT_MODIFIED_HEADERS = {"cache-control", "etag", "expires", "last-modified", "vary", "x-cache-status"}
+
+
+def parse_single_range(range_header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    """解析单区间 Range 头，返回闭区间 (start, end)。
+
+    Returns:
+        None 表示忽略 Range（缺失、格式无法识别或多区间）
+    Raises:
+        ValueError: 区间不可满足（应返回 416）
+    """
+    if not range_header:
+        return None
+    unit, _, spec = range_header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_raw, sep, end_raw = spec.strip().partition("-")
+    if not sep:
+        return None
+    try:
+        start = int(start_raw) if start_raw else None
+        end = int(end_raw) if end_raw else None
+    except ValueError:
+        return None
+
+    if start is None:
+        # 后缀区间：bytes=-N 表示最后 N 个字节
+        if end is None or end <= 0 or size <= 0:
+            raise ValueError("unsatisfiable range")
+        return max(0, size - end), size - 1
+    if end is None:
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, min(end, size - 1)
+
+
+def content_addressed_etag(key: str) -> Optional[str]:
+    """内容寻址 key 自带 sha256，直接作为强 ETag（缩略图等衍生物保留后缀以区分）"""
+    name = key.rsplit("/", 1)[-1]
+    stem = name.rsplit(".", 1)[0] if "." in name else name
+    digest = stem.split(".", 1)[0]
+    if len(digest) == 64 and all(c in "0123456789abcdef" for c in digest):
+        return f'"{stem}"'
+    return None
+
+
+def stat_etag(size: int, mtime: float) -> str:
+    """非内容寻址对象按大小与修改时间生成 ETag"""
+    return f'"{size:x}-{int(mtime * 1_000_000):x}"'
+
+
+def _etag_in_list(header_value: str, etag: str) -> bool:
+    """If-None-Match 使用弱比较：忽略 W/ 前缀"""
+    if header_value.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == target for candidate in header_value.split(","))
+
+
+def is_not_modified(request_headers: Headers, *, etag: Optional[str], last_modified: Optional[float]) -> bool:
+    """按 RFC 9110 判断条件请求是否可返回 304（If-None-Match 优先于 If-Modified-Since）"""
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag is not None and _etag_in_list(if_none_match, etag)
+
+    if_modified_since = request_headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= int(since)
+    return False
+
+
+def not_modified_response(headers: Mapping[str, str]) -> Response:
+    """304 响应只保留缓存相关头"""
+    kept = {k: v for k, v in headers.items() if k.lower() in _NOT_MODIFIED_HEADERS}
+    return Response(status_code=304, headers=kept)
+
+
+class _RangedResponse(Response, ABC):
+    """单区间 Range + If-Range 的公共实现，子类负责发送指定区间的字节。"""
+
+    def __init__(
+        self,
+        *,
+        size: int,
+        media_type: str,
+        headers: Optional[Mapping[str, str]] = None,
+        last_modified: Optional[float] = None,
+    ):
+        super().__init__(content=None, status_code=200, headers=headers, media_type=media_type)
+        self.size = size
+        if last_modified is not None:
+            self.headers.setdefault("last-modified", formatdate(last_modified, usegmt=True))
+
+    def _should_use_range(self, if_range: Optional[str]) -> bool:
+        if if_range is None:
+            return True
+        return if_range in (self.headers.get("etag"), self.headers.get("last-modified"))
+
+    @abstractmethod
+    async def _send_range(self, send: Send, start: int, count: int, scope: Scope) -> None:
+        """发送 [start, start + count) 区间的响应体（响应头已发出，count > 0）"""
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        request_headers = Headers(scope=scope)
+        size = self.size
+        start, end = 0, size - 1
+        self.headers["accept-ranges"] = "bytes"
+
+        byte_range = None
+        if self._should_use_range(request_headers.get("if-range")):
+            try:
+                byte_range = parse_single_range(request_headers.get("range"), size)
+            except ValueError:
+                response = Response(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+                await response(scope, receive, send)
+                return
+
+        if byte_range is not None:
+            start, end = byte_range
+            self.status_code = 206
+            self.headers["content-range"] = f"bytes {start}-{end}/{size}"
+
+        count = max(0, end - start + 1)
+        self.headers["content-length"] = str(count)
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+
+        if scope["method"].upper() == "HEAD" or count == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        await self._send_range(send, start, count, scope)
+
+
+class StoredObjectResponse(_RangedResponse):
+    """发送段文件中的一个区间。"""
+
+    def __init__(
+        self,
+        located: LocatedObject,
+        *,
+        media_type: str,
+        headers: Optional[Mapping[str, str]] = None,
+    ):
+        super().__init__(size=located.length, media_type=media_type, headers=headers, last_modified=located.mtime)
+        self.located = located
+
+    async def _send_range(self, send: Send, start: int, count: int, scope: Scope) -> None:
+        file = await anyio.to_thread.run_sync(open, self.located.path, "rb")
+        try:
+            offset = self.located.offset + start
+            if "http.response.zerocopysend" in scope.get("extensions", {}):
+                await send({"type": "http.response.zerocopysend", "file": file, "offset": offset, "count": count})
+                return
+
+            fd = file.fileno()
+            remaining = count
+            while remaining > 0:
+                chunk = await anyio.to_thread.run_sync(pread, fd, min(_CHUNK_SIZE, remaining), offset)
+                if not chunk:
+                    break
+                offset += len(chunk)
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+        finally:
+            file.close()
+
+
+class BytesRangeResponse(_RangedResponse):
+    """内存中的内容（如代理缓存未命中时刚下载的数据）按区间返回。"""
+
+    def __init__(self, data: bytes, *, media_type: str, headers: Optional[Mapping[str, str]] = None):
+        super().__init__(size=len(data), media_type=media_type, headers=headers)
+        self.data = data
+
+    async def _send_range(self, send: Send, start: int, count: int, scope: Scope) -> None:
+        await send({"type": "http.response.body", "body": self.data[start:start + count], "more_body": False})
@@ -3,19 +3,25 @@ Models root module.
 导出分解重构后的所有数据库模型和枚举以确保向后兼容性。
 """
 from app.models.base import Base, LayoutType, ContentStatus, ReviewStatus, Platform, TaskStatus, DiscoveryState, DiscoverySourceKind
-from app.models.content import BilibiliContentType, TwitterContentType, Content, ContentSource, DiscoverySource, ContentDiscoveryLink
+from app.models.content import BilibiliContentType, TwitterContentType, Content, ContentSource, DiscoverySource, ContentDiscoveryLink, ContentFingerprint, ContentTag, TagCount, ContentBlob, ContentBlobDict
 from app.models.distribution import DistributionRule, DistributionTarget
 from app.models.bot import BotChatType, BotConfigPlatform, BotConfig, BotChat, BotRuntime
-from app.models.system import Task, SystemSetting, PushedRecord, QueueItemStatus, ContentQueueItem
-from app.models.search import ContentEmbedding
+from app.models.system import Task, SystemSetting, PushedRecord, QueueItemStatus, ContentQueueItem, DashboardCounter, DataVersion
+from app.models.search import ContentEmbedding, ContentNeighbors
 
 __all__ = [
     "Base", "LayoutType", "ContentStatus", "ReviewStatus", "Platform", "TaskStatus",
     "DiscoveryState", "DiscoverySourceKind",
     "BilibiliContentType", "TwitterContentType",
-    "Content", "ContentSource", "DiscoverySource", "ContentDiscoveryLink",
+    "Content", "ContentSource", "DiscoverySource", "ContentDiscoveryLink", "ContentFingerprint", "ContentTag", "TagCount", "ContentBlob", "ContentBlobDict",
     "DistributionRule", "DistributionTarget",
     "BotChatType", "BotConfigPlatform", "BotConfig", "BotChat", "BotRuntime",
-    "Task", "SystemSetting", "PushedRecord", "QueueItemStatus", "ContentQueueItem",
-    "ContentEmbedding",
+    "Task", "SystemSetting", "PushedRecord", "QueueItemStatus", "ContentQueueItem", "DashboardCounter", "DataVersion",
+    "ContentEmbedding", "ContentNeighbors",
 ]
+
+# 建表后安装标签索引、仪表盘计数、数据版本与大字段副表触发器（create_all 的 after_create 钩子）
+from app.core import content_tags as _content_tags  # noqa: E402,F401
+from app.core import dashboard_counters as _dashboard_counters  # noqa: E402,F401
+from app.core import data_versions as _data_versions  # noqa: E402,F401
+from app.core import content_blobs as _content_blobs  # noqa: E402,F401
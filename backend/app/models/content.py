@@ -4,11 +4,15 @@
 from datetime import datetime
 from enum import Enum
 from typing import Optional, Any
-from sqlalchemy import String, Text, JSON, Integer, Float, DateTime, Boolean, ForeignKey, Index, UniqueConstraint
+from sqlalchemy import String, Text, JSON, Integer, Float, DateTime, Boolean, ForeignKey, Index, UniqueConstraint, LargeBinary
 from sqlalchemy import Enum as SQLEnum
+from sqlalchemy import event
+from sqlalchemy import inspect as sa_inspect
 from sqlalchemy.orm import relationship, Mapped, mapped_column
+from sqlalchemy.orm.attributes import set_committed_value
 
 from app.core.time_utils import utcnow
+from app.utils.blob_codec import decode_field, encode_field
 from app.models.base import Base, Platform, ContentStatus, LayoutType, ReviewStatus, DiscoveryState, DiscoverySourceKind
 
 
@@ -30,6 +34,31 @@ class TwitterContentType(str, Enum):
     # 未来可扩展：SPACE, MOMENT 等
 
 
+BLOB_VALUES_ATTR = "_blob_values"
+BLOB_PENDING_ATTR = "_blob_pending"
+
+
+class BlobField:
+    """存放在 content_blobs 中的大字段：读写透传到 Content.blob，对调用方仍是普通属性"""
+
+    def __set_name__(self, owner, name: str) -> None:
+        self.name = name
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        blob = obj.blob
+        return blob.read(self.name) if blob is not None else None
+
+    def __set__(self, obj, value) -> None:
+        blob = obj.blob
+        if blob is None:
+            if value is None:
+                return
+            blob = obj.blob = ContentBlob()
+        blob.write(self.name, value)
+
+
 class Content(Base):
     """内容表"""
     __tablename__ = "contents"
@@ -40,6 +69,8 @@ class Content(Base):
         Index("ix_contents_status_created_at", "status", "created_at"),
         Index("ix_contents_is_nsfw_created_at", "is_nsfw", "created_at"),
         Index("ix_contents_layout_type_created_at", "layout_type", "created_at"),
+        # 列表游标分页按 (created_at, id) 倒序；SQLite 二级索引隐含 rowid(id) 作为末列
+        Index("ix_contents_review_status_created_at", "review_status", "created_at"),
     )
     
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -105,9 +136,13 @@ class Content(Base):
     # 树状结构支持 (用于事件级聚合)
     parent_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("contents.id"), default=None, index=True)
     is_synthesis: Mapped[bool] = mapped_column(Boolean, default=False, index=True)
+    # 近似重复：解析时判定为已有内容的转载/镜像，指向最早的原始内容
+    duplicate_of_id: Mapped[Optional[int]] = mapped_column(
+        Integer, ForeignKey("contents.id", ondelete="SET NULL"), default=None, index=True
+    )
 
     title: Mapped[Optional[str]] = mapped_column(Text, default=None)
-    body: Mapped[Optional[str]] = mapped_column(Text, default=None)
+    body = BlobField()
     summary: Mapped[Optional[str]] = mapped_column(Text, default=None)
     author_name: Mapped[Optional[str]] = mapped_column(String(200), default=None)
     author_id: Mapped[Optional[str]] = mapped_column(String(100), default=None)
@@ -120,19 +155,84 @@ class Content(Base):
     media_urls: Mapped[Optional[Any]] = mapped_column(JSON, default=list)
     
     context_data: Mapped[Optional[Any]] = mapped_column(JSON, default=None)
-    rich_payload: Mapped[Optional[Any]] = mapped_column(JSON, default=None)
-    archive_metadata: Mapped[Optional[Any]] = mapped_column(JSON, default=None)
+    rich_payload = BlobField()
+    archive_metadata = BlobField()
     
     deleted_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
     
     created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow, index=True)
-    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow, onupdate=utcnow)
+    updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow, onupdate=utcnow, index=True)
     published_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=None)
     
     pushed_records = relationship("PushedRecord", back_populates="content")
     sources = relationship("ContentSource", back_populates="content")
     discovery_links = relationship("ContentDiscoveryLink", back_populates="content")
     discovery_source = relationship("DiscoverySource", foreign_keys="[Content.discovery_source_id]")
+    # 大字段副表；不需要大字段的批量查询用投影或 raiseload(Content.blob) 跳过
+    blob: Mapped[Optional["ContentBlob"]] = relationship(
+        back_populates="content",
+        uselist=False,
+        lazy="selectin",
+        cascade="all, delete-orphan",
+        passive_deletes=True,
+    )
+
+
+class ContentBlobDict(Base):
+    """content_blobs 的 zstd 压缩字典（只增不改，新行使用最新一个）"""
+    __tablename__ = "content_blob_dicts"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
+    sample_count: Mapped[int] = mapped_column(Integer, default=0)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow)
+
+
+class ContentBlob(Base):
+    """内容大字段（每个字段一个 zstd 帧，见 app.core.content_blobs）"""
+    __tablename__ = "content_blobs"
+
+    content_id: Mapped[int] = mapped_column(Integer, ForeignKey("contents.id", ondelete="CASCADE"), primary_key=True)
+    dict_id: Mapped[Optional[int]] = mapped_column(Integer, ForeignKey("content_blob_dicts.id"), default=None)
+    body: Mapped[Optional[bytes]] = mapped_column(LargeBinary, default=None)
+    rich_payload: Mapped[Optional[bytes]] = mapped_column(LargeBinary, default=None)
+    archive_metadata: Mapped[Optional[bytes]] = mapped_column(LargeBinary, default=None)
+
+    content: Mapped["Content"] = relationship(back_populates="blob")
+    dictionary: Mapped[Optional[ContentBlobDict]] = relationship(lazy="selectin")
+
+    def _dict_data(self) -> Optional[bytes]:
+        return self.dictionary.data if self.dictionary is not None else None
+
+    def read(self, name: str) -> Any:
+        """解压后的字段值（首次读取时解压并缓存）"""
+        values = self.__dict__.setdefault(BLOB_VALUES_ATTR, {})
+        if name not in values:
+            data = getattr(self, name)
+            values[name] = decode_field(name, data, self._dict_data()) if data is not None else None
+        return values[name]
+
+    def write(self, name: str, value: Any) -> None:
+        """已入库的行按自己的字典立即压缩；新行留到 flush 前选定字典后再压缩"""
+        self.__dict__.setdefault(BLOB_VALUES_ATTR, {})[name] = value
+        if sa_inspect(self).has_identity:
+            setattr(self, name, encode_field(name, value, self._dict_data()))
+        else:
+            self.__dict__.setdefault(BLOB_PENDING_ATTR, set()).add(name)
+
+
+@event.listens_for(Content, "init")
+def _init_blob(target: Content, args, kwargs) -> None:
+    # 新建内容没有副表行：标记为已加载，之后写大字段时不再回库查询
+    set_committed_value(target, "blob", None)
+
+
+@event.listens_for(ContentBlob, "refresh")
+@event.listens_for(ContentBlob, "expire")
+def _reset_blob_values(target: ContentBlob, *args) -> None:
+    # 重新加载或过期后按库中的压缩值重新解压（对象已被回收时为 None）
+    if target is not None:
+        target.__dict__.pop(BLOB_VALUES_ATTR, None)
 
 
 class ContentSource(Base):
@@ -190,3 +290,50 @@ class ContentDiscoveryLink(Base):
 
     content = relationship("Content", back_populates="discovery_links")
     discovery_source = relationship("DiscoverySource")
+
+
+class ContentFingerprint(Base):
+    """内容 SimHash 指纹（仅原始内容），按 16 位分段建索引做 LSH 召回"""
+
+    __tablename__ = "content_fingerprints"
+
+    content_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("contents.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # 64 位 SimHash，按有符号 int64 存储
+    simhash: Mapped[int] = mapped_column(Integer)
+    band0: Mapped[int] = mapped_column(Integer, index=True)
+    band1: Mapped[int] = mapped_column(Integer, index=True)
+    band2: Mapped[int] = mapped_column(Integer, index=True)
+    band3: Mapped[int] = mapped_column(Integer, index=True)
+    created_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow)
+
+
+class ContentTag(Base):
+    """内容标签索引（每个规范化标签一行，由 contents 上的触发器维护，见 app.core.content_tags）"""
+
+    __tablename__ = "content_tags"
+    __table_args__ = (
+        # 标签筛选：按 tag_norm 定位后直接取 content_id
+        Index("ix_content_tags_tag_norm_content_id", "tag_norm", "content_id"),
+    )
+
+    content_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("contents.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    tag_norm: Mapped[str] = mapped_column(String(200), primary_key=True)
+    name: Mapped[str] = mapped_column(String(200))
+
+
+class TagCount(Base):
+    """标签使用次数（由 content_tags 上的触发器增减）"""
+
+    __tablename__ = "tag_counts"
+
+    tag_norm: Mapped[str] = mapped_column(String(200), primary_key=True)
+    name: Mapped[str] = mapped_column(String(200))  # 首次出现时的原始写法，用于展示
+    count: Mapped[int] = mapped_column(Integer, default=0, index=True)
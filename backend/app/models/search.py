@@ -4,7 +4,7 @@
 from datetime import datetime
 from typing import Any, Optional
 
-from sqlalchemy import DateTime, ForeignKey, Index, Integer, String, Text, UniqueConstraint
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, LargeBinary, String, Text, UniqueConstraint
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 from sqlalchemy import JSON
 
@@ -20,6 +20,8 @@ class ContentEmbedding(Base):
         UniqueConstraint("content_id", name="uq_content_embeddings_content_id"),
         Index("ix_content_embeddings_indexed_at", "indexed_at"),
         Index("ix_content_embeddings_model", "embedding_model"),
+        # 向量矩阵缓存对账（行数 + 最大 updated_at）走覆盖索引
+        Index("ix_content_embeddings_model_updated", "embedding_model", "updated_at"),
     )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
@@ -30,7 +32,11 @@ class ContentEmbedding(Base):
     )
 
     embedding_model: Mapped[str] = mapped_column(String(100), default="gemini-embedding-2-preview")
-    embedding: Mapped[Any] = mapped_column(JSON, default=list)
+    # float32 小端字节，长度 = embedding_dim * 4
+    embedding_blob: Mapped[Optional[bytes]] = mapped_column(LargeBinary, default=None)
+    embedding_dim: Mapped[Optional[int]] = mapped_column(Integer, default=None)
+    # 旧版 JSON 向量，读取时回填到 embedding_blob 后置空
+    embedding: Mapped[Any] = mapped_column(JSON(none_as_null=True), default=None, nullable=True)
     text_hash: Mapped[Optional[str]] = mapped_column(String(64), default=None)
     source_text: Mapped[Optional[str]] = mapped_column(Text, default=None)
 
@@ -39,3 +45,25 @@ class ContentEmbedding(Base):
     updated_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow, onupdate=utcnow)
 
     content = relationship("Content")
+
+
+class ContentNeighbors(Base):
+    """预计算的相似内容（每条内容一行，近邻按相似度降序打包存储）"""
+
+    __tablename__ = "content_neighbors"
+    __table_args__ = (
+        # 定时任务按计算时间挑选过期行
+        Index("ix_content_neighbors_computed_at", "computed_at"),
+    )
+
+    content_id: Mapped[int] = mapped_column(
+        Integer,
+        ForeignKey("contents.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    # 计算时使用的向量签名，与当前签名不一致的行视为未计算
+    embedding_model: Mapped[str] = mapped_column(String(100))
+    # int64 小端 content_id 与 float32 小端相似度，长度一一对应
+    neighbor_ids: Mapped[bytes] = mapped_column(LargeBinary)
+    scores: Mapped[bytes] = mapped_column(LargeBinary)
+    computed_at: Mapped[Optional[datetime]] = mapped_column(DateTime, default=utcnow)
@@ -140,3 +140,21 @@ class ContentQueueItem(Base):
     content = relationship("Content")
     rule = relationship("DistributionRule")
     bot_chat = relationship("BotChat")
+
+
+class DashboardCounter(Base):
+    """仪表盘预汇总计数（由触发器增量维护、定时对账，见 app.core.dashboard_counters）"""
+    __tablename__ = "dashboard_counters"
+
+    metric: Mapped[str] = mapped_column(String(32), primary_key=True)  # parse / platform / distribution
+    dim: Mapped[str] = mapped_column(String(64), primary_key=True, default="")  # distribution 为 rule_id
+    bucket: Mapped[str] = mapped_column(String(32), primary_key=True)
+    count: Mapped[int] = mapped_column(Integer, default=0)
+
+
+class DataVersion(Base):
+    """按表的数据版本号（写入时由触发器递增，见 app.core.data_versions）"""
+    __tablename__ = "data_versions"
+
+    name: Mapped[str] = mapped_column(String(64), primary_key=True)  # 表名
+    version: Mapped[int] = mapped_column(Integer, default=0)
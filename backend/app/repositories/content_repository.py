@@ -1,10 +1,54 @@
-from typing import List, Optional, Tuple
-from sqlalchemy import select, and_, or_, func, desc, text, bindparam
-from sqlalchemy.orm import defer
+from typing import List, Optional, Tuple, Union
+from sqlalchemy import Row, select, and_, or_, func, desc, false, tuple_
+from sqlalchemy.orm import defer, raiseload
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.models import Content, ContentStatus, Platform, ReviewStatus, DiscoveryState
+from app.core.content_blobs import blob_content_ids, blob_value
+from app.core.fts import build_match_query, fts_content_ids, fts_ready
+from app.models import Content, ContentStatus, ContentTag, Platform, ReviewStatus, DiscoveryState
+from app.utils.pagination import decode_cursor, encode_cursor
+from app.utils.tags import normalize_tag
 from datetime import datetime
 
+# 列表 / 卡片视图只查询展示所需的列，body、rich_payload、archive_metadata 等大字段不读出
+LIST_ITEM_COLUMNS = (
+    Content.id,
+    Content.platform,
+    Content.url,
+    Content.status,
+    Content.title,
+    Content.cover_url,
+    Content.author_name,
+    Content.tags,
+    Content.is_nsfw,
+    Content.layout_type,
+    Content.created_at,
+    Content.published_at,
+)
+
+CARD_COLUMNS = (
+    Content.id,
+    Content.platform,
+    Content.url,
+    Content.clean_url,
+    Content.content_type,
+    Content.layout_type,
+    Content.layout_type_override,
+    Content.title,
+    Content.author_name,
+    Content.author_id,
+    Content.author_avatar_url,
+    Content.cover_url,
+    Content.cover_color,
+    Content.tags,
+    Content.is_nsfw,
+    Content.published_at,
+    Content.created_at,
+    Content.review_status,
+    Content.view_count,
+    Content.like_count,
+)
+
+
 class ContentRepository:
     def __init__(self, db: AsyncSession):
         self.db = db
@@ -23,83 +67,68 @@ class ContentRepository:
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
         include_archive_metadata: bool = False,
-    ) -> Tuple[List[Content], int]:
-        """统一的内容查询逻辑，支持 FTS5 搜索"""
-        conditions = []
-        if platforms:
-            conditions.append(Content.platform.in_(platforms))
-        if statuses:
-            conditions.append(Content.status.in_(statuses))
-        if review_status:
-            conditions.append(Content.review_status == review_status)
-        if is_nsfw is not None:
-            conditions.append(Content.is_nsfw == is_nsfw)
-        if author:
-            conditions.append(Content.author_name.ilike(f"%{author}%"))
-        if start_date:
-            conditions.append(Content.created_at >= start_date)
-        if end_date:
-            conditions.append(Content.created_at <= end_date)
+        cursor: Optional[str] = None,
+        with_total: bool = True,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Content], Optional[int]]:
+        """统一的内容查询逻辑，支持 FTS5 搜索
 
-        # 默认隔离 discovery 缓冲区：只有 discovery_state 为 NULL（正式收藏）或 PROMOTED 的内容进入主库视图
-        conditions.append(
-            or_(
-                Content.discovery_state.is_(None),
-                Content.discovery_state == DiscoveryState.PROMOTED,
-            )
+        传入 cursor 时按游标续页（忽略 page）；with_total=False 时不统计总数，返回 None。
+        limit 为本次取回的行数（默认等于 size），翻页偏移始终按 size 计算。
+        """
+        conditions = await self._list_conditions(
+            platforms=platforms,
+            statuses=statuses,
+            review_status=review_status,
+            tags=tags,
+            q=q,
+            is_nsfw=is_nsfw,
+            author=author,
+            start_date=start_date,
+            end_date=end_date,
         )
+        total = await self._count(conditions) if with_total else None
 
-        if tags:
-            tag_subquery = text(
-                "SELECT DISTINCT c.id FROM contents c, json_each(c.tags) AS je "
-                "WHERE je.value IN :tags"
-            ).bindparams(bindparam("tags", expanding=True))
-            tag_ids_result = await self.db.execute(tag_subquery, {"tags": tags})
-            tag_ids = [row[0] for row in tag_ids_result.all()]
-            if tag_ids:
-                conditions.append(Content.id.in_(tag_ids))
-            else:
-                conditions.append(text("0 = 1"))
-
-        if q:
-            # 整合 FTS5 与 ILIKE
-            fts_stmt = text("SELECT content_id FROM contents_fts WHERE contents_fts MATCH :q")
-            try:
-                fts_result = await self.db.execute(fts_stmt, {"q": q})
-                fts_ids = [row[0] for row in fts_result.all()]
-            except Exception:
-                fts_ids = []
-
-            like_cond = or_(
-                Content.title.ilike(f"%{q}%"),
-                Content.body.ilike(f"%{q}%"),
-                Content.author_name.ilike(f"%{q}%")
-            )
-            if fts_ids:
-                conditions.append(or_(Content.id.in_(fts_ids), like_cond))
-            else:
-                conditions.append(like_cond)
-
-        # 统计总数
-        count_stmt = select(func.count()).select_from(Content).where(and_(*conditions))
-        total = (await self.db.execute(count_stmt)).scalar() or 0
-
-        # 分页查询（列表场景跳过加载 archive_metadata / last_error_detail 大字段）
-        stmt = (
-            select(Content)
-            .where(and_(*conditions))
-            .order_by(desc(Content.created_at))
-            .offset((page - 1) * size)
-            .limit(size)
-        )
+        # 列表场景跳过 last_error_detail 与大字段副表（include_archive_metadata 时随内容加载副表）
+        stmt = self._paginate(select(Content).where(and_(*conditions)), page, size, cursor, limit)
+        stmt = stmt.options(defer(Content.last_error_detail))
         if not include_archive_metadata:
-            stmt = stmt.options(defer(Content.archive_metadata), defer(Content.last_error_detail))
-        else:
-            stmt = stmt.options(defer(Content.last_error_detail))
+            stmt = stmt.options(raiseload(Content.blob))
         
         result = await self.db.execute(stmt)
         return result.scalars().all(), total
 
+    async def list_content_items(
+        self,
+        page: int = 1,
+        size: int = 20,
+        platforms: Optional[List[str]] = None,
+        statuses: Optional[List[str]] = None,
+        review_status: Optional[ReviewStatus] = None,
+        tags: Optional[List[str]] = None,
+        q: Optional[str] = None,
+        is_nsfw: Optional[bool] = None,
+        author: Optional[str] = None,
+        start_date: Optional[datetime] = None,
+        end_date: Optional[datetime] = None,
+        cursor: Optional[str] = None,
+        with_total: bool = True,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        """内容列表视图 — 只查询 LIST_ITEM_COLUMNS，返回行而不构造 ORM 对象"""
+        conditions = await self._list_conditions(
+            platforms=platforms,
+            statuses=statuses,
+            review_status=review_status,
+            tags=tags,
+            q=q,
+            is_nsfw=is_nsfw,
+            author=author,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        return await self._list_rows(LIST_ITEM_COLUMNS, conditions, page, size, cursor, with_total, limit)
+
     async def list_cards(
         self,
         page: int = 1,
@@ -113,8 +142,77 @@ class ContentRepository:
         author: Optional[str] = None,
         start_date: Optional[datetime] = None,
         end_date: Optional[datetime] = None,
-    ) -> Tuple[List[Content], int]:
-        """轻量级卡片查询 — 延迟加载大字段，仅返回展示所需列"""
+        cursor: Optional[str] = None,
+        with_total: bool = True,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        """轻量级卡片查询 — 只查询 CARD_COLUMNS，返回行而不构造 ORM 对象"""
+        conditions = await self._list_conditions(
+            platforms=platforms,
+            statuses=statuses,
+            review_status=review_status,
+            tags=tags,
+            q=q,
+            is_nsfw=is_nsfw,
+            author=author,
+            start_date=start_date,
+            end_date=end_date,
+        )
+        return await self._list_rows(CARD_COLUMNS, conditions, page, size, cursor, with_total, limit)
+
+    async def _list_rows(
+        self,
+        columns,
+        conditions,
+        page: int,
+        size: int,
+        cursor: Optional[str],
+        with_total: bool,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[Row], Optional[int]]:
+        total = await self._count(conditions) if with_total else None
+        stmt = self._paginate(select(*columns).where(and_(*conditions)), page, size, cursor, limit)
+        result = await self.db.execute(stmt)
+        return list(result.all()), total
+
+    @staticmethod
+    def next_cursor(items: List[Union[Content, Row]]) -> Optional[str]:
+        """以本页最后一条生成下一页游标"""
+        if not items:
+            return None
+        last = items[-1]
+        return encode_cursor(last.created_at, last.id)
+
+    @staticmethod
+    def _paginate(stmt, page: int, size: int, cursor: Optional[str], limit: Optional[int] = None):
+        """(created_at, id) 倒序；有游标时按行值比较续页，否则 OFFSET 翻页
+
+        limit 只决定取回行数（调用方可多取一条探测下一页），OFFSET 仍按页大小 size 计算。
+        """
+        stmt = stmt.order_by(desc(Content.created_at), desc(Content.id)).limit(limit or size)
+        if not cursor:
+            return stmt.offset((page - 1) * size)
+        created_at, content_id = decode_cursor(cursor)
+        # created_at 在写入时总会赋值，行值比较可直接沿 (..., created_at, id) 索引定位
+        return stmt.where(tuple_(Content.created_at, Content.id) < tuple_(created_at, content_id))
+
+    async def _count(self, conditions) -> int:
+        count_stmt = select(func.count()).select_from(Content).where(and_(*conditions))
+        return (await self.db.execute(count_stmt)).scalar() or 0
+
+    async def _list_conditions(
+        self,
+        *,
+        platforms: Optional[List[str]],
+        statuses: Optional[List[str]],
+        review_status: Optional[ReviewStatus],
+        tags: Optional[List[str]],
+        q: Optional[str],
+        is_nsfw: Optional[bool],
+        author: Optional[str],
+        start_date: Optional[datetime],
+        end_date: Optional[datetime],
+    ) -> list:
         conditions = []
         if platforms:
             conditions.append(Content.platform.in_(platforms))
@@ -131,68 +229,36 @@ class ContentRepository:
         if end_date:
             conditions.append(Content.created_at <= end_date)
 
+        # 默认隔离 discovery 缓冲区：只有 discovery_state 为 NULL（正式收藏）或 PROMOTED 的内容进入主库视图
+        # 写成 COALESCE 表达式：主库内容占绝大多数，让规划器沿 created_at 索引按序扫描而不是按该列取出后再排序
         conditions.append(
-            or_(
-                Content.discovery_state.is_(None),
-                Content.discovery_state == DiscoveryState.PROMOTED,
-            )
+            func.coalesce(Content.discovery_state, DiscoveryState.PROMOTED.value) == DiscoveryState.PROMOTED
         )
 
         if tags:
-            tag_subquery = text(
-                "SELECT DISTINCT c.id FROM contents c, json_each(c.tags) AS je "
-                "WHERE je.value IN :tags"
-            ).bindparams(bindparam("tags", expanding=True))
-            tag_ids_result = await self.db.execute(tag_subquery, {"tags": tags})
-            tag_ids = [row[0] for row in tag_ids_result.all()]
-            if tag_ids:
-                conditions.append(Content.id.in_(tag_ids))
-            else:
-                conditions.append(text("0 = 1"))
+            # 任一标签命中：走 content_tags (tag_norm, content_id) 索引
+            tag_norms = sorted({normalize_tag(tag) for tag in tags} - {""})
+            conditions.append(
+                Content.id.in_(select(ContentTag.content_id).where(ContentTag.tag_norm.in_(tag_norms)))
+                if tag_norms
+                else false()
+            )
 
         if q:
-            fts_stmt = text("SELECT content_id FROM contents_fts WHERE contents_fts MATCH :q")
-            try:
-                fts_result = await self.db.execute(fts_stmt, {"q": q})
-                fts_ids = [row[0] for row in fts_result.all()]
-            except Exception:
-                fts_ids = []
-
-            like_cond = or_(
-                Content.title.ilike(f"%{q}%"),
-                Content.body.ilike(f"%{q}%"),
-                Content.author_name.ilike(f"%{q}%")
-            )
-            if fts_ids:
-                conditions.append(or_(Content.id.in_(fts_ids), like_cond))
-            else:
-                conditions.append(like_cond)
+            conditions.append(await self._keyword_condition(q))
+        return conditions
 
-        count_stmt = select(func.count()).select_from(Content).where(and_(*conditions))
-        total = (await self.db.execute(count_stmt)).scalar() or 0
-
-        stmt = (
-            select(Content)
-            .options(
-                defer(Content.body),
-                defer(Content.rich_payload),
-                defer(Content.archive_metadata),
-                defer(Content.context_data),
-                defer(Content.extra_stats),
-                defer(Content.summary),
-                defer(Content.last_error),
-                defer(Content.last_error_detail),
-                defer(Content.media_urls),
-            )
-            .where(and_(*conditions))
-            .order_by(desc(Content.created_at))
-            .offset((page - 1) * size)
-            .limit(size)
+    async def _keyword_condition(self, q: str):
+        """关键词过滤：走 FTS5 索引；仅在索引不可用（未编译 FTS5）时退回 ILIKE"""
+        if await fts_ready(self.db):
+            match = build_match_query(q)
+            return Content.id.in_(fts_content_ids(match)) if match else false()
+        return or_(
+            Content.title.ilike(f"%{q}%"),
+            Content.id.in_(blob_content_ids(blob_value("body").ilike(f"%{q}%"))),
+            Content.author_name.ilike(f"%{q}%")
         )
 
-        result = await self.db.execute(stmt)
-        return result.scalars().all(), total
-
     async def get_by_id(self, content_id: int) -> Optional[Content]:
         result = await self.db.execute(select(Content).where(Content.id == content_id))
         return result.scalar_one_or_none()
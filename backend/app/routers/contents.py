@@ -13,22 +13,25 @@ from app.core.database import get_db
 from app.models import Content, ContentStatus, PushedRecord, Platform, ReviewStatus, ContentSource
 from app.schemas import (
     ShareRequest, ShareResponse, ContentDetail,
-    ShareCardListResponse, ContentListItemResponse, ContentListItem,
+    ShareCardListResponse, ContentListItemResponse,
     ContentUpdate, ReviewAction, BatchReviewRequest,
-    PushedRecordResponse
+    PushedRecordResponse, RelatedContentItem, RelatedContentResponse,
 )
 from app.core.logging import logger
 from app.core.config import settings
 from app.tasks import worker
 from app.core.dependencies import require_api_token, get_content_service, get_content_repo
+from app.core.response_cache import cached_response
 from app.services.content_service import ContentService
+from app.services.related_content import RelatedContentService
 from app.repositories.content_repository import ContentRepository
 from app.services.content_presenter import (
     compute_effective_layout_type, compute_display_title, compute_author_avatar_url,
-    transform_media_url, transform_content_detail,
+    transform_media_url, transform_content_detail, build_list_item, build_share_card,
 )
 from app.media.extractor import sanitize_media_urls
-from app.adapters.utils import ensure_title
+from app.utils.json_response import json_response
+from app.utils.pagination import decode_cursor
 
 router = APIRouter()
 
@@ -44,6 +47,22 @@ def _parse_list_param(values: Optional[List[str]]) -> Optional[List[str]]:
             result.append(v)
     return result if result else None
 
+def _want_total(include_total: Optional[bool], cursor: Optional[str]) -> bool:
+    """总数按需统计：游标续页（无限滚动）默认不再 COUNT；同时校验游标格式"""
+    if cursor:
+        try:
+            decode_cursor(cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    return include_total if include_total is not None else not cursor
+
+
+def _keyset_window(items: list, size: int) -> tuple[list, bool, Optional[str]]:
+    """截取多取的一条，返回 (本页, 是否还有下一页, 下一页游标)"""
+    has_more = len(items) > size
+    items = list(items[:size])
+    return items, has_more, ContentRepository.next_cursor(items) if has_more else None
+
 # --- 分享 ---
 
 @router.post("/shares", response_model=ShareResponse)
@@ -80,6 +99,7 @@ async def create_share(
 # --- 内容 增删改查 ---
 
 @router.get("/contents", response_model=ContentListItemResponse)
+@cached_response("contents", "content_blobs")  # q 检索正文，正文在副表
 async def list_contents(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
@@ -92,13 +112,18 @@ async def list_contents(
     end_date: Optional[datetime] = Query(None),
     q: Optional[str] = Query(None),
     is_nsfw: Optional[bool] = Query(None),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入后忽略 page"),
+    include_total: Optional[bool] = Query(None, description="是否统计总数，默认仅在未传 cursor 时统计"),
     repo: ContentRepository = Depends(get_content_repo),
     _: None = Depends(require_api_token),
 ):
-    """完整内容列表查询"""
-    items, total = await repo.list_contents(
+    """完整内容列表查询（列投影 + orjson，不构造 ORM 对象）"""
+    rows, total = await repo.list_content_items(
         page=page, 
-        size=size, 
+        size=size,
+        limit=size + 1,  # 多取一条判断是否还有下一页
+        cursor=cursor,
+        with_total=_want_total(include_total, cursor),
         platforms=_parse_list_param(platforms), 
         statuses=_parse_list_param(statuses), 
         review_status=review_status,
@@ -109,19 +134,16 @@ async def list_contents(
         q=q, 
         is_nsfw=is_nsfw
     )
-    
-    items_pydantic = [
-        ContentListItem.model_validate(c)
-        for c in items
-    ]
-    
-    return {
-        "items": items_pydantic,
+    rows, has_more, next_cursor = _keyset_window(rows, size)
+
+    return json_response({
+        "items": [build_list_item(row) for row in rows],
         "total": total,
         "page": page,
         "size": size,
-        "has_more": total > page * size
-    }
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    })
 
 @router.get("/contents/{content_id}", response_model=ContentDetail)
 async def get_content_detail(
@@ -147,6 +169,35 @@ async def get_content_detail(
     base_url = settings.base_url or "http://localhost:8000"
     return transform_content_detail(ContentDetail.model_validate(content), base_url)
 
+@router.get("/contents/{content_id}/related", response_model=RelatedContentResponse)
+async def get_related_contents(
+    content_id: int,
+    limit: int = Query(10, ge=1, le=50, description="返回数量"),
+    db: AsyncSession = Depends(get_db),
+    _: None = Depends(require_api_token),
+):
+    """相似内容（读取预计算的近邻列表）"""
+    related = await RelatedContentService().get_related(db, content_id, limit)
+    if related is None and await db.get(Content, content_id) is None:
+        raise HTTPException(status_code=404, detail="Content not found")
+
+    items = [
+        RelatedContentItem(
+            content_id=content.id,
+            score=float(score),
+            platform=content.platform.value if content.platform else "",
+            url=content.url,
+            title=content.title,
+            author_name=content.author_name,
+            cover_url=content.cover_url,
+            tags=(content.tags or []),
+            created_at=content.created_at,
+            published_at=content.published_at,
+        )
+        for content, score in (related or [])
+    ]
+    return RelatedContentResponse(content_id=content_id, computed=related is not None, items=items)
+
 @router.patch("/contents/{content_id}", response_model=ContentDetail)
 async def update_content(
     content_id: int,
@@ -282,6 +333,7 @@ async def delete_pushed_record(
 # --- 卡片与预览 ---
 
 @router.get("/cards", response_model=ShareCardListResponse)
+@cached_response("contents", "content_blobs")  # q 检索正文，正文在副表
 async def list_share_cards(
     page: int = Query(1, ge=1),
     size: int = Query(20, ge=1, le=100),
@@ -293,13 +345,18 @@ async def list_share_cards(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
     q: Optional[str] = Query(None),
+    cursor: Optional[str] = Query(None, description="上一页返回的 next_cursor，传入后忽略 page"),
+    include_total: Optional[bool] = Query(None, description="是否统计总数，默认仅在未传 cursor 时统计"),
     repo: ContentRepository = Depends(get_content_repo),
     _: None = Depends(require_api_token),
 ):
-    """轻量级分享卡片列表"""
-    contents, total = await repo.list_cards(
+    """轻量级分享卡片列表（列投影 + orjson，不构造 ORM 对象）"""
+    rows, total = await repo.list_cards(
         page=page, 
-        size=size, 
+        size=size,
+        limit=size + 1,
+        cursor=cursor,
+        with_total=_want_total(include_total, cursor),
         platforms=_parse_list_param(platforms), 
         statuses=_parse_list_param(statuses), 
         review_status=review_status,
@@ -309,45 +366,17 @@ async def list_share_cards(
         end_date=end_date, 
         q=q
     )
+    rows, has_more, next_cursor = _keyset_window(rows, size)
 
     base_url = settings.base_url or "http://localhost:8000"
-    items = []
-    for c in contents:
-        cover_url = transform_media_url(c.cover_url, base_url)
-        thumbnail_url = None
-        if cover_url and "/api/v1/media/" in cover_url:
-            thumbnail_url = f"{cover_url}?size=thumb"
-        
-        items.append({
-            "id": c.id,
-            "platform": c.platform,
-            "url": c.url,
-            "clean_url": c.clean_url,
-            "content_type": c.content_type,
-            "effective_layout_type": compute_effective_layout_type(c),
-            "title": ensure_title(c.title, None),
-            "author_name": c.author_name,
-            "author_id": c.author_id,
-            "author_avatar_url": transform_media_url(compute_author_avatar_url(c), base_url),
-            "cover_url": cover_url,
-            "thumbnail_url": thumbnail_url,
-            "cover_color": c.cover_color,
-            "tags": c.tags or [],
-            "is_nsfw": c.is_nsfw or False,
-            "published_at": c.published_at,
-            "created_at": c.created_at,
-            "review_status": c.review_status,
-            "view_count": c.view_count or 0,
-            "like_count": c.like_count or 0,
-        })
-
-    return {
-        "items": items,
+    return json_response({
+        "items": [build_share_card(row, base_url) for row in rows],
         "total": total,
         "page": page,
         "size": size,
-        "has_more": total > page * size
-    }
+        "has_more": has_more,
+        "next_cursor": next_cursor,
+    })
 
 
 @router.get("/cards/{card_id}")
@@ -10,6 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.core.dependencies import require_api_token
+from app.core.response_cache import cached_response
 from app.core.events import event_bus
 from app.core.logging import logger
 from app.core.time_utils import utcnow
@@ -109,6 +110,7 @@ def _build_status_conditions(status: Optional[str]):
 
 
 @router.get("/stats", response_model=QueueStatsResponse)
+@cached_response("content_queue_items", ttl_seconds=30)  # due_now 随时间变化
 async def get_queue_stats(
     rule_id: Optional[int] = Query(None, description="按规则ID过滤"),
     db: AsyncSession = Depends(get_db),
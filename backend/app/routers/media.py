@@ -3,20 +3,39 @@
 包含：本地媒体代理、远程图片代理
 调用方式：无需 API Token (方便前端直接加载)，但部分接口可能限制来源
 """
+import asyncio
 import os
 import ipaddress
 import mimetypes
 import socket
 import urllib.parse
+from dataclasses import dataclass, field
 from urllib.parse import urlparse
 
 import httpx
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import FileResponse, StreamingResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
 
 from app.core.logging import logger
 from app.core.config import settings
-from app.adapters.storage import get_storage_backend, LocalStorageBackend
+from app.core.dependencies import require_api_token
+from app.adapters.storage import (
+    get_local_storage_backend,
+    get_storage_backend,
+    LocalStorageBackend,
+    LocatedObject,
+    S3StorageBackend,
+)
+from app.media.guards import MediaLimitExceeded, read_response_limited
+from app.media.proxy_cache import ProxyImageCache, get_proxy_image_cache
+from app.media.responses import (
+    BytesRangeResponse,
+    StoredObjectResponse,
+    content_addressed_etag,
+    is_not_modified,
+    not_modified_response,
+    stat_etag,
+)
 
 router = APIRouter()
 
@@ -48,33 +67,44 @@ def _is_safe_url(url: str) -> bool:
     except (ValueError, socket.gaierror):
         return False
 
+def _stored_object_response(located: LocatedObject, *, media_type: str, headers: dict[str, str]) -> Response:
+    """独立文件走 FileResponse，打包对象按段文件区间发送"""
+    if located.packed:
+        return StoredObjectResponse(located, media_type=media_type, headers=headers)
+    return FileResponse(located.path, media_type=media_type, headers=headers)
+
+
 @router.get("/media/{key:path}")
 async def proxy_media(
+    request: Request,
     key: str,
     size: str = Query("original", pattern=r"^(original|thumb)$"),
-    storage: LocalStorageBackend = Depends(get_storage_backend),
+    storage: LocalStorageBackend | S3StorageBackend = Depends(get_storage_backend),
 ):
     """
     媒体代理 API
-    支持 Range 请求以加速播放视频预览。
+    支持 Range 请求以加速播放视频预览；内容寻址 key 的 sha256 作为强 ETag，支持 304 重验证。
     
     Query Parameters:
         size: original (默认) | thumb (缩略图，由前端控制尺寸)
         注：当前版本 size 参数传递给前端，由前端 CachedNetworkImage 控制加载尺寸
     """
-    if not isinstance(storage, LocalStorageBackend):
-        raise HTTPException(status_code=400, detail="Only local storage proxy is supported")
-
     # 路径穿越防护
     if ".." in key:
         raise HTTPException(status_code=400, detail="Invalid media key")
 
+    if isinstance(storage, S3StorageBackend):
+        return await _redirect_to_object_storage(request, key, storage)
+    if not isinstance(storage, LocalStorageBackend):
+        raise HTTPException(status_code=400, detail="Unsupported storage backend")
+
     file_path = storage._full_path(key)
     # 确保解析后的路径仍在存储根目录内
     if not os.path.realpath(file_path).startswith(os.path.realpath(storage.root_dir)):
         raise HTTPException(status_code=403, detail="Access denied")
 
-    if not os.path.exists(file_path):
+    located = await asyncio.to_thread(storage.locate, key)
+    if located is None:
         raise HTTPException(status_code=404, detail="Media not found")
         
     mime_type, _ = mimetypes.guess_type(file_path)
@@ -82,17 +112,43 @@ async def proxy_media(
         mime_type = "application/octet-stream"
     
     # 添加缓存头优化性能
-    return FileResponse(
-        file_path, 
-        media_type=mime_type,
-        headers={
-            "Cache-Control": "public, max-age=31536000, immutable",  # 1年缓存
-            "ETag": f'"{key}"',
-        }
+    etag = content_addressed_etag(key) or stat_etag(located.length, located.mtime)
+    headers = {
+        "Cache-Control": "public, max-age=31536000, immutable",  # 1年缓存
+        "ETag": etag,
+    }
+    if is_not_modified(request.headers, etag=etag, last_modified=located.mtime):
+        return not_modified_response(headers)
+    return _stored_object_response(located, media_type=mime_type, headers=headers)
+
+async def _redirect_to_object_storage(request: Request, key: str, storage: S3StorageBackend) -> Response:
+    """对象存储：字节由对象存储直接服务，这里只做存在性检查与跳转（公开地址优先，否则预签名）"""
+    if not await storage.exists(key=key):
+        raise HTTPException(status_code=404, detail="Media not found")
+
+    etag = content_addressed_etag(key)
+    if etag is not None and is_not_modified(request.headers, etag=etag, last_modified=None):
+        return not_modified_response({"Cache-Control": "public, max-age=31536000, immutable", "ETag": etag})
+
+    # 预签名地址会过期，跳转本身只允许短时缓存
+    max_age = min(300, storage.presign_expires_seconds // 2)
+    return RedirectResponse(
+        storage.get_download_url(key),
+        status_code=307,
+        headers={"Cache-Control": f"private, max-age={max_age}"},
     )
 
+
+def _proxy_cache_storage(storage) -> LocalStorageBackend:
+    """图片代理缓存始终落在本地磁盘（对象存储模式下使用本地后端）"""
+    if isinstance(storage, LocalStorageBackend):
+        return storage
+    return get_local_storage_backend()
+
+
 @router.get("/proxy/image")
 async def proxy_image(
+    request: Request,
     url: str = Query(..., description="要代理的图片 URL"),
     storage: LocalStorageBackend = Depends(get_storage_backend),
 ):
@@ -101,16 +157,9 @@ async def proxy_image(
     优化机制：
     1. 首次访问：下载并转码为WebP存储到本地
     2. 后续访问：直接返回本地缓存（速度提升100倍+）
+    3. 同一 URL 的并发未命中只下载/转码一次，缓存总量超出预算后按 LRU 淘汰
+    4. 以缓存内容的 sha256 作为 ETag，支持 304 重验证与 Range 请求
     """
-    import hashlib
-    from pathlib import Path
-    from app.media.processor import (
-        _image_to_webp,
-        _request_headers_for_url,
-        _content_addressed_key,
-        _sha256_bytes,
-    )
-    
     # 还原 URL 编码以确保 hash 一致性 (前端通过 query 参数传过来往往会被 encode)
     url = urllib.parse.unquote(url)
 
@@ -118,28 +167,50 @@ async def proxy_image(
     if not _is_safe_url(url):
         raise HTTPException(status_code=400, detail="目标 URL 不允许访问（内网地址或无效协议）")
 
-    # 1. 生成缓存key（使用URL的MD5作为命名空间）
-    url_hash = hashlib.md5(url.encode(), usedforsecurity=False).hexdigest()
-    cache_namespace = f"proxy_cache/{url_hash[:2]}/{url_hash[2:4]}"
-    
-    # 2. 检查是否已缓存（查找任意扩展名的文件）
-    cache_dir = storage._full_path(cache_namespace)
-    if os.path.exists(cache_dir):
-        # 查找以url_hash开头的文件
-        cache_files = [f for f in os.listdir(cache_dir) if f.startswith(url_hash)]
-        if cache_files:
-            cached_file = os.path.join(cache_dir, cache_files[0])
-            logger.debug(f"图片代理缓存命中: {url} -> {cached_file}")
-            return FileResponse(
-                cached_file,
-                media_type="image/webp",
-                headers={
-                    "Cache-Control": "public, max-age=86400",
-                    "X-Cache-Status": "HIT"
-                }
-            )
-    
-    # 3. 缓存未命中，下载并转码存储
+    storage = _proxy_cache_storage(storage)
+    cache = get_proxy_image_cache(storage)
+
+    # 1. 索引命中直接返回本地文件
+    entry = await cache.lookup(url)
+    located = await asyncio.to_thread(storage.locate, entry.key) if entry is not None else None
+    if located is not None:
+        logger.debug(f"图片代理缓存命中: {url} -> {entry.key}")
+        etag = f'"{entry.sha256}"' if entry.sha256 else stat_etag(located.length, located.mtime)
+        headers = {
+            "Cache-Control": "public, max-age=86400",
+            "X-Cache-Status": "HIT",
+            "ETag": etag,
+        }
+        if is_not_modified(request.headers, etag=etag, last_modified=located.mtime):
+            return not_modified_response(headers)
+        return _stored_object_response(located, media_type=entry.content_type, headers=headers)
+
+    # 2. 缓存未命中：合并并发请求，只下载/转码一次
+    result, coalesced = await cache.single_flight(url, lambda: _fetch_and_cache_image(url, cache))
+    headers = {
+        "Cache-Control": "public, max-age=86400",
+        "X-Cache-Status": "COALESCED" if coalesced else result.cache_status,
+        "ETag": f'"{result.sha256}"',
+        **result.extra_headers,
+    }
+    if is_not_modified(request.headers, etag=headers["ETag"], last_modified=None):
+        return not_modified_response(headers)
+    return BytesRangeResponse(result.data, media_type=result.content_type, headers=headers)
+
+
+@dataclass(frozen=True)
+class _ProxyFetchResult:
+    data: bytes
+    content_type: str
+    cache_status: str
+    sha256: str
+    extra_headers: dict[str, str] = field(default_factory=dict)
+
+
+async def _fetch_and_cache_image(url: str, cache: ProxyImageCache) -> _ProxyFetchResult:
+    """下载远程图片、转码为 WebP 并写入代理缓存。"""
+    from app.media.processor import _image_to_webp, _request_headers_for_url
+
     logger.info(f"图片代理缓存未命中，开始下载: {url}")
     
     headers = _request_headers_for_url(url)
@@ -148,43 +219,40 @@ async def proxy_image(
     
     try:
         async with httpx.AsyncClient(proxy=proxy, timeout=httpx.Timeout(10.0, connect=5.0)) as client:
-            resp = await client.get(url, headers=headers, follow_redirects=True)
-            
-            if resp.status_code != 200:
-                logger.error(f"图片代理上游错误 {resp.status_code}: {url}")
-                raise HTTPException(
-                    status_code=502,
-                    detail=f"上游服务器返回错误: {resp.status_code}"
-                )
-            
-            original_data = resp.content
-            content_type = resp.headers.get("content-type", "image/jpeg")
+            async with client.stream("GET", url, headers=headers, follow_redirects=True) as resp:
+                if resp.status_code != 200:
+                    logger.error(f"图片代理上游错误 {resp.status_code}: {url}")
+                    raise HTTPException(
+                        status_code=502,
+                        detail=f"上游服务器返回错误: {resp.status_code}"
+                    )
+
+                # 流式读取，超过下载上限立即中止
+                original_data = await read_response_limited(resp)
+                content_type = resp.headers.get("content-type", "image/jpeg")
             
-            # 4. 转码为WebP（支持动画GIF）
+            # 3. 转码为WebP（支持动画GIF）；超出像素/帧数/内存上限时走下方原图降级
             try:
-                webp_data, width, height = _image_to_webp(original_data, quality=80)
-                sha256 = _sha256_bytes(webp_data)
+                webp_data, width, height = await _image_to_webp(original_data, quality=80)
                 
-                # 5. 存储到本地
-                cache_key = f"{cache_namespace}/{url_hash}.webp"
-                await storage.put_bytes(key=cache_key, data=webp_data, content_type="image/webp")
+                # 4. 写入缓存（索引登记 + 超预算淘汰）
+                entry = await cache.store(url, data=webp_data, ext="webp", content_type="image/webp")
                 
                 logger.info(
-                    f"图片代理已缓存: {url} -> {cache_key} "
+                    f"图片代理已缓存: {url} -> {entry.key} "
                     f"[{len(original_data)//1024}KB原始 -> {len(webp_data)//1024}KB WebP, "
                     f"{width}x{height}]"
                 )
                 
-                # 6. 返回转码后的图片
-                return StreamingResponse(
-                    iter([webp_data]),
-                    media_type="image/webp",
-                    headers={
-                        "Cache-Control": "public, max-age=86400",
-                        "X-Cache-Status": "MISS",
+                return _ProxyFetchResult(
+                    data=webp_data,
+                    content_type="image/webp",
+                    cache_status="MISS",
+                    sha256=entry.sha256,
+                    extra_headers={
                         "X-Original-Size": str(len(original_data)),
                         "X-Compressed-Size": str(len(webp_data)),
-                    }
+                    },
                 )
             
             except Exception as transcode_error:
@@ -195,18 +263,22 @@ async def proxy_image(
                 ext = content_type.split("/")[-1].split(";")[0]
                 if ext not in ["jpeg", "jpg", "png", "gif", "webp"]:
                     ext = "jpg"
-                cache_key = f"{cache_namespace}/{url_hash}.{ext}"
-                await storage.put_bytes(key=cache_key, data=original_data, content_type=content_type)
+                entry = await cache.store(url, data=original_data, ext=ext, content_type=content_type)
                 
-                return StreamingResponse(
-                    iter([original_data]),
-                    media_type=content_type,
-                    headers={
-                        "Cache-Control": "public, max-age=86400",
-                        "X-Cache-Status": "MISS-RAW",
-                    }
+                return _ProxyFetchResult(
+                    data=original_data,
+                    content_type=content_type,
+                    cache_status="MISS-RAW",
+                    sha256=entry.sha256,
                 )
     
+    except HTTPException:
+        raise
+
+    except MediaLimitExceeded as e:
+        logger.warning(f"图片代理源文件过大: {url}, {e}")
+        raise HTTPException(status_code=413, detail="上游图片超出大小限制")
+
     except httpx.TimeoutException:
         logger.error(f"图片代理请求超时: {url}")
         raise HTTPException(status_code=504, detail="上游服务器响应超时")
@@ -218,3 +290,12 @@ async def proxy_image(
     except Exception as e:
         logger.error(f"图片代理未知错误: {url}, {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="图片代理服务内部错误")
+
+
+@router.get("/proxy/image/stats")
+async def proxy_image_cache_stats(
+    storage: LocalStorageBackend = Depends(get_storage_backend),
+    _: None = Depends(require_api_token),
+):
+    """图片代理缓存指标（命中/未命中/合并/淘汰计数与容量）"""
+    return get_proxy_image_cache(_proxy_cache_storage(storage)).stats()
@@ -11,6 +11,7 @@ from app.core.database import get_db
 from app.core.dependencies import require_api_token
 from app.models import Platform
 from app.schemas import SemanticSearchResponse, SemanticSearchItem
+from app.services.embedding_queue import get_reindex_job
 from app.services.embedding_service import EmbeddingService
 
 router = APIRouter()
@@ -70,3 +71,24 @@ async def semantic_search(
         top_k=top_k,
         results=results,
     )
+
+
+@router.get("/search/reindex")
+async def get_reindex_status(_: None = Depends(require_api_token)):
+    """全库语义索引重建进度"""
+    return await get_reindex_job().status()
+
+
+@router.post("/search/reindex", status_code=202)
+async def start_reindex(
+    restart: bool = Query(False, description="忽略断点从头开始"),
+    _: None = Depends(require_api_token),
+):
+    """开始或继续全库语义索引重建（切换 embedding 模型后使用）"""
+    return await get_reindex_job().start(restart=restart)
+
+
+@router.post("/search/reindex/pause")
+async def pause_reindex(_: None = Depends(require_api_token)):
+    """暂停全库语义索引重建，进度保留"""
+    return await get_reindex_job().stop()
@@ -6,14 +6,12 @@
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 import asyncio
-import os
-import time
 from fastapi import APIRouter, Depends, HTTPException, Query, Request, Body
 from sqlalchemy import select, and_, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db, db_ping
-from app.models import SystemSetting, Content, DiscoveryState
+from app.models import SystemSetting, Content, DiscoveryState, TagCount
 from app.schemas import (
     SystemSettingResponse, SystemSettingUpdate, DashboardStats, 
     QueueStats, TagStats, QueueOverviewStats, DistributionStatusStats,
@@ -21,38 +19,19 @@ from app.schemas import (
 )
 from app.core.logging import logger
 from app.core.dependencies import require_api_token
+from app.core.response_cache import cached_response
 from app.core.api_errors import build_error_payload
 from app.adapters.favorites.errors import FavoritesFetchError
-from app.adapters.storage import get_storage_backend, LocalStorageBackend
+from app.adapters.storage import get_storage_backend
 from app.core.queue import task_queue
 from app.utils.sensitive_display import as_configured_placeholder, is_sensitive_setting_key
 
 router = APIRouter()
 
-_storage_usage_cache: dict = {"value": 0, "expires_at": 0.0}
-_STORAGE_CACHE_TTL = 300  # 5 minutes
-
-
-def _get_cached_storage_usage() -> int:
-    now = time.monotonic()
-    if now < _storage_usage_cache["expires_at"]:
-        return _storage_usage_cache["value"]
-
+async def _get_storage_usage() -> dict:
+    """读取存储用量台账（增量维护，O(1)）"""
     storage = get_storage_backend()
-    usage = 0
-    if isinstance(storage, LocalStorageBackend):
-        root = storage.root_dir
-        if os.path.exists(root):
-            for dirpath, _, filenames in os.walk(root):
-                for f in filenames:
-                    try:
-                        usage += os.path.getsize(os.path.join(dirpath, f))
-                    except OSError:
-                        pass
-
-    _storage_usage_cache["value"] = usage
-    _storage_usage_cache["expires_at"] = now + _STORAGE_CACHE_TTL
-    return usage
+    return await asyncio.to_thread(storage.usage.snapshot)
 
 
 def _serialize_setting_for_response(setting: SystemSetting) -> dict:
@@ -110,6 +89,7 @@ async def get_init_status(
     }
 
 @router.get("/dashboard/stats", response_model=DashboardStats)
+@cached_response("contents", ttl_seconds=60)  # 今日增长与存储用量随时间变化
 async def get_dashboard_stats(
     db: AsyncSession = Depends(get_db),
     _: None = Depends(require_api_token),
@@ -120,13 +100,9 @@ async def get_dashboard_stats(
         Content.discovery_state == DiscoveryState.PROMOTED,
     )
 
-    platform_query = (
-        select(Content.platform, func.count())
-        .where(_library_content)
-        .group_by(Content.platform)
-    )
-    platform_results = (await db.execute(platform_query)).all()
-    platform_counts = {str(p[0].value): p[1] for p in platform_results}
+    from app.services.dashboard_service import build_platform_counts
+
+    platform_counts = await build_platform_counts(db)
     
     today = datetime.now().date()
     daily_growth = []
@@ -144,15 +120,33 @@ async def get_dashboard_stats(
         day_count = (await db.execute(count_q)).scalar() or 0
         daily_growth.append({"date": day.isoformat(), "count": day_count})
 
-    usage = _get_cached_storage_usage()
+    usage = await _get_storage_usage()
     
     return {
         "platform_counts": platform_counts,
         "daily_growth": daily_growth,
-        "storage_usage_bytes": usage
+        "storage_usage_bytes": usage["total_bytes"],
+        "storage_usage_breakdown": {
+            ns: value["bytes"] for ns, value in usage["namespaces"].items()
+        },
     }
 
+@router.post("/storage/gc")
+async def run_storage_gc(
+    dry_run: bool = Query(True, description="仅报告孤儿文件，不删除"),
+    grace_seconds: Optional[int] = Query(None, ge=0, description="宽限期（秒），默认使用配置值"),
+    _: None = Depends(require_api_token),
+):
+    """手动执行一次媒体 GC（默认 dry-run），返回清理报告"""
+    from app.core.config import settings
+    from app.services.media_gc_service import MediaGarbageCollector
+
+    grace = settings.storage_gc_grace_seconds if grace_seconds is None else grace_seconds
+    report = await MediaGarbageCollector(get_storage_backend()).run(grace_seconds=grace, dry_run=dry_run)
+    return report.to_dict()
+
 @router.get("/dashboard/queue", response_model=QueueOverviewStats)
+@cached_response("contents", "content_queue_items")
 async def get_dashboard_queue(
     db: AsyncSession = Depends(get_db),
     _: None = Depends(require_api_token),
@@ -169,26 +163,19 @@ async def get_dashboard_queue(
     }
 
 @router.get("/tags", response_model=List[TagStats])
+@cached_response("contents")
 async def get_tags_list(
     db: AsyncSession = Depends(get_db),
     _: None = Depends(require_api_token),
 ):
-    """获取所有标签列表及其使用次数"""
+    """获取所有标签列表及其使用次数（读取由触发器维护的 tag_counts）"""
     try:
-        result = await db.execute(select(Content.tags).where(Content.tags.isnot(None)))
-        all_tags_lists = result.scalars().all()
-        
-        counts = {}
-        for tags in all_tags_lists:
-            if isinstance(tags, list):
-                for t in tags:
-                    counts[t] = counts.get(t, 0) + 1
-        
-        tag_stats = [
-            {"name": name, "count": count} 
-            for name, count in sorted(counts.items(), key=lambda x: x[1], reverse=True)
-        ]
-        return tag_stats
+        result = await db.execute(
+            select(TagCount.name, TagCount.count)
+            .where(TagCount.count > 0)
+            .order_by(TagCount.count.desc(), TagCount.name)
+        )
+        return [{"name": name, "count": count} for name, count in result.all()]
     except Exception as e:
         logger.exception("获取标签列表失败")
         raise HTTPException(
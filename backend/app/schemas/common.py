@@ -38,6 +38,7 @@ class DashboardStats(BaseModel):
     platform_counts: Dict[str, int]
     daily_growth: List[Dict[str, Any]]
     storage_usage_bytes: int
+    storage_usage_breakdown: Dict[str, int] = {}
 
 
 class QueueOverviewStats(BaseModel):
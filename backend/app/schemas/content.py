@@ -101,6 +101,8 @@ class ContentDetail(BaseModel):
 
     context_data: Optional[Dict[str, Any]] = None
     rich_payload: Optional[Dict[str, Any]] = None
+
+    duplicate_of_id: Optional[int] = None  # 近似重复时指向原始内容
     
     created_at: UtcDatetime
     updated_at: UtcDatetime
@@ -138,10 +140,11 @@ class ContentListResponse(BaseModel):
 
 class ContentListItemResponse(BaseModel):
     items: List[ContentListItem]
-    total: int
+    total: Optional[int] = None  # 游标续页默认不统计
     page: int
     size: int
     has_more: bool
+    next_cursor: Optional[str] = None
 
 
 class ContentUpdate(BaseModel):
@@ -204,10 +207,11 @@ class ShareCard(BaseModel):
 class ShareCardListResponse(BaseModel):
     """分发合规内容列表响应"""
     items: List[ShareCard]
-    total: int
+    total: Optional[int] = None  # 游标续页默认不统计
     page: int
     size: int
     has_more: bool
+    next_cursor: Optional[str] = None
 
 
 class BatchDeleteRequest(BaseModel):
@@ -30,3 +30,23 @@ class SemanticSearchResponse(BaseModel):
     query: str
     top_k: int
     results: List[SemanticSearchItem]
+
+
+class RelatedContentItem(BaseModel):
+    content_id: int
+    score: float
+
+    platform: str
+    url: str
+    title: Optional[str] = None
+    author_name: Optional[str] = None
+    cover_url: Optional[str] = None
+    tags: List[str] = []
+    created_at: OptionalUtcDatetime = None
+    published_at: OptionalUtcDatetime = None
+
+
+class RelatedContentResponse(BaseModel):
+    content_id: int
+    computed: bool  # False：近邻尚未计算（新内容或刚切换模型），稍后重试
+    items: List[RelatedContentItem]
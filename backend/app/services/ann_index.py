@@ -0,0 +1,311 @@
+"""
+向量近似最近邻索引（IVF-Flat）
+
+- 训练：在抽样向量上做球面 k-means，得到 nlist 个归一化质心
+- 倒排表：每行向量归入内积最大的质心；倒排表只存矩阵行号，不复制向量，
+  检索时按质心相似度选取 nprobe 个列表，再对候选行做精确点积
+- 增量：写入/删除只改动该行所属的列表（O(1)），质心保持不变；
+  分布漂移较大时随矩阵重建重新分配
+- 持久化：质心与“行 -> 列表”映射随向量矩阵快照一起落盘（见 vector_cache）
+
+纯 numpy 实现，不引入额外依赖。
+
+基准测试（合成聚类数据，对比精确检索的召回率与延迟）：
+
+    python -m app.services.ann_index --rows 1000000 --dim 256
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+_TRAIN_SAMPLE_PER_LIST = 32
+_TRAIN_SAMPLE_MAX = 131072
+_TRAIN_ITERATIONS = 8
+_ASSIGN_CHUNK_ROWS = 4096
+_MIN_LISTS = 16
+_MAX_LISTS = 4096
+
+
+def suggest_nlist(rows: int) -> int:
+    """列表数取 4·sqrt(N)，限制在 [16, 4096]"""
+    return int(min(_MAX_LISTS, max(_MIN_LISTS, round(4 * math.sqrt(max(rows, 1))))))
+
+
+def train_sample_size(rows: int, nlist: int) -> int:
+    """训练抽样行数：每个列表约 32 行，总量封顶"""
+    return min(rows, nlist * _TRAIN_SAMPLE_PER_LIST, _TRAIN_SAMPLE_MAX)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """分块计算每行内积最大的质心编号"""
+    labels = np.empty(vectors.shape[0], dtype=np.int32)
+    for start in range(0, vectors.shape[0], _ASSIGN_CHUNK_ROWS):
+        block = vectors[start:start + _ASSIGN_CHUNK_ROWS]
+        labels[start:start + block.shape[0]] = np.argmax(block @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(
+    sample: np.ndarray,
+    nlist: int,
+    *,
+    iterations: int = _TRAIN_ITERATIONS,
+    seed: Optional[int] = None,
+) -> np.ndarray:
+    """球面 k-means（按内积分配，质心每轮归一化）"""
+    sample = np.asarray(sample, dtype=np.float32)
+    nlist = max(1, min(int(nlist), sample.shape[0]))
+    rng = np.random.default_rng(seed)
+    centroids = normalize(sample[rng.choice(sample.shape[0], nlist, replace=False)].copy())
+
+    for _ in range(iterations):
+        labels = nearest_centroids(sample, centroids)
+        counts = np.bincount(labels, minlength=nlist)
+        present = counts > 0
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        sums = np.zeros_like(centroids)
+        sums[present] = np.add.reduceat(sample[np.argsort(labels, kind="stable")], starts[present], axis=0)
+        # 空簇重新随机取样，避免质心塌缩
+        empty = np.flatnonzero(~present)
+        if empty.size:
+            sums[empty] = sample[rng.choice(sample.shape[0], empty.size, replace=False)]
+        centroids = normalize(sums)
+    return centroids
+
+
+class IVFFlatIndex:
+    """倒排文件索引：质心 + 每个列表的矩阵行号"""
+
+    def __init__(self, centroids: np.ndarray):
+        self.centroids = normalize(np.asarray(centroids, dtype=np.float32))
+        self.nlist, self.dim = self.centroids.shape
+        self._members: list[np.ndarray] = [np.zeros(0, dtype=np.int64) for _ in range(self.nlist)]
+        self._counts = np.zeros(self.nlist, dtype=np.int64)
+        # 行号 -> (列表编号, 列表内位置)；-1 表示不在索引中
+        self._label_of = np.full(0, -1, dtype=np.int32)
+        self._pos_of = np.zeros(0, dtype=np.int64)
+
+    @property
+    def size(self) -> int:
+        return int(self._counts.sum())
+
+    def labels(self, rows: int) -> np.ndarray:
+        """导出前 rows 行的列表编号（用于快照）"""
+        out = np.full(rows, -1, dtype=np.int32)
+        n = min(rows, self._label_of.shape[0])
+        out[:n] = self._label_of[:n]
+        return out
+
+    def load_labels(self, labels: np.ndarray) -> None:
+        """按“行 -> 列表”映射批量构建倒排表"""
+        labels = np.asarray(labels, dtype=np.int32)
+        rows = np.flatnonzero(labels >= 0)
+        ordered = rows[np.argsort(labels[rows], kind="stable")]
+        counts = np.bincount(labels[rows], minlength=self.nlist)
+        offsets = np.concatenate(([0], np.cumsum(counts)))
+
+        self._label_of = labels.copy()
+        self._pos_of = np.zeros(labels.shape[0], dtype=np.int64)
+        self._counts = counts.astype(np.int64)
+        self._members = []
+        for label in range(self.nlist):
+            members = ordered[offsets[label]:offsets[label + 1]].astype(np.int64)
+            self._members.append(members)
+            self._pos_of[members] = np.arange(members.shape[0])
+
+    def _ensure_rows(self, needed: int) -> None:
+        capacity = self._label_of.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 256)
+        label_of = np.full(new_capacity, -1, dtype=np.int32)
+        label_of[:capacity] = self._label_of
+        pos_of = np.zeros(new_capacity, dtype=np.int64)
+        pos_of[:capacity] = self._pos_of
+        self._label_of, self._pos_of = label_of, pos_of
+
+    def add(self, row: int, vector: np.ndarray) -> None:
+        """写入或重新分配一行"""
+        label = int(np.argmax(self.centroids @ vector))
+        self._ensure_rows(row + 1)
+        current = int(self._label_of[row])
+        if current == label:
+            return
+        if current >= 0:
+            self.discard(row)
+
+        members = self._members[label]
+        n = int(self._counts[label])
+        if n == members.shape[0]:
+            grown = np.zeros(max(16, n * 2), dtype=np.int64)
+            grown[:n] = members
+            members = self._members[label] = grown
+        members[n] = row
+        self._counts[label] = n + 1
+        self._label_of[row] = label
+        self._pos_of[row] = n
+
+    def discard(self, row: int) -> None:
+        """移出一行（与列表末尾交换）"""
+        if row >= self._label_of.shape[0] or self._label_of[row] < 0:
+            return
+        label = int(self._label_of[row])
+        pos = int(self._pos_of[row])
+        last = int(self._counts[label]) - 1
+        members = self._members[label]
+        moved = int(members[last])
+        members[pos] = moved
+        self._pos_of[moved] = pos
+        self._counts[label] = last
+        self._label_of[row] = -1
+
+    def search(
+        self,
+        vectors: np.ndarray,
+        ids: np.ndarray,
+        query: np.ndarray,
+        k: int,
+        nprobe: int,
+        *,
+        scales: Optional[np.ndarray] = None,
+        mask: Optional[np.ndarray] = None,
+    ) -> list[tuple[int, float]]:
+        """在 vectors/ids（矩阵的行存储）上检索 top-k
+
+        至少探查 nprobe 个列表；候选不足 k 时继续按质心相似度扩展，
+        因此返回数量只会在探查完所有列表后才少于 k。ids < 0 的行（已删除）被跳过。
+        vectors 为 int8 量化矩阵时传入每行的 scales；mask 为行掩码时只保留其中为 True 的行。
+        """
+        if k <= 0 or self.size == 0:
+            return []
+        picked: list[np.ndarray] = []
+        total = 0
+        for probed, label in enumerate(np.argsort(self.centroids @ query)[::-1]):
+            if probed >= nprobe and total >= k:
+                break
+            n = int(self._counts[label])
+            if n:
+                members = self._members[label][:n]
+                if mask is not None:
+                    members = members[mask[members]]
+                picked.append(members)
+                total += members.size
+        if not picked:
+            return []
+
+        rows = np.concatenate(picked)
+        rows = rows[ids[rows] >= 0]
+        if scales is None:
+            scores = vectors[rows] @ query
+        else:
+            scores = (vectors[rows].astype(np.float32) @ query) * scales[rows]
+        if k < scores.size:
+            part = np.argpartition(scores, -k)[-k:]
+            order = part[np.argsort(scores[part])[::-1]]
+        else:
+            order = np.argsort(scores)[::-1]
+        return [(int(ids[rows[i]]), float(scores[i])) for i in order]
+
+
+# ---------------------------------------------------------------------------
+# 基准测试
+# ---------------------------------------------------------------------------
+
+
+def synthetic_corpus(rows: int, centers: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+    """高斯混合 + 归一化，近似真实文本向量的簇结构（均匀随机向量没有近邻结构）"""
+    clusters, dim = centers.shape
+    noise = 1.0 / math.sqrt(dim)
+    out = np.empty((rows, dim), dtype=np.float32)
+    for start in range(0, rows, _ASSIGN_CHUNK_ROWS * 16):
+        end = min(rows, start + _ASSIGN_CHUNK_ROWS * 16)
+        block = centers[rng.integers(0, clusters, end - start)]
+        block = block + rng.standard_normal((end - start, dim)).astype(np.float32) * noise
+        out[start:end] = normalize(block)
+    return out
+
+
+def _exact_top_k(vectors: np.ndarray, query: np.ndarray, k: int) -> np.ndarray:
+    scores = vectors @ query
+    part = np.argpartition(scores, -k)[-k:]
+    return part[np.argsort(scores[part])[::-1]]
+
+
+def benchmark(
+    *,
+    rows: int,
+    dim: int,
+    queries: int,
+    k: int,
+    nprobes: Iterable[int],
+    clusters: int,
+    seed: int,
+) -> None:
+    rng = np.random.default_rng(seed)
+    started = time.perf_counter()
+    centers = normalize(rng.standard_normal((clusters, dim)).astype(np.float32))
+    vectors = synthetic_corpus(rows, centers, rng)
+    ids = np.arange(rows, dtype=np.int64)
+    query_vectors = synthetic_corpus(queries, centers, rng)
+    print(f"corpus: {rows} x {dim} float32 ({vectors.nbytes / 2**20:.0f} MiB), generated in {time.perf_counter() - started:.1f}s")
+
+    nlist = suggest_nlist(rows)
+    started = time.perf_counter()
+    sample = vectors[rng.choice(rows, train_sample_size(rows, nlist), replace=False)]
+    index = IVFFlatIndex(train_centroids(sample, nlist, seed=seed))
+    trained = time.perf_counter() - started
+    index.load_labels(nearest_centroids(vectors, index.centroids))
+    print(f"ivf: nlist={nlist}, train {trained:.1f}s, assign {time.perf_counter() - started - trained:.1f}s")
+
+    exact_ms: list[float] = []
+    truth: list[set[int]] = []
+    for q in query_vectors:
+        t0 = time.perf_counter()
+        truth.append(set(_exact_top_k(vectors, q, k).tolist()))
+        exact_ms.append((time.perf_counter() - t0) * 1000)
+    print(f"exact: p50 {np.percentile(exact_ms, 50):.2f}ms  p95 {np.percentile(exact_ms, 95):.2f}ms")
+
+    for nprobe in nprobes:
+        latencies: list[float] = []
+        hits = 0
+        for q, expected in zip(query_vectors, truth):
+            t0 = time.perf_counter()
+            found = index.search(vectors, ids, q, k, nprobe)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            hits += len(expected.intersection(cid for cid, _ in found))
+        print(
+            f"nprobe={nprobe:<4d} recall@{k} {hits / (k * len(truth)):.3f}  "
+            f"p50 {np.percentile(latencies, 50):.2f}ms  p95 {np.percentile(latencies, 95):.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="IVF-Flat 与精确检索的召回率/延迟对比")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[4, 8, 16, 32, 64])
+    parser.add_argument("--clusters", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    benchmark(
+        rows=args.rows,
+        dim=args.dim,
+        queries=args.queries,
+        k=args.k,
+        nprobes=args.nprobe,
+        clusters=args.clusters,
+        seed=args.seed,
+    )
@@ -49,6 +49,55 @@ def transform_media_url(url: Optional[str], base_url: str) -> Optional[str]:
     return url
 
 
+def build_list_item(row) -> Dict[str, Any]:
+    """内容列表项（与 ContentListItem 字段一致），row 为 LIST_ITEM_COLUMNS 的查询行"""
+    return {
+        "id": row.id,
+        "platform": row.platform,
+        "url": row.url,
+        "status": row.status,
+        "title": row.title,
+        "cover_url": row.cover_url,
+        "thumbnail_url": None,
+        "author_name": row.author_name,
+        "tags": row.tags or [],
+        "is_nsfw": row.is_nsfw or False,
+        "layout_type": row.layout_type,
+        "created_at": row.created_at,
+        "published_at": row.published_at,
+    }
+
+
+def build_share_card(row, base_url: str) -> Dict[str, Any]:
+    """分享卡片（与 ShareCard 字段一致），row 为 CARD_COLUMNS 的查询行"""
+    from app.adapters.utils import ensure_title
+
+    cover_url = transform_media_url(row.cover_url, base_url)
+    thumbnail_url = f"{cover_url}?size=thumb" if cover_url and "/api/v1/media/" in cover_url else None
+    return {
+        "id": row.id,
+        "platform": row.platform,
+        "url": row.url,
+        "clean_url": row.clean_url,
+        "content_type": row.content_type,
+        "effective_layout_type": compute_effective_layout_type(row),
+        "title": ensure_title(row.title, None),
+        "author_name": row.author_name,
+        "author_id": row.author_id,
+        "author_avatar_url": transform_media_url(compute_author_avatar_url(row), base_url),
+        "cover_url": cover_url,
+        "thumbnail_url": thumbnail_url,
+        "cover_color": row.cover_color,
+        "tags": row.tags or [],
+        "is_nsfw": row.is_nsfw or False,
+        "published_at": row.published_at,
+        "created_at": row.created_at,
+        "review_status": row.review_status,
+        "view_count": row.view_count or 0,
+        "like_count": row.like_count or 0,
+    }
+
+
 def transform_content_detail(content, base_url: str):
     """转换内容详情中的所有媒体链接，并填充计算字段（Pydantic ContentDetail 对象）"""
     # 计算字段：覆盖 > 系统检测
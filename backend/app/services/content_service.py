@@ -4,6 +4,7 @@ from typing import List, Optional
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func
 from sqlalchemy.exc import IntegrityError
+from app.core.content_blobs import blob_content_ids, blob_value
 from app.models import Content, ContentStatus, ContentSource, PushedRecord, Platform, ReviewStatus
 from app.adapters import AdapterFactory
 from app.utils.url_utils import (
@@ -11,6 +12,7 @@ from app.utils.url_utils import (
     is_url_like_input,
     normalize_share_url_input,
 )
+from app.utils.blob_codec import BLOB_FIELDS
 from app.utils.tags import normalize_tags
 from app.core.queue import task_queue
 from app.core.logging import logger
@@ -256,10 +258,10 @@ class ContentService:
                 Content.cover_url == local_url,
                 Content.author_avatar_url == local_url,
                 Content.media_urls.like(f'%{local_url}%'),
-                Content.body.like(f'%{local_url}%'),
                 Content.context_data.like(f'%{local_url}%'),
-                Content.rich_payload.like(f'%{local_url}%'),
-                Content.archive_metadata.like(f'%{local_url}%'),
+                Content.id.in_(
+                    blob_content_ids(*(blob_value(name).like(f'%{local_url}%') for name in BLOB_FIELDS))
+                ),
             )
         )
         ref_count = (await self.db.execute(ref_stmt)).scalar() or 0
@@ -1,21 +1,24 @@
 """
 仪表盘统计服务 - 提供解析状态和分发状态的共享统计逻辑
+
+统计读取 dashboard_counters 中由触发器增量维护的预汇总计数（见 app.core.dashboard_counters），
+不再对 contents / content_queue_items 做全表分组。
 """
 from datetime import datetime
 from typing import Optional
 
-from sqlalchemy import func, or_, select
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models import Content, ContentStatus, ContentQueueItem, QueueItemStatus, DiscoveryState
-
+from app.core.dashboard_counters import METRIC_DISTRIBUTION, METRIC_PARSE, METRIC_PLATFORM
+from app.models import ContentStatus, DashboardCounter, QueueItemStatus
 
-def _is_library_content():
-    """已加入库的内容：普通订阅内容（discovery_state IS NULL）+ 已收录的 discovery 内容"""
-    return or_(
-        Content.discovery_state.is_(None),
-        Content.discovery_state == DiscoveryState.PROMOTED,
-    )
+_PARSE_STATUS_KEYS = {
+    ContentStatus.UNPROCESSED.value,
+    ContentStatus.PROCESSING.value,
+    ContentStatus.PARSE_SUCCESS.value,
+    ContentStatus.PARSE_FAILED.value,
+}
 
 
 def classify_distribution_status(
@@ -36,77 +39,48 @@ def empty_distribution_bucket() -> dict[str, int]:
     return {"will_push": 0, "filtered": 0, "pushed": 0, "total": 0}
 
 
-async def build_parse_stats(db: AsyncSession) -> dict:
-    """构建解析阶段统计（订阅库内容 + 已收录的 discovery 内容）"""
-    stats = {"unprocessed": 0, "processing": 0, "parse_success": 0, "parse_failed": 0, "total": 0}
+async def _counter_rows(db: AsyncSession, metric: str) -> list[tuple[str, str, int]]:
     result = await db.execute(
-        select(Content.status, func.count(Content.id))
-        .where(_is_library_content())
-        .group_by(Content.status)
+        select(DashboardCounter.dim, DashboardCounter.bucket, DashboardCounter.count).where(
+            DashboardCounter.metric == metric,
+            DashboardCounter.count > 0,
+        )
     )
-    for status, count in result.all():
-        count_int = int(count or 0)
-        stats["total"] += count_int
-        if status == ContentStatus.UNPROCESSED:
-            stats["unprocessed"] += count_int
-        elif status == ContentStatus.PROCESSING:
-            stats["processing"] += count_int
-        elif status == ContentStatus.PARSE_SUCCESS:
-            stats["parse_success"] += count_int
-        elif status == ContentStatus.PARSE_FAILED:
-            stats["parse_failed"] += count_int
+    return [(dim, bucket, int(count or 0)) for dim, bucket, count in result.all()]
+
+
+async def build_parse_stats(db: AsyncSession) -> dict:
+    """构建解析阶段统计（订阅库内容 + 已收录的 discovery 内容），读取预汇总计数"""
+    stats = {"unprocessed": 0, "processing": 0, "parse_success": 0, "parse_failed": 0, "total": 0}
+    for _, status, count in await _counter_rows(db, METRIC_PARSE):
+        stats["total"] += count
+        if status in _PARSE_STATUS_KEYS:
+            stats[status] += count
     return stats
 
 
+async def build_platform_counts(db: AsyncSession) -> dict[str, int]:
+    """订阅库内容按平台计数，读取预汇总计数"""
+    return {platform: count for _, platform, count in await _counter_rows(db, METRIC_PLATFORM)}
+
+
 async def build_distribution_stats(
     db: AsyncSession, *, include_rule_breakdown: bool = False
 ) -> tuple[dict, dict[str, dict]]:
-    """构建分发阶段统计，可选按规则拆分"""
+    """构建分发阶段统计，可选按规则拆分；读取预汇总计数（dim 为规则 ID）"""
     distribution_stats = empty_distribution_bucket()
     rule_breakdown: dict[str, dict] = {}
 
-    cols = [
-        ContentQueueItem.status,
-        ContentQueueItem.next_attempt_at,
-        func.count(ContentQueueItem.id),
-    ]
-    group_cols = [
-        ContentQueueItem.status,
-        ContentQueueItem.next_attempt_at,
-    ]
-    if include_rule_breakdown:
-        cols.insert(0, ContentQueueItem.rule_id)
-        group_cols.insert(0, ContentQueueItem.rule_id)
-
-    query = (
-        select(*cols)
-        .join(Content, Content.id == ContentQueueItem.content_id)
-        .where(
-            Content.status == ContentStatus.PARSE_SUCCESS,
-            _is_library_content(),
-        )
-        .group_by(*group_cols)
-    )
-    rows = (await db.execute(query)).all()
-
-    for row in rows:
-        if include_rule_breakdown:
-            rule_id, status, next_attempt_at, count = row
-        else:
-            status, next_attempt_at, count = row
-            rule_id = None
-
-        count_int = int(count or 0)
-        bucket = classify_distribution_status(status, next_attempt_at)
-
-        distribution_stats[bucket] += count_int
-        distribution_stats["total"] += count_int
-
-        if include_rule_breakdown and rule_id is not None:
-            key = str(rule_id)
-            if key not in rule_breakdown:
-                rule_breakdown[key] = empty_distribution_bucket()
-            rule_breakdown[key][bucket] += count_int
-            rule_breakdown[key]["total"] += count_int
+    for rule_key, bucket, count in await _counter_rows(db, METRIC_DISTRIBUTION):
+        if bucket not in distribution_stats:
+            continue
+        distribution_stats[bucket] += count
+        distribution_stats["total"] += count
+
+        if include_rule_breakdown and rule_key:
+            if rule_key not in rule_breakdown:
+                rule_breakdown[rule_key] = empty_distribution_bucket()
+            rule_breakdown[rule_key][bucket] += count
+            rule_breakdown[rule_key]["total"] += count
 
     return distribution_stats, rule_breakdown
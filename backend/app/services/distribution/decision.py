@@ -6,7 +6,8 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple, Union
 
 from app.models import BotChat, Content, DistributionRule, ReviewStatus
 from app.utils.tags import normalize_tags
@@ -27,6 +28,21 @@ class DistributionDecision:
     nsfw_routing_result: Optional[Dict[str, Any]] = None
 
 
+@lru_cache(maxsize=4096)
+def _normalized_tag_tuple(tags: Union[str, Tuple[Any, ...]]) -> Tuple[str, ...]:
+    return tuple(normalize_tags(tags if isinstance(tags, str) else list(tags), lower=True))
+
+
+def _normalized_tags(tags: Any) -> Tuple[str, ...]:
+    """规范化标签（小写去重）；同一内容与规则的标签在多条规则间反复判定，按标签元组缓存"""
+    if not tags:
+        return ()
+    try:
+        return _normalized_tag_tuple(tags if isinstance(tags, str) else tuple(tags))
+    except TypeError:  # 含不可哈希元素的异常数据
+        return tuple(normalize_tags(tags, lower=True))
+
+
 def check_match_conditions(content: Content, conditions: Dict[str, Any]) -> DistributionDecision:
     conditions = conditions or {}
 
@@ -38,9 +54,9 @@ def check_match_conditions(content: Content, conditions: Dict[str, Any]) -> Dist
             reason=f"平台不匹配: 需要 {platform}, 实际 {content.platform.value}",
         )
 
-    content_tags = normalize_tags(content.tags or [], lower=True)
+    content_tags = frozenset(_normalized_tags(content.tags))
 
-    exclude_tags = normalize_tags(conditions.get("tags_exclude", []), lower=True)
+    exclude_tags = list(_normalized_tags(conditions.get("tags_exclude")))
     if exclude_tags:
         hit_exclude = [tag for tag in exclude_tags if tag in content_tags]
         if hit_exclude:
@@ -50,7 +66,7 @@ def check_match_conditions(content: Content, conditions: Dict[str, Any]) -> Dist
                 reason=f"包含排除标签: {hit_exclude}",
             )
 
-    required_tags = normalize_tags(conditions.get("tags", []), lower=True)
+    required_tags = list(_normalized_tags(conditions.get("tags")))
     if required_tags:
         tags_match_mode = str(conditions.get("tags_match_mode", "any")).strip().lower() or "any"
         if tags_match_mode == "all":
@@ -0,0 +1,280 @@
+"""
+语义索引批处理
+
+- EmbeddingIndexQueue：解析完成的内容先进入队列，攒满一批（或等待片刻）后批量生成向量，
+  远程 embedding 一次请求多条文本；同时执行的批次数有上限，避免挤占 SQLite 写锁与 API 配额
+- EmbeddingReindexJob：全库重建（切换模型后使用）。按主键分批推进，每批完成后把进度写入系统设置，
+  进程重启或手动暂停后从断点继续；文本与模型签名都未变化的内容直接跳过
+"""
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Optional
+
+from sqlalchemy import func, select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging import logger
+from app.core.time_utils import utcnow
+from app.models import Content, ContentEmbedding, ContentStatus
+from app.services.embedding_service import EmbeddingService
+from app.services.related_content import RelatedContentService
+from app.services.settings_service import get_setting_value_fresh, set_setting_value
+
+
+class EmbeddingIndexQueue:
+    """进程内语义索引队列（按批合并，批次并发受限）"""
+
+    def __init__(
+        self,
+        *,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        linger_seconds: Optional[float] = None,
+    ):
+        self.batch_size = max(1, batch_size or settings.embedding_batch_size)
+        self.concurrency = max(1, concurrency or settings.embedding_batch_concurrency)
+        self.linger_seconds = settings.embedding_batch_linger_seconds if linger_seconds is None else linger_seconds
+        # dict 作为有序集合：同一内容在落盘前重复入队只处理一次
+        self._pending: dict[int, None] = {}
+        self._wakeup: Optional[asyncio.Event] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._inflight: set[asyncio.Task] = set()
+
+    @property
+    def pending(self) -> int:
+        return len(self._pending)
+
+    def enqueue(self, content_id: int) -> None:
+        self._pending[int(content_id)] = None
+        if self._wakeup is None:
+            self._wakeup = asyncio.Event()
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        if len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+        if self._runner is None or self._runner.done():
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while self._pending:
+            if len(self._pending) < self.batch_size and self.linger_seconds > 0:
+                # 等待攒批：满批立即唤醒，否则最多等 linger_seconds
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.linger_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = list(self._pending)[: self.batch_size]
+            for content_id in batch:
+                self._pending.pop(content_id, None)
+
+            await self._semaphore.acquire()
+            task = asyncio.create_task(self._index_batch(batch))
+            self._inflight.add(task)
+            task.add_done_callback(self._on_batch_done)
+
+    def _on_batch_done(self, task: asyncio.Task) -> None:
+        self._inflight.discard(task)
+        self._semaphore.release()
+
+    async def _index_batch(self, content_ids: list[int]) -> None:
+        try:
+            indexed = await EmbeddingService().index_contents(content_ids)
+            logger.debug("语义索引批次完成: size={}, indexed={}", len(content_ids), len(indexed))
+        except Exception as e:
+            logger.warning("语义索引批次失败(已忽略): content_ids={}, error={}", content_ids, e)
+            return
+        try:
+            # 新向量落库后增量更新相似内容（含把新内容插入已有列表）
+            await RelatedContentService().refresh(indexed, reciprocal=True)
+        except Exception as e:
+            logger.warning("相似内容增量更新失败(已忽略): content_ids={}, error={}", indexed, e)
+
+    async def drain(self) -> None:
+        """等待队列中和执行中的批次全部完成"""
+        while (self._runner is not None and not self._runner.done()) or self._inflight:
+            if self._wakeup is not None:
+                self._wakeup.set()
+            await asyncio.gather(
+                *([self._runner] if self._runner and not self._runner.done() else []),
+                *list(self._inflight),
+                return_exceptions=True,
+            )
+
+
+class EmbeddingReindexJob:
+    """可断点续跑的全库语义索引重建"""
+
+    STATE_KEY = "embedding_reindex_state"
+
+    def __init__(self, *, batch_size: Optional[int] = None, concurrency: Optional[int] = None):
+        self.batch_size = max(1, batch_size or settings.embedding_batch_size)
+        self.concurrency = max(1, concurrency or settings.embedding_batch_concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._pausing = False
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def status(self) -> dict[str, Any]:
+        state = await self._load_state() or {"status": "idle"}
+        return {**state, "running": self.is_running()}
+
+    async def start(self, *, restart: bool = False) -> dict[str, Any]:
+        """开始或继续重建；模型签名变化、已完成或 restart=True 时从头开始"""
+        if self.is_running():
+            return await self.status()
+
+        signature = await EmbeddingService()._get_document_embedding_signature()
+        state = await self._load_state()
+        if restart or not state or state.get("model") != signature or state.get("status") == "completed":
+            state = {
+                "model": signature,
+                "last_content_id": 0,
+                "total": await self._count_contents(),
+                "processed": 0,
+                "indexed": 0,
+                "started_at": utcnow().isoformat(),
+                "finished_at": None,
+                "error": None,
+            }
+            logger.info("开始全库语义索引重建: model={}, total={}", signature, state["total"])
+        else:
+            logger.info(
+                "继续全库语义索引重建: model={}, progress={}/{}",
+                signature,
+                state.get("processed", 0),
+                state.get("total", 0),
+            )
+        state["status"] = "running"
+        await self._save_state(state)
+        self._task = asyncio.create_task(self._run(state))
+        return {**state, "running": True}
+
+    async def stop(self, *, pause: bool = True) -> dict[str, Any]:
+        """停止重建，进度保留
+
+        pause=False 用于进程退出：状态仍记为 running，下次启动自动继续。
+        """
+        if self.is_running():
+            self._pausing = pause
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return await self.status()
+
+    async def resume_if_interrupted(self) -> None:
+        """启动时继续上次未完成（进程退出时仍为 running）的重建；
+        库中存在其他签名的向量（模型或本地哈希版本已变化）且未手动暂停时自动开始
+        """
+        state = await self._load_state()
+        if state and state.get("status") == "running":
+            await self.start()
+            return
+        signature = await EmbeddingService()._get_document_embedding_signature()
+        if state and state.get("model") == signature and state.get("status") == "paused":
+            return
+        if await self._has_stale_embeddings(signature):
+            logger.info("检测到旧签名的语义向量，自动开始全库重建: model={}", signature)
+            await self.start()
+
+    async def _run(self, state: dict[str, Any]) -> None:
+        service = EmbeddingService()
+        window = self.batch_size * self.concurrency
+        try:
+            while True:
+                async with AsyncSessionLocal() as session:
+                    content_ids = list(
+                        (
+                            await session.execute(
+                                select(Content.id)
+                                .where(
+                                    Content.status == ContentStatus.PARSE_SUCCESS,
+                                    Content.id > state["last_content_id"],
+                                )
+                                .order_by(Content.id)
+                                .limit(window)
+                            )
+                        ).scalars().all()
+                    )
+                if not content_ids:
+                    break
+
+                batches = [content_ids[i:i + self.batch_size] for i in range(0, len(content_ids), self.batch_size)]
+                results = await asyncio.gather(*(service.index_contents(batch) for batch in batches))
+
+                state["last_content_id"] = content_ids[-1]
+                state["processed"] += len(content_ids)
+                state["indexed"] += sum(len(indexed) for indexed in results)
+                state["updated_at"] = utcnow().isoformat()
+                await self._save_state(state)
+
+            state["status"] = "completed"
+            state["finished_at"] = utcnow().isoformat()
+            await self._save_state(state)
+            logger.info(
+                "全库语义索引重建完成: processed={}, indexed={}",
+                state["processed"],
+                state["indexed"],
+            )
+        except asyncio.CancelledError:
+            if self._pausing:
+                state["status"] = "paused"
+                await self._save_state(state)
+            self._pausing = False
+            logger.info("全库语义索引重建已停止: progress={}/{}", state["processed"], state["total"])
+            raise
+        except Exception as e:
+            state["status"] = "failed"
+            state["error"] = str(e)
+            await self._save_state(state)
+            logger.error(f"全库语义索引重建失败: {e}")
+
+    async def _has_stale_embeddings(self, signature: str) -> bool:
+        async with AsyncSessionLocal() as session:
+            stale = (
+                await session.execute(
+                    select(ContentEmbedding.id).where(ContentEmbedding.embedding_model != signature).limit(1)
+                )
+            ).first()
+        return stale is not None
+
+    async def _count_contents(self) -> int:
+        async with AsyncSessionLocal() as session:
+            return int(
+                (
+                    await session.execute(
+                        select(func.count(Content.id)).where(Content.status == ContentStatus.PARSE_SUCCESS)
+                    )
+                ).scalar_one()
+            )
+
+    async def _load_state(self) -> Optional[dict[str, Any]]:
+        state = await get_setting_value_fresh(self.STATE_KEY)
+        return dict(state) if isinstance(state, dict) else None
+
+    async def _save_state(self, state: dict[str, Any]) -> None:
+        await set_setting_value(self.STATE_KEY, dict(state), category="search", description="全库语义索引重建进度")
+
+
+_index_queue: Optional[EmbeddingIndexQueue] = None
+_reindex_job: Optional[EmbeddingReindexJob] = None
+
+
+def get_embedding_queue() -> EmbeddingIndexQueue:
+    global _index_queue
+    if _index_queue is None:
+        _index_queue = EmbeddingIndexQueue()
+    return _index_queue
+
+
+def get_reindex_job() -> EmbeddingReindexJob:
+    global _reindex_job
+    if _reindex_job is None:
+        _reindex_job = EmbeddingReindexJob()
+    return _reindex_job
@@ -2,16 +2,21 @@ from __future__ import annotations
 
 import asyncio
 import hashlib
-import math
 import re
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
 from typing import Optional
 
-from sqlalchemy import and_, or_, select, text
+import numpy as np
+from sqlalchemy import and_, event, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.database import AsyncSessionLocal
+from app.core.content_blobs import blob_content_ids, blob_value
+from app.core.data_versions import read_versions
+from app.core.fts import build_match_query, contents_fts, fts_match, fts_rank, fts_ready
 from app.core.logging import logger
 from app.models import (
     Content,
@@ -20,7 +25,34 @@ from app.models import (
     DiscoveryState,
     Platform,
 )
+from app.services.search_cache import get_query_embedding_cache, get_ranked_ids_cache, normalize_query
 from app.services.settings_service import get_setting_value
+from app.services.vector_cache import RowFilter, get_vector_cache, pack_vector
+
+
+_LOCAL_EMBEDDING_DIM = 256
+_LOCAL_HASH_VERSION = 2
+_LOCAL_HASH_MAX_POSITION = 64
+# 多线性哈希的位置权重（奇数）；由固定种子的 SHAKE-256 派生，不依赖 numpy 随机数实现
+_LOCAL_HASH_WEIGHTS = np.frombuffer(
+    hashlib.shake_256(b"vaultstream-local-embedding-v2").digest(_LOCAL_HASH_MAX_POSITION * 8), dtype="<u8"
+) | np.uint64(1)
+_LOCAL_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+_LOCAL_HASH_WEIGHTS_PY = [int(w) for w in _LOCAL_HASH_WEIGHTS]
+_UINT64_MASK = (1 << 64) - 1
+# 总字符数低于该值（典型为检索词）时逐 token 计算，避免 numpy 的固定调用开销
+_LOCAL_VECTORIZE_MIN_CHARS = 512
+_LOCAL_TOKEN_PATTERN = re.compile(r"[\w\u4e00-\u9fff]+")
+
+
+@lru_cache(maxsize=1)
+def _word_char_table() -> np.ndarray:
+    """码位 -> 是否为词字符（与正则 [\\w\\u4e00-\\u9fff] 一致），首次使用时构建"""
+    return np.fromiter(
+        (chr(cp).isalnum() or cp == 0x5F for cp in range(0x110000)),
+        dtype=bool,
+        count=0x110000,
+    )
 
 
 @dataclass
@@ -40,7 +72,9 @@ class EmbeddingService:
     """
 
     _RRF_K = 60
-    _LOCAL_DIM = 256
+    _FILTER_CHUNK_SIZE = 500
+    _REMOTE_BATCH_SIZE = 100
+    _LOCAL_DIM = _LOCAL_EMBEDDING_DIM
     _MAX_BODY_CHARS = 4000
     _DEFAULT_MODEL = "gemini-embedding-2-preview"
     _DEFAULT_OUTPUT_DIMENSIONALITY = 1536
@@ -52,14 +86,37 @@ class EmbeddingService:
         return await self._embed_text(text_payload, task_type=self._DOCUMENT_TASK_TYPE)
 
     async def embed_query(self, query: str) -> list[float]:
-        return await self._embed_text(query, task_type=self._QUERY_TASK_TYPE)
+        normalized = normalize_query(query)
+        cache = get_query_embedding_cache()
+        key = (await self._get_document_embedding_signature(), normalized)
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+
+        vector = await self._embed_text(normalized, task_type=self._QUERY_TASK_TYPE)
+        # 远程调用失败时返回的是本地降级向量，维度不符，不缓存
+        expected_dim = await self._get_embedding_output_dimensionality() if await self._get_embedding_api_key() else self._LOCAL_DIM
+        if len(vector) == expected_dim:
+            cache.put(key, vector)
+        return vector
 
     async def index_content(self, content_id: int, *, session: Optional[AsyncSession] = None) -> bool:
+        return bool(await self.index_contents([content_id], session=session))
+
+    async def index_contents(
+        self,
+        content_ids: list[int],
+        *,
+        session: Optional[AsyncSession] = None,
+    ) -> list[int]:
+        """批量建立语义索引，返回实际写入的 content_id（文本与模型均未变化的跳过）"""
+        if not content_ids:
+            return []
         if session is not None:
-            return await self._index_content_impl(content_id, session, own_session=False)
+            return await self._index_contents_impl(content_ids, session, own_session=False)
 
         async with AsyncSessionLocal() as local_session:
-            return await self._index_content_impl(content_id, local_session, own_session=True)
+            return await self._index_contents_impl(content_ids, local_session, own_session=True)
 
     async def search(
         self,
@@ -94,55 +151,84 @@ class EmbeddingService:
                 session=local_session,
             )
 
-    async def _index_content_impl(
+    async def _index_contents_impl(
         self,
-        content_id: int,
+        content_ids: list[int],
         session: AsyncSession,
         *,
         own_session: bool,
-    ) -> bool:
-        content = (
+    ) -> list[int]:
+        contents = (
             await session.execute(
                 select(Content).where(
-                    Content.id == content_id,
+                    Content.id.in_(content_ids),
                     Content.status == ContentStatus.PARSE_SUCCESS,
                 )
             )
-        ).scalar_one_or_none()
-        if content is None:
-            return False
-
-        payload = self._build_content_text(content)
-        if not payload:
-            return False
+        ).scalars().all()
+        if not contents:
+            return []
 
-        text_hash = self._hash_text(payload)
         model_signature = await self._get_document_embedding_signature()
-        existing = (
-            await session.execute(
-                select(ContentEmbedding).where(ContentEmbedding.content_id == content_id)
-            )
-        ).scalar_one_or_none()
-
-        if existing and existing.text_hash == text_hash and existing.embedding_model == model_signature:
-            return False
+        existing = {
+            record.content_id: record
+            for record in (
+                await session.execute(
+                    select(ContentEmbedding).where(ContentEmbedding.content_id.in_([c.id for c in contents]))
+                )
+            ).scalars().all()
+        }
 
-        vector = await self._embed_text(payload, task_type=self._DOCUMENT_TASK_TYPE)
-        record = existing or ContentEmbedding(content_id=content_id)
-        record.embedding_model = model_signature
-        record.embedding = vector
-        record.text_hash = text_hash
-        record.source_text = payload[:4000]
-        record.indexed_at = datetime.utcnow()
+        pending: list[tuple[int, str, str]] = []
+        for content in contents:
+            payload = self._build_content_text(content)
+            if not payload:
+                continue
+            text_hash = self._hash_text(payload)
+            record = existing.get(content.id)
+            if record and record.text_hash == text_hash and record.embedding_model == model_signature:
+                continue
+            pending.append((content.id, payload, text_hash))
+        if not pending:
+            return []
 
-        if existing is None:
-            session.add(record)
+        vectors = await self._embed_texts([payload for _, payload, _ in pending], task_type=self._DOCUMENT_TASK_TYPE)
+        indexed_at = datetime.utcnow()
+        for (content_id, payload, text_hash), vector in zip(pending, vectors):
+            record = existing.get(content_id)
+            if record is None:
+                record = ContentEmbedding(content_id=content_id)
+                session.add(record)
+            record.embedding_model = model_signature
+            record.embedding_blob = pack_vector(vector)
+            record.embedding_dim = len(vector)
+            record.embedding = None
+            record.text_hash = text_hash
+            record.source_text = payload[:4000]
+            record.indexed_at = indexed_at
+
+        # 事务提交后再更新进程内向量矩阵，回滚时不污染缓存
+        content_map = {content.id: content for content in contents}
+
+        def _update_matrix(_session=None) -> None:
+            cache = get_vector_cache()
+            for (content_id, _, _), vector in zip(pending, vectors):
+                content = content_map[content_id]
+                cache.upsert(
+                    model_signature,
+                    content_id,
+                    vector,
+                    platform=content.platform,
+                    created_at=content.created_at,
+                )
 
         if own_session:
             await session.commit()
+            _update_matrix()
         else:
             await session.flush()
-        return True
+            event.listen(session.sync_session, "after_commit", _update_matrix, once=True)
+        return [content_id for content_id, _, _ in pending]
 
     async def _search_impl(
         self,
@@ -157,23 +243,40 @@ class EmbeddingService:
         filters = self._build_content_filters(platform=platform, date_from=date_from, date_to=date_to)
         candidate_limit = max(50, top_k * 6)
 
-        query_vec = await self.embed_query(query)
-        vector_ranked = await self._vector_rank_ids(
-            session=session,
-            query_vec=query_vec,
-            filters=filters,
-            limit=candidate_limit,
+        # 召回结果按数据版本缓存：重复检索与翻页跳过向量计算和排序
+        signature = await self._get_document_embedding_signature()
+        cache_key = (
+            signature,
+            normalize_query(query),
+            platform,
+            date_from,
+            date_to,
+            candidate_limit,
+            await self._search_data_version(session, signature),
         )
+        ranked_cache = get_ranked_ids_cache()
+        cached = ranked_cache.get(cache_key)
+        if cached is None:
+            query_vec = await self.embed_query(query)
+            vector_ranked = await self._vector_rank_ids(
+                session=session,
+                query_vec=query_vec,
+                filters=filters,
+                limit=candidate_limit,
+                where=RowFilter(platform=platform, date_from=date_from, date_to=date_to),
+            )
+            fts_ids = await self._fts_rank_ids(
+                session=session,
+                query=query,
+                filters=filters,
+                limit=candidate_limit,
+            )
+            cached = (vector_ranked, fts_ids)
+            ranked_cache.put(cache_key, cached)
+        vector_ranked, fts_ids = cached
         vector_ids = [cid for cid, _ in vector_ranked]
         vector_score_map = {cid: score for cid, score in vector_ranked}
 
-        fts_ids = await self._fts_rank_ids(
-            session=session,
-            query=query,
-            filters=filters,
-            limit=candidate_limit,
-        )
-
         merged = self._rrf_merge(vector_ids=vector_ids, fts_ids=fts_ids, top_k=top_k)
         if not merged:
             return []
@@ -204,6 +307,19 @@ class EmbeddingService:
             results.append(SemanticSearchHit(content=content, score=score, match_source=source))
         return results
 
+    async def _search_data_version(self, session: AsyncSession, signature: str) -> tuple:
+        """内容数据版本（触发器维护，含正文副表改写与删除）+ 当前模型向量的更新水位"""
+        embedded_at = (
+            await session.execute(
+                select(func.max(ContentEmbedding.updated_at)).where(ContentEmbedding.embedding_model == signature)
+            )
+        ).scalar()
+        versions = await read_versions(session, ("contents", "content_blobs"))
+        if versions is None:
+            # 非 SQLite 没有版本触发器：退回内容更新水位，正文改写与删除由 TTL 兜底
+            versions = ((await session.execute(select(func.max(Content.updated_at)))).scalar(),)
+        return (*versions, embedded_at)
+
     async def _vector_rank_ids(
         self,
         *,
@@ -211,44 +327,41 @@ class EmbeddingService:
         query_vec: list[float],
         filters: list,
         limit: int,
+        where: Optional[RowFilter] = None,
     ) -> list[tuple[int, float]]:
+        """where 中的平台/时间条件下推到矩阵，只在命中子集内打分；filters 在候选上用 SQL 复核"""
         # 补充模型维度隔离墙：防止模型更替后新老向量维度不一致导致的错误截断或计算垃圾分数
         current_model = await self._get_document_embedding_signature()
-        model_filters = list(filters)
-        model_filters.append(ContentEmbedding.embedding_model == current_model)
-        
-        rows = (
-            await session.execute(
-                select(ContentEmbedding.content_id, ContentEmbedding.embedding)
-                .join(Content, Content.id == ContentEmbedding.content_id)
-                .where(and_(*model_filters))
-            )
-        ).all()
-
-        if not rows:
-            return []
-
-        import numpy as np
-        
-        q = np.array(query_vec, dtype=np.float32)
-        doc_ids = np.array([row.content_id for row in rows])
-        
-        # 安全转换：提取出纯净的、同维度的向量数组
-        vec_list = [self._coerce_vector(row.embedding) for row in rows]
-        valid_indices = [i for i, vec in enumerate(vec_list) if len(vec) == len(q) and len(vec) > 0]
-        
-        if not valid_indices:
-            return []
-            
-        filtered_ids = doc_ids[valid_indices]
-        filtered_vecs = np.array([vec_list[i] for i in valid_indices], dtype=np.float32)
-
-
-        scores = np.dot(filtered_vecs, q)
-
-        top_indices = np.argsort(scores)[::-1][:limit]
-        
-        return [(int(filtered_ids[i]), float(scores[i])) for i in top_indices]
+        cache = get_vector_cache()
+        matrix = await cache.get(session, current_model)
+
+        q = np.asarray(query_vec, dtype=np.float32)
+        # 量化矩阵多取若干候选，用 float32 原始向量精排后再截断
+        needed = max(limit, 1) * (max(1, settings.embedding_rerank_factor) if matrix.quantized else 1)
+        # 可变条件（解析状态、发现缓冲区）仍在排序后校验：按需扩大候选窗口直到凑够所需数量
+        window = needed * 4 if where is None or where.empty else needed * 2
+        while True:
+            ranked = matrix.top_k(q, window, where=where)
+            if not ranked:
+                return []
+            allowed = await self._filter_content_ids(session, [cid for cid, _ in ranked], filters)
+            hits = [(cid, score) for cid, score in ranked if cid in allowed]
+            if len(hits) >= needed or len(ranked) < window or window >= matrix.size:
+                break
+            window *= 4
+        if matrix.quantized:
+            hits = await cache.rerank(session, current_model, q, hits[:needed])
+        return hits[:limit]
+
+    async def _filter_content_ids(self, session: AsyncSession, content_ids: list[int], filters: list) -> set[int]:
+        allowed: set[int] = set()
+        for start in range(0, len(content_ids), self._FILTER_CHUNK_SIZE):
+            chunk = content_ids[start:start + self._FILTER_CHUNK_SIZE]
+            rows = (
+                await session.execute(select(Content.id).where(Content.id.in_(chunk), and_(*filters)))
+            ).scalars().all()
+            allowed.update(int(cid) for cid in rows)
+        return allowed
 
     async def _fts_rank_ids(
         self,
@@ -258,31 +371,23 @@ class EmbeddingService:
         filters: list,
         limit: int,
     ) -> list[int]:
-        try:
-            fts_rows = (
-                await session.execute(
-                    text(
-                        "SELECT content_id FROM contents_fts "
-                        "WHERE contents_fts MATCH :q "
-                        "LIMIT :limit"
-                    ),
-                    {"q": query, "limit": int(limit)},
-                )
-            ).all()
-            raw_ids = [int(row[0]) for row in fts_rows]
-            if not raw_ids:
+        if await fts_ready(session):
+            match = build_match_query(query)
+            if match is None:
                 return []
-
-            filtered_ids = (
+            # 过滤条件与 MATCH 同一条语句执行，按 bm25 取前 limit 条
+            ranked_ids = (
                 await session.execute(
-                    select(Content.id).where(Content.id.in_(raw_ids), and_(*filters))
+                    select(Content.id)
+                    .join(contents_fts, contents_fts.c.rowid == Content.id)
+                    .where(fts_match(match), and_(*filters))
+                    .order_by(fts_rank())
+                    .limit(limit)
                 )
             ).scalars().all()
-            filtered_set = set(int(cid) for cid in filtered_ids)
-            return [cid for cid in raw_ids if cid in filtered_set]
-        except Exception:
-            logger.debug("FTS query unavailable, fallback to LIKE ranking")
+            return [int(cid) for cid in ranked_ids]
 
+        logger.debug("FTS index unavailable, fallback to LIKE ranking")
         like_expr = f"%{query}%"
         fallback_ids = (
             await session.execute(
@@ -293,7 +398,7 @@ class EmbeddingService:
                         or_(
                             Content.title.ilike(like_expr),
                             Content.summary.ilike(like_expr),
-                            Content.body.ilike(like_expr),
+                            Content.id.in_(blob_content_ids(blob_value("body").ilike(like_expr))),
                         ),
                     )
                 )
@@ -373,41 +478,54 @@ class EmbeddingService:
         *,
         task_type: str,
     ) -> list[float]:
-        text_value = text_value.strip()
-        if not text_value:
-            return self._build_local_embedding("")
+        return (await self._embed_texts([text_value], task_type=task_type))[0]
 
-        model = await self._get_embedding_model()
+    async def _embed_texts(
+        self,
+        texts: list[str],
+        *,
+        task_type: str,
+    ) -> list[list[float]]:
+        """批量生成向量；远程每次请求最多 _REMOTE_BATCH_SIZE 条，失败或缺失的条目降级为本地向量"""
+        texts = [t.strip() for t in texts]
         api_key = await self._get_embedding_api_key()
-        output_dimensionality = await self._get_embedding_output_dimensionality()
         if not api_key:
-            return self._build_local_embedding(text_value)
+            return self._build_local_embeddings(texts).tolist()
 
-        try:
-            from google import genai
-            from google.genai import types
-
-            # google-genai 的 embed 接口是同步调用，放到线程池里避免阻塞事件循环。
-            def _call_gemini():
-                client = genai.Client(api_key=api_key)
-                return client.models.embed_content(
-                    model=model,
-                    contents=text_value,
-                    config=types.EmbedContentConfig(
-                        task_type=task_type,
-                        output_dimensionality=output_dimensionality,
-                    ),
-                )
+        model = await self._get_embedding_model()
+        output_dimensionality = await self._get_embedding_output_dimensionality()
+        vectors: list[Optional[list[float]]] = [None] * len(texts)
+        remote_indexes = [i for i, t in enumerate(texts) if t]
+
+        for start in range(0, len(remote_indexes), self._REMOTE_BATCH_SIZE):
+            chunk = remote_indexes[start:start + self._REMOTE_BATCH_SIZE]
+            try:
+                from google import genai
+                from google.genai import types
+
+                # google-genai 的 embed 接口是同步调用，放到线程池里避免阻塞事件循环。
+                def _call_gemini(batch: list[str]):
+                    client = genai.Client(api_key=api_key)
+                    return client.models.embed_content(
+                        model=model,
+                        contents=batch,
+                        config=types.EmbedContentConfig(
+                            task_type=task_type,
+                            output_dimensionality=output_dimensionality,
+                        ),
+                    )
 
-            response = await asyncio.to_thread(_call_gemini)
-            vector = response.embeddings[0].values if response.embeddings else None
+                response = await asyncio.to_thread(_call_gemini, [texts[i] for i in chunk])
+                for index, embedding in zip(chunk, response.embeddings or []):
+                    if embedding.values:
+                        vectors[index] = self._normalize_vector(embedding.values)
+            except Exception as e:
+                logger.warning(f"Embedding remote call failed, fallback to local: {e}")
 
-            if not vector:
-                return self._build_local_embedding(text_value)
-            return self._normalize_vector([float(v) for v in vector])
-        except Exception as e:
-            logger.warning(f"Embedding remote call failed, fallback to local: {e}")
-            return self._build_local_embedding(text_value)
+        return [
+            vector if vector is not None else self._build_local_embedding(texts[i])
+            for i, vector in enumerate(vectors)
+        ]
 
     async def _get_embedding_model(self) -> str:
         model = await get_setting_value("embedding_model")
@@ -433,29 +551,83 @@ class EmbeddingService:
         return self._DEFAULT_OUTPUT_DIMENSIONALITY
 
     async def _get_document_embedding_signature(self) -> str:
+        if not await self._get_embedding_api_key():
+            # 未配置远程 embedding 时向量来自本地哈希，签名随算法版本变化，旧版本向量不会混入检索
+            return f"local-hash-v{_LOCAL_HASH_VERSION}|dim={self._LOCAL_DIM}|task={self._DOCUMENT_TASK_TYPE}"
         model = await self._get_embedding_model()
         dimension = await self._get_embedding_output_dimensionality()
         return f"{model}|dim={dimension}|task={self._DOCUMENT_TASK_TYPE}"
 
     def _build_local_embedding(self, text_value: str) -> list[float]:
-        vec = [0.0] * self._LOCAL_DIM
-        tokens = re.findall(r"[\w\u4e00-\u9fff]+", text_value.lower())
-        if not tokens:
-            return vec
-
-        for token in tokens:
-            digest = hashlib.md5(token.encode("utf-8")).hexdigest()
-            hashed = int(digest, 16)
-            idx = hashed % self._LOCAL_DIM
-            sign = -1.0 if ((hashed >> 8) & 1) else 1.0
-            vec[idx] += sign
-        return self._normalize_vector(vec)
-
-    def _normalize_vector(self, vector: list[float]) -> list[float]:
-        norm = math.sqrt(sum(v * v for v in vector))
+        return self._build_local_embeddings([text_value])[0].tolist()
+
+    def _build_local_embeddings(self, texts: list[str]) -> np.ndarray:
+        """本地确定性向量（批量、全向量化）
+
+        整批文本按码位数组处理：查表切分词字符连续段作为 token，
+        每个 token 用按位置加权的多线性哈希（uint64 溢出即取模）求值，
+        再映射为桶位与符号，所有文本一次 bincount 累加后按行归一化。
+        """
+        dim = self._LOCAL_DIM
+        if not texts:
+            return np.zeros((0, dim), dtype=np.float64)
+        lowered = [t.lower() for t in texts]
+        if sum(len(t) for t in lowered) < _LOCAL_VECTORIZE_MIN_CHARS:
+            return self._normalize_rows(np.array([self._local_counts_scalar(t) for t in lowered], dtype=np.float64))
+        # 文本之间用非词字符分隔，保证 token 不跨文本
+        codepoints = np.frombuffer("\x00".join(lowered).encode("utf-32-le", "surrogatepass"), dtype="<u4")
+        text_ends = np.cumsum([len(t) + 1 for t in lowered]) - 1
+
+        is_word = _word_char_table()[codepoints]
+        edges = np.diff(np.concatenate(([False], is_word, [False])).astype(np.int8))
+        starts = np.flatnonzero(edges == 1)
+        lengths = np.flatnonzero(edges == -1) - starts
+
+        counts = np.zeros(len(texts) * 2 * dim, dtype=np.int64)
+        if starts.size:
+            word_index = np.flatnonzero(is_word)
+            first = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+            position = np.arange(word_index.size) - np.repeat(first, lengths)
+            position &= _LOCAL_HASH_MAX_POSITION - 1
+            weighted = codepoints[word_index].astype(np.uint64)
+            weighted *= _LOCAL_HASH_WEIGHTS[position]
+            hashed = np.add.reduceat(weighted, first) * _LOCAL_HASH_MIX
+            bucket = (hashed >> np.uint64(32)) % np.uint64(dim)
+            negative = (hashed >> np.uint64(31)) & np.uint64(1)
+            rows = np.searchsorted(text_ends, starts)
+            slots = rows * 2 * dim + negative.astype(np.int64) * dim + bucket.astype(np.int64)
+            counts = np.bincount(slots, minlength=counts.size)
+
+        counts = counts.reshape(len(texts), 2, dim)
+        return self._normalize_rows((counts[:, 0, :] - counts[:, 1, :]).astype(np.float64))
+
+    def _local_counts_scalar(self, lowered: str) -> list[int]:
+        """单条短文本的逐 token 实现，哈希与向量化路径逐位一致"""
+        dim = self._LOCAL_DIM
+        weights = _LOCAL_HASH_WEIGHTS_PY
+        mix = int(_LOCAL_HASH_MIX)
+        counts = [0] * dim
+        for token in _LOCAL_TOKEN_PATTERN.findall(lowered):
+            hashed = 0
+            for position, char in enumerate(token):
+                hashed += ord(char) * weights[position & (_LOCAL_HASH_MAX_POSITION - 1)]
+            hashed = (hashed * mix) & _UINT64_MASK
+            counts[(hashed >> 32) % dim] += -1 if (hashed >> 31) & 1 else 1
+        return counts
+
+    @staticmethod
+    def _normalize_rows(vectors: np.ndarray) -> np.ndarray:
+        # 分量都是整数，平方和精确，单条与批量结果一致
+        norms = np.sqrt(np.einsum("ij,ij->i", vectors, vectors))[:, None]
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    def _normalize_vector(self, vector) -> list[float]:
+        arr = np.asarray(vector, dtype=np.float64)
+        norm = float(np.linalg.norm(arr))
         if norm == 0:
-            return vector
-        return [v / norm for v in vector]
+            return arr.tolist()
+        return (arr / norm).tolist()
 
     def _coerce_vector(self, value) -> list[float]:
         if not isinstance(value, list):
@@ -0,0 +1,223 @@
+"""
+媒体垃圾回收服务 - 标记清除（mark-and-sweep）清理无人引用的归档媒体文件
+
+流程：
+- 标记：按主键分批流式读取 contents 的媒体相关列，收集所有 local:// 引用与归档元数据中的存储 key，
+  写入存储根目录下 `.staging/` 内的临时 SQLite 标记表（内存占用与内容库规模无关）
+- 清除：遍历内容寻址目录（`*/blobs/*`，含打包存储中的对象），未被标记且早于宽限期的文件视为孤儿；
+  dry-run 只出报告，否则经存储后端删除（同步更新用量台账）
+
+宽限期用于保护"文件已落盘、引用尚未提交"的解析中内容。对象年龄取自存储后端，去重命中（同一 key
+以相同大小再次写入）时各后端都会把年龄重置为当前时间，因此复用旧孤儿文件的内容同样受宽限期保护：
+- 本地独立文件：put_bytes 重写文件，刷新 mtime
+- 打包存储：不重复追加，刷新索引中的 created_at（PackStore.touch）
+- S3：不重复上传，服务端自我复制刷新 LastModified
+"""
+import asyncio
+import os
+import re
+import sqlite3
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator, Optional
+
+from sqlalchemy import select
+
+from app.adapters.storage import LocalStorageBackend, get_storage_backend
+from app.adapters.storage.manager import STAGING_DIR
+from app.core.content_blobs import blob_value
+from app.core.db_adapter import AsyncSessionLocal
+from app.core.logging import logger
+from app.models import Content, ContentBlob
+
+_LOCAL_URL_PATTERN = re.compile(r"local://([a-zA-Z0-9_/.:-]+)")
+# 归档元数据中以裸 key 形式保存的内容寻址路径（stored_key / thumb_key / key）
+_BLOB_KEY_PATTERN = re.compile(r"^[a-zA-Z0-9_/.-]*blobs/sha256/[a-zA-Z0-9_/.-]+$")
+
+_MARK_BATCH_SIZE = 500
+_SWEEP_BATCH_SIZE = 1000
+_REPORT_SAMPLE_LIMIT = 100
+
+
+@dataclass
+class MediaGCReport:
+    dry_run: bool
+    grace_seconds: int
+    contents_scanned: int = 0
+    referenced_keys: int = 0
+    files_scanned: int = 0
+    skipped_recent: int = 0
+    orphan_files: int = 0
+    orphan_bytes: int = 0
+    deleted_files: int = 0
+    deleted_bytes: int = 0
+    duration_seconds: float = 0.0
+    orphan_samples: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict:
+        return {
+            "dry_run": self.dry_run,
+            "grace_seconds": self.grace_seconds,
+            "contents_scanned": self.contents_scanned,
+            "referenced_keys": self.referenced_keys,
+            "files_scanned": self.files_scanned,
+            "skipped_recent": self.skipped_recent,
+            "orphan_files": self.orphan_files,
+            "orphan_bytes": self.orphan_bytes,
+            "deleted_files": self.deleted_files,
+            "deleted_bytes": self.deleted_bytes,
+            "duration_seconds": round(self.duration_seconds, 3),
+            "orphan_samples": self.orphan_samples,
+        }
+
+
+def iter_referenced_keys(value: object) -> Iterator[str]:
+    """递归提取 JSON/文本中的存储 key（local:// 引用与裸的内容寻址 key）。"""
+    if isinstance(value, str):
+        if "local://" in value:
+            for match in _LOCAL_URL_PATTERN.finditer(value):
+                yield match.group(1)
+        elif _BLOB_KEY_PATTERN.match(value):
+            yield value
+        return
+    if isinstance(value, dict):
+        for nested_value in value.values():
+            yield from iter_referenced_keys(nested_value)
+        return
+    if isinstance(value, list):
+        for nested_value in value:
+            yield from iter_referenced_keys(nested_value)
+
+
+class _MarkSet:
+    """磁盘上的标记集合（临时 SQLite），用完即删。"""
+
+    def __init__(self, storage: LocalStorageBackend):
+        self._storage = storage
+        staging_dir = os.path.join(storage.root_dir, STAGING_DIR)
+        os.makedirs(staging_dir, exist_ok=True)
+        self.path = os.path.join(staging_dir, f"gc-{uuid.uuid4().hex}.db")
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=OFF")
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute("CREATE TABLE marks (path TEXT PRIMARY KEY) WITHOUT ROWID")
+
+    def add_many(self, keys: Iterable[str]) -> None:
+        rows = []
+        for key in keys:
+            path = self._storage.relative_key(key)
+            rows.append((path,))
+            # 缩略图跟随原图存活
+            if path.endswith(".webp") and not path.endswith(".thumb.webp"):
+                rows.append((path[: -len(".webp")] + ".thumb.webp",))
+        if rows:
+            self._conn.execute("BEGIN")
+            self._conn.executemany("INSERT OR IGNORE INTO marks (path) VALUES (?)", rows)
+            self._conn.execute("COMMIT")
+
+    def count(self) -> int:
+        return int(self._conn.execute("SELECT COUNT(*) FROM marks").fetchone()[0])
+
+    def filter_unmarked(self, paths: list[str]) -> set[str]:
+        if not paths:
+            return set()
+        placeholders = ",".join("?" * len(paths))
+        marked = {
+            row[0]
+            for row in self._conn.execute(f"SELECT path FROM marks WHERE path IN ({placeholders})", paths)
+        }
+        return set(paths) - marked
+
+    def close(self) -> None:
+        self._conn.close()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+
+class MediaGarbageCollector:
+    """归档媒体孤儿文件回收器"""
+
+    def __init__(self, storage: Optional[LocalStorageBackend] = None):
+        self.storage = storage or get_storage_backend()
+
+    async def run(self, *, grace_seconds: int, dry_run: bool = True) -> MediaGCReport:
+        started = time.monotonic()
+        report = MediaGCReport(dry_run=dry_run, grace_seconds=grace_seconds)
+        marks = await asyncio.to_thread(_MarkSet, self.storage)
+        try:
+            await self._mark(marks, report)
+            report.referenced_keys = await asyncio.to_thread(marks.count)
+            await self._sweep(marks, report, grace_seconds=grace_seconds, dry_run=dry_run)
+        finally:
+            await asyncio.to_thread(marks.close)
+
+        report.duration_seconds = time.monotonic() - started
+        logger.info(
+            "媒体 GC 完成: dry_run={}, referenced={}, scanned={}, orphans={} ({} bytes), deleted={} ({} bytes)",
+            dry_run,
+            report.referenced_keys,
+            report.files_scanned,
+            report.orphan_files,
+            report.orphan_bytes,
+            report.deleted_files,
+            report.deleted_bytes,
+        )
+        return report
+
+    async def _mark(self, marks: _MarkSet, report: MediaGCReport) -> None:
+        """按主键分批读取引用列（只投影需要的列，大字段在库内解压，每批一个短会话）。"""
+        last_id = 0
+        while True:
+            async with AsyncSessionLocal() as db:
+                rows = (
+                    await db.execute(
+                        select(
+                            Content.id,
+                            Content.cover_url,
+                            Content.author_avatar_url,
+                            Content.media_urls,
+                            Content.context_data,
+                            blob_value("body"),
+                            blob_value("rich_payload", parse_json=True),
+                            blob_value("archive_metadata", parse_json=True),
+                        )
+                        .outerjoin(ContentBlob, ContentBlob.content_id == Content.id)
+                        .where(Content.id > last_id)
+                        .order_by(Content.id)
+                        .limit(_MARK_BATCH_SIZE)
+                    )
+                ).all()
+            if not rows:
+                return
+
+            keys: list[str] = []
+            for row in rows:
+                for value in row[1:]:
+                    keys.extend(iter_referenced_keys(value))
+            await asyncio.to_thread(marks.add_many, keys)
+            report.contents_scanned += len(rows)
+            last_id = rows[-1][0]
+
+    async def _sweep(self, marks: _MarkSet, report: MediaGCReport, *, grace_seconds: int, dry_run: bool) -> None:
+        cutoff = time.time() - max(0, grace_seconds)
+        async for batch in self.storage.iter_blob_batches(_SWEEP_BATCH_SIZE):
+            report.files_scanned += len(batch)
+            candidates = [(path, size) for path, size, mtime in batch if mtime < cutoff]
+            report.skipped_recent += len(batch) - len(candidates)
+            orphans = await asyncio.to_thread(marks.filter_unmarked, [path for path, _ in candidates])
+
+            for path, size in candidates:
+                if path not in orphans:
+                    continue
+                report.orphan_files += 1
+                report.orphan_bytes += size
+                if len(report.orphan_samples) < _REPORT_SAMPLE_LIMIT:
+                    report.orphan_samples.append(path)
+                if dry_run:
+                    continue
+                if await self.storage.delete(key=path):
+                    report.deleted_files += 1
+                    report.deleted_bytes += size
@@ -0,0 +1,146 @@
+"""
+近似重复检测（SimHash + LSH 分段）
+
+- 解析时对标题与正文计算 64 位 SimHash：文本去掉 HTML 标签与链接后按全文索引同样的规则切分
+  （中日韩二元组、其余按词），每个词的哈希按出现次数加权累加
+- 64 位指纹均分为 4 段 16 位，分别建索引；汉明距离不超过 3 的两个指纹至少有一段完全相同，
+  按段等值召回候选再精确比较距离，查找耗时与库大小基本无关
+- 只为原始内容保存指纹；判定为重复的内容记录 duplicate_of_id，指向最早的原始内容
+"""
+from __future__ import annotations
+
+import hashlib
+import html
+import re
+from collections import Counter
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import delete, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.fts import segment_text
+from app.core.logging import logger
+from app.models import Content, ContentFingerprint
+
+BAND_COUNT = 4
+BAND_BITS = 64 // BAND_COUNT
+_BAND_MASK = (1 << BAND_BITS) - 1
+_BIT_SHIFTS = np.arange(64, dtype=np.uint64)
+
+_HTML_TAG = re.compile(r"<[^>]+>")
+_URL = re.compile(r"(?:https?|local)://\S+")
+_TOKEN = re.compile(r"\w+")
+
+
+def simhash_features(title: Optional[str], body: Optional[str]) -> Counter:
+    """特征（词）及出现次数；中日韩二元组本身已保留相邻字的顺序"""
+    text = html.unescape(_HTML_TAG.sub(" ", f"{title or ''}\n{body or ''}"))
+    text = _URL.sub(" ", text).lower()
+    return Counter(_TOKEN.findall(segment_text(text)))
+
+
+def compute_simhash(features: Counter) -> int:
+    """64 位 SimHash（无符号整数）"""
+    if not features:
+        return 0
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(f.encode("utf-8"), digest_size=8).digest(), "little") for f in features),
+        dtype=np.uint64,
+        count=len(features),
+    )
+    weights = np.fromiter(features.values(), dtype=np.float64, count=len(features))
+    bits = ((hashes[:, None] >> _BIT_SHIFTS) & np.uint64(1)).astype(np.float64)
+    totals = weights @ (bits * 2.0 - 1.0)
+    return int(np.packbits(totals[::-1] > 0).view(">u8")[0])
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+def band_values(simhash: int) -> tuple[int, ...]:
+    return tuple((simhash >> (BAND_BITS * i)) & _BAND_MASK for i in range(BAND_COUNT))
+
+
+def _to_signed(value: int) -> int:
+    # SQLite INTEGER 为有符号 64 位
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def _to_unsigned(value: int) -> int:
+    return value & 0xFFFFFFFFFFFFFFFF
+
+
+class NearDuplicateService:
+    """解析阶段的近似重复判定与指纹维护"""
+
+    def __init__(self, *, max_distance: Optional[int] = None, min_features: Optional[int] = None):
+        distance = settings.near_duplicate_max_distance if max_distance is None else max_distance
+        # 超过分段数 - 1 时分段召回可能漏掉，按上限截断
+        self.max_distance = max(0, min(distance, BAND_COUNT - 1))
+        self.min_features = settings.near_duplicate_min_features if min_features is None else min_features
+
+    async def find_duplicate(
+        self,
+        session: AsyncSession,
+        simhash: int,
+        *,
+        exclude_id: Optional[int] = None,
+    ) -> Optional[tuple[int, int]]:
+        """返回 (原始内容 id, 汉明距离)；没有足够接近的指纹时返回 None"""
+        bands = band_values(simhash)
+        stmt = (
+            select(ContentFingerprint.content_id, ContentFingerprint.simhash)
+            .join(Content, Content.id == ContentFingerprint.content_id)
+            .where(
+                or_(*(getattr(ContentFingerprint, f"band{i}") == band for i, band in enumerate(bands))),
+                Content.deleted_at.is_(None),
+            )
+        )
+        if exclude_id is not None:
+            stmt = stmt.where(ContentFingerprint.content_id != exclude_id)
+
+        best: Optional[tuple[int, int]] = None
+        for content_id, stored in (await session.execute(stmt)).all():
+            distance = hamming_distance(simhash, _to_unsigned(stored))
+            if distance > self.max_distance:
+                continue
+            if best is None or (distance, content_id) < (best[1], best[0]):
+                best = (content_id, distance)
+        return best
+
+    async def check(
+        self,
+        session: AsyncSession,
+        content: Content,
+        title: Optional[str],
+        body: Optional[str],
+    ) -> Optional[int]:
+        """判定并写回 content.duplicate_of_id，返回原始内容 id（非重复时为 None）
+
+        原始内容写入（或更新）指纹；重复内容不保存指纹，后续转载仍会指向同一原始内容。
+        """
+        features = simhash_features(title, body)
+        if len(features) < self.min_features:
+            content.duplicate_of_id = None
+            return None
+
+        simhash = compute_simhash(features)
+        match = await self.find_duplicate(session, simhash, exclude_id=content.id)
+        if match is not None:
+            original_id, distance = match
+            content.duplicate_of_id = original_id
+            await session.execute(delete(ContentFingerprint).where(ContentFingerprint.content_id == content.id))
+            logger.info(f"近似重复内容: content_id={content.id}, duplicate_of={original_id}, distance={distance}")
+            return original_id
+
+        content.duplicate_of_id = None
+        row = await session.get(ContentFingerprint, content.id)
+        if row is None:
+            row = ContentFingerprint(content_id=content.id)
+            session.add(row)
+        row.simhash = _to_signed(simhash)
+        row.band0, row.band1, row.band2, row.band3 = band_values(simhash)
+        return None
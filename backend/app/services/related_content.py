@@ -0,0 +1,203 @@
+"""
+相似内容（"更多类似内容"）
+
+- 每条内容的 top-k 近邻预先计算，打包存入 content_neighbors（每条内容一行），
+  详情页按主键读取一行再按 id 取内容，耗时与库大小无关
+- 新向量写入后增量更新：重算新内容的近邻，并把新内容插入其近邻的列表（相似度足够高时）
+- 定时任务补算缺失、签名过期或超过有效期的行；删除的内容在读取时过滤，随定时重算清出列表
+"""
+from __future__ import annotations
+
+from datetime import timedelta
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.logging import logger
+from app.core.time_utils import utcnow
+from app.models import Content, ContentEmbedding, ContentNeighbors, ContentStatus, DiscoveryState
+from app.services.embedding_service import EmbeddingService
+from app.services.vector_cache import get_vector_cache
+
+
+def pack_neighbors(neighbors: list[tuple[int, float]]) -> tuple[bytes, bytes]:
+    ids = np.asarray([cid for cid, _ in neighbors], dtype="<i8")
+    scores = np.asarray([score for _, score in neighbors], dtype="<f4")
+    return ids.tobytes(), scores.tobytes()
+
+
+def unpack_neighbors(row: ContentNeighbors) -> list[tuple[int, float]]:
+    ids = np.frombuffer(row.neighbor_ids or b"", dtype="<i8")
+    scores = np.frombuffer(row.scores or b"", dtype="<f4")
+    return list(zip(ids.tolist(), scores.tolist()))
+
+
+class RelatedContentService:
+    """相似内容的计算、增量维护与读取"""
+
+    def __init__(self, *, k: Optional[int] = None):
+        self.k = max(1, k or settings.related_content_k)
+
+    async def get_related(
+        self,
+        session: AsyncSession,
+        content_id: int,
+        limit: int,
+    ) -> Optional[list[tuple[Content, float]]]:
+        """返回 [(内容, 相似度)]；尚未计算（或向量签名已变化）时返回 None"""
+        row = await session.get(ContentNeighbors, content_id)
+        if row is None or row.embedding_model != await EmbeddingService()._get_document_embedding_signature():
+            return None
+        neighbors = unpack_neighbors(row)
+        if not neighbors:
+            return []
+
+        contents = (
+            await session.execute(
+                select(Content).where(
+                    Content.id.in_([cid for cid, _ in neighbors]),
+                    Content.status == ContentStatus.PARSE_SUCCESS,
+                    or_(
+                        Content.discovery_state.is_(None),
+                        Content.discovery_state == DiscoveryState.PROMOTED,
+                    ),
+                )
+            )
+        ).scalars().all()
+        content_map = {content.id: content for content in contents}
+        related = [(content_map[cid], score) for cid, score in neighbors if cid in content_map]
+        return related[:limit]
+
+    async def refresh(
+        self,
+        content_ids: list[int],
+        *,
+        reciprocal: bool = False,
+        session: Optional[AsyncSession] = None,
+    ) -> int:
+        """重算给定内容的近邻并写入，返回写入行数
+
+        reciprocal=True 用于新写入的向量：同时把它们插入各自近邻的列表。
+        """
+        if not content_ids:
+            return 0
+        if session is not None:
+            return await self._refresh_impl(content_ids, session, reciprocal=reciprocal)
+        async with AsyncSessionLocal() as local_session:
+            written = await self._refresh_impl(content_ids, local_session, reciprocal=reciprocal)
+            await local_session.commit()
+            return written
+
+    async def _refresh_impl(self, content_ids: list[int], session: AsyncSession, *, reciprocal: bool) -> int:
+        signature = await EmbeddingService()._get_document_embedding_signature()
+        matrix = await get_vector_cache().get(session, signature)
+        present = [cid for cid in dict.fromkeys(content_ids) if cid in matrix.row_of]
+        if not present:
+            return 0
+
+        # 多取一条用于排除自身
+        queries = matrix.vectors(np.asarray([matrix.row_of[cid] for cid in present]))
+        ranked = matrix.top_k_batch(np.asarray(queries, dtype=np.float32), self.k + 1)
+        fresh = {
+            cid: [(other, score) for other, score in neighbors if other != cid][: self.k]
+            for cid, neighbors in zip(present, ranked)
+        }
+
+        existing = {
+            row.content_id: row
+            for row in (
+                await session.execute(select(ContentNeighbors).where(ContentNeighbors.content_id.in_(present)))
+            ).scalars().all()
+        }
+        computed_at = utcnow()
+        for cid, neighbors in fresh.items():
+            row = existing.get(cid)
+            if row is None:
+                row = ContentNeighbors(content_id=cid)
+                session.add(row)
+            row.embedding_model = signature
+            row.neighbor_ids, row.scores = pack_neighbors(neighbors)
+            row.computed_at = computed_at
+
+        if reciprocal:
+            await self._merge_reverse(session, signature, fresh)
+        await session.flush()
+        return len(fresh)
+
+    async def _merge_reverse(
+        self,
+        session: AsyncSession,
+        signature: str,
+        fresh: dict[int, list[tuple[int, float]]],
+    ) -> None:
+        """把新内容插入其近邻的列表：相似度高于对方当前第 k 名时替换"""
+        inserts: dict[int, dict[int, float]] = {}
+        for cid, neighbors in fresh.items():
+            for other, score in neighbors:
+                if other not in fresh:
+                    inserts.setdefault(other, {})[cid] = score
+        if not inserts:
+            return
+
+        rows = (
+            await session.execute(
+                select(ContentNeighbors).where(
+                    ContentNeighbors.content_id.in_(list(inserts)),
+                    ContentNeighbors.embedding_model == signature,
+                )
+            )
+        ).scalars().all()
+        for row in rows:
+            current = dict(unpack_neighbors(row))
+            floor = min(current.values()) if len(current) >= self.k else -np.inf
+            candidates = {cid: score for cid, score in inserts[row.content_id].items() if score > floor}
+            if not candidates:
+                continue
+            current.update(candidates)
+            merged = sorted(current.items(), key=lambda item: item[1], reverse=True)[: self.k]
+            row.neighbor_ids, row.scores = pack_neighbors(merged)
+
+    async def stale_content_ids(self, session: AsyncSession, *, after_id: int, limit: int) -> list[int]:
+        """按 content_id 顺序找出需要（重新）计算的内容：缺失、签名不符或超过有效期"""
+        signature = await EmbeddingService()._get_document_embedding_signature()
+        cutoff = utcnow() - timedelta(hours=max(1, settings.related_content_max_age_hours))
+        return list(
+            (
+                await session.execute(
+                    select(ContentEmbedding.content_id)
+                    .outerjoin(ContentNeighbors, ContentNeighbors.content_id == ContentEmbedding.content_id)
+                    .where(
+                        ContentEmbedding.embedding_model == signature,
+                        ContentEmbedding.content_id > after_id,
+                        or_(
+                            ContentNeighbors.content_id.is_(None),
+                            ContentNeighbors.embedding_model != signature,
+                            ContentNeighbors.computed_at < cutoff,
+                        ),
+                    )
+                    .order_by(ContentEmbedding.content_id)
+                    .limit(limit)
+                )
+            ).scalars().all()
+        )
+
+    async def refresh_stale(self) -> int:
+        """补算全部过期行，返回写入行数"""
+        batch_size = max(1, settings.related_content_batch_size)
+        last_id = 0
+        written = 0
+        while True:
+            async with AsyncSessionLocal() as session:
+                content_ids = await self.stale_content_ids(session, after_id=last_id, limit=batch_size)
+                if not content_ids:
+                    break
+                written += await self._refresh_impl(content_ids, session, reciprocal=False)
+                await session.commit()
+            last_id = content_ids[-1]
+        if written:
+            logger.info("相似内容已更新: rows={}", written)
+        return written
@@ -0,0 +1,78 @@
+"""
+检索缓存
+
+- 查询向量：按 (向量签名, 规范化查询) 缓存，重复检索与翻页不再调用 embedding
+- 召回结果：按 (查询, 过滤条件, 数据版本) 缓存排序后的候选 id，短时有效；
+  数据版本取自 contents / content_blobs 的触发器版本号（见 app.core.data_versions，正文改写与删除同样生效）
+  与当前模型向量表的更新水位，写入后键随之变化；TTL 仅为无版本触发器的数据库兜底
+"""
+from __future__ import annotations
+
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional
+
+from app.core.config import settings
+
+
+def normalize_query(query: str) -> str:
+    """折叠空白；大小写保留（远程模型对大小写敏感）"""
+    return " ".join(query.split())
+
+
+class LRUCache:
+    """有界 LRU，可选过期时间；maxsize<=0 时不缓存"""
+
+    def __init__(self, maxsize: int, ttl_seconds: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is not None and self.ttl_seconds is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._data[key]
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+_query_embedding_cache: Optional[LRUCache] = None
+_ranked_ids_cache: Optional[LRUCache] = None
+
+
+def get_query_embedding_cache() -> LRUCache:
+    global _query_embedding_cache
+    if _query_embedding_cache is None:
+        _query_embedding_cache = LRUCache(settings.search_query_cache_size)
+    return _query_embedding_cache
+
+
+def get_ranked_ids_cache() -> LRUCache:
+    global _ranked_ids_cache
+    if _ranked_ids_cache is None:
+        _ranked_ids_cache = LRUCache(
+            settings.search_ranked_cache_size,
+            ttl_seconds=settings.search_ranked_cache_ttl_seconds,
+        )
+    return _ranked_ids_cache
@@ -0,0 +1,872 @@
+"""
+内容向量矩阵缓存
+
+- 向量以 float32 小端字节（BLOB）存储，读取时零解析直接映射为 numpy 数组
+- 每个 embedding 模型签名在进程内维护一个连续的 (N, dim) 矩阵与对应的 content_id 数组，
+  语义检索变为一次矩阵-向量乘法，不再每次全表读取并解析 JSON
+- 一致性：
+  - 本进程写入向量后（事务提交时）增量更新矩阵
+  - 每次检索前用一条聚合查询（行数 + 最大 updated_at，走覆盖索引）与数据库对账：
+    有更新的行按 updated_at 水位增量加载；行数对不上（删除）时整体重建
+  - 全局版本号变化（模型切换、手动失效）时丢弃所有矩阵
+- 向量数达到 embedding_ann_min_rows 时在后台构建 IVF-Flat 索引（见 ann_index），
+  构建完成前及小库时走精确检索；带索引的矩阵快照落盘，重启后直接加载再按水位补齐
+- embedding_quantization=int8 时矩阵按行对称量化为 int8（每行一个缩放系数），
+  内存约为 float32 的 1/4；检索结果是近似分数，由 rerank() 用库中的 float32 原始向量精排
+- 每行附带内容的平台与创建时间（创建后不变），带过滤条件的检索先按 RowFilter 生成行掩码，
+  只对命中子集打分（子集较大且已有 ANN 索引时在探查的倒排表内按掩码过滤），
+  成本与命中子集成正比；状态等可变条件仍由调用方在候选上用 SQL 校验
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import shutil
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.logging import logger
+from app.models import Content, ContentEmbedding
+from app.services.ann_index import (
+    IVFFlatIndex,
+    nearest_centroids,
+    suggest_nlist,
+    train_centroids,
+    train_sample_size,
+)
+
+_INITIAL_CAPACITY = 256
+_LOAD_BATCH_SIZE = 2000
+_ANN_ASSIGN_BATCH_ROWS = 65536
+_ANN_TRAIN_SEED = 0  # 训练抽样与聚类的固定种子：同一批向量重建出同一索引
+_SCORE_BLOCK_ROWS = 2048
+_BATCH_BLOCK_ROWS = 8192  # 批量查询时每块行数（分数矩阵为 查询数 x 块行数）
+_GATHER_BLOCK_ROWS = 128  # 按行号取子集时每块行数（随机访问，块小于 L2 更快）
+_SNAPSHOT_FORMAT = 2
+# 行属性未知（调用方未提供）时的占位：过滤时视为可能命中，交给 SQL 校验
+_NO_PLATFORM = -1
+_NO_TIME = np.iinfo(np.int64).min
+
+
+def pack_vector(vector: Iterable[float]) -> bytes:
+    """向量打包为 float32 小端字节"""
+    return np.asarray(list(vector), dtype="<f4").tobytes()
+
+
+def unpack_vector(blob: Optional[bytes]) -> np.ndarray:
+    """float32 字节还原为向量（只读视图，不复制）"""
+    if not blob:
+        return np.empty(0, dtype=np.float32)
+    return np.frombuffer(blob, dtype="<f4")
+
+
+def quantize_int8(vectors: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """按行对称量化：codes = round(x / scale)，scale = max|x| / 127"""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127.0
+    scales[scales == 0] = 1.0
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def row_vector(blob: Optional[bytes], legacy: object) -> np.ndarray:
+    """读取一行向量：优先 BLOB，兼容尚未迁移的 JSON 列"""
+    if blob:
+        return unpack_vector(blob)
+    if isinstance(legacy, list) and legacy:
+        try:
+            return np.asarray(legacy, dtype=np.float32)
+        except (TypeError, ValueError):
+            pass
+    return np.empty(0, dtype=np.float32)
+
+
+def _timestamp_us(value: datetime) -> int:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return int(np.datetime64(value, "us").astype(np.int64))
+
+
+@dataclass(frozen=True)
+class RowFilter:
+    """可下推到矩阵的内容过滤条件（平台、创建时间范围）"""
+
+    platform: Optional[str] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+
+    @property
+    def empty(self) -> bool:
+        return self.platform is None and self.date_from is None and self.date_to is None
+
+
+@dataclass
+class _SyncState:
+    rows: int
+    max_updated_at: Optional[datetime]
+
+
+class ModelMatrix:
+    """单个模型签名的向量矩阵
+
+    行号在删除后保持不变（空洞记入空闲表并被后续写入复用），ANN 倒排表直接引用行号。
+    """
+
+    def __init__(self, quantization: str = "none"):
+        self.quantization = quantization
+        # 维度由首个有效向量决定，之后维度不符的行计入 skipped
+        self.dim: Optional[int] = None
+        self.size = 0  # 有效行数
+        self.used = 0  # 已分配行数（含空洞）
+        self.ids = np.zeros(0, dtype=np.int64)  # 空洞为 -1
+        # 行属性：平台编码（见 platform_names）与创建时间（微秒时间戳）
+        self.platforms = np.zeros(0, dtype=np.int16)
+        self.created = np.zeros(0, dtype=np.int64)
+        self.platform_names: list[str] = []
+        self.matrix = np.zeros((0, 0), dtype=np.float32)
+        # int8 量化时每行的缩放系数，否则为 None
+        self.scales: Optional[np.ndarray] = None
+        self.row_of: dict[int, int] = {}
+        # 数据库中存在但无法使用的行（空向量/维度不符），对账时计入行数
+        self.skipped: set[int] = set()
+        self.watermark: Optional[datetime] = None
+        self.ann: Optional[IVFFlatIndex] = None
+        self.dirty = True  # 自上次快照后有变动
+        self._free: list[int] = []
+        # ANN 构建期间变动的行，挂载索引时补做分配
+        self._pending_rows: Optional[set[int]] = None
+
+    @property
+    def source_rows(self) -> int:
+        return self.size + len(self.skipped)
+
+    @property
+    def quantized(self) -> bool:
+        return self.scales is not None
+
+    @property
+    def nbytes(self) -> int:
+        """矩阵占用内存（含预留容量）"""
+        attrs = self.ids.nbytes + self.platforms.nbytes + self.created.nbytes
+        return self.matrix.nbytes + attrs + (self.scales.nbytes if self.scales is not None else 0)
+
+    def _init_storage(self, dim: int) -> None:
+        self.dim = dim
+        if self.quantization == "int8":
+            self.matrix = np.zeros((0, dim), dtype=np.int8)
+            self.scales = np.zeros(0, dtype=np.float32)
+        else:
+            self.matrix = np.zeros((0, dim), dtype=np.float32)
+
+    def _ensure_capacity(self, needed: int) -> None:
+        capacity = self.matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, _INITIAL_CAPACITY)
+        matrix = np.zeros((new_capacity, self.dim), dtype=self.matrix.dtype)
+        matrix[: self.used] = self.matrix[: self.used]
+        ids = np.full(new_capacity, -1, dtype=np.int64)
+        ids[: self.used] = self.ids[: self.used]
+        platforms = np.full(new_capacity, _NO_PLATFORM, dtype=np.int16)
+        platforms[: self.used] = self.platforms[: self.used]
+        created = np.full(new_capacity, _NO_TIME, dtype=np.int64)
+        created[: self.used] = self.created[: self.used]
+        self.platforms, self.created = platforms, created
+        if self.scales is not None:
+            scales = np.ones(new_capacity, dtype=np.float32)
+            scales[: self.used] = self.scales[: self.used]
+            self.scales = scales
+        self.matrix, self.ids = matrix, ids
+
+    def vectors(self, rows) -> np.ndarray:
+        """取若干行的 float32 向量（量化时为反量化后的近似值）"""
+        block = self.matrix[rows]
+        if self.scales is None:
+            return block
+        scales = self.scales[rows]
+        return block.astype(np.float32) * (scales[..., None] if block.ndim == 2 else scales)
+
+    def _touch(self, row: int) -> None:
+        self.dirty = True
+        if self._pending_rows is not None:
+            self._pending_rows.add(row)
+        if self.ann is not None:
+            if self.ids[row] >= 0:
+                self.ann.add(row, self.vectors(row))
+            else:
+                self.ann.discard(row)
+
+    def _platform_code(self, platform: str) -> int:
+        try:
+            return self.platform_names.index(platform)
+        except ValueError:
+            self.platform_names.append(platform)
+            return len(self.platform_names) - 1
+
+    def upsert(
+        self,
+        content_id: int,
+        vector: np.ndarray,
+        *,
+        platform: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+    ) -> bool:
+        """写入一行；空向量或维度不一致时忽略并返回 False
+
+        platform/created_at 为 None 时新行记为未知，已有行保留原值。
+        """
+        if vector.size == 0:
+            return False
+        if self.dim is None:
+            self._init_storage(int(vector.shape[0]))
+        if vector.shape[0] != self.dim:
+            return False
+        row = self.row_of.get(content_id)
+        if row is None:
+            if self._free:
+                row = self._free.pop()
+            else:
+                self._ensure_capacity(self.used + 1)
+                row = self.used
+                self.used += 1
+            self.ids[row] = content_id
+            self.platforms[row] = _NO_PLATFORM
+            self.created[row] = _NO_TIME
+            self.row_of[content_id] = row
+            self.size += 1
+        if platform is not None:
+            # Platform 枚举与其字符串值均可
+            self.platforms[row] = self._platform_code(getattr(platform, "value", platform))
+        if created_at is not None:
+            self.created[row] = _timestamp_us(created_at)
+        if self.scales is None:
+            self.matrix[row] = vector
+        else:
+            codes, scales = quantize_int8(vector)
+            self.matrix[row] = codes[0]
+            self.scales[row] = scales[0]
+        self._touch(row)
+        return True
+
+    def remove(self, content_id: int) -> None:
+        row = self.row_of.pop(content_id, None)
+        if row is None:
+            return
+        self.ids[row] = -1
+        self.matrix[row] = 0
+        self._free.append(row)
+        self.size -= 1
+        self._touch(row)
+
+    def scores(self, query: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """返回 (content_ids, 点积分数)，向量已归一化即余弦相似度；空洞行分数为 -inf"""
+        ids = self.ids[: self.used]
+        if self.scales is None:
+            scores = self.matrix[: self.used] @ query
+        else:
+            # 分块转换到可复用的小缓冲区（常驻 CPU 缓存）后走 BLAS，避免生成整张 float32 矩阵
+            scores = np.empty(self.used, dtype=np.float32)
+            buffer = np.empty((min(self.used, _SCORE_BLOCK_ROWS), self.dim), dtype=np.float32)
+            for start in range(0, self.used, _SCORE_BLOCK_ROWS):
+                end = min(self.used, start + _SCORE_BLOCK_ROWS)
+                block = buffer[: end - start]
+                np.copyto(block, self.matrix[start:end], casting="unsafe")
+                np.matmul(block, query, out=scores[start:end])
+            scores *= self.scales[: self.used]
+        if self._free:
+            scores[ids < 0] = -np.inf
+        return ids, scores
+
+    def row_mask(self, where: Optional[RowFilter]) -> Optional[np.ndarray]:
+        """过滤条件对应的行掩码（不含空洞）；无条件时返回 None。属性未知的行保留"""
+        if where is None or where.empty:
+            return None
+        used = self.used
+        mask = self.ids[:used] >= 0
+        if where.platform is not None:
+            platforms = self.platforms[:used]
+            name = getattr(where.platform, "value", where.platform)
+            matched = platforms == _NO_PLATFORM
+            if name in self.platform_names:
+                matched |= platforms == self.platform_names.index(name)
+            mask &= matched
+        if where.date_from is not None or where.date_to is not None:
+            created = self.created[:used]
+            in_range = np.ones(used, dtype=bool)
+            if where.date_from is not None:
+                in_range &= created >= _timestamp_us(where.date_from)
+            if where.date_to is not None:
+                in_range &= created <= _timestamp_us(where.date_to)
+            mask &= in_range | (created == _NO_TIME)
+        return mask
+
+    def top_k(
+        self,
+        query: np.ndarray,
+        limit: int,
+        *,
+        exact: bool = False,
+        where: Optional[RowFilter] = None,
+    ) -> list[tuple[int, float]]:
+        """查询维度与矩阵不一致（如远程 embedding 降级为本地向量）时返回空
+
+        已挂载 ANN 索引时走近似检索（exact=True 强制在全矩阵上计算）。
+        where 非空时只在命中子集内检索：子集小于 ANN 阈值时对子集精确打分，否则走带掩码的 ANN。
+        量化矩阵的分数为近似值，需要精确分数时由调用方 rerank。
+        """
+        if self.size == 0 or limit <= 0 or query.shape[0] != self.dim:
+            return []
+        mask = self.row_mask(where)
+        if mask is None:
+            if self.ann is not None and not exact and limit < self.size:
+                return self.ann.search(
+                    self.matrix, self.ids, query, limit, max(1, settings.embedding_ann_nprobe), scales=self.scales
+                )
+            ids, scores = self.scores(query)
+            return _top_scores(ids, scores, min(limit, self.size))
+
+        rows = np.flatnonzero(mask)
+        if rows.size == 0:
+            return []
+        if self.ann is not None and not exact and limit < rows.size and rows.size >= settings.embedding_ann_min_rows:
+            return self.ann.search(
+                self.matrix,
+                self.ids,
+                query,
+                limit,
+                max(1, settings.embedding_ann_nprobe),
+                scales=self.scales,
+                mask=mask,
+            )
+        return _top_scores(self.ids[rows], self._subset_scores(rows, query), min(limit, rows.size))
+
+    def top_k_batch(self, queries: np.ndarray, limit: int) -> list[list[tuple[int, float]]]:
+        """多条查询一起检索（如预计算近邻）
+
+        精确路径按行块做矩阵乘并滚动保留各查询的 top-k，矩阵只扫描一遍；
+        已挂载 ANN 索引时逐条走近似检索。
+        """
+        if self.size == 0 or limit <= 0 or queries.ndim != 2 or queries.shape[1] != self.dim:
+            return [[] for _ in range(len(queries))]
+        if self.ann is not None:
+            return [self.top_k(query, limit) for query in queries]
+
+        queries = np.ascontiguousarray(queries, dtype=np.float32)
+        limit = min(limit, self.size)
+        batch = queries.shape[0]
+        best_scores = np.full((batch, 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((batch, 0), dtype=np.int64)
+        for start in range(0, self.used, _BATCH_BLOCK_ROWS):
+            end = min(self.used, start + _BATCH_BLOCK_ROWS)
+            block = self.vectors(slice(start, end))
+            scores = queries @ block.T
+            if self._free:
+                scores[:, self.ids[start:end] < 0] = -np.inf
+            scores = np.concatenate([best_scores, scores], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), (batch, end - start))], axis=1)
+            if scores.shape[1] > limit:
+                part = np.argpartition(scores, -limit, axis=1)[:, -limit:]
+                scores = np.take_along_axis(scores, part, axis=1)
+                rows = np.take_along_axis(rows, part, axis=1)
+            best_scores, best_rows = scores, rows
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_ids = self.ids[np.take_along_axis(best_rows, order, axis=1)]
+        return [
+            [(int(cid), float(score)) for cid, score in zip(ids_row, scores_row) if score > -np.inf]
+            for ids_row, scores_row in zip(best_ids, best_scores)
+        ]
+
+    def _subset_scores(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """按行号子集打分：分块取行到可复用缓冲区再走 BLAS，不复制整个子集"""
+        scores = np.empty(rows.size, dtype=np.float32)
+        block_rows = min(rows.size, _GATHER_BLOCK_ROWS)
+        gathered = np.empty((block_rows, self.dim), dtype=self.matrix.dtype)
+        buffer = gathered if self.scales is None else np.empty((block_rows, self.dim), dtype=np.float32)
+        for start in range(0, rows.size, _GATHER_BLOCK_ROWS):
+            chunk = rows[start:start + _GATHER_BLOCK_ROWS]
+            n = chunk.size
+            np.take(self.matrix, chunk, axis=0, out=gathered[:n])
+            if self.scales is not None:
+                np.copyto(buffer[:n], gathered[:n], casting="unsafe")
+            np.matmul(buffer[:n], query, out=scores[start:start + n])
+        if self.scales is not None:
+            scores *= self.scales[rows]
+        return scores
+
+    def begin_ann_build(self) -> None:
+        self._pending_rows = set()
+
+    def cancel_ann_build(self) -> None:
+        self._pending_rows = None
+
+    def attach_ann(self, index: IVFFlatIndex, labels: np.ndarray) -> None:
+        """挂载构建完成的索引；labels 为构建开始时各行的列表编号"""
+        index.load_labels(labels)
+        pending = self._pending_rows or set()
+        pending.update(range(labels.shape[0], self.used))
+        self._pending_rows = None
+        self.ann = index
+        for row in pending:
+            if self.ids[row] >= 0:
+                index.add(row, self.vectors(row))
+            else:
+                index.discard(row)
+        self.dirty = True
+
+    def export_state(self) -> dict[str, np.ndarray]:
+        """导出快照用的数组（复制，可交给后台线程写盘）"""
+        state = {
+            "ids": self.ids[: self.used].copy(),
+            "matrix": self.matrix[: self.used].copy(),
+            "platforms": self.platforms[: self.used].copy(),
+            "created": self.created[: self.used].copy(),
+            "platform_names": np.asarray(self.platform_names, dtype=str),
+            "skipped": np.fromiter(self.skipped, dtype=np.int64, count=len(self.skipped)),
+        }
+        if self.scales is not None:
+            state["scales"] = self.scales[: self.used].copy()
+        if self.ann is not None:
+            state["centroids"] = self.ann.centroids.copy()
+            state["labels"] = self.ann.labels(self.used)
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict[str, np.ndarray], watermark: Optional[datetime]) -> "ModelMatrix":
+        matrix = cls("int8" if "scales" in state else "none")
+        ids = state["ids"].astype(np.int64, copy=False)
+        matrix.matrix = np.ascontiguousarray(state["matrix"])
+        matrix.dim = int(matrix.matrix.shape[1])
+        if "scales" in state:
+            matrix.scales = state["scales"].astype(np.float32, copy=True)
+        matrix.ids = ids.copy()
+        matrix.used = int(ids.shape[0])
+        matrix.platforms = state["platforms"].astype(np.int16, copy=True)
+        matrix.created = state["created"].astype(np.int64, copy=True)
+        matrix.platform_names = [str(name) for name in state["platform_names"].tolist()]
+        live = np.flatnonzero(ids >= 0)
+        matrix.row_of = dict(zip(ids[live].tolist(), live.tolist()))
+        matrix.size = len(matrix.row_of)
+        matrix._free = np.flatnonzero(ids < 0).tolist()
+        matrix.skipped = set(state["skipped"].tolist())
+        matrix.watermark = watermark
+        if "centroids" in state:
+            index = IVFFlatIndex(state["centroids"])
+            index.load_labels(state["labels"])
+            matrix.ann = index
+        matrix.dirty = False
+        return matrix
+
+
+class VectorMatrixCache:
+    """进程级向量矩阵缓存（按模型签名分区）"""
+
+    def __init__(self):
+        self.version = 0
+        self._matrices: dict[str, ModelMatrix] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._builds: dict[str, asyncio.Task] = {}
+
+    def invalidate(self) -> None:
+        """丢弃所有矩阵，下次检索时重建"""
+        self.version += 1
+        self._matrices.clear()
+
+    def upsert(
+        self,
+        model: str,
+        content_id: int,
+        vector: Iterable[float],
+        *,
+        platform: Optional[str] = None,
+        created_at: Optional[datetime] = None,
+    ) -> None:
+        """本进程写入向量后增量更新（矩阵尚未加载时无需处理，加载时会读到最新数据）"""
+        matrix = self._matrices.get(model)
+        if matrix is None:
+            return
+        vec = np.asarray(list(vector), dtype=np.float32)
+        if matrix.upsert(content_id, vec, platform=platform, created_at=created_at):
+            matrix.skipped.discard(content_id)
+        else:
+            # 维度与矩阵不一致（如远程 embedding 临时降级）：不参与检索，但计入对账行数
+            matrix.remove(content_id)
+            matrix.skipped.add(content_id)
+
+    def remove(self, model: str, content_id: int) -> None:
+        matrix = self._matrices.get(model)
+        if matrix is not None:
+            matrix.remove(content_id)
+            matrix.skipped.discard(content_id)
+
+    async def get(self, session: AsyncSession, model: str) -> ModelMatrix:
+        """取得与数据库一致的矩阵（必要时增量加载或重建）"""
+        lock = self._locks.setdefault(model, asyncio.Lock())
+        async with lock:
+            state = await self._sync_state(session, model)
+            matrix = self._matrices.get(model)
+            if matrix is None and state.rows:
+                matrix = await self._load_snapshot(model)
+                if matrix is not None:
+                    self._matrices = {model: matrix}
+
+            if matrix is not None and state.max_updated_at is not None and (
+                matrix.watermark is None or state.max_updated_at > matrix.watermark
+            ):
+                await self._load_rows(session, model, matrix, since=matrix.watermark)
+
+            centroids = None
+            if matrix is None or matrix.source_rows != state.rows:
+                previous = matrix
+                matrix = ModelMatrix(settings.embedding_quantization)
+                await self._load_rows(session, model, matrix, since=None)
+                # 只保留当前模型的矩阵，旧模型的向量不再参与检索
+                self._matrices = {model: matrix}
+                logger.info("向量矩阵已重建: model={}, rows={}, dim={}", model, matrix.size, matrix.dim)
+                # 同模型重建（如有删除）沿用旧质心，只需重新分配
+                if previous is not None and previous.ann is not None and previous.dim == matrix.dim:
+                    centroids = previous.ann.centroids
+            self._maybe_build_ann(model, matrix, centroids)
+            return matrix
+
+    async def rerank(
+        self,
+        session: AsyncSession,
+        model: str,
+        query: np.ndarray,
+        ranked: list[tuple[int, float]],
+    ) -> list[tuple[int, float]]:
+        """用库中的 float32 原始向量重新计算候选分数并排序（量化矩阵的精排）"""
+        if not ranked:
+            return []
+        exact: dict[int, float] = {}
+        content_ids = [cid for cid, _ in ranked]
+        for start in range(0, len(content_ids), _LOAD_BATCH_SIZE):
+            rows = (
+                await session.execute(
+                    select(ContentEmbedding.content_id, ContentEmbedding.embedding_blob).where(
+                        ContentEmbedding.embedding_model == model,
+                        ContentEmbedding.content_id.in_(content_ids[start:start + _LOAD_BATCH_SIZE]),
+                    )
+                )
+            ).all()
+            for content_id, blob in rows:
+                vector = unpack_vector(blob)
+                if vector.shape[0] == query.shape[0]:
+                    exact[int(content_id)] = float(vector @ query)
+        rescored = [(cid, exact.get(cid, score)) for cid, score in ranked]
+        rescored.sort(key=lambda item: item[1], reverse=True)
+        return rescored
+
+    def _maybe_build_ann(self, model: str, matrix: ModelMatrix, centroids: Optional[np.ndarray]) -> None:
+        min_rows = int(settings.embedding_ann_min_rows)
+        if min_rows <= 0 or matrix.ann is not None or matrix.size < min_rows or model in self._builds:
+            return
+        task = asyncio.create_task(self._build_ann(model, matrix, centroids))
+        self._builds[model] = task
+        task.add_done_callback(lambda _task: self._builds.pop(model, None))
+
+    async def _build_ann(self, model: str, matrix: ModelMatrix, centroids: Optional[np.ndarray]) -> None:
+        """后台构建 IVF 索引：训练与分配都在工作线程中对拷贝进行，构建期间检索走精确路径"""
+        started = time.perf_counter()
+        matrix.begin_ann_build()
+        try:
+            used = matrix.used
+            ids = matrix.ids[:used].copy()
+            if centroids is None:
+                live = np.flatnonzero(ids >= 0)
+                nlist = suggest_nlist(live.shape[0])
+                rng = np.random.default_rng(_ANN_TRAIN_SEED)
+                picked = rng.choice(live, train_sample_size(live.shape[0], nlist), replace=False)
+                sample = matrix.vectors(np.sort(picked))
+                centroids = await asyncio.to_thread(train_centroids, sample, nlist, seed=_ANN_TRAIN_SEED)
+
+            labels = np.full(used, -1, dtype=np.int32)
+            for start in range(0, used, _ANN_ASSIGN_BATCH_ROWS):
+                end = min(used, start + _ANN_ASSIGN_BATCH_ROWS)
+                block = np.array(matrix.vectors(slice(start, end)), dtype=np.float32)
+                labels[start:end] = await asyncio.to_thread(nearest_centroids, block, centroids)
+            labels[ids < 0] = -1
+
+            if self._matrices.get(model) is not matrix:
+                # 构建期间矩阵已被重建或失效
+                matrix.cancel_ann_build()
+                return
+            matrix.attach_ann(IVFFlatIndex(centroids), labels)
+            logger.info(
+                "向量 ANN 索引已构建: model={}, rows={}, lists={}, 耗时 {:.1f}s",
+                model,
+                matrix.size,
+                matrix.ann.nlist,
+                time.perf_counter() - started,
+            )
+        except Exception as e:
+            matrix.cancel_ann_build()
+            logger.warning(f"构建向量 ANN 索引失败: {e}")
+            return
+        await self.persist(model)
+
+    async def persist(self, model: Optional[str] = None) -> None:
+        """把带 ANN 索引的矩阵快照写入磁盘（小库直接从数据库加载即可，不落盘）"""
+        for name, matrix in list(self._matrices.items()):
+            if (model is not None and name != model) or matrix.ann is None or not matrix.dirty:
+                continue
+            state = matrix.export_state()
+            watermark = matrix.watermark
+            matrix.dirty = False
+            try:
+                await asyncio.to_thread(_write_snapshot, name, watermark, state)
+            except Exception as e:
+                matrix.dirty = True
+                logger.warning(f"写入向量索引快照失败: {e}")
+
+    async def _load_snapshot(self, model: str) -> Optional[ModelMatrix]:
+        try:
+            loaded = await asyncio.to_thread(_read_snapshot, model)
+        except Exception as e:
+            logger.warning(f"读取向量索引快照失败，改为从数据库加载: {e}")
+            return None
+        if loaded is None:
+            return None
+        state, watermark = loaded
+        matrix = ModelMatrix.from_state(state, watermark)
+        if matrix.quantization != settings.embedding_quantization:
+            # 量化配置已变更，快照作废
+            return None
+        logger.info("向量矩阵已从快照加载: model={}, rows={}", model, matrix.size)
+        return matrix
+
+    async def _sync_state(self, session: AsyncSession, model: str) -> _SyncState:
+        rows, max_updated_at = (
+            await session.execute(
+                select(func.count(ContentEmbedding.id), func.max(ContentEmbedding.updated_at)).where(
+                    ContentEmbedding.embedding_model == model
+                )
+            )
+        ).one()
+        return _SyncState(rows=int(rows or 0), max_updated_at=max_updated_at)
+
+    async def _load_rows(
+        self,
+        session: AsyncSession,
+        model: str,
+        matrix: ModelMatrix,
+        *,
+        since: Optional[datetime],
+    ) -> None:
+        """按主键分批加载；遇到仅有 JSON 的旧行顺带回填 BLOB"""
+        last_id = 0
+        watermark = matrix.watermark
+        while True:
+            stmt = (
+                select(
+                    ContentEmbedding.id,
+                    ContentEmbedding.content_id,
+                    ContentEmbedding.embedding_blob,
+                    ContentEmbedding.updated_at,
+                    Content.platform,
+                    Content.created_at,
+                )
+                # 外连接：内容已删除的向量行仍需计入对账行数
+                .outerjoin(Content, Content.id == ContentEmbedding.content_id)
+                .where(ContentEmbedding.embedding_model == model, ContentEmbedding.id > last_id)
+                .order_by(ContentEmbedding.id)
+                .limit(_LOAD_BATCH_SIZE)
+            )
+            if since is not None:
+                stmt = stmt.where(ContentEmbedding.updated_at >= since)
+            rows = (await session.execute(stmt)).all()
+            if not rows:
+                break
+
+            legacy_ids = [row.id for row in rows if not row.embedding_blob]
+            legacy = await self._backfill_legacy(session, legacy_ids) if legacy_ids else {}
+            for row in rows:
+                content_id = int(row.content_id)
+                vector = unpack_vector(row.embedding_blob) if row.embedding_blob else legacy.get(row.id)
+                if vector is not None and matrix.upsert(
+                    content_id, vector, platform=row.platform, created_at=row.created_at
+                ):
+                    matrix.skipped.discard(content_id)
+                else:
+                    matrix.remove(content_id)
+                    matrix.skipped.add(content_id)
+                if row.updated_at is not None and (watermark is None or row.updated_at > watermark):
+                    watermark = row.updated_at
+            last_id = rows[-1].id
+        matrix.watermark = watermark
+
+    async def _backfill_legacy(self, session: AsyncSession, record_ids: list[int]) -> dict[int, np.ndarray]:
+        """把旧版 JSON 向量转写为 BLOB（不修改 updated_at，避免触发其他进程重载）"""
+        rows = (
+            await session.execute(
+                select(ContentEmbedding.id, ContentEmbedding.embedding).where(ContentEmbedding.id.in_(record_ids))
+            )
+        ).all()
+        vectors: dict[int, np.ndarray] = {}
+        for record_id, legacy in rows:
+            vector = row_vector(None, legacy)
+            if vector.size:
+                vectors[record_id] = vector
+
+        if vectors:
+            # 独立短事务写回，不影响调用方会话
+            try:
+                async with AsyncSession(session.bind) as write_session:
+                    for record_id, vector in vectors.items():
+                        await write_session.execute(
+                            update(ContentEmbedding)
+                            .where(ContentEmbedding.id == record_id)
+                            .values(
+                                embedding_blob=vector.astype("<f4").tobytes(),
+                                embedding_dim=int(vector.size),
+                                embedding=None,
+                                updated_at=ContentEmbedding.updated_at,
+                            )
+                        )
+                    await write_session.commit()
+            except Exception as e:
+                logger.warning(f"回填向量 BLOB 失败: {e}")
+        return vectors
+
+
+def _top_scores(ids: np.ndarray, scores: np.ndarray, limit: int) -> list[tuple[int, float]]:
+    if limit < scores.size:
+        part = np.argpartition(scores, -limit)[-limit:]
+        order = part[np.argsort(scores[part])[::-1]]
+    else:
+        order = np.argsort(scores)[::-1]
+    return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+def _snapshot_root() -> Path:
+    return Path(settings.embedding_index_dir)
+
+
+def _snapshot_dir(model: str) -> Path:
+    return _snapshot_root() / hashlib.sha1(model.encode("utf-8")).hexdigest()[:16]
+
+
+def _write_snapshot(model: str, watermark: Optional[datetime], state: dict[str, np.ndarray]) -> None:
+    """写入临时目录后整体替换；同时清理其他模型的旧快照"""
+    target = _snapshot_dir(model)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    staging = target.with_name(target.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir()
+    for name, array in state.items():
+        np.save(staging / f"{name}.npy", array)
+    meta = {
+        "format": _SNAPSHOT_FORMAT,
+        "model": model,
+        "watermark": watermark.isoformat() if watermark else None,
+    }
+    (staging / "meta.json").write_text(json.dumps(meta), encoding="utf-8")
+
+    for entry in target.parent.iterdir():
+        if entry != staging and entry.is_dir():
+            shutil.rmtree(entry, ignore_errors=True)
+    staging.rename(target)
+
+
+def _read_snapshot(model: str) -> Optional[tuple[dict[str, np.ndarray], Optional[datetime]]]:
+    target = _snapshot_dir(model)
+    meta_path = target / "meta.json"
+    if not meta_path.exists():
+        return None
+    meta = json.loads(meta_path.read_text(encoding="utf-8"))
+    if meta.get("format") != _SNAPSHOT_FORMAT or meta.get("model") != model:
+        return None
+    state = {path.stem: np.load(path) for path in target.glob("*.npy")}
+    watermark = datetime.fromisoformat(meta["watermark"]) if meta.get("watermark") else None
+    return state, watermark
+
+
+_vector_cache = VectorMatrixCache()
+
+
+def get_vector_cache() -> VectorMatrixCache:
+    return _vector_cache
+
+
+# ---------------------------------------------------------------------------
+# 基准测试：python -m app.services.vector_cache --rows 200000 --dim 768
+# ---------------------------------------------------------------------------
+
+
+def _benchmark(*, rows: int, dim: int, queries: int, k: int, rerank_factor: int, seed: int) -> None:
+    from app.services.ann_index import normalize, synthetic_corpus
+
+    rng = np.random.default_rng(seed)
+    centers = normalize(rng.standard_normal((max(16, rows // 500), dim)).astype(np.float32))
+    vectors = synthetic_corpus(rows, centers, rng)
+    query_vectors = synthetic_corpus(queries, centers, rng)
+    ids = np.arange(rows, dtype=np.int64)
+    empty = np.zeros(0, dtype=np.int64)
+
+    exact = ModelMatrix.from_state({"ids": ids, "matrix": vectors, "skipped": empty}, None)
+    codes = np.empty((rows, dim), dtype=np.int8)
+    scales = np.empty(rows, dtype=np.float32)
+    for start in range(0, rows, _SCORE_BLOCK_ROWS):
+        end = min(rows, start + _SCORE_BLOCK_ROWS)
+        codes[start:end], scales[start:end] = quantize_int8(vectors[start:end])
+    quantized = ModelMatrix.from_state({"ids": ids, "matrix": codes, "skipped": empty, "scales": scales}, None)
+
+    def run(label: str, search) -> None:
+        latencies: list[float] = []
+        hits = 0
+        for q, expected in zip(query_vectors, truth):
+            t0 = time.perf_counter()
+            found = search(q)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            hits += len(expected.intersection(cid for cid, _ in found[:k]))
+        print(
+            f"{label:<22s} recall@{k} {hits / (k * len(truth)):.3f}  "
+            f"p50 {np.percentile(latencies, 50):.2f}ms  p95 {np.percentile(latencies, 95):.2f}ms"
+        )
+
+    def rerank_in_memory(q: np.ndarray) -> list[tuple[int, float]]:
+        # 模拟 rerank()：按 id 取 float32 原始向量重新打分（不含数据库读取开销）
+        candidates = quantized.top_k(q, k * rerank_factor)
+        rows_ = np.fromiter((cid for cid, _ in candidates), dtype=np.int64, count=len(candidates))
+        scores = vectors[rows_] @ q
+        order = np.argsort(scores)[::-1]
+        return [(int(rows_[i]), float(scores[i])) for i in order]
+
+    print(f"corpus: {rows} x {dim}")
+    print(f"memory: float32 {exact.nbytes / 2**20:.1f} MiB, int8 {quantized.nbytes / 2**20:.1f} MiB")
+    truth = [{cid for cid, _ in exact.top_k(q, k)} for q in query_vectors]
+    run("float32 (current)", lambda q: exact.top_k(q, k))
+    run("int8", lambda q: quantized.top_k(q, k))
+    run(f"int8 + rerank x{rerank_factor}", rerank_in_memory)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="float32 与 int8 量化矩阵的内存/延迟/召回率对比")
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--rerank-factor", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+    _benchmark(
+        rows=args.rows,
+        dim=args.dim,
+        queries=args.queries,
+        k=args.k,
+        rerank_factor=args.rerank_factor,
+        seed=args.seed,
+    )
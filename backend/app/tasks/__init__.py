@@ -5,6 +5,9 @@ from .runner import TaskWorker
 from .discovery_sync import DiscoverySyncTask
 from .discovery_cleanup import DiscoveryCleanupTask
 from .favorites_sync import FavoritesSyncTask
+from .storage_maintenance import StorageMaintenanceTask
+from .related_content import RelatedContentTask
+from .dashboard_counters import DashboardCountersTask
 
 # 全局单例
 worker = TaskWorker()
@@ -18,4 +21,7 @@ __all__ = [
     "DiscoverySyncTask",
     "DiscoveryCleanupTask",
     "FavoritesSyncTask",
+    "StorageMaintenanceTask",
+    "RelatedContentTask",
+    "DashboardCountersTask",
 ]
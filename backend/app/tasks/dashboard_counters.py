@@ -0,0 +1,50 @@
+"""
+仪表盘计数对账任务
+
+dashboard_counters 由触发器增量维护（见 app.core.dashboard_counters），
+这里定期按源表重算并修正漂移（绕过触发器的手工改库、异常中断的迁移等）。
+"""
+import asyncio
+
+from loguru import logger
+
+from app.core.config import settings
+from app.core.dashboard_counters import reconcile_counters
+from app.core.db_adapter import engine
+
+
+class DashboardCountersTask:
+    """仪表盘计数对账任务"""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._reconcile_loop())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def reconcile(self) -> int:
+        """执行一次对账，返回修正的计数项数"""
+        async with engine.begin() as conn:
+            return await conn.run_sync(reconcile_counters)
+
+    async def _reconcile_loop(self):
+        logger.info("Dashboard counters task started")
+        interval = max(60, int(settings.dashboard_counters_reconcile_interval_seconds))
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reconcile()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Dashboard counters reconcile error: {e}")
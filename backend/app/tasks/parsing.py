@@ -13,7 +13,6 @@ from typing import Optional, Dict, Any
 from urllib.parse import unquote
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm.attributes import flag_modified
 
 from app.core.logging import logger, log_context
 from app.core.database import AsyncSessionLocal
@@ -156,10 +155,13 @@ class ContentParser:
         content.context_data = getattr(parsed, 'context_data', None)
         content.rich_payload = getattr(parsed, 'rich_payload', None)
 
+        # 近似重复判定（在媒体归档前完成，重复内容跳过归档、向量与分发）
+        duplicate_of_id = await self._check_near_duplicate(session, content, parsed)
+
         # 私有归档媒体处理（可能更新 parsed.body / media_urls / cover_url 等）
         from app.services.settings_service import get_setting_value
         enable_processing = await get_setting_value("enable_archive_media_processing", settings.enable_archive_media_processing)
-        if enable_processing:
+        if enable_processing and duplicate_of_id is None:
             try:
                 await self._maybe_process_private_archive_media(parsed)
             except Exception as e:
@@ -214,7 +216,8 @@ class ContentParser:
         logger.info("内容解析完成")
 
         # Phase 2: 解析成功后异步建立语义索引（失败不阻断主链路）
-        self._schedule_embedding_index(content.id)
+        if duplicate_of_id is None:
+            self._schedule_embedding_index(content.id)
         
         # 自动生成摘要
         enable_auto_summary = await get_setting_value("enable_auto_summary", settings.enable_auto_summary)
@@ -235,19 +238,27 @@ class ContentParser:
             "title": content.title,
             "status": content.status.value,
             "platform": content.platform.value if content.platform else None,
-            "cover_url": content.cover_url
+            "cover_url": content.cover_url,
+            "duplicate_of_id": content.duplicate_of_id,
         })
 
-    def _schedule_embedding_index(self, content_id: int) -> None:
-        async def _run():
-            try:
-                from app.services.embedding_service import EmbeddingService
+    async def _check_near_duplicate(self, session: AsyncSession, content: Content, parsed: Any) -> Optional[int]:
+        """SimHash 判重，返回原始内容 id；判定失败不阻断解析"""
+        if not settings.enable_near_duplicate_detection or content.is_synthesis:
+            return None
+        from app.services.near_duplicate import NearDuplicateService
 
-                await EmbeddingService().index_content(content_id)
-            except Exception as e:
-                logger.warning("语义索引失败(已忽略): content_id={}, error={}", content_id, e)
+        try:
+            return await NearDuplicateService().check(session, content, parsed.title, parsed.body)
+        except Exception as e:
+            logger.warning(f"近似重复检测失败: {type(e).__name__}: {e}")
+            return None
 
-        asyncio.create_task(_run())
+    def _schedule_embedding_index(self, content_id: int) -> None:
+        # 进入批处理队列，与其他新解析内容合并生成向量
+        from app.services.embedding_queue import get_embedding_queue
+
+        get_embedding_queue().enqueue(content_id)
 
     async def _handle_parse_error(self, session, content, task_data, error, attempt, max_attempts):
         """处理解析错误"""
@@ -291,6 +302,9 @@ class ContentParser:
 
     async def _check_auto_approval(self, session, content):
         """M4: 解析完成后尝试自动审批"""
+        if content.duplicate_of_id is not None:
+            logger.info(f"近似重复内容不自动分发: content_id={content.id}, duplicate_of={content.duplicate_of_id}")
+            return
         try:
             from app.services.distribution.decision import (
                 check_match_conditions,
@@ -692,11 +706,13 @@ class ContentParser:
         # 处理视频
         if archive.get("videos"):
             max_videos = getattr(settings, "archive_video_max_count", None)
+            max_video_bytes = await get_setting_value("archive_video_max_bytes", settings.archive_video_max_bytes)
             await store_archive_videos(
                 archive=archive,
                 storage=storage,
                 namespace=namespace,
                 max_videos=max_videos,
+                max_bytes=int(max_video_bytes) if max_video_bytes else None,
             )
             
             stored_videos = archive.get("stored_videos", [])
@@ -777,9 +793,8 @@ class ContentParser:
                 if parsed_like.author_avatar_url:
                     content.author_avatar_url = parsed_like.author_avatar_url
                 if isinstance(parsed_like.rich_payload, dict):
-                    # 需要新对象触发 ORM 脏检查，避免 JSON 原地修改不落库。
+                    # 大字段赋值即重新压缩落库；拷贝一份，避免与解析结果共享可变对象
                     content.rich_payload = copy.deepcopy(parsed_like.rich_payload)
-                    flag_modified(content, "rich_payload")
                 if parsed_like.media_urls:
                     content.media_urls = sanitize_media_urls(
                         parsed_like.media_urls,
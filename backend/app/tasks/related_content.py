@@ -0,0 +1,44 @@
+"""
+相似内容预计算任务
+
+定期补算缺失、向量签名过期或超过有效期的近邻列表（见 RelatedContentService）。
+新解析内容的近邻由语义索引队列在写入向量后增量计算，这里只做兜底与全量刷新。
+"""
+import asyncio
+
+from loguru import logger
+
+from app.core.config import settings
+from app.services.related_content import RelatedContentService
+
+
+class RelatedContentTask:
+    """相似内容预计算任务"""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _refresh_loop(self):
+        logger.info("Related content task started")
+        interval = max(60, int(settings.related_content_refresh_interval_seconds))
+        while True:
+            try:
+                await RelatedContentService().refresh_stale()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Related content refresh error: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,79 @@
+"""
+存储维护任务
+
+定期执行：
+- 媒体 GC：清理无人引用的归档媒体文件（见 MediaGarbageCollector）
+- 打包存储压缩：回收段文件中已删除/覆盖对象占用的空间（启用打包时）
+- 全量校准存储用量台账，修正增量计数的漂移（进程崩溃、手工删改文件等）
+"""
+import asyncio
+import time
+
+from loguru import logger
+
+from app.adapters.storage import get_storage_backend
+from app.core.config import settings
+from app.services.media_gc_service import MediaGarbageCollector
+
+
+class StorageMaintenanceTask:
+    """存储维护任务（媒体 GC + 用量台账校准）"""
+
+    def __init__(self):
+        self._task: asyncio.Task | None = None
+
+    def start(self):
+        if self._task and not self._task.done():
+            return
+        self._task = asyncio.create_task(self._maintenance_loop())
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _maintenance_loop(self):
+        """按上次校准时间排期：从未校准或已过期时立即执行，之后按配置间隔执行"""
+        logger.info("Storage maintenance task started")
+        interval = max(60, int(settings.storage_usage_reconcile_interval_seconds))
+        while True:
+            try:
+                delay = await self._seconds_until_due(interval)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                if settings.storage_gc_enabled:
+                    await self.collect_garbage(dry_run=settings.storage_gc_dry_run)
+                await self.compact_packs()
+                await self.reconcile_usage()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Storage maintenance error: {e}")
+                await asyncio.sleep(interval)
+
+    async def _seconds_until_due(self, interval: int) -> float:
+        storage = get_storage_backend()
+        snapshot = await asyncio.to_thread(storage.usage.snapshot)
+        reconciled_at = snapshot.get("reconciled_at")
+        if reconciled_at is None:
+            return 0
+        return max(0.0, reconciled_at + interval - time.time())
+
+    async def collect_garbage(self, *, dry_run: bool) -> dict:
+        collector = MediaGarbageCollector(get_storage_backend())
+        report = await collector.run(grace_seconds=settings.storage_gc_grace_seconds, dry_run=dry_run)
+        return report.to_dict()
+
+    async def compact_packs(self) -> dict | None:
+        storage = get_storage_backend()
+        return await storage.compact_packs(garbage_ratio=settings.storage_pack_compact_garbage_ratio)
+
+    async def reconcile_usage(self) -> dict:
+        storage = get_storage_backend()
+        totals = await storage.reconcile_usage()
+        total_bytes = sum(v["bytes"] for v in totals.values())
+        logger.info(f"Storage usage reconciled: total_bytes={total_bytes}")
+        return totals
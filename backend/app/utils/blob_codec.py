@@ -0,0 +1,76 @@
+"""
+内容大字段的 zstd 编解码
+
+- 每个字段单独一个 zstd 帧；JSON 字段先序列化为紧凑文本，正文按 UTF-8 原样压缩
+- 可选的训练字典以原始字节传入；字典只增不改，按字典头（魔数 + dictID）缓存解析结果
+- 压缩器/解压器按次创建：SQLite 自定义函数可能在多个连接线程里同时调用，zstd 上下文不能共享
+"""
+from __future__ import annotations
+
+import json
+from typing import Any, Optional
+
+import zstandard
+
+from app.core.config import settings
+
+BLOB_FIELDS = ("body", "rich_payload", "archive_metadata")
+JSON_FIELDS = frozenset({"rich_payload", "archive_metadata"})
+
+_dictionaries: dict[tuple[int, bytes], zstandard.ZstdCompressionDict] = {}
+
+
+def _dictionary(dict_data: Optional[bytes]) -> Optional[zstandard.ZstdCompressionDict]:
+    if not dict_data:
+        return None
+    data = bytes(dict_data)
+    key = (len(data), data[:8])
+    zdict = _dictionaries.get(key)
+    if zdict is None:
+        zdict = _dictionaries[key] = zstandard.ZstdCompressionDict(data)
+    return zdict
+
+
+def serialize_field(name: str, value: Any) -> Optional[str]:
+    """字段值转为待压缩的文本；JSON 字段的 None 与 JSON null 一样不存储"""
+    if value is None:
+        return None
+    if name in JSON_FIELDS:
+        return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+    return str(value)
+
+
+def compress_text(text: str, dict_data: Optional[bytes] = None) -> bytes:
+    zdict = _dictionary(dict_data)
+    kwargs = {"dict_data": zdict} if zdict is not None else {}
+    return zstandard.ZstdCompressor(level=settings.content_blob_zstd_level, **kwargs).compress(text.encode("utf-8"))
+
+
+def decompress_text(data: Optional[bytes], dict_data: Optional[bytes] = None) -> Optional[str]:
+    if data is None:
+        return None
+    zdict = _dictionary(dict_data)
+    kwargs = {"dict_data": zdict} if zdict is not None else {}
+    return zstandard.ZstdDecompressor(**kwargs).decompress(bytes(data)).decode("utf-8")
+
+
+def encode_field(name: str, value: Any, dict_data: Optional[bytes] = None) -> Optional[bytes]:
+    text = serialize_field(name, value)
+    return compress_text(text, dict_data) if text is not None else None
+
+
+def decode_field(name: str, data: Optional[bytes], dict_data: Optional[bytes] = None) -> Any:
+    text = decompress_text(data, dict_data)
+    if text is None:
+        return None
+    return json.loads(text) if name in JSON_FIELDS else text
+
+
+def train_dictionary(samples: list[bytes], dict_size: Optional[int] = None) -> bytes:
+    """按样本训练字典，返回字典原始字节；样本不足时 zstandard 抛 ZstdError"""
+    zdict = zstandard.train_dictionary(
+        dict_size or settings.content_blob_dict_size,
+        samples,
+        level=settings.content_blob_zstd_level,
+    )
+    return zdict.as_bytes()
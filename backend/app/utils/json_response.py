@@ -0,0 +1,20 @@
+"""
+快速 JSON 响应工具模块
+
+列表接口由查询行直接组装 dict，用 orjson 一次序列化为字节，跳过 Pydantic 模型校验与逐字段序列化。
+输出格式与 schemas 一致：无时区的 datetime 视为 UTC 并以 Z 结尾（同 UtcDatetime），枚举输出其值。
+"""
+from typing import Any
+
+import orjson
+from fastapi import Response
+
+_OPTIONS = orjson.OPT_NAIVE_UTC | orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+
+def dumps(payload: Any) -> bytes:
+    return orjson.dumps(payload, option=_OPTIONS)
+
+
+def json_response(payload: Any, status_code: int = 200) -> Response:
+    return Response(content=dumps(payload), status_code=status_code, media_type="application/json")
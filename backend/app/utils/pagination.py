@@ -0,0 +1,25 @@
+"""
+游标分页工具模块
+
+列表按 (created_at, id) 倒序排列，游标编码最后一条的排序键；
+下一页用行值比较 (created_at, id) < 游标 直接从索引定位，不随页深变慢。
+游标对客户端不透明（URL 安全 base64 的 JSON）。
+"""
+import base64
+import json
+from datetime import datetime
+
+
+def encode_cursor(created_at: datetime, content_id: int) -> str:
+    payload = json.dumps([created_at.isoformat(), int(content_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """解析游标，格式不合法时抛出 ValueError"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, content_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(content_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("无效的分页游标") from e
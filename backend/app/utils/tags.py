@@ -1,6 +1,11 @@
 import re
 from typing import List, Optional, Union, Any
 
+def normalize_tag(tag: str) -> str:
+    """单个标签的规范形式（去首尾空白 + 小写），用于索引与匹配"""
+    return tag.strip().lower()
+
+
 def normalize_tags(tags: Optional[Union[List[str], str]] = None, tags_text: Optional[str] = None, lower: bool = False) -> List[str]:
     """
     统一标签清洗逻辑。
@@ -41,9 +46,7 @@ def normalize_tags(tags: Optional[Union[List[str], str]] = None, tags_text: Opti
     seen: set[str] = set()
     
     for raw in candidates:
-        clean = raw.strip()
-        if lower:
-            clean = clean.lower()
+        clean = normalize_tag(raw) if lower else raw.strip()
             
         if not clean:
             continue
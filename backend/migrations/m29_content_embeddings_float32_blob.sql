@@ -0,0 +1,5 @@
+-- Store content embeddings as packed float32 BLOBs instead of JSON lists.
+-- Existing JSON vectors are converted lazily by the vector matrix cache on first load.
+ALTER TABLE content_embeddings ADD COLUMN embedding_blob BLOB;
+ALTER TABLE content_embeddings ADD COLUMN embedding_dim INTEGER;
+CREATE INDEX IF NOT EXISTS ix_content_embeddings_model_updated ON content_embeddings (embedding_model, updated_at);
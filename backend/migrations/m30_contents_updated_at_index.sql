@@ -0,0 +1,2 @@
+-- Index contents.updated_at so the search cache can read the data watermark with an index seek.
+CREATE INDEX IF NOT EXISTS ix_contents_updated_at ON contents (updated_at);
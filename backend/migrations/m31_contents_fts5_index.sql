@@ -0,0 +1,12 @@
+-- Full-text index for contents (FTS5), kept in sync by triggers on contents.
+-- CJK runs are indexed as overlapping bigrams by the vs_fts_segment() function, which the
+-- application registers on every SQLite connection; init_db applies this automatically.
+-- Rows are backfilled by init_db when the index is empty, or manually: python -m app.core.fts rebuild
+DROP TABLE IF EXISTS contents_fts;
+DROP TRIGGER IF EXISTS contents_fts_ai;
+DROP TRIGGER IF EXISTS contents_fts_ad;
+DROP TRIGGER IF EXISTS contents_fts_au;
+CREATE VIRTUAL TABLE contents_fts USING fts5(title, author, tags, summary, body, tokenize = 'unicode61 remove_diacritics 2');
+CREATE TRIGGER contents_fts_ai AFTER INSERT ON contents BEGIN INSERT INTO contents_fts(rowid, title, author, tags, summary, body) VALUES (new.id, vs_fts_segment(new.title), vs_fts_segment(new.author_name), vs_fts_segment((SELECT group_concat(value, ' ') FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags END))), vs_fts_segment(new.summary), vs_fts_segment(new.body)); END;
+CREATE TRIGGER contents_fts_ad AFTER DELETE ON contents BEGIN DELETE FROM contents_fts WHERE rowid = old.id; END;
+CREATE TRIGGER contents_fts_au AFTER UPDATE OF title, author_name, tags, summary, body ON contents BEGIN DELETE FROM contents_fts WHERE rowid = old.id; INSERT INTO contents_fts(rowid, title, author, tags, summary, body) VALUES (new.id, vs_fts_segment(new.title), vs_fts_segment(new.author_name), vs_fts_segment((SELECT group_concat(value, ' ') FROM json_each(CASE WHEN json_valid(new.tags) THEN new.tags END))), vs_fts_segment(new.summary), vs_fts_segment(new.body)); END;
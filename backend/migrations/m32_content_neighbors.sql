@@ -0,0 +1,9 @@
+-- Precomputed "more like this" neighbours: one row per content with packed ids and scores.
+CREATE TABLE IF NOT EXISTS content_neighbors (
+    content_id INTEGER NOT NULL PRIMARY KEY REFERENCES contents(id) ON DELETE CASCADE,
+    embedding_model VARCHAR(100) NOT NULL,
+    neighbor_ids BLOB NOT NULL,
+    scores BLOB NOT NULL,
+    computed_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS ix_content_neighbors_computed_at ON content_neighbors (computed_at);
@@ -0,0 +1,17 @@
+-- Near-duplicate detection: SimHash fingerprints with LSH band indexes, and the duplicate decision on contents.
+ALTER TABLE contents ADD COLUMN duplicate_of_id INTEGER REFERENCES contents(id) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS ix_contents_duplicate_of_id ON contents (duplicate_of_id);
+
+CREATE TABLE IF NOT EXISTS content_fingerprints (
+    content_id INTEGER NOT NULL PRIMARY KEY REFERENCES contents(id) ON DELETE CASCADE,
+    simhash INTEGER NOT NULL,
+    band0 INTEGER NOT NULL,
+    band1 INTEGER NOT NULL,
+    band2 INTEGER NOT NULL,
+    band3 INTEGER NOT NULL,
+    created_at DATETIME
+);
+CREATE INDEX IF NOT EXISTS ix_content_fingerprints_band0 ON content_fingerprints (band0);
+CREATE INDEX IF NOT EXISTS ix_content_fingerprints_band1 ON content_fingerprints (band1);
+CREATE INDEX IF NOT EXISTS ix_content_fingerprints_band2 ON content_fingerprints (band2);
+CREATE INDEX IF NOT EXISTS ix_content_fingerprints_band3 ON content_fingerprints (band3);
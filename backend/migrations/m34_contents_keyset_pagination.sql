@@ -0,0 +1,2 @@
+-- Keyset pagination for /contents and /cards walks (filter, created_at, id) in index order.
+CREATE INDEX IF NOT EXISTS ix_contents_review_status_created_at ON contents (review_status, created_at);
@@ -0,0 +1,18 @@
+-- Normalized tag index: one row per (content, normalized tag), plus per-tag usage counts.
+-- Both tables are kept in sync by triggers that call vs_tag_norm(), which the application registers
+-- on every SQLite connection; init_db installs the triggers and backfills when content_tags is empty,
+-- or manually: python -m app.core.content_tags rebuild
+CREATE TABLE IF NOT EXISTS content_tags (
+    content_id INTEGER NOT NULL REFERENCES contents(id) ON DELETE CASCADE,
+    tag_norm VARCHAR(200) NOT NULL,
+    name VARCHAR(200) NOT NULL,
+    PRIMARY KEY (content_id, tag_norm)
+);
+CREATE INDEX IF NOT EXISTS ix_content_tags_tag_norm_content_id ON content_tags (tag_norm, content_id);
+
+CREATE TABLE IF NOT EXISTS tag_counts (
+    tag_norm VARCHAR(200) NOT NULL PRIMARY KEY,
+    name VARCHAR(200) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS ix_tag_counts_count ON tag_counts (count);
@@ -0,0 +1,11 @@
+-- Precomputed dashboard counters (parse status, platform, distribution buckets per rule).
+-- Kept up to date by triggers on contents / content_queue_items and reconciled periodically;
+-- init_db installs the triggers and backfills when the table is empty,
+-- or manually: python -m app.core.dashboard_counters rebuild
+CREATE TABLE IF NOT EXISTS dashboard_counters (
+    metric VARCHAR(32) NOT NULL,
+    dim VARCHAR(64) NOT NULL DEFAULT '',
+    bucket VARCHAR(32) NOT NULL,
+    count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (metric, dim, bucket)
+);
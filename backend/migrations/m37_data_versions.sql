@@ -0,0 +1,7 @@
+-- Per-table data versions used by the ETag response cache.
+-- Triggers bump the row for a table on every insert/update/delete; init_db installs them
+-- (see app.core.data_versions). Missing rows read as version 0.
+CREATE TABLE IF NOT EXISTS data_versions (
+    name VARCHAR(64) NOT NULL PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0
+);
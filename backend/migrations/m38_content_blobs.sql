@@ -0,0 +1,20 @@
+-- Bulky content fields (body, rich_payload, archive_metadata) move to a compressed side table.
+-- Each field is one zstd frame, compressed with the dictionary referenced by dict_id (trained from
+-- existing content, see app.core.content_blobs). Copy existing rows online in chunks while the old
+-- version is still serving:  python -m app.core.content_blobs migrate
+-- init_db on the new version copies the remainder and clears the old columns; dropping them
+-- (table rewrite) is optional:  python -m app.core.content_blobs finalize --drop-columns --vacuum
+CREATE TABLE IF NOT EXISTS content_blob_dicts (
+    id INTEGER NOT NULL PRIMARY KEY,
+    data BLOB NOT NULL,
+    sample_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME
+);
+
+CREATE TABLE IF NOT EXISTS content_blobs (
+    content_id INTEGER NOT NULL PRIMARY KEY REFERENCES contents(id) ON DELETE CASCADE,
+    dict_id INTEGER REFERENCES content_blob_dicts(id),
+    body BLOB,
+    rich_payload BLOB,
+    archive_metadata BLOB
+);
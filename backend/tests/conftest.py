@@ -2,6 +2,8 @@
 Pytest Fixtures for Backend Tests
 """
 import os
+import shutil
+import tempfile
 import pytest
 import asyncio
 from typing import AsyncGenerator, Dict, List
@@ -10,6 +12,9 @@ from httpx import AsyncClient, ASGITransport
 # Set test database path in environment before importing app/settings
 TEST_DB_PATH = os.path.abspath("data/test_vaultstream.db")
 os.environ["SQLITE_DB_PATH"] = TEST_DB_PATH
+# Keep storage side files (usage ledger, proxy cache index, packs) out of the working tree
+TEST_STORAGE_ROOT = tempfile.mkdtemp(prefix="vaultstream-test-storage-")
+os.environ["STORAGE_LOCAL_ROOT"] = TEST_STORAGE_ROOT
 
 from app.main import app
 from app.core.config import settings
@@ -48,6 +53,7 @@ async def setup_test_db():
     yield
 
     await engine.dispose()
+    shutil.rmtree(TEST_STORAGE_ROOT, ignore_errors=True)
 
 @pytest.fixture(scope="session")
 def event_loop():
@@ -0,0 +1,110 @@
+"""
+Tests for app.services.ann_index — IVF-Flat index and its integration with the vector matrix cache.
+"""
+import asyncio
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.models import Content, ContentEmbedding, ContentStatus
+from app.models.base import Base
+from app.services.ann_index import IVFFlatIndex, nearest_centroids, train_centroids
+from app.services.vector_cache import VectorMatrixCache, pack_vector
+
+
+def _clustered(rows: int, dim: int, seed: int = 0, noise: float = 0.3) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((20, dim))
+    vectors = centers[rng.integers(0, 20, rows)] + rng.standard_normal((rows, dim)) * noise
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _recall(found, expected) -> float:
+    return len({cid for cid, _ in found} & {cid for cid, _ in expected}) / len(expected)
+
+
+def test_ivf_search_matches_exact_and_supports_incremental_updates():
+    vectors = _clustered(4000, 32)
+    ids = np.arange(100, 4100, dtype=np.int64)
+    index = IVFFlatIndex(train_centroids(vectors[::4], 64, seed=1))
+    index.load_labels(nearest_centroids(vectors, index.centroids))
+    assert index.size == 4000
+
+    query = vectors[7].copy()
+    exact_scores = vectors @ query
+    expected = [(int(ids[i]), 0.0) for i in np.argsort(exact_scores)[::-1][:10]]
+    assert _recall(index.search(vectors, ids, query, 10, nprobe=8), expected) >= 0.9
+    # 探查全部列表即精确结果
+    assert _recall(index.search(vectors, ids, query, 10, nprobe=64), expected) == 1.0
+
+    # 删除：行号标记为 -1 的行被跳过；移出倒排表后不再作为候选
+    ids[7] = -1
+    index.discard(7)
+    assert 107 not in [cid for cid, _ in index.search(vectors, ids, query, 10, nprobe=64)]
+    assert index.size == 3999
+
+    # 复用行号写入新向量
+    ids[7] = 9999
+    vectors[7] = -query
+    index.add(7, vectors[7])
+    assert index.search(vectors, ids, -query, 1, nprobe=1)[0][0] == 9999
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'ann.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_cache_builds_persists_and_reloads_ann_index(db_session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_ann_min_rows", 100)
+    monkeypatch.setattr(settings, "embedding_ann_nprobe", 4)
+    monkeypatch.setattr(settings, "embedding_index_dir", str(tmp_path / "index"))
+    model = f"ann-{uuid.uuid4().hex[:8]}"
+    # 簇间距远大于簇内噪声：近邻都落在查询所在簇，召回不依赖聚类的随机性
+    vectors = _clustered(300, 16, seed=3, noise=0.05)
+
+    for i, vector in enumerate(vectors):
+        url = f"https://example.com/ann/{i}"
+        content = Content(platform="zhihu", url=url, canonical_url=url, title=str(i), status=ContentStatus.PARSE_SUCCESS)
+        db_session.add(content)
+        await db_session.flush()
+        db_session.add(ContentEmbedding(
+            content_id=content.id,
+            embedding_model=model,
+            embedding_blob=pack_vector(vector),
+            embedding_dim=16,
+        ))
+    await db_session.commit()
+
+    cache = VectorMatrixCache()
+    matrix = await cache.get(db_session, model)
+    assert matrix.ann is None  # 构建在后台进行，首次检索走精确路径
+    await asyncio.gather(*cache._builds.values())
+    assert matrix.ann is not None and matrix.ann.size == 300
+
+    query = vectors[0]
+    approx = matrix.top_k(query, 10)
+    assert _recall(approx, matrix.top_k(query, 10, exact=True)) >= 0.9
+    assert (tmp_path / "index").exists()
+
+    # 增量删除/写入同步到倒排表
+    first = approx[0][0]
+    matrix.remove(first)
+    assert first not in [cid for cid, _ in matrix.top_k(query, 10)]
+    matrix.upsert(first, query)
+    assert matrix.top_k(query, 1)[0][0] == first
+
+    # 新进程：直接从快照加载矩阵与索引，不再全量读库
+    reloaded = await VectorMatrixCache().get(db_session, model)
+    assert reloaded.ann is not None
+    assert reloaded.size == 300
+    assert [cid for cid, _ in reloaded.top_k(query, 10)] == [cid for cid, _ in approx]
@@ -50,6 +50,22 @@ class TestCardsAPI:
         assert "author_name" in card
         assert "review_status" in card
 
+    @pytest.mark.asyncio
+    async def test_list_cards_cursor_pagination(self, client: AsyncClient):
+        await self._setup_content(client)
+        await self._setup_content(client)
+
+        first = (await client.get("/api/v1/cards?size=1")).json()
+        assert first["has_more"] is True and first["next_cursor"]
+        assert first["total"] >= 2
+
+        second = (await client.get(f"/api/v1/cards?size=1&cursor={first['next_cursor']}")).json()
+        assert second["total"] is None  # 游标续页默认不统计总数
+        assert second["items"][0]["id"] != first["items"][0]["id"]
+
+        response = await client.get("/api/v1/cards?cursor=invalid")
+        assert response.status_code == 400
+
     @pytest.mark.asyncio
     async def test_get_single_card(self, client: AsyncClient):
         content_id = await self._setup_content(client)
@@ -0,0 +1,156 @@
+"""
+Tests for app.core.content_blobs — compressed side table for bulky content fields and its online migration.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import select, text
+from sqlalchemy.exc import InvalidRequestError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import raiseload
+
+from app.core.content_blobs import (
+    drop_legacy_columns,
+    legacy_columns,
+    migrate_legacy_blobs,
+    train_blob_dictionary,
+)
+from app.core.fts import ensure_fts
+from app.models import Content, ContentBlob
+from app.models.base import Base
+from app.repositories.content_repository import ContentRepository
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'blobs.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        await conn.run_sync(ensure_fts)
+    yield engine
+    await engine.dispose()
+
+
+def _body(i: int) -> str:
+    return f"第 {i} 篇：向量检索与全文索引的实践笔记。" + "正文段落，记录索引、压缩与分页的细节。" * (5 + i % 7)
+
+
+def _payload(i: int) -> dict:
+    return {"blocks": [{"type": "text", "text": f"段落 {i}"}, {"type": "image", "url": f"local://media/{i}.png"}]}
+
+
+def _content(i: int, **fields) -> Content:
+    url = f"https://example.com/blobs/{uuid.uuid4().hex}"
+    return Content(platform="zhihu", url=url, canonical_url=url, title=f"标题 {i}", **fields)
+
+
+@pytest.mark.asyncio
+async def test_fields_roundtrip_through_dictionary_compressed_blobs(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        session.add_all(_content(i, body=_body(i), rich_payload=_payload(i)) for i in range(250))
+        session.add(_content(-1))
+        await session.commit()
+
+    async with engine.begin() as conn:
+        dict_id = await conn.run_sync(train_blob_dictionary, [])
+    assert dict_id is not None
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        content = _content(999, body=_body(999), archive_metadata={"source": "备份"})
+        session.add(content)
+        await session.commit()
+        content_id = content.id
+        assert content.blob.dict_id == dict_id
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        content = await session.get(Content, content_id)
+        assert content.body == _body(999)
+        assert content.archive_metadata == {"source": "备份"} and content.rich_payload is None
+        assert len(content.blob.body) < len(_body(999).encode("utf-8")) // 4
+
+        # 已入库的行沿用自己的字典
+        content.rich_payload = _payload(999)
+        content.body = "改写后的正文"
+        await session.commit()
+
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        content = await session.get(Content, content_id)
+        assert content.rich_payload == _payload(999) and content.body == "改写后的正文"
+        empty = (await session.execute(select(Content).where(Content.title == "标题 -1"))).scalar_one()
+        assert empty.blob is None and empty.body is None
+
+        # 列表查询不加载副表
+        listed = (await session.execute(select(Content).options(raiseload(Content.blob)).limit(1))).scalar_one()
+        with pytest.raises(InvalidRequestError):
+            listed.body
+
+
+@pytest.mark.asyncio
+async def test_fts_and_fallback_search_read_compressed_body(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        content = _content(1, body="关于机器学习的长文")
+        session.add(content)
+        await session.commit()
+        repo = ContentRepository(session)
+
+        assert (await repo.list_contents(q="机器学习"))[1] == 1
+        content.body = "改为讨论数据库"
+        await session.commit()
+        assert (await repo.list_contents(q="机器学习"))[1] == 0
+        assert (await repo.list_contents(q="数据库"))[1] == 1
+
+        await session.execute(text("DROP TABLE contents_fts"))
+        assert (await repo.list_contents(q="讨论数据"))[1] == 1
+
+
+async def _legacy_engine(tmp_path):
+    """模拟旧库：contents 上仍有三列大字段（旧版本写入的数据）"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'legacy.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        for name, type_ in (("body", "TEXT"), ("rich_payload", "JSON"), ("archive_metadata", "JSON")):
+            await conn.execute(text(f"ALTER TABLE contents ADD COLUMN {name} {type_}"))
+    async with AsyncSession(engine) as session:
+        session.add_all(_content(i) for i in range(300))
+        await session.commit()
+    async with engine.begin() as conn:
+        await conn.execute(
+            text("UPDATE contents SET body = :body, rich_payload = :payload, archive_metadata = 'null' WHERE id = :id"),
+            [{"id": i + 1, "body": _body(i), "payload": f'{{"n": {i}}}'} for i in range(300)],
+        )
+    return engine
+
+
+@pytest.mark.asyncio
+async def test_online_migration_copies_then_finalizes_legacy_columns(tmp_path):
+    engine = await _legacy_engine(tmp_path)
+    try:
+        # 旧版本仍在服务：只复制，不动旧列
+        assert await migrate_legacy_blobs(engine, finalize=False, chunk_size=64) == 300
+        async with engine.begin() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM contents WHERE body IS NOT NULL"))).scalar() == 300
+            # 复制之后旧版本改写了一行：副本作废
+            await conn.execute(text("UPDATE contents SET body = '旧版本改写' WHERE id = 5"))
+            assert (await conn.execute(text("SELECT count(*) FROM content_blobs"))).scalar() == 299
+        async with AsyncSession(engine) as session:
+            session.add(_content(300))
+            await session.commit()
+        async with engine.begin() as conn:
+            await conn.execute(text("UPDATE contents SET body = '新增' WHERE id = 301"))
+
+        # 新版本收尾：补齐并清空旧列
+        assert await migrate_legacy_blobs(engine, finalize=True, chunk_size=64) == 2
+        async with engine.begin() as conn:
+            assert (await conn.execute(text("SELECT count(*) FROM contents WHERE body IS NOT NULL"))).scalar() == 0
+            assert (await conn.execute(text("SELECT count(DISTINCT dict_id) FROM content_blobs"))).scalar() == 1
+            assert await conn.run_sync(drop_legacy_columns) == ["body", "rich_payload", "archive_metadata"]
+            assert await conn.run_sync(legacy_columns) == []
+
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            rows = {c.id: c for c in (await session.execute(select(Content).where(Content.id.in_([1, 5, 301])))).scalars()}
+            assert rows[1].body == _body(0) and rows[1].rich_payload == {"n": 0} and rows[1].archive_metadata is None
+            assert rows[5].body == "旧版本改写"
+            assert rows[301].body == "新增"
+            assert (await session.execute(select(ContentBlob).where(ContentBlob.content_id == 301))).scalar_one()
+    finally:
+        await engine.dispose()
@@ -0,0 +1,80 @@
+"""
+Tests for projection-only /contents and /cards list queries and their orjson responses.
+"""
+import json
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import Content, ContentStatus, LayoutType, ReviewStatus
+from app.models.base import Base
+from app.repositories.content_repository import ContentRepository
+from app.schemas import ContentListItemResponse, ShareCardListResponse
+from app.services.content_presenter import build_list_item, build_share_card
+from app.utils.json_response import dumps
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'projection.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def _seed(session) -> None:
+    for i, (platform, layout) in enumerate((("bilibili", LayoutType.VIDEO), ("weibo", None))):
+        url = f"https://example.com/projection/{uuid.uuid4().hex}"
+        session.add(Content(
+            platform=platform,
+            url=url,
+            canonical_url=url,
+            title=f"projection {i}" if i == 0 else None,
+            body="正文" * 10_000,
+            rich_payload={"blocks": [{"type": "text", "data": {"text": "x" * 1000}}]},
+            archive_metadata={"raw": "y" * 1000},
+            cover_url="local://covers/a.webp" if i == 0 else "https://img.example.com/b.jpg",
+            tags=["ai", "daily"] if i == 0 else None,
+            status=ContentStatus.PARSE_SUCCESS,
+            layout_type=layout,
+            review_status=ReviewStatus.APPROVED if i == 0 else None,
+            created_at=datetime(2024, 5, 1, 12, 0, i, 123456 * i),
+            published_at=datetime(2024, 4, 30) if i == 0 else None,
+        ))
+    await session.commit()
+
+
+def _page(items) -> dict:
+    return {"items": items, "total": len(items), "page": 1, "size": 20, "has_more": False, "next_cursor": None}
+
+
+@pytest.mark.asyncio
+async def test_list_items_skip_heavy_columns_and_match_schema(db_session):
+    await _seed(db_session)
+    rows, total = await ContentRepository(db_session).list_content_items()
+    assert total == 2
+    assert all("body" not in row._fields and "rich_payload" not in row._fields for row in rows)
+
+    payload = _page([build_list_item(row) for row in rows])
+    expected = ContentListItemResponse.model_validate(payload).model_dump(mode="json")
+    assert json.loads(dumps(payload)) == expected
+    assert expected["items"][0]["created_at"].endswith("Z")
+
+
+@pytest.mark.asyncio
+async def test_cards_skip_heavy_columns_and_match_schema(db_session):
+    await _seed(db_session)
+    rows, _ = await ContentRepository(db_session).list_cards(size=10)
+    assert all("body" not in row._fields and "archive_metadata" not in row._fields for row in rows)
+
+    payload = _page([build_share_card(row, "http://vault.test") for row in rows])
+    expected = ShareCardListResponse.model_validate(payload).model_dump(mode="json")
+    assert json.loads(dumps(payload)) == expected
+
+    by_platform = {item["platform"]: item for item in expected["items"]}
+    assert by_platform["bilibili"]["thumbnail_url"] == "http://vault.test/api/v1/media/covers/a.webp?size=thumb"
+    assert by_platform["weibo"]["effective_layout_type"] == "gallery"
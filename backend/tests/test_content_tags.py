@@ -0,0 +1,83 @@
+"""
+Tests for app.core.content_tags — trigger-maintained content_tags / tag_counts and the queries that use them.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import delete, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.content_tags import ensure_content_tags
+from app.models import Content, ContentTag, TagCount
+from app.models.base import Base
+from app.repositories.content_repository import ContentRepository
+from app.routers.system import get_tags_list
+from app.services.distribution.decision import DECISION_FILTERED, check_match_conditions
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'tags.db'}")
+    async with engine.begin() as conn:
+        # create_all 的 after_create 钩子安装触发器
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def _add(session, tags) -> Content:
+    url = f"https://example.com/tags/{uuid.uuid4().hex}"
+    content = Content(platform="zhihu", url=url, canonical_url=url, tags=tags)
+    session.add(content)
+    await session.commit()
+    return content
+
+
+async def _counts(session) -> dict:
+    return {row.tag_norm: (row.name, row.count) for row in (await session.execute(select(TagCount))).scalars()}
+
+
+@pytest.mark.asyncio
+async def test_triggers_maintain_tag_rows_and_counts(db_session):
+    a = await _add(db_session, ["AI", "编程", "ai"])
+    b = await _add(db_session, ["ai", " Daily "])
+    await _add(db_session, None)
+
+    assert await _counts(db_session) == {"ai": ("AI", 2), "编程": ("编程", 1), "daily": ("Daily", 1)}
+
+    repo = ContentRepository(db_session)
+    items, total = await repo.list_contents(tags=["Ai"])
+    assert total == 2
+    items, total = await repo.list_cards(tags=["daily", "编程"])
+    assert {c.id for c in items} == {a.id, b.id}
+    assert (await repo.list_contents(tags=["missing"]))[1] == 0
+
+    b.tags = ["编程"]
+    await db_session.commit()
+    assert await _counts(db_session) == {"ai": ("AI", 1), "编程": ("编程", 2)}
+
+    await db_session.execute(delete(Content).where(Content.id == a.id))
+    await db_session.commit()
+    assert await _counts(db_session) == {"编程": ("编程", 1)}
+    assert await get_tags_list(db=db_session, _=None) == [{"name": "编程", "count": 1}]
+
+    # 标签表为空时 ensure 回填
+    await db_session.execute(delete(ContentTag))
+    await db_session.execute(delete(TagCount))
+    await db_session.commit()
+    connection = await db_session.connection()
+    await connection.run_sync(ensure_content_tags)
+    assert await _counts(db_session) == {"编程": ("编程", 1)}
+
+    plan = (await db_session.execute(text(
+        "EXPLAIN QUERY PLAN SELECT content_id FROM content_tags WHERE tag_norm IN ('ai', 'daily')"
+    ))).all()
+    assert "ix_content_tags_tag_norm_content_id" in str(plan)
+
+
+def test_match_conditions_normalizes_tags_once():
+    content = Content(platform="zhihu", url="u", tags=["AI", "Daily"], is_nsfw=False)
+    assert check_match_conditions(content, {"tags": ["ai"], "tags_match_mode": "all"}).bucket != DECISION_FILTERED
+    decision = check_match_conditions(content, {"tags_exclude": "daily, news"})
+    assert decision.bucket == DECISION_FILTERED and decision.reason_code == "tags_excluded"
@@ -0,0 +1,169 @@
+"""
+Tests for app.core.dashboard_counters — trigger-maintained dashboard counters and periodic reconcile.
+"""
+import uuid
+from datetime import datetime
+
+import pytest
+from sqlalchemy import delete, event, select, text, update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.dashboard_counters import reconcile_counters
+from app.models import (
+    BotChat,
+    BotChatType,
+    BotConfig,
+    BotConfigPlatform,
+    Content,
+    ContentQueueItem,
+    ContentStatus,
+    DiscoveryState,
+    DistributionRule,
+    QueueItemStatus,
+)
+from app.models.base import Base
+from app.services.dashboard_service import build_distribution_stats, build_parse_stats, build_platform_counts
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'counters.db'}")
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def _foreign_keys(dbapi_conn, connection_record):
+        dbapi_conn.execute("PRAGMA foreign_keys=ON")
+
+    async with engine.begin() as conn:
+        # create_all 的 after_create 钩子安装触发器
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db_session(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+async def _add_content(session, status=ContentStatus.PARSE_SUCCESS, platform="bilibili", **kwargs) -> Content:
+    url = f"https://example.com/counters/{uuid.uuid4().hex}"
+    content = Content(platform=platform, url=url, canonical_url=url, status=status, **kwargs)
+    session.add(content)
+    await session.commit()
+    return content
+
+
+async def _add_rule_with_chats(session, chat_count: int) -> tuple[DistributionRule, list[BotChat]]:
+    uid = uuid.uuid4().hex[:8]
+    bot_config = BotConfig(platform=BotConfigPlatform.TELEGRAM, name=f"counter_bot_{uid}")
+    rule = DistributionRule(name=f"counter_rule_{uid}", match_conditions={})
+    session.add_all([bot_config, rule])
+    await session.flush()
+    chats = [
+        BotChat(
+            bot_config_id=bot_config.id,
+            chat_id=f"counter_chat_{i}_{uid}",
+            chat_type=BotChatType.CHANNEL,
+            enabled=True,
+            is_accessible=True,
+        )
+        for i in range(chat_count)
+    ]
+    session.add_all(chats)
+    await session.commit()
+    return rule, chats
+
+
+async def _enqueue(session, content, rule, chat, status, next_attempt_at=None) -> ContentQueueItem:
+    item = ContentQueueItem(
+        content_id=content.id,
+        rule_id=rule.id,
+        bot_chat_id=chat.id,
+        target_platform="telegram",
+        target_id=chat.chat_id,
+        status=status,
+        next_attempt_at=next_attempt_at,
+    )
+    session.add(item)
+    await session.commit()
+    return item
+
+
+async def _reconcile(engine) -> int:
+    async with engine.begin() as conn:
+        return await conn.run_sync(reconcile_counters)
+
+
+@pytest.mark.asyncio
+async def test_parse_and_platform_counters_follow_status_changes(engine, db_session):
+    first = await _add_content(db_session, ContentStatus.UNPROCESSED)
+    await _add_content(db_session, ContentStatus.PARSE_FAILED, platform="weibo")
+    await _add_content(db_session, ContentStatus.UNPROCESSED, discovery_state=DiscoveryState.VISIBLE)
+
+    stats = await build_parse_stats(db_session)
+    assert stats == {"unprocessed": 1, "processing": 0, "parse_success": 0, "parse_failed": 1, "total": 2}
+
+    first.status = ContentStatus.PARSE_SUCCESS
+    await db_session.commit()
+    stats = await build_parse_stats(db_session)
+    assert stats["unprocessed"] == 0 and stats["parse_success"] == 1 and stats["total"] == 2
+    assert await build_platform_counts(db_session) == {"bilibili": 1, "weibo": 1}
+
+    await db_session.execute(delete(Content).where(Content.id == first.id))
+    await db_session.commit()
+    assert (await build_parse_stats(db_session))["total"] == 1
+    assert await build_platform_counts(db_session) == {"weibo": 1}
+    assert await _reconcile(engine) == 0
+
+
+@pytest.mark.asyncio
+async def test_distribution_counters_follow_queue_and_content(engine, db_session):
+    rule, chats = await _add_rule_with_chats(db_session, 3)
+    content = await _add_content(db_session, ContentStatus.PARSE_SUCCESS)
+    pushed = await _enqueue(db_session, content, rule, chats[0], QueueItemStatus.SCHEDULED)
+    await _enqueue(db_session, content, rule, chats[1], QueueItemStatus.FAILED, datetime(2025, 1, 1))
+    await _enqueue(db_session, content, rule, chats[2], QueueItemStatus.FAILED)
+
+    pushed.status = QueueItemStatus.SUCCESS
+    await db_session.commit()
+
+    stats, breakdown = await build_distribution_stats(db_session, include_rule_breakdown=True)
+    assert stats == {"will_push": 1, "filtered": 1, "pushed": 1, "total": 3}
+    assert breakdown == {str(rule.id): stats}
+
+    # 内容不再是解析成功时，其队列项整体移出分发统计；恢复后重新计入
+    await db_session.execute(
+        update(Content).where(Content.id == content.id).values(status=ContentStatus.PROCESSING)
+    )
+    await db_session.commit()
+    assert (await build_distribution_stats(db_session))[0]["total"] == 0
+    await db_session.execute(
+        update(Content).where(Content.id == content.id).values(status=ContentStatus.PARSE_SUCCESS)
+    )
+    await db_session.commit()
+    assert (await build_distribution_stats(db_session))[0]["total"] == 3
+
+    # 删除内容级联删除队列项，不会重复扣减
+    await db_session.execute(delete(Content).where(Content.id == content.id))
+    await db_session.commit()
+    assert await db_session.scalar(select(ContentQueueItem.id).limit(1)) is None
+    assert (await build_distribution_stats(db_session))[0] == {"will_push": 0, "filtered": 0, "pushed": 0, "total": 0}
+    assert await _reconcile(engine) == 0
+
+
+@pytest.mark.asyncio
+async def test_reconcile_repairs_drift(engine, db_session):
+    await _add_content(db_session, ContentStatus.PARSE_SUCCESS)
+    assert await _reconcile(engine) == 0
+
+    await db_session.execute(text("UPDATE dashboard_counters SET count = count + 5 WHERE metric = 'parse'"))
+    await db_session.execute(
+        text("INSERT INTO dashboard_counters(metric, dim, bucket, count) VALUES ('platform', '', 'ghost', 2)")
+    )
+    await db_session.commit()
+    assert (await build_parse_stats(db_session))["total"] == 6
+
+    assert await _reconcile(engine) == 2
+    assert (await build_parse_stats(db_session))["total"] == 1
+    assert await build_platform_counts(db_session) == {"bilibili": 1}
@@ -0,0 +1,127 @@
+"""
+Tests for app.services.embedding_queue — batched indexing queue and the resumable reindex job.
+"""
+import asyncio
+import uuid
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Content, ContentEmbedding, ContentStatus
+from app.models.base import Base
+from app.services import embedding_queue, embedding_service
+from app.services.embedding_queue import EmbeddingIndexQueue, EmbeddingReindexJob
+from app.services.embedding_service import EmbeddingService
+from app.services.related_content import RelatedContentService
+
+
+@pytest.mark.asyncio
+async def test_queue_merges_batches_and_bounds_concurrency(monkeypatch):
+    batches: list[list[int]] = []
+    running = 0
+    peak = 0
+
+    async def fake_index_contents(self, content_ids, *, session=None):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        batches.append(list(content_ids))
+        await asyncio.sleep(0.01)
+        running -= 1
+        return list(content_ids)
+
+    refreshed: list[int] = []
+
+    async def fake_refresh(self, content_ids, *, reciprocal=False, session=None):
+        assert reciprocal
+        refreshed.extend(content_ids)
+        return len(content_ids)
+
+    monkeypatch.setattr(EmbeddingService, "index_contents", fake_index_contents)
+    monkeypatch.setattr(RelatedContentService, "refresh", fake_refresh)
+    queue = EmbeddingIndexQueue(batch_size=3, concurrency=1, linger_seconds=0.05)
+    for content_id in (1, 2, 3, 4, 2, 5, 6, 7):
+        queue.enqueue(content_id)
+    await queue.drain()
+
+    assert batches == [[1, 2, 3], [4, 5, 6], [7]]
+    assert refreshed == [1, 2, 3, 4, 5, 6, 7]  # 写入向量后增量更新相似内容
+    assert peak == 1
+    assert queue.pending == 0
+
+
+@pytest.fixture
+async def session_factory(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'reindex.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(embedding_queue, "AsyncSessionLocal", factory)
+    monkeypatch.setattr(embedding_service, "AsyncSessionLocal", factory)
+
+    model = f"reindex-{uuid.uuid4().hex[:8]}"
+
+    async def _value(self, result=None):
+        return result
+
+    monkeypatch.setattr(EmbeddingService, "_get_document_embedding_signature", lambda self: _value(self, model))
+    monkeypatch.setattr(EmbeddingService, "_get_embedding_api_key", lambda self: _value(self))
+
+    # 进度只保存在内存里，不访问全局设置表
+    store: dict = {}
+
+    async def load_state(self):
+        return dict(store["state"]) if "state" in store else None
+
+    async def save_state(self, state):
+        store["state"] = dict(state)
+
+    monkeypatch.setattr(EmbeddingReindexJob, "_load_state", load_state)
+    monkeypatch.setattr(EmbeddingReindexJob, "_save_state", save_state)
+    yield factory, store
+    await engine.dispose()
+
+
+@pytest.mark.asyncio
+async def test_reindex_job_completes_skips_unchanged_and_resumes(session_factory, monkeypatch):
+    factory, store = session_factory
+    async with factory() as session:
+        for i in range(5):
+            url = f"https://example.com/reindex/{i}"
+            session.add(Content(
+                platform="zhihu", url=url, canonical_url=url, title=f"title {i}", body=f"body {i}",
+                status=ContentStatus.PARSE_SUCCESS,
+            ))
+        await session.commit()
+        content_ids = list((await session.execute(select(Content.id).order_by(Content.id))).scalars())
+
+    job = EmbeddingReindexJob(batch_size=2, concurrency=2)
+    await job.start()
+    await job._task
+    state = await job.status()
+    assert state["status"] == "completed" and state["running"] is False
+    assert (state["total"], state["processed"], state["indexed"]) == (5, 5, 5)
+    async with factory() as session:
+        assert (await session.execute(select(func.count(ContentEmbedding.id)))).scalar_one() == 5
+
+    # 已完成后再次执行：从头扫描，但文本与模型未变的内容全部跳过
+    await job.start()
+    await job._task
+    assert (store["state"]["processed"], store["state"]["indexed"]) == (5, 0)
+
+    # 模拟上次运行在第 3 条后中断：只处理剩余内容
+    seen: list[int] = []
+    original = EmbeddingService.index_contents
+
+    async def recording(self, ids, *, session=None):
+        seen.extend(ids)
+        return await original(self, ids, session=session)
+
+    monkeypatch.setattr(EmbeddingService, "index_contents", recording)
+    store["state"].update(status="running", last_content_id=content_ids[2], processed=3)
+    await job.resume_if_interrupted()
+    await job._task
+    assert seen == content_ids[3:]
+    assert store["state"]["status"] == "completed" and store["state"]["processed"] == 5
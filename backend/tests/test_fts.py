@@ -0,0 +1,84 @@
+"""
+Tests for app.core.fts — trigger-maintained FTS5 index with CJK bigrams and bm25 ranking.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import delete, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.fts import build_match_query, ensure_fts, rebuild_fts, segment_text
+from app.models import Content, ContentStatus
+from app.models.base import Base
+from app.repositories.content_repository import ContentRepository
+from app.services.embedding_service import EmbeddingService
+
+
+def test_segment_and_match_query():
+    assert segment_text("学习Python机器学习") == " 学习 Python 机器 器学 学习 "
+    assert segment_text(None) is None
+    # 用户输入的 FTS5 语法字符被丢弃，每个词一个前缀短语
+    assert build_match_query('机器学习 "rust" -x*') == '"机器 器学 学习"* "rust"* "x"*'
+    assert build_match_query("  ?! ") is None
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'fts.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+        assert await conn.run_sync(ensure_fts)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def _add(session, title: str, body: str = "", **kwargs) -> Content:
+    url = f"https://example.com/fts/{uuid.uuid4().hex}"
+    content = Content(
+        platform="zhihu",
+        url=url,
+        canonical_url=url,
+        title=title,
+        body=body,
+        status=ContentStatus.PARSE_SUCCESS,
+        **kwargs,
+    )
+    session.add(content)
+    await session.commit()
+    return content
+
+
+@pytest.mark.asyncio
+async def test_triggers_keep_index_in_sync_and_rank_with_bm25(db_session):
+    in_body = await _add(db_session, "周末随笔", body="最近在读机器学习的入门书")
+    in_title = await _add(db_session, "机器学习实战", body="笔记")
+    tagged = await _add(db_session, "Rust notes", tags=["编程语言"], author_name="Ferris")
+
+    svc = EmbeddingService()
+    filters = svc._build_content_filters(platform=None, date_from=None, date_to=None)
+    # 标题权重高于正文
+    assert await svc._fts_rank_ids(session=db_session, query="机器学习", filters=filters, limit=10) == [
+        in_title.id,
+        in_body.id,
+    ]
+
+    repo = ContentRepository(db_session)
+    items, total = await repo.list_contents(q="编程")
+    assert total == 1 and items[0].id == tagged.id
+    assert (await repo.list_contents(q="ferr"))[1] == 1  # 作者列，前缀匹配
+
+    # 更新与删除由触发器同步
+    in_body.body = "与检索无关的内容"
+    await db_session.commit()
+    assert await svc._fts_rank_ids(session=db_session, query="机器学习", filters=filters, limit=10) == [in_title.id]
+    await db_session.execute(delete(Content).where(Content.id == in_title.id))
+    await db_session.commit()
+    assert (await repo.list_contents(q="机器学习"))[1] == 0
+
+    # 重建后结果一致
+    connection = await db_session.connection()
+    assert await connection.run_sync(rebuild_fts) == 2
+    assert (await repo.list_contents(q="rust"))[1] == 1
+    plan = (await db_session.execute(text("EXPLAIN QUERY PLAN SELECT rowid FROM contents_fts WHERE contents_fts MATCH 'x'"))).all()
+    assert "VIRTUAL TABLE INDEX" in str(plan)
@@ -0,0 +1,92 @@
+"""
+Tests for conditional GET / Range handling in the media router.
+"""
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.adapters.storage import LocalStorageBackend, get_storage_backend
+from app.main import app
+from app.media.proxy_cache import get_proxy_image_cache
+from app.media.responses import content_addressed_etag, parse_single_range
+
+SHA = "ab" * 32
+
+
+@pytest.fixture
+async def media_client(tmp_path):
+    storage = LocalStorageBackend(root_dir=str(tmp_path), pack_threshold_bytes=32)
+    app.dependency_overrides[get_storage_backend] = lambda: storage
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            yield client, storage
+    finally:
+        app.dependency_overrides.pop(get_storage_backend, None)
+        get_proxy_image_cache(storage).close()
+
+
+def test_content_addressed_etag():
+    assert content_addressed_etag(f"ns/blobs/sha256/ab/ab/{SHA}.webp") == f'"{SHA}"'
+    assert content_addressed_etag(f"ns/blobs/sha256/ab/ab/{SHA}.thumb.webp") == f'"{SHA}.thumb"'
+    assert content_addressed_etag("misc/avatar.png") is None
+
+
+def test_parse_single_range():
+    assert parse_single_range("bytes=0-9", 100) == (0, 9)
+    assert parse_single_range("bytes=90-", 100) == (90, 99)
+    assert parse_single_range("bytes=-10", 100) == (90, 99)
+    assert parse_single_range("bytes=0-1,5-6", 100) is None
+    assert parse_single_range("items=0-1", 100) is None
+    with pytest.raises(ValueError):
+        parse_single_range("bytes=100-", 100)
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [16, 256], ids=["packed", "loose"])
+async def test_proxy_media_revalidation_and_range(media_client, size):
+    client, storage = media_client
+    key = f"ns/blobs/sha256/ab/ab/{SHA}.webp"
+    payload = bytes(range(256))[:size]
+    await storage.put_bytes(key=key, data=payload, content_type="image/webp")
+
+    first = await client.get(f"/api/v1/media/{key}")
+    assert first.status_code == 200
+    assert first.headers["etag"] == f'"{SHA}"'
+    assert "last-modified" in first.headers
+
+    revalidated = await client.get(f"/api/v1/media/{key}", headers={"If-None-Match": f'W/"x", "{SHA}"'})
+    assert revalidated.status_code == 304
+    assert revalidated.content == b""
+    assert revalidated.headers["etag"] == f'"{SHA}"'
+
+    changed = await client.get(f"/api/v1/media/{key}", headers={"If-None-Match": '"other"'})
+    assert changed.status_code == 200
+
+    ranged = await client.get(f"/api/v1/media/{key}", headers={"Range": "bytes=4-7", "If-Range": f'"{SHA}"'})
+    assert ranged.status_code == 206
+    assert ranged.content == payload[4:8]
+
+    stale = await client.get(f"/api/v1/media/{key}", headers={"Range": "bytes=4-7", "If-Range": '"stale"'})
+    assert stale.status_code == 200
+    assert stale.content == payload
+
+
+@pytest.mark.asyncio
+async def test_proxy_image_hit_uses_sha_etag(media_client, monkeypatch):
+    client, storage = media_client
+    monkeypatch.setattr("app.routers.media._is_safe_url", lambda url: True)
+    url = "https://img.example.com/cat.jpg"
+    entry = await get_proxy_image_cache(storage).store(url, data=b"w" * 100, ext="webp", content_type="image/webp")
+
+    hit = await client.get("/api/v1/proxy/image", params={"url": url})
+    assert hit.status_code == 200
+    assert hit.headers["x-cache-status"] == "HIT"
+    assert hit.headers["etag"] == f'"{entry.sha256}"'
+
+    revalidated = await client.get(
+        "/api/v1/proxy/image", params={"url": url}, headers={"If-None-Match": hit.headers["etag"]}
+    )
+    assert revalidated.status_code == 304
+
+    ranged = await client.get("/api/v1/proxy/image", params={"url": url}, headers={"Range": "bytes=0-9"})
+    assert ranged.status_code == 206
+    assert ranged.content == b"w" * 10
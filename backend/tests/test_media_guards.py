@@ -0,0 +1,120 @@
+"""
+Tests for app.media.guards — decompression-bomb limits and memory budget.
+"""
+import asyncio
+import struct
+import zlib
+from io import BytesIO
+
+import httpx
+import pytest
+from PIL import Image
+
+from app.core.config import settings
+from app.media.guards import (
+    MediaLimitExceeded,
+    MediaMemoryBudget,
+    fetch_bytes_limited,
+    probe_image_header,
+)
+
+
+def _png_header_only(width: int, height: int) -> bytes:
+    """只有 IHDR 的 PNG：字节极小，但声明了巨大的画布"""
+    def chunk(kind: bytes, payload: bytes) -> bytes:
+        body = kind + payload
+        return struct.pack(">I", len(payload)) + body + struct.pack(">I", zlib.crc32(body))
+
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", ihdr) + chunk(b"IDAT", zlib.compress(b"\x00" * 64))
+
+
+def _gif(frames: int) -> bytes:
+    images = [Image.new("RGB", (4, 4), color=(i * 40 % 256, 0, 0)) for i in range(frames)]
+    out = BytesIO()
+    images[0].save(out, format="GIF", save_all=True, append_images=images[1:], duration=50)
+    return out.getvalue()
+
+
+def test_probe_rejects_huge_canvas_without_decoding(monkeypatch):
+    monkeypatch.setattr(settings, "media_max_image_pixels", 10_000_000)
+    with pytest.raises(MediaLimitExceeded) as exc:
+        probe_image_header(_png_header_only(40_000, 40_000))
+    assert exc.value.reason == "pixels"
+
+
+def test_probe_counts_frames_and_stops_at_limit(monkeypatch):
+    monkeypatch.setattr(settings, "media_max_image_frames", 100)
+    header = probe_image_header(_gif(5))
+    assert header.is_animated and header.frames == 5
+    assert header.decoded_bytes(all_frames=True) == 5 * 4 * 4 * 4
+
+    monkeypatch.setattr(settings, "media_max_image_frames", 3)
+    with pytest.raises(MediaLimitExceeded) as exc:
+        probe_image_header(_gif(5))
+    assert exc.value.reason == "frames"
+
+
+@pytest.mark.asyncio
+async def test_memory_budget_queues_and_rejects_oversized_jobs():
+    budget = MediaMemoryBudget(100)
+    with pytest.raises(MediaLimitExceeded):
+        async with budget.reserve(101):
+            pass
+
+    order = []
+
+    async def job(name, nbytes, hold):
+        async with budget.reserve(nbytes):
+            order.append(f"{name}+")
+            await asyncio.sleep(hold)
+            order.append(f"{name}-")
+
+    await asyncio.gather(job("a", 70, 0.05), job("b", 70, 0))
+    # b 必须等 a 归还额度
+    assert order == ["a+", "a-", "b+", "b-"]
+    assert budget.in_use == 0
+
+
+@pytest.mark.asyncio
+async def test_fetch_aborts_when_stream_exceeds_limit():
+    async def body():
+        yield b"x" * 600
+        yield b"x" * 600
+
+    def handler(request):
+        # 不声明 Content-Length 的分块响应
+        return httpx.Response(200, content=body())
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        with pytest.raises(MediaLimitExceeded) as exc:
+            await fetch_bytes_limited(client, "http://img.test/a.png", max_bytes=1000)
+        assert exc.value.reason == "download"
+
+        data, _ = await fetch_bytes_limited(client, "http://img.test/a.png", max_bytes=2000)
+        assert len(data) == 1200
+
+
+@pytest.mark.asyncio
+async def test_archive_stores_original_when_decode_limits_exceeded(monkeypatch):
+    from unittest.mock import AsyncMock, MagicMock, patch
+
+    from app.media.processor import store_archive_images_as_webp
+
+    monkeypatch.setattr(settings, "media_max_image_pixels", 1_000_000)
+    bomb = _png_header_only(20_000, 20_000)
+    storage = MagicMock()
+    storage.put_bytes = AsyncMock()
+    storage.get_url = MagicMock(return_value=None)
+
+    with patch("app.media.processor.fetch_bytes_limited", AsyncMock(return_value=(bomb, "image/png"))), \
+            patch("app.services.settings_service.get_setting_value", AsyncMock(return_value=None)):
+        archive = await store_archive_images_as_webp(
+            archive={"images": [{"url": "https://img.test/bomb.png"}]}, storage=storage, namespace="t"
+        )
+
+    stored = archive["stored_images"][0]
+    assert stored["content_type"] == "image/png"
+    assert stored["key"].endswith(".png")
+    # 只保存原图，不生成缩略图
+    storage.put_bytes.assert_awaited_once()
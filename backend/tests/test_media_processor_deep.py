@@ -64,19 +64,13 @@ async def test_store_archive_images_skips_on_download_failure():
 
     # First image: all 3 retries fail; second image: succeeds
     good_png = b'\x89PNG\r\n\x1a\n' + b'\x00' * 100
-    mock_resp_fail = MagicMock()
-    mock_resp_fail.raise_for_status.side_effect = Exception("Connection refused")
+    fetch = AsyncMock(side_effect=[
+        Exception("Connection refused"), Exception("Connection refused"), Exception("Connection refused"),
+        (good_png, "image/png"),  # second image succeeds
+    ])
 
-    mock_resp_ok = MagicMock()
-    mock_resp_ok.raise_for_status = MagicMock()
-    mock_resp_ok.content = good_png
-
-    with patch("httpx.AsyncClient") as mock_client_cls:
+    with patch("httpx.AsyncClient") as mock_client_cls, patch("app.media.processor.fetch_bytes_limited", fetch):
         mock_client = AsyncMock()
-        mock_client.get = AsyncMock(side_effect=[
-            mock_resp_fail, mock_resp_fail, mock_resp_fail,  # 3 retries for first image
-            mock_resp_ok,  # second image succeeds
-        ])
         mock_client_cls.return_value.__aenter__ = AsyncMock(return_value=mock_client)
         mock_client_cls.return_value.__aexit__ = AsyncMock(return_value=False)
 
@@ -107,13 +101,10 @@ async def test_store_archive_images_rewrites_markdown_with_local_url():
     mock_storage.get_url = MagicMock(return_value="http://local/ignored.webp")
 
     good_png = b'\x89PNG\r\n\x1a\n' + b'\x00' * 128
-    mock_resp_ok = MagicMock()
-    mock_resp_ok.raise_for_status = MagicMock()
-    mock_resp_ok.content = good_png
+    fetch = AsyncMock(return_value=(good_png, "image/png"))
 
-    with patch("httpx.AsyncClient") as mock_client_cls:
+    with patch("httpx.AsyncClient") as mock_client_cls, patch("app.media.processor.fetch_bytes_limited", fetch):
         mock_client = AsyncMock()
-        mock_client.get = AsyncMock(return_value=mock_resp_ok)
         mock_client_cls.return_value.__aenter__ = AsyncMock(return_value=mock_client)
         mock_client_cls.return_value.__aexit__ = AsyncMock(return_value=False)
 
@@ -181,13 +172,10 @@ async def test_store_archive_images_keeps_bang_in_request_url():
     mock_storage.put_bytes = AsyncMock()
     mock_storage.get_url = MagicMock(return_value="http://local/img.webp")
 
-    mock_resp_ok = MagicMock()
-    mock_resp_ok.raise_for_status = MagicMock()
-    mock_resp_ok.content = b"\x89PNG\r\n\x1a\n" + b"\x00" * 128
+    fetch = AsyncMock(return_value=(b"\x89PNG\r\n\x1a\n" + b"\x00" * 128, "image/png"))
 
-    with patch("httpx.AsyncClient") as mock_client_cls:
+    with patch("httpx.AsyncClient") as mock_client_cls, patch("app.media.processor.fetch_bytes_limited", fetch):
         mock_client = AsyncMock()
-        mock_client.get = AsyncMock(return_value=mock_resp_ok)
         mock_client_cls.return_value.__aenter__ = AsyncMock(return_value=mock_client)
         mock_client_cls.return_value.__aexit__ = AsyncMock(return_value=False)
 
@@ -197,17 +185,49 @@ async def test_store_archive_images_keeps_bang_in_request_url():
                     archive=archive, storage=mock_storage, namespace="test"
                 )
 
-    request_url = mock_client.get.await_args.args[0]
+    request_url = fetch.await_args.args[1]
     assert request_url.endswith("!nd_dft_wlteh_webp_3")
     assert "%21" not in request_url
 
-def test_image_to_webp_ffmpeg_mocked():
+def _mock_ffmpeg_proc(returncode, stdout=b"", stderr=b""):
+    proc = MagicMock()
+    proc.returncode = returncode
+    proc.communicate = AsyncMock(return_value=(stdout, stderr))
+    return proc
+
+
+@pytest.mark.asyncio
+async def test_image_to_webp_ffmpeg_mocked():
     """Test ffmpeg bridge returns None on non-zero returncode."""
     from app.media.processor import _image_to_webp_ffmpeg
-    import subprocess
 
-    with patch("subprocess.run") as mock_run:
-        mock_run.return_value = MagicMock(returncode=1, stderr=b"error")
-        result = _image_to_webp_ffmpeg(b"fake_image_data")
+    proc = _mock_ffmpeg_proc(1, stderr=b"error")
+    with patch("asyncio.create_subprocess_exec", AsyncMock(return_value=proc)) as mock_exec:
+        result = await _image_to_webp_ffmpeg(b"fake_image_data")
         assert result is None
-        mock_run.assert_called_once()
+        mock_exec.assert_awaited_once()
+        proc.communicate.assert_awaited_once_with(input=b"fake_image_data")
+
+
+@pytest.mark.asyncio
+async def test_image_to_webp_ffmpeg_pipes_and_fixes_riff_size():
+    """Output read from stdout gets its RIFF size patched; dimensions come from the caller."""
+    from app.media.processor import _image_to_webp_ffmpeg
+
+    # 管道输出时 RIFF 大小字段未回写（为 0）
+    piped = b"RIFF" + b"\x00\x00\x00\x00" + b"WEBP" + b"VP8X" + b"\x00" * 20
+    proc = _mock_ffmpeg_proc(0, stdout=piped)
+    with patch("asyncio.create_subprocess_exec", AsyncMock(return_value=proc)) as mock_exec:
+        data, width, height = await _image_to_webp_ffmpeg(b"gif", size=(320, 240))
+
+    assert "pipe:0" in mock_exec.await_args.args and "pipe:1" in mock_exec.await_args.args
+    assert int.from_bytes(data[4:8], "little") == len(piped) - 8
+    assert (width, height) == (320, 240)
+
+
+@pytest.mark.asyncio
+async def test_image_to_webp_ffmpeg_missing_binary():
+    from app.media.processor import _image_to_webp_ffmpeg
+
+    with patch("asyncio.create_subprocess_exec", AsyncMock(side_effect=FileNotFoundError("ffmpeg"))):
+        assert await _image_to_webp_ffmpeg(b"gif") is None
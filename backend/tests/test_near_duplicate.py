@@ -0,0 +1,120 @@
+"""
+Tests for app.services.near_duplicate — SimHash fingerprints, LSH band lookup and the parse short-circuit.
+"""
+import uuid
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.adapters.base import ParsedContent
+from app.models import Content, ContentFingerprint, ContentStatus, Platform
+from app.models.base import Base
+from app.services.near_duplicate import (
+    NearDuplicateService,
+    band_values,
+    compute_simhash,
+    hamming_distance,
+    simhash_features,
+)
+from app.tasks.parsing import ContentParser
+
+ARTICLE = (
+    "向量检索把文本映射为稠密向量，再用近似最近邻索引在海量数据中查找语义相近的内容。"
+    "倒排文件索引先对向量聚类，查询时只扫描距离最近的若干个簇，从而把线性扫描变成亚线性查找。"
+    "Product quantization compresses each vector into a handful of bytes so that millions of items fit in memory, "
+    "and a final exact re-ranking step restores most of the recall lost to quantization."
+)
+
+
+def test_simhash_is_stable_across_reposts():
+    original = compute_simhash(simhash_features("向量检索入门", f"<p>{ARTICLE}</p>"))
+    # 转载：纯文本、链接不同、末尾多一句
+    repost = compute_simhash(simhash_features(
+        "向量检索入门",
+        f"{ARTICLE} 原文链接 https://mirror.example.com/post/1",
+    ))
+    unrelated = compute_simhash(simhash_features("周末做饭", "番茄炒蛋先炒蛋再炒番茄，出锅前加一点糖提鲜。" * 5))
+
+    assert original == compute_simhash(simhash_features("向量检索入门", f"<p>{ARTICLE}</p>"))
+    assert hamming_distance(original, repost) <= 3
+    assert hamming_distance(original, unrelated) > 10
+    assert len(band_values(original)) == 4
+    # 距离不超过 3 时至少一段完全相同
+    assert set(enumerate(band_values(original))) & set(enumerate(band_values(repost)))
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'dedup.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def _add(session) -> Content:
+    url = f"https://example.com/dedup/{uuid.uuid4().hex}"
+    content = Content(platform=Platform.ZHIHU, url=url, canonical_url=url, status=ContentStatus.PROCESSING)
+    session.add(content)
+    await session.commit()
+    return content
+
+
+def _parsed(body: str) -> ParsedContent:
+    return ParsedContent(
+        platform="zhihu",
+        content_type="article",
+        content_id=uuid.uuid4().hex,
+        clean_url="https://example.com/clean",
+        title="向量检索入门",
+        body=body,
+        layout_type="article",
+        media_urls=["https://example.com/a.jpg"],
+    )
+
+
+@pytest.mark.asyncio
+async def test_service_indexes_originals_and_points_duplicates_at_them(db_session):
+    svc = NearDuplicateService()
+    original = await _add(db_session)
+    repost = await _add(db_session)
+    short = await _add(db_session)
+
+    assert await svc.check(db_session, original, "向量检索入门", ARTICLE) is None
+    await db_session.commit()
+    assert await svc.check(db_session, repost, "向量检索入门", ARTICLE + " 转载自知乎") == original.id
+    await db_session.commit()
+    assert repost.duplicate_of_id == original.id
+    assert await db_session.get(ContentFingerprint, repost.id) is None
+
+    # 原始内容重新解析不会命中自身
+    assert await svc.check(db_session, original, "向量检索入门", ARTICLE) is None
+    # 短文本不参与判重
+    assert await svc.check(db_session, short, "好", "好") is None
+
+
+@pytest.mark.asyncio
+async def test_parse_skips_media_embedding_and_distribution_for_duplicates(db_session):
+    original = await _add(db_session)
+    repost = await _add(db_session)
+    parser = ContentParser()
+    adapter = MagicMock()
+
+    with patch("app.services.settings_service.get_setting_value", new=AsyncMock(side_effect=lambda key, default=None: default)), \
+         patch("app.tasks.parsing.extract_cover_color", new=AsyncMock(return_value=None)), \
+         patch("app.core.events.event_bus.publish", new_callable=AsyncMock), \
+         patch.object(ContentParser, "_maybe_process_private_archive_media", new_callable=AsyncMock) as media, \
+         patch.object(ContentParser, "_schedule_embedding_index") as schedule:
+        await parser._update_content(db_session, original, _parsed(ARTICLE), adapter)
+        await parser._update_content(db_session, repost, _parsed(ARTICLE + " 转载"), adapter)
+
+    assert original.duplicate_of_id is None and repost.duplicate_of_id == original.id
+    assert repost.status == ContentStatus.PARSE_SUCCESS
+    assert media.await_count == 1
+    schedule.assert_called_once_with(original.id)
+
+    with patch("app.services.distribution.scheduler.enqueue_content", new_callable=AsyncMock) as enqueue:
+        await parser._check_auto_approval(db_session, repost)
+    enqueue.assert_not_awaited()
@@ -0,0 +1,138 @@
+"""
+Tests for app.media.proxy_cache — bounded proxy image cache.
+"""
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from app.adapters.storage import LocalStorageBackend
+from app.media.proxy_cache import ProxyImageCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    storage = LocalStorageBackend(root_dir=str(tmp_path))
+    c = ProxyImageCache(storage, max_bytes=1000)
+    yield c
+    c.close()
+
+
+@pytest.mark.asyncio
+async def test_store_then_lookup_hits_index(cache):
+    url = "https://example.com/a.jpg"
+    assert await cache.lookup(url) is None
+
+    entry = await cache.store(url, data=b"x" * 100, ext="webp", content_type="image/webp")
+    assert os.path.exists(entry.path)
+
+    hit = await cache.lookup(url)
+    assert hit is not None
+    assert hit.key == entry.key
+    assert hit.size == 100
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["total_bytes"] == 100
+
+
+@pytest.mark.asyncio
+async def test_lookup_drops_entry_when_file_missing(cache):
+    url = "https://example.com/gone.jpg"
+    entry = await cache.store(url, data=b"x" * 50, ext="webp", content_type="image/webp")
+    os.remove(entry.path)
+
+    assert await cache.lookup(url) is None
+    assert cache.stats()["total_bytes"] == 0
+
+
+@pytest.mark.asyncio
+async def test_store_evicts_least_recently_used(cache):
+    old = await cache.store("https://example.com/old.jpg", data=b"o" * 400, ext="webp", content_type="image/webp")
+    mid = await cache.store("https://example.com/mid.jpg", data=b"m" * 400, ext="webp", content_type="image/webp")
+    new = await cache.store("https://example.com/new.jpg", data=b"n" * 400, ext="webp", content_type="image/webp")
+
+    assert not os.path.exists(old.path)
+    assert os.path.exists(mid.path)
+    assert os.path.exists(new.path)
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["total_bytes"] == 800
+
+
+@pytest.mark.asyncio
+async def test_lookup_adopts_legacy_cache_file(cache):
+    url = "https://example.com/legacy.png"
+    key = ProxyImageCache.build_key(ProxyImageCache.hash_url(url), "png")
+    await cache.storage.put_bytes(key=key, data=b"p" * 30, content_type="image/png")
+
+    hit = await cache.lookup(url)
+    assert hit is not None
+    assert hit.content_type == "image/png"
+    assert hit.sha256 == hashlib.sha256(b"p" * 30).hexdigest()
+    assert cache.stats()["total_bytes"] == 30
+
+
+@pytest.mark.asyncio
+async def test_lookup_backfills_missing_digest(cache):
+    url = "https://example.com/old-index.jpg"
+    await cache.store(url, data=b"d" * 20, ext="webp", content_type="image/webp")
+    # 早期索引写入的条目没有摘要
+    with cache._db_lock:
+        cache._connect().execute("UPDATE entries SET sha256 = NULL")
+
+    assert (await cache.lookup(url)).sha256 == hashlib.sha256(b"d" * 20).hexdigest()
+    with cache._db_lock:
+        assert cache._connect().execute("SELECT sha256 FROM entries").fetchone()[0] is not None
+
+
+@pytest.mark.asyncio
+async def test_restore_with_new_extension_removes_old_file(cache):
+    url = "https://example.com/changed.img"
+    old = await cache.store(url, data=b"j" * 300, ext="jpeg", content_type="image/jpeg")
+    new = await cache.store(url, data=b"w" * 100, ext="webp", content_type="image/webp")
+
+    assert not os.path.exists(old.path)
+    assert os.path.exists(new.path)
+    assert cache.stats()["total_bytes"] == 100
+    assert cache.storage.usage.snapshot()["namespaces"]["proxy_cache"] == {"bytes": 100, "files": 1}
+    assert (await cache.lookup(url)).key == new.key
+
+
+@pytest.mark.asyncio
+async def test_single_flight_coalesces_concurrent_misses(cache):
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"payload"
+
+    url = "https://example.com/hot.jpg"
+    results = await asyncio.gather(*[cache.single_flight(url, fetch) for _ in range(5)])
+
+    assert calls == 1
+    assert all(data == b"payload" for data, _ in results)
+    assert sum(1 for _, coalesced in results if coalesced) == 4
+    stats = cache.stats()
+    assert stats["misses"] == 1
+    assert stats["coalesced"] == 4
+    assert stats["inflight"] == 0
+
+
+@pytest.mark.asyncio
+async def test_single_flight_propagates_errors_and_resets(cache):
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("upstream down")
+
+    url = "https://example.com/bad.jpg"
+    with pytest.raises(RuntimeError):
+        await cache.single_flight(url, failing)
+
+    async def ok():
+        return b"ok"
+
+    data, coalesced = await cache.single_flight(url, ok)
+    assert data == b"ok"
+    assert coalesced is False
@@ -0,0 +1,82 @@
+"""
+Tests for app.services.related_content — precomputed neighbours and their incremental maintenance.
+"""
+import uuid
+
+import numpy as np
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.models import Content, ContentEmbedding, ContentNeighbors, ContentStatus
+from app.models.base import Base
+from app.services import related_content
+from app.services.embedding_service import EmbeddingService
+from app.services.related_content import RelatedContentService, unpack_neighbors
+from app.services.vector_cache import VectorMatrixCache, pack_vector
+
+
+@pytest.fixture
+async def session_factory(tmp_path, monkeypatch):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'related.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(related_content, "AsyncSessionLocal", factory)
+
+    model = f"related-{uuid.uuid4().hex[:8]}"
+
+    async def _signature(self):
+        return model
+
+    monkeypatch.setattr(EmbeddingService, "_get_document_embedding_signature", _signature)
+    cache = VectorMatrixCache()
+    monkeypatch.setattr(related_content, "get_vector_cache", lambda: cache)
+    yield factory, model
+    await engine.dispose()
+
+
+async def _add(session, model: str, vector) -> int:
+    url = f"https://example.com/related/{uuid.uuid4().hex}"
+    content = Content(platform="zhihu", url=url, canonical_url=url, title=url, status=ContentStatus.PARSE_SUCCESS)
+    session.add(content)
+    await session.flush()
+    vec = np.asarray(vector, dtype=np.float32)
+    session.add(ContentEmbedding(
+        content_id=content.id,
+        embedding_model=model,
+        embedding_blob=pack_vector(vec / np.linalg.norm(vec)),
+        embedding_dim=vec.size,
+    ))
+    await session.commit()
+    return content.id
+
+
+@pytest.mark.asyncio
+async def test_neighbours_are_precomputed_and_updated_incrementally(session_factory):
+    factory, model = session_factory
+    svc = RelatedContentService(k=2)
+    async with factory() as session:
+        a = await _add(session, model, [1.0, 0.0, 0.0])
+        b = await _add(session, model, [0.9, 0.1, 0.0])
+        c = await _add(session, model, [0.0, 1.0, 0.0])
+        d = await _add(session, model, [0.0, 0.0, 1.0])
+
+        assert await svc.get_related(session, a, 5) is None  # 尚未计算
+
+    assert await svc.refresh_stale() == 4
+    assert await svc.refresh_stale() == 0  # 已是最新，不再重算
+    async with factory() as session:
+        related = await svc.get_related(session, a, 5)
+        assert [content.id for content, _ in related] == [b, c]
+        assert related[0][1] == pytest.approx(0.9 / np.linalg.norm([0.9, 0.1]), rel=1e-5)
+
+        # 新内容：计算自身近邻，并挤进相似度更高的已有列表
+        e = await _add(session, model, [1.0, 0.05, 0.0])
+        assert await svc.refresh([e], reciprocal=True, session=session) == 1
+        await session.commit()
+
+        assert [cid for cid, _ in unpack_neighbors(await session.get(ContentNeighbors, e))] == [a, b]
+        assert [content.id for content, _ in await svc.get_related(session, a, 5)] == [e, b]
+        # d 与 e 正交，不应被替换
+        assert e not in [content.id for content, _ in await svc.get_related(session, d, 5)]
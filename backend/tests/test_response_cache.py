@@ -0,0 +1,157 @@
+"""
+Tests for app.core.response_cache — data-version keyed ETag caching of read-heavy endpoints.
+"""
+import uuid
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.core.data_versions import read_versions
+from app.core.database import get_db
+from app.core.response_cache import get_response_cache
+from app.main import app
+from app.models import Content, ContentStatus
+from app.models.base import Base
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'etag.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+async def db_session(engine):
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+
+
+@pytest.fixture
+async def client(engine):
+    async def _get_db():
+        async with AsyncSession(engine, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_db] = _get_db
+    get_response_cache().clear()
+    headers = {"X-API-Token": settings.api_token.get_secret_value() if settings.api_token else ""}
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test", headers=headers) as c:
+            yield c
+    finally:
+        app.dependency_overrides.pop(get_db, None)
+
+
+async def _add_content(session, **kwargs) -> Content:
+    url = f"https://example.com/etag/{uuid.uuid4().hex}"
+    content = Content(platform="zhihu", url=url, canonical_url=url, **kwargs)
+    session.add(content)
+    await session.commit()
+    return content
+
+
+@pytest.mark.asyncio
+async def test_data_versions_bumped_by_writes(db_session):
+    epoch, contents, queue_items = await read_versions(db_session, ("contents", "content_queue_items"))
+    assert epoch != 0 and (contents, queue_items) == (0, 0)
+
+    content = await _add_content(db_session)
+    await db_session.execute(update(Content).where(Content.id == content.id).values(title="changed"))
+    await db_session.commit()
+    assert await read_versions(db_session, ("contents", "content_queue_items")) == (epoch, 2, 0)
+
+    await db_session.delete(content)
+    await db_session.commit()
+    assert await read_versions(db_session, ("contents",)) == (epoch, 3)
+
+
+@pytest.mark.asyncio
+async def test_tags_etag_revalidation(client: AsyncClient, db_session):
+    await _add_content(db_session, tags=["etag-a"])
+
+    first = await client.get("/api/v1/tags")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert first.json() == [{"name": "etag-a", "count": 1}]
+
+    # 数据未变：条件请求返回 304，普通请求命中缓存体
+    not_modified = await client.get("/api/v1/tags", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == etag
+    hits = get_response_cache().hits
+    cached = await client.get("/api/v1/tags")
+    assert cached.content == first.content and cached.headers["etag"] == etag
+    assert get_response_cache().hits == hits + 1
+
+    # 写入后版本变化，旧 ETag 失效
+    await _add_content(db_session, tags=["etag-b"])
+    changed = await client.get("/api/v1/tags", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != etag
+    assert {item["name"] for item in changed.json()} == {"etag-a", "etag-b"}
+
+
+@pytest.mark.asyncio
+async def test_contents_cache_keyed_by_query(client: AsyncClient, db_session):
+    content = await _add_content(db_session, status=ContentStatus.PARSE_SUCCESS, title="etag list")
+    await _add_content(db_session, status=ContentStatus.PARSE_SUCCESS, title="etag other")
+
+    page = await client.get("/api/v1/contents", params={"size": 1})
+    other = await client.get("/api/v1/contents", params={"size": 2})
+    assert page.headers["etag"] != other.headers["etag"]
+    assert len(other.json()["items"]) == 2
+
+    await db_session.execute(update(Content).where(Content.id == content.id).values(title="etag list changed"))
+    await db_session.commit()
+    refreshed = await client.get("/api/v1/contents", params={"size": 2}, headers={"If-None-Match": other.headers["etag"]})
+    assert refreshed.status_code == 200
+    assert "etag list changed" in {item["title"] for item in refreshed.json()["items"]}
+
+    # 非法游标不缓存、不带 ETag
+    invalid = await client.get("/api/v1/contents", params={"cursor": "invalid"})
+    assert invalid.status_code == 400 and "etag" not in invalid.headers
+
+
+@pytest.mark.asyncio
+async def test_body_only_edit_invalidates_contents_search(client: AsyncClient, db_session):
+    content = await _add_content(db_session, status=ContentStatus.PARSE_SUCCESS, body="旧的正文")
+    _, contents, blobs = await read_versions(db_session, ("contents", "content_blobs"))
+
+    first = await client.get("/api/v1/contents", params={"q": "改写后的正文"})
+    assert first.json()["items"] == []
+
+    # 只改大字段：contents 行不变，副表版本号变化
+    content.body = "改写后的正文"
+    await db_session.commit()
+    assert (await read_versions(db_session, ("contents", "content_blobs")))[1:] == (contents, blobs + 1)
+
+    refreshed = await client.get("/api/v1/contents", params={"q": "改写后的正文"}, headers={"If-None-Match": first.headers["etag"]})
+    assert refreshed.status_code == 200
+    assert [item["id"] for item in refreshed.json()["items"]] == [content.id]
+
+
+@pytest.mark.asyncio
+async def test_new_database_does_not_reuse_etags(tmp_path, client: AsyncClient, engine):
+    first = await client.get("/api/v1/tags")
+
+    # 重建后的库版本号从头计数，纪元不同
+    fresh = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'fresh.db'}")
+    async with fresh.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+    async def _fresh_db():
+        async with AsyncSession(fresh, expire_on_commit=False) as session:
+            yield session
+
+    app.dependency_overrides[get_db] = _fresh_db
+    try:
+        again = await client.get("/api/v1/tags", headers={"If-None-Match": first.headers["etag"]})
+        assert again.status_code == 200 and again.headers["etag"] != first.headers["etag"]
+    finally:
+        await fresh.dispose()
@@ -0,0 +1,114 @@
+"""
+Tests for app.services.search_cache — query-embedding LRU and ranked-id cache used by semantic search.
+"""
+import uuid
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.models import Content, ContentStatus
+from app.models.base import Base
+from app.services import search_cache
+from app.services.embedding_service import EmbeddingService
+from app.services.search_cache import LRUCache
+
+
+def test_lru_cache_evicts_oldest_and_expires(monkeypatch):
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)  # b 最久未用，被淘汰
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+
+    now = [100.0]
+    monkeypatch.setattr(search_cache.time, "monotonic", lambda: now[0])
+    ttl = LRUCache(8, ttl_seconds=30)
+    ttl.put("q", [1])
+    now[0] += 29
+    assert ttl.get("q") == [1]
+    now[0] += 2
+    assert ttl.get("q") is None and len(ttl) == 0
+
+    disabled = LRUCache(0)
+    disabled.put("x", 1)
+    assert disabled.get("x") is None
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'search.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+async def _add_content(session, title: str) -> Content:
+    url = f"https://example.com/search/{uuid.uuid4().hex}"
+    content = Content(platform="zhihu", url=url, canonical_url=url, title=title, body=title, status=ContentStatus.PARSE_SUCCESS)
+    session.add(content)
+    await session.commit()
+    return content
+
+
+@pytest.mark.asyncio
+async def test_repeated_search_skips_embedding_and_ranking(db_session, monkeypatch):
+    monkeypatch.setattr(search_cache, "_query_embedding_cache", LRUCache(16))
+    monkeypatch.setattr(search_cache, "_ranked_ids_cache", LRUCache(16, ttl_seconds=60))
+    model = f"search-{uuid.uuid4().hex[:8]}"
+    svc = EmbeddingService()
+
+    async def _value(result):
+        return result
+
+    monkeypatch.setattr(svc, "_get_document_embedding_signature", lambda: _value(model))
+    monkeypatch.setattr(svc, "_get_embedding_api_key", lambda: _value(None))
+
+    embedded: list[str] = []
+    original_embed = svc._embed_texts
+
+    async def counting_embed(texts, *, task_type):
+        if task_type == svc._QUERY_TASK_TYPE:
+            embedded.extend(texts)
+        return await original_embed(texts, task_type=task_type)
+
+    monkeypatch.setattr(svc, "_embed_texts", counting_embed)
+
+    apple = await _add_content(db_session, "apple orchard harvest")
+    await svc.index_content(apple.id, session=db_session)
+    await db_session.commit()
+
+    first = await svc.search(query="apple  orchard", top_k=5, session=db_session)
+    assert [hit.content.id for hit in first] == [apple.id]
+    second = await svc.search(query=" apple orchard ", top_k=5, session=db_session)
+    assert [hit.content.id for hit in second] == [apple.id]
+    assert embedded == ["apple orchard"]  # 规范化后命中同一缓存项
+
+    # 新内容写入后数据版本变化：重新排序，但查询向量仍来自 LRU
+    pie = await _add_content(db_session, "apple orchard pie")
+    await svc.index_content(pie.id, session=db_session)
+    await db_session.commit()
+    third = await svc.search(query="apple orchard", top_k=5, session=db_session)
+    assert {hit.content.id for hit in third} == {apple.id, pie.id}
+    assert embedded == ["apple orchard"]
+
+
+@pytest.mark.asyncio
+async def test_ranked_cache_key_tracks_body_edits_and_deletes(db_session):
+    svc = EmbeddingService()
+    older = await _add_content(db_session, "older post")
+    newer = await _add_content(db_session, "newer post")
+    version = await svc._search_data_version(db_session, "model")
+
+    # 只改正文：contents.updated_at 不变，但副表版本变化
+    newer.body = "rewritten body"
+    await db_session.commit()
+    edited = await svc._search_data_version(db_session, "model")
+    assert edited != version
+
+    # 删除非最新一行：updated_at 水位不变，版本号仍变化
+    await db_session.delete(older)
+    await db_session.commit()
+    assert await svc._search_data_version(db_session, "model") != edited
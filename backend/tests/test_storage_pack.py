@@ -0,0 +1,113 @@
+"""
+Tests for app.adapters.storage.pack — pack-file storage for small objects.
+"""
+import asyncio
+import os
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from app.adapters.storage import LocalStorageBackend, get_storage_backend
+from app.main import app
+
+
+@pytest.fixture
+def storage(tmp_path):
+    backend = LocalStorageBackend(root_dir=str(tmp_path), pack_threshold_bytes=100, pack_segment_max_bytes=250)
+    yield backend
+    backend.packs.close()
+    backend.usage.close()
+
+
+@pytest.mark.asyncio
+async def test_small_objects_are_packed_large_stay_loose(storage):
+    thumb = "ns/blobs/sha256/ab/cd/abcd.thumb.webp"
+    big = "ns/blobs/sha256/ab/cd/abcd.webp"
+    await storage.put_bytes(key=thumb, data=b"t" * 50, content_type="image/webp")
+    await storage.put_bytes(key=big, data=b"b" * 500, content_type="image/webp")
+
+    assert not os.path.exists(storage._full_path(thumb))
+    assert os.path.exists(storage._full_path(big))
+    assert await storage.exists(key=thumb)
+    assert await storage.get_bytes(thumb) == b"t" * 50
+    assert storage.locate(thumb).packed is True
+    assert storage.usage.snapshot()["namespaces"]["thumbs"] == {"bytes": 50, "files": 1}
+
+    assert await storage.delete(key=thumb) is True
+    assert not await storage.exists(key=thumb)
+    assert storage.usage.snapshot()["namespaces"]["thumbs"] == {"bytes": 0, "files": 0}
+
+
+@pytest.mark.asyncio
+async def test_compaction_reclaims_garbage_and_keeps_live_objects(storage):
+    for i in range(6):
+        await storage.put_bytes(key=f"proxy_cache/k{i}.webp", data=bytes([i]) * 80, content_type="image/webp")
+    # 段上限 250 字节：每段 3 个对象，前两段已封存
+    for i in range(3):
+        await storage.delete(key=f"proxy_cache/k{i}.webp")
+
+    before = storage.packs.stats()
+    assert before["garbage_bytes"] == 240
+
+    result = await storage.compact_packs(garbage_ratio=0.5)
+    assert result["compacted_segments"] == 1
+    after = storage.packs.stats()
+    assert after["garbage_bytes"] == 0
+    for i in range(3, 6):
+        assert await storage.get_bytes(f"proxy_cache/k{i}.webp") == bytes([i]) * 80
+
+    totals = await storage.reconcile_usage()
+    assert totals["proxy_cache"] == {"bytes": 240, "files": 3}
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_put_is_idempotent_and_extractable(storage):
+    key = "ns/blobs/sha256/12/34/1234.thumb.webp"
+    await storage.put_bytes(key=key, data=b"x" * 60, content_type="image/webp")
+    await storage.put_bytes(key=key, data=b"x" * 60, content_type="image/webp")
+    assert storage.packs.stats()["segment_bytes"] == 60
+    assert storage.usage.snapshot()["namespaces"]["thumbs"] == {"bytes": 60, "files": 1}
+
+    # 推送渠道需要文件路径：打包对象解出为独立副本，同一位置复用
+    path = storage.get_local_path(key=key)
+    assert path is not None and path.endswith("1234.thumb.webp")
+    with open(path, "rb") as f:
+        assert f.read() == b"x" * 60
+    assert storage.get_local_path(key=key) == path
+    assert storage.get_local_path(key="ns/blobs/sha256/12/34/missing.webp") is None
+
+
+@pytest.mark.asyncio
+async def test_reads_do_not_wait_for_the_write_lock(storage):
+    key = "proxy_cache/reader.webp"
+    await storage.put_bytes(key=key, data=b"r" * 40, content_type="image/webp")
+
+    # 压缩等长时间写操作持有写锁时，定位与读取照常进行
+    with storage.packs._write_lock():
+        located = await asyncio.wait_for(asyncio.to_thread(storage.locate, key), timeout=5)
+        data = await asyncio.wait_for(storage.get_bytes(key), timeout=5)
+    assert located.packed and data == b"r" * 40
+
+
+@pytest.mark.asyncio
+async def test_media_route_serves_packed_object_with_range(storage):
+    key = "ns/blobs/sha256/ef/01/ef01.thumb.webp"
+    payload = bytes(range(64))
+    await storage.put_bytes(key=key, data=payload, content_type="image/webp")
+
+    app.dependency_overrides[get_storage_backend] = lambda: storage
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as client:
+            full = await client.get(f"/api/v1/media/{key}")
+            ranged = await client.get(f"/api/v1/media/{key}", headers={"Range": "bytes=10-19"})
+            bad = await client.get(f"/api/v1/media/{key}", headers={"Range": "bytes=100-"})
+    finally:
+        app.dependency_overrides.pop(get_storage_backend, None)
+
+    assert full.status_code == 200
+    assert full.content == payload
+    assert full.headers["content-type"] == "image/webp"
+    assert ranged.status_code == 206
+    assert ranged.content == payload[10:20]
+    assert ranged.headers["content-range"] == "bytes 10-19/64"
+    assert bad.status_code == 416
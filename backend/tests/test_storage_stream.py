@@ -0,0 +1,137 @@
+"""
+Tests for streaming storage writes and streamed video archiving.
+"""
+import hashlib
+import os
+
+import httpx
+import pytest
+
+from app.adapters.storage import LocalStorageBackend, StorageLimitExceeded
+from app.media.processor import _download_video_stream
+
+
+async def _aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.fixture
+def storage(tmp_path):
+    return LocalStorageBackend(root_dir=str(tmp_path))
+
+
+def _staging_files(storage):
+    staging = os.path.join(storage.root_dir, ".staging")
+    return os.listdir(staging) if os.path.exists(staging) else []
+
+
+@pytest.mark.asyncio
+async def test_put_stream_content_addressed_key(storage):
+    chunks = [b"a" * 10, b"b" * 10, b"c" * 5]
+    expected_sha = hashlib.sha256(b"".join(chunks)).hexdigest()
+
+    stored = await storage.put_stream(
+        chunks=_aiter(chunks),
+        key=lambda sha: f"blobs/{sha}.bin",
+        content_type="application/octet-stream",
+    )
+
+    assert stored.sha256 == expected_sha
+    assert stored.size == 25
+    assert stored.key == f"blobs/{expected_sha}.bin"
+    assert await storage.get_bytes(stored.key) == b"".join(chunks)
+    assert _staging_files(storage) == []
+
+
+@pytest.mark.asyncio
+async def test_put_stream_enforces_max_bytes(storage):
+    with pytest.raises(StorageLimitExceeded):
+        await storage.put_stream(
+            chunks=_aiter([b"x" * 8, b"x" * 8]),
+            key="too_big.bin",
+            content_type="application/octet-stream",
+            max_bytes=10,
+        )
+
+    assert not await storage.exists(key="too_big.bin")
+    assert _staging_files(storage) == []
+
+
+class _FlakyStream(httpx.AsyncByteStream):
+    def __init__(self, data: bytes):
+        self._data = data
+
+    async def __aiter__(self):
+        yield self._data
+        raise httpx.ReadError("connection reset")
+
+
+@pytest.mark.asyncio
+async def test_download_video_stream_resumes_with_range(storage, monkeypatch):
+    # 续传从最后一个完整分块处开始，缩小分块以便部分数据能落盘
+    monkeypatch.setattr("app.media.processor._VIDEO_STREAM_CHUNK_SIZE", 100)
+    payload = b"0123456789" * 100
+    seen_ranges = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        range_header = request.headers.get("range")
+        seen_ranges.append(range_header)
+        if range_header is None:
+            return httpx.Response(
+                200,
+                headers={"content-type": "video/mp4", "content-length": str(len(payload))},
+                stream=_FlakyStream(payload[:400]),
+            )
+        start = int(range_header.split("=")[1].rstrip("-"))
+        return httpx.Response(
+            206,
+            headers={
+                "content-type": "video/mp4",
+                "content-range": f"bytes {start}-{len(payload) - 1}/{len(payload)}",
+            },
+            content=payload[start:],
+        )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        stored = await _download_video_stream(
+            client=client,
+            storage=storage,
+            orig_url="https://video.example.com/v.mp4",
+            namespace="ns",
+            max_bytes=None,
+        )
+
+    assert stored is not None
+    assert seen_ranges == [None, "bytes=400-"]
+    assert stored.sha256 == hashlib.sha256(payload).hexdigest()
+    assert stored.key.endswith(".mp4")
+    assert await storage.get_bytes(stored.key) == payload
+    assert _staging_files(storage) == []
+
+
+@pytest.mark.asyncio
+async def test_download_video_stream_skips_declared_oversize(storage):
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        return httpx.Response(
+            200,
+            headers={"content-type": "video/mp4", "content-length": "5000"},
+            content=b"x" * 5000,
+        )
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        stored = await _download_video_stream(
+            client=client,
+            storage=storage,
+            orig_url="https://video.example.com/big.mp4",
+            namespace="ns",
+            max_bytes=1000,
+        )
+
+    assert stored is None
+    assert calls == 1
+    assert _staging_files(storage) == []
@@ -0,0 +1,116 @@
+"""
+Tests for app.adapters.storage.usage — incremental storage usage ledger.
+"""
+import os
+
+import pytest
+
+from app.adapters.storage import LocalStorageBackend
+from app.adapters.storage.usage import classify_key, is_internal_key
+from app.media.proxy_cache import ProxyImageCache
+
+
+async def _aiter(chunks):
+    for chunk in chunks:
+        yield chunk
+
+
+@pytest.fixture
+def storage(tmp_path):
+    backend = LocalStorageBackend(root_dir=str(tmp_path))
+    yield backend
+    backend.usage.close()
+
+
+def _ns(storage, name):
+    return storage.usage.snapshot()["namespaces"][name]
+
+
+def test_classify_key():
+    assert classify_key("proxy_cache/ab/cd/abcd.webp") == "proxy_cache"
+    assert classify_key("vaultstream/blobs/sha256/ab/cd/abcd.thumb.webp") == "thumbs"
+    assert classify_key("vaultstream/blobs/sha256/ab/cd/abcd.webp") == "blobs"
+    assert classify_key("sha256:abcd") == "blobs"
+    assert classify_key("misc/file.txt") == "other"
+
+    assert is_internal_key(".packs/seg-000001.pack") and is_internal_key(".usage.db-wal")
+    assert is_internal_key("proxy_cache/index.db-wal") and is_internal_key("ns/blobs/a.webp.tmp")
+    assert not is_internal_key("proxy_cache/ab/cd/abcd.webp")
+
+
+@pytest.mark.asyncio
+async def test_put_overwrite_delete_update_counters(storage):
+    key = "ns/blobs/sha256/ab/cd/abcd.webp"
+    await storage.put_bytes(key=key, data=b"x" * 100, content_type="image/webp")
+    assert _ns(storage, "blobs") == {"bytes": 100, "files": 1}
+
+    await storage.put_bytes(key=key, data=b"x" * 40, content_type="image/webp")
+    assert _ns(storage, "blobs") == {"bytes": 40, "files": 1}
+
+    await storage.put_bytes(key="proxy_cache/aa/bb/aabb.webp", data=b"p" * 10, content_type="image/webp")
+    assert storage.usage.snapshot()["total_bytes"] == 50
+
+    assert await storage.delete(key=key) is True
+    assert await storage.delete(key=key) is False
+    assert _ns(storage, "blobs") == {"bytes": 0, "files": 0}
+    assert _ns(storage, "proxy_cache") == {"bytes": 10, "files": 1}
+
+
+@pytest.mark.asyncio
+async def test_put_stream_counts_committed_file(storage):
+    await storage.put_stream(
+        chunks=_aiter([b"a" * 30, b"b" * 20]),
+        key=lambda sha: f"ns/blobs/sha256/{sha[:2]}/{sha[2:4]}/{sha}.mp4",
+        content_type="video/mp4",
+    )
+    assert _ns(storage, "blobs") == {"bytes": 50, "files": 1}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_fixes_drift(storage):
+    await storage.put_bytes(key="ns/blobs/sha256/ab/cd/abcd.thumb.webp", data=b"t" * 25, content_type="image/webp")
+    await storage.put_bytes(key="misc/a.txt", data=b"o" * 5, content_type="text/plain")
+    # 绕过后端直接删除文件，台账产生漂移
+    os.remove(storage._full_path("misc/a.txt"))
+    assert _ns(storage, "other")["files"] == 1
+    assert storage.usage.snapshot()["reconciled_at"] is None
+
+    storage.usage.reconcile()
+
+    snapshot = storage.usage.snapshot()
+    assert snapshot["namespaces"]["other"] == {"bytes": 0, "files": 0}
+    assert snapshot["namespaces"]["thumbs"] == {"bytes": 25, "files": 1}
+    assert snapshot["total_bytes"] == 25
+    assert snapshot["reconciled_at"] is not None
+
+
+@pytest.mark.asyncio
+async def test_reconcile_agrees_with_incremental_counts(storage):
+    cache = ProxyImageCache(storage, max_bytes=0)
+    try:
+        await cache.store("https://img.example.com/a.jpg", data=b"p" * 30, ext="webp", content_type="image/webp")
+        await storage.put_bytes(key="ns/blobs/sha256/ab/cd/abcd.webp", data=b"b" * 70, content_type="image/webp")
+        incremental = storage.usage.snapshot()["namespaces"]
+
+        # 代理缓存索引库、暂存文件与台账自身都不是存储对象，校准后计数不变
+        with open(storage._full_path("ns/blobs/sha256/ab/cd/abcd.webp") + ".tmp", "wb") as f:
+            f.write(b"partial")
+        assert storage.usage.reconcile() == incremental
+    finally:
+        cache.close()
+
+
+def test_reconcile_keeps_deltas_applied_during_the_walk(storage):
+    def packed_objects():
+        yield "ns/blobs/sha256/ab/cd/abcd.thumb.webp", 20
+        # 遍历进行中另一个写入者记账（对象位于遍历已经过或看不到的位置）
+        storage.usage.apply("ns/blobs/sha256/ef/01/ef01.webp", bytes_delta=64, files_delta=1)
+
+    totals = storage.usage.reconcile(extra_objects=packed_objects())
+
+    assert totals["blobs"] == {"bytes": 64, "files": 1}
+    assert totals["thumbs"] == {"bytes": 20, "files": 1}
+    assert storage.usage.snapshot()["namespaces"]["blobs"] == {"bytes": 64, "files": 1}
+
+    # 没有并发写入时，校准结果与遍历一致
+    assert storage.usage.reconcile()["blobs"] == {"bytes": 0, "files": 0}
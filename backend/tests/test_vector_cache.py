@@ -0,0 +1,213 @@
+"""
+Tests for app.services.vector_cache — float32 BLOB embeddings and the in-memory matrix cache.
+"""
+import uuid
+from datetime import datetime
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+from app.core.config import settings
+from app.models import Content, ContentEmbedding, ContentStatus
+from app.models.base import Base
+from app.services.embedding_service import EmbeddingService
+from app.services.ann_index import IVFFlatIndex, nearest_centroids, train_centroids
+from app.services.vector_cache import (
+    ModelMatrix,
+    RowFilter,
+    get_vector_cache,
+    pack_vector,
+    quantize_int8,
+    unpack_vector,
+)
+
+
+def test_pack_roundtrip_and_matrix_ops():
+    blob = pack_vector([0.5, -1.0, 2.0])
+    assert len(blob) == 12
+    assert unpack_vector(blob).tolist() == [0.5, -1.0, 2.0]
+
+    matrix = ModelMatrix()
+    for cid, vec in ((1, [1, 0]), (2, [0, 1]), (3, [0.6, 0.8])):
+        assert matrix.upsert(cid, np.asarray(vec, dtype=np.float32))
+    assert not matrix.upsert(4, np.asarray([1, 0, 0], dtype=np.float32))
+
+    ranked = matrix.top_k(np.asarray([1, 0], dtype=np.float32), 2)
+    assert [cid for cid, _ in ranked] == [1, 3]
+
+    matrix.remove(1)
+    assert matrix.size == 2 and set(matrix.row_of) == {2, 3}
+    assert [cid for cid, _ in matrix.top_k(np.asarray([1, 0], dtype=np.float32), 5)] == [3, 2]
+    # 查询维度不符时不计算
+    assert matrix.top_k(np.asarray([1, 0, 0], dtype=np.float32), 5) == []
+
+
+def test_row_filter_restricts_scoring_to_matching_rows(monkeypatch):
+    rng = np.random.default_rng(5)
+    vectors = rng.standard_normal((600, 8)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    matrix = ModelMatrix()
+    for cid, vec in enumerate(vectors):
+        matrix.upsert(
+            cid,
+            vec,
+            platform=("zhihu", "bilibili", "twitter")[cid % 3],
+            created_at=datetime(2024, 1 + cid % 12, 1),
+        )
+    matrix.upsert(999, vectors[0])  # 属性未知：保留给 SQL 复核
+
+    query = vectors[1]
+    where = RowFilter(platform="bilibili", date_from=datetime(2024, 6, 1), date_to=datetime(2024, 9, 30))
+    expected = [cid for cid in range(600) if cid % 3 == 1 and 6 <= 1 + cid % 12 <= 9]
+    ranked = matrix.top_k(query, 1000, where=where)
+    assert {cid for cid, _ in ranked} == set(expected) | {999}
+    assert [s for _, s in ranked] == sorted((s for _, s in ranked), reverse=True)
+    assert matrix.top_k(query, 5, where=RowFilter(platform="weibo")) == [(999, pytest.approx(float(vectors[0] @ query)))]
+
+    # 子集达到 ANN 阈值时在探查的倒排表内按掩码过滤
+    monkeypatch.setattr(settings, "embedding_ann_min_rows", 10)
+    monkeypatch.setattr(settings, "embedding_ann_nprobe", 1)
+    index = IVFFlatIndex(train_centroids(vectors, 8, seed=0))
+    matrix.begin_ann_build()
+    matrix.attach_ann(index, nearest_centroids(matrix.vectors(slice(0, matrix.used)), index.centroids))
+    approx = matrix.top_k(query, 10, where=where)
+    assert len(approx) == 10 and {cid for cid, _ in approx} <= set(expected) | {999}
+
+
+def test_local_embedder_batch_matches_single_text():
+    svc = EmbeddingService()
+    texts = ["Apple 苹果 orchard_2024!", "", "rocket " * 200, "中文分词 测试 test"]
+    batch = svc._build_local_embeddings(texts)
+    assert batch.shape == (4, svc._LOCAL_DIM)
+    # 短文本走逐 token 路径，长批次走向量化路径，结果逐位一致
+    for text, row in zip(texts, batch):
+        assert np.array_equal(np.asarray(svc._build_local_embedding(text)), row)
+    assert not batch[1].any()
+    assert np.allclose(np.linalg.norm(batch[[0, 2, 3]], axis=1), 1.0)
+
+
+@pytest.fixture
+async def db_session(tmp_path):
+    """独立的文件库：回填走 session.bind 上的第二个连接"""
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'vectors.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSession(engine, expire_on_commit=False) as session:
+        yield session
+    await engine.dispose()
+
+
+@pytest.fixture
+def embedding_service(monkeypatch):
+    model = f"test-model-{uuid.uuid4().hex[:8]}"
+    svc = EmbeddingService()
+
+    async def _value(result):
+        return result
+
+    monkeypatch.setattr(svc, "_get_document_embedding_signature", lambda: _value(model))
+    monkeypatch.setattr(svc, "_get_embedding_model", lambda: _value(model))
+    monkeypatch.setattr(svc, "_get_embedding_api_key", lambda: _value(None))
+    monkeypatch.setattr(svc, "_get_embedding_output_dimensionality", lambda: _value(svc._LOCAL_DIM))
+    svc.model = model
+    return svc
+
+
+async def _add_content(session, title: str) -> Content:
+    url = f"https://example.com/vec/{uuid.uuid4().hex}"
+    content = Content(
+        platform="zhihu",
+        url=url,
+        canonical_url=url,
+        title=title,
+        body=title,
+        status=ContentStatus.PARSE_SUCCESS,
+    )
+    session.add(content)
+    await session.commit()
+    return content
+
+
+@pytest.mark.asyncio
+async def test_search_uses_matrix_and_updates_incrementally(db_session, embedding_service):
+    svc = embedding_service
+    cache = get_vector_cache()
+
+    apple = await _add_content(db_session, "apple banana orchard")
+    rocket = await _add_content(db_session, "rocket engine launch")
+    for content in (apple, rocket):
+        assert await svc.index_content(content.id, session=db_session)
+    await db_session.commit()
+
+    record = (
+        await db_session.execute(select(ContentEmbedding).where(ContentEmbedding.content_id == apple.id))
+    ).scalar_one()
+    assert record.embedding is None
+    assert record.embedding_dim == svc._LOCAL_DIM
+    assert len(record.embedding_blob) == svc._LOCAL_DIM * 4
+
+    query = await svc.embed_query("apple orchard")
+    filters = svc._build_content_filters(platform=None, date_from=None, date_to=None)
+    ranked = await svc._vector_rank_ids(session=db_session, query_vec=query, filters=filters, limit=1)
+    assert [cid for cid, _ in ranked] == [apple.id]
+    matrix = await cache.get(db_session, svc.model)
+    assert matrix.size == 2
+
+    # 提交后增量写入同一矩阵，不重建
+    launch = await _add_content(db_session, "rocket launch pad apple")
+    await svc.index_content(launch.id, session=db_session)
+    await db_session.commit()
+    assert matrix.row_of.keys() == {apple.id, rocket.id, launch.id}
+    assert await cache.get(db_session, svc.model) is matrix
+
+
+@pytest.mark.asyncio
+async def test_legacy_json_rows_are_backfilled(db_session, embedding_service):
+    svc = embedding_service
+    content = await _add_content(db_session, "legacy vector row")
+    vector = svc._build_local_embedding("legacy vector row")
+    db_session.add(ContentEmbedding(content_id=content.id, embedding_model=svc.model, embedding=vector))
+    await db_session.commit()
+
+    matrix = await get_vector_cache().get(db_session, svc.model)
+    assert matrix.size == 1
+    assert np.allclose(matrix.matrix[matrix.row_of[content.id]], vector)
+
+    content_id = content.id
+    db_session.expire_all()
+    record = (
+        await db_session.execute(select(ContentEmbedding).where(ContentEmbedding.content_id == content_id))
+    ).scalar_one()
+    assert record.embedding is None
+    assert np.allclose(unpack_vector(record.embedding_blob), vector)
+
+
+@pytest.mark.asyncio
+async def test_int8_matrix_is_reranked_with_stored_float_vectors(db_session, embedding_service, monkeypatch):
+    monkeypatch.setattr(settings, "embedding_quantization", "int8")
+    svc = embedding_service
+
+    codes, scales = quantize_int8(np.asarray([[0.5, -1.0, 0.25]], dtype=np.float32))
+    assert codes.dtype == np.int8 and codes[0].tolist() == [64, -127, 32]
+    assert np.allclose(codes[0] * scales[0], [0.5, -1.0, 0.25], atol=scales[0])
+
+    titles = ("apple banana orchard", "rocket engine launch", "apple pie recipe")
+    contents = [await _add_content(db_session, title) for title in titles]
+    for content in contents:
+        await svc.index_content(content.id, session=db_session)
+    await db_session.commit()
+
+    query = await svc.embed_query("apple orchard")
+    filters = svc._build_content_filters(platform=None, date_from=None, date_to=None)
+    ranked = await svc._vector_rank_ids(session=db_session, query_vec=query, filters=filters, limit=2)
+
+    matrix = await get_vector_cache().get(db_session, svc.model)
+    assert matrix.quantized and matrix.matrix.dtype == np.int8
+    assert ranked[0][0] == contents[0].id
+    # 返回的是 float32 原始向量的精确分数
+    record = (
+        await db_session.execute(select(ContentEmbedding).where(ContentEmbedding.content_id == contents[0].id))
+    ).scalar_one()
+    assert ranked[0][1] == pytest.approx(float(unpack_vector(record.embedding_blob) @ np.asarray(query, dtype=np.float32)))